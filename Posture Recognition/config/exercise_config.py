@@ -1,59 +1,209 @@
 """
 Exercise configuration file containing thresholds and parameters for each exercise
+
+Each exercise is described declaratively and compiled once by utils.rule_engine:
+
+- display_features: label shown in the UI -> feature name (see FEATURE_DEFINITIONS)
+- feature_defaults: value used when an optional feature's landmarks are missing
+- feedback: list of stages; within a stage the first matching rule wins, and a
+  later stage overrides the feedback of an earlier one. A rule marked
+  'incorrect' flags the form as incorrect.
+- rep_transitions: rep state machine; the first state in rep_states is the
+  starting state and a transition with 'counts_rep' completes a rep when the
+  form is correct.
+- tempo_phases: the rep states timed as the eccentric (lowering) and
+  concentric (lifting) part of a rep by utils.rep_events.TempoAnalytics.
+
+Conditions are lists of clauses that must all hold. A clause is
+(feature, op, threshold) or (feature, op, threshold, scale_feature). op is one
+of <, <=, >, >= or a negated form such as 'not >' (which also holds for NaN),
+the threshold is a number, a name in angle_thresholds or a tuple of those
+(multiplied together), and scale_feature multiplies the threshold.
+
+Thresholds tuned by tools/tune_thresholds.py are stored in
+tuned_thresholds.json next to this file. They override the values below only
+when USE_TUNED_THRESHOLDS is set, and every overridden value is logged.
 """
+import json
+import logging
+import os
+
+# Geometric features computed from the landmark dict
+# ('angle', a, b, c):        angle at b in degrees
+# ('abs_dx', a, b):          horizontal distance in pixels
+# ('dy', a, b):              b.y - a.y in pixels (positive when b is lower)
+# ('mid_dx', a, b, c, d):     signed horizontal offset of the midpoint of a-b from that of c-d
+# ('mid_abs_dx', a, b, c, d): horizontal offset between the midpoints of a-b and c-d
+# ('distance', a, b):        Euclidean distance in pixels
+# ('mean', f1, f2):          mean of two other features
+# ('midpoint', a, b), ('ratio', f1, f2): per-frame feature graph only (utils.feature_graph)
+FEATURE_DEFINITIONS = {
+    'left_elbow_angle': ('angle', 'left_shoulder', 'left_elbow', 'left_wrist'),
+    'right_elbow_angle': ('angle', 'right_shoulder', 'right_elbow', 'right_wrist'),
+    'left_knee_angle': ('angle', 'left_hip', 'left_knee', 'left_ankle'),
+    'right_knee_angle': ('angle', 'right_hip', 'right_knee', 'right_ankle'),
+    'left_hip_angle': ('angle', 'left_shoulder', 'left_hip', 'left_knee'),
+    'right_hip_angle': ('angle', 'right_shoulder', 'right_hip', 'right_knee'),
+    'left_shoulder_angle': ('angle', 'left_hip', 'left_shoulder', 'left_elbow'),
+    'right_shoulder_angle': ('angle', 'right_hip', 'right_shoulder', 'right_elbow'),
+    'avg_elbow_angle': ('mean', 'left_elbow_angle', 'right_elbow_angle'),
+    'avg_knee_angle': ('mean', 'left_knee_angle', 'right_knee_angle'),
+    'avg_hip_angle': ('mean', 'left_hip_angle', 'right_hip_angle'),
+    'avg_shoulder_angle': ('mean', 'left_shoulder_angle', 'right_shoulder_angle'),
+    'knee_distance': ('abs_dx', 'left_knee', 'right_knee'),
+    'hip_width': ('abs_dx', 'left_hip', 'right_hip'),
+    'shoulder_width': ('abs_dx', 'left_shoulder', 'right_shoulder'),
+    'feet_distance': ('abs_dx', 'left_ankle', 'right_ankle'),
+    'left_elbow_drift': ('abs_dx', 'left_elbow', 'left_shoulder'),
+    'right_elbow_drift': ('abs_dx', 'right_elbow', 'right_shoulder'),
+    'shoulder_elevation': ('dy', 'left_shoulder', 'left_elbow'),
+    'rotation_offset': ('mid_abs_dx', 'left_shoulder', 'right_shoulder', 'left_hip', 'right_hip'),
+    'rotation_side': ('mid_dx', 'left_shoulder', 'right_shoulder', 'left_hip', 'right_hip'),
+    'shoulder_elbow_distance': ('distance', 'left_shoulder', 'left_elbow'),
+    'shoulder_midpoint': ('midpoint', 'left_shoulder', 'right_shoulder'),
+    'hip_midpoint': ('midpoint', 'left_hip', 'right_hip'),
+    'torso_length': ('distance', 'shoulder_midpoint', 'hip_midpoint'),
+    'knee_hip_ratio': ('ratio', 'knee_distance', 'hip_width'),
+    'feet_hip_ratio': ('ratio', 'feet_distance', 'hip_width'),
+    # Body-size independent posture features for exercise recognition
+    'wrist_midpoint': ('midpoint', 'left_wrist', 'right_wrist'),
+    'torso_rise': ('dy', 'shoulder_midpoint', 'hip_midpoint'),
+    'wrist_rise': ('dy', 'wrist_midpoint', 'shoulder_midpoint'),
+    'torso_incline': ('ratio', 'torso_rise', 'torso_length'),
+    'wrist_height': ('ratio', 'wrist_rise', 'torso_length'),
+    'shoulder_width_ratio': ('ratio', 'shoulder_width', 'torso_length'),
+    'feet_width_ratio': ('ratio', 'feet_distance', 'torso_length')
+}
 
 # Exercise-specific angle thresholds and parameters
 EXERCISE_CONFIG = {
     'Push-ups': {
-        'required_landmarks': ['left_shoulder', 'left_elbow', 'left_wrist', 
+        'required_landmarks': ['left_shoulder', 'left_elbow', 'left_wrist',
                              'right_shoulder', 'right_elbow', 'right_wrist',
                              'left_hip', 'right_hip'],
         'angle_thresholds': {
             'down_position': 90,  # Degrees
             'up_position': 150,
             'body_alignment_min': 160,
-            'body_alignment_max': 200
+            'body_alignment_max': 200,
+            'full_depth_position': 45,
+            'extended_position': 160
         },
         'rep_states': ['up', 'down'],
+        'tempo_phases': {'eccentric': 'up', 'concentric': 'down'},
         'form_tips': {
             'body_alignment': "Keep your body straight - avoid sagging hips",
             'elbow_angle': "Lower down more - bend elbows to 90 degrees",
+            'lower_down': "Good position - now lower down",
             'good_form': "Good form!"
-        }
+        },
+        'missing_feedback': "Please ensure your full body is visible",
+        'display_features': {
+            'left_elbow': 'left_elbow_angle',
+            'right_elbow': 'right_elbow_angle',
+            'body_alignment': 'left_shoulder_angle'
+        },
+        'feedback': [
+            [
+                {'when': [('left_shoulder_angle', '<', 'body_alignment_min')], 'tip': 'body_alignment', 'incorrect': True},
+                {'when': [('left_shoulder_angle', '>', 'body_alignment_max')], 'tip': 'body_alignment', 'incorrect': True},
+                {'when': [('avg_elbow_angle', '<', 'full_depth_position')], 'tip': 'elbow_angle'},
+                {'when': [('avg_elbow_angle', '>', 'extended_position')], 'tip': 'lower_down'}
+            ]
+        ],
+        'rep_transitions': [
+            {'from': 'up', 'to': 'down', 'when': [('avg_elbow_angle', '<', 'down_position')]},
+            {'from': 'down', 'to': 'up', 'when': [('avg_elbow_angle', '>', 'up_position')], 'counts_rep': True}
+        ]
     },
-    
+
     'Squats': {
         'required_landmarks': ['left_hip', 'left_knee', 'left_ankle',
                              'right_hip', 'right_knee', 'right_ankle'],
         'angle_thresholds': {
             'down_position': 90,
             'up_position': 160,
-            'knee_valgus_ratio': 0.7  # Knee distance / hip distance
+            'knee_valgus_ratio': 0.7,  # Knee distance / hip distance
+            'deep_position': 70
         },
         'rep_states': ['up', 'down'],
+        'tempo_phases': {'eccentric': 'up', 'concentric': 'down'},
         'form_tips': {
             'depth': "Squat down - bend knees to 90 degrees",
             'knee_alignment': "Keep knees aligned with toes - don't let them cave in",
-            'good_depth': "Great depth! Now stand up"
-        }
+            'good_depth': "Great depth! Now stand up",
+            'squat_depth': "Good squat depth",
+            'full_range': "Lower down more for full range",
+            'good_form': "Good form!"
+        },
+        'missing_feedback': "Please ensure your legs are fully visible",
+        'display_features': {
+            'left_knee': 'left_knee_angle',
+            'right_knee': 'right_knee_angle',
+            'left_hip': 'left_hip_angle'
+        },
+        'feature_defaults': {'left_hip_angle': 180},
+        'feedback': [
+            [
+                {'when': [('avg_knee_angle', '<', 'deep_position')], 'tip': 'good_depth'},
+                {'when': [('avg_knee_angle', '<', 'down_position')], 'tip': 'squat_depth'},
+                {'when': [('avg_knee_angle', '>', 'up_position')], 'tip': 'depth'},
+                {'when': [], 'tip': 'full_range'}
+            ],
+            [
+                {'when': [('knee_distance', '<', 'knee_valgus_ratio', 'hip_width')], 'tip': 'knee_alignment', 'incorrect': True}
+            ]
+        ],
+        'rep_transitions': [
+            {'from': 'up', 'to': 'down', 'when': [('avg_knee_angle', '<', 'down_position')]},
+            {'from': 'down', 'to': 'up', 'when': [('avg_knee_angle', '>', 'up_position')], 'counts_rep': True}
+        ]
     },
-    
+
     'Bicep Curls': {
         'required_landmarks': ['left_shoulder', 'left_elbow', 'left_wrist',
                              'right_shoulder', 'right_elbow', 'right_wrist'],
         'angle_thresholds': {
             'contracted_position': 50,
             'extended_position': 140,
-            'elbow_stability_threshold': 50  # Max horizontal elbow movement
+            'elbow_stability_threshold': 50,  # Max horizontal elbow movement
+            'full_contraction': 45,
+            'curl_position': 90,
+            'start_position': 160
         },
         'rep_states': ['down', 'up'],
+        'tempo_phases': {'eccentric': 'up', 'concentric': 'down'},
         'form_tips': {
             'contraction': "Full contraction - great! Now lower slowly",
             'elbow_stability': "Keep elbows close to your body - don't swing",
-            'range_of_motion': "Continue curling up"
-        }
+            'range_of_motion': "Continue curling up",
+            'squeeze': "Good curl - squeeze at the top",
+            'start_curl': "Starting position - now curl up",
+            'good_form': "Good form!"
+        },
+        'missing_feedback': "Please ensure your arms are fully visible",
+        'display_features': {
+            'left_elbow': 'left_elbow_angle',
+            'right_elbow': 'right_elbow_angle'
+        },
+        'feedback': [
+            [
+                {'when': [('avg_elbow_angle', '<', 'full_contraction')], 'tip': 'contraction'},
+                {'when': [('avg_elbow_angle', '<', 'curl_position')], 'tip': 'squeeze'},
+                {'when': [('avg_elbow_angle', '>', 'start_position')], 'tip': 'start_curl'},
+                {'when': [], 'tip': 'range_of_motion'}
+            ],
+            [
+                {'when': [('left_elbow_drift', '>', 'elbow_stability_threshold')], 'tip': 'elbow_stability', 'incorrect': True},
+                {'when': [('right_elbow_drift', '>', 'elbow_stability_threshold')], 'tip': 'elbow_stability', 'incorrect': True}
+            ]
+        ],
+        'rep_transitions': [
+            {'from': 'down', 'to': 'up', 'when': [('avg_elbow_angle', '<', 'contracted_position')]},
+            {'from': 'up', 'to': 'down', 'when': [('avg_elbow_angle', '>', 'extended_position')], 'counts_rep': True}
+        ]
     },
-    
+
     'Plank Hold': {
         'required_landmarks': ['left_shoulder', 'left_hip', 'left_knee',
                              'right_shoulder', 'right_hip', 'right_knee'],
@@ -61,16 +211,40 @@ EXERCISE_CONFIG = {
             'ideal_alignment_min': 170,
             'ideal_alignment_max': 190,
             'sag_threshold': 160,
-            'pike_threshold': 200
+            'pike_threshold': 200,
+            'shoulder_elbow_max_distance': 100  # Pixels
         },
         'rep_states': ['holding'],
         'form_tips': {
             'sag': "Raise your hips - avoid sagging",
             'pike': "Lower your hips - keep body straight",
-            'perfect': "Perfect plank position! Hold it!"
-        }
+            'perfect': "Perfect plank position! Hold it!",
+            'shoulders_over_elbows': "Keep shoulders directly over elbows",
+            'hold': "Hold steady!"
+        },
+        'missing_feedback': "Please ensure your full body is visible",
+        'default_tip': 'hold',
+        'display_features': {
+            'left_body': 'left_hip_angle',
+            'right_body': 'right_hip_angle'
+        },
+        # The shoulder check only runs while the forearm is in view
+        'feature_requires': {'shoulder_elbow_distance': ['left_wrist']},
+        'feedback': [
+            [
+                {'when': [('avg_hip_angle', '<', 'sag_threshold')], 'tip': 'pike', 'incorrect': True},
+                {'when': [('avg_hip_angle', '>', 'pike_threshold')], 'tip': 'sag', 'incorrect': True},
+                {'when': [('avg_hip_angle', '>=', 'ideal_alignment_min'),
+                          ('avg_hip_angle', '<=', 'ideal_alignment_max')], 'tip': 'perfect'}
+            ],
+            [
+                {'when': [('shoulder_elbow_distance', '>', 'shoulder_elbow_max_distance')],
+                 'tip': 'shoulders_over_elbows', 'incorrect': True}
+            ]
+        ],
+        'rep_transitions': []  # Plank is a hold exercise
     },
-    
+
     'Crunches': {
         'required_landmarks': ['left_shoulder', 'left_hip', 'left_knee',
                              'right_shoulder', 'right_hip', 'right_knee'],
@@ -78,64 +252,182 @@ EXERCISE_CONFIG = {
             'contracted_position': 130,
             'extended_position': 155,
             'knee_bend_min': 70,
-            'knee_bend_max': 120
+            'knee_bend_max': 120,
+            'full_contraction': 120,
+            'partial_contraction': 140,
+            'start_position': 160
         },
         'rep_states': ['down', 'up'],
+        'tempo_phases': {'eccentric': 'up', 'concentric': 'down'},
         'form_tips': {
             'contraction': "Great crunch! Feel the squeeze, now lower",
             'knee_position': "Keep knees bent at 90 degrees",
-            'range': "Lift your shoulders off the ground"
-        }
+            'range': "Lift your shoulders off the ground",
+            'hold_contraction': "Good contraction - hold briefly",
+            'start_crunch': "Starting position - now crunch up",
+            'good_form': "Good form!"
+        },
+        'missing_feedback': "Please ensure your torso and legs are visible",
+        'display_features': {
+            'left_torso': 'left_hip_angle',
+            'right_torso': 'right_hip_angle',
+            'left_knee': 'left_knee_angle'
+        },
+        'feature_defaults': {'left_knee_angle': 90},
+        'feedback': [
+            [
+                {'when': [('avg_hip_angle', '<', 'full_contraction')], 'tip': 'contraction'},
+                {'when': [('avg_hip_angle', '<', 'partial_contraction')], 'tip': 'hold_contraction'},
+                {'when': [('avg_hip_angle', '>', 'start_position')], 'tip': 'start_crunch'},
+                {'when': [], 'tip': 'range'}
+            ],
+            [
+                {'when': [('left_knee_angle', '>', 'knee_bend_max')], 'tip': 'knee_position', 'incorrect': True}
+            ]
+        ],
+        'rep_transitions': [
+            {'from': 'down', 'to': 'up', 'when': [('avg_hip_angle', '<', 'contracted_position')]},
+            {'from': 'up', 'to': 'down', 'when': [('avg_hip_angle', '>', 'extended_position')], 'counts_rep': True}
+        ]
     },
-    
+
     'Sit-ups': {
         'required_landmarks': ['left_shoulder', 'left_hip', 'left_knee',
                              'right_shoulder', 'right_hip', 'right_knee'],
         'angle_thresholds': {
             'full_up_position': 60,
             'down_position': 150,
-            'mid_range': 90
+            'mid_range': 90,
+            'full_sit_up': 45,
+            'start_position': 160
         },
         'rep_states': ['down', 'up'],
+        'tempo_phases': {'eccentric': 'up', 'concentric': 'down'},
         'form_tips': {
             'full_range': "Full sit-up! Touch your knees, now lower",
             'continue_up': "Keep going up - full range of motion",
-            'starting': "Starting position - now sit up fully"
-        }
+            'starting': "Starting position - now sit up fully",
+            'great_range': "Great range! Continue to knees",
+            'good_form': "Good form!"
+        },
+        'missing_feedback': "Please ensure your full body is visible",
+        'display_features': {
+            'left_torso': 'left_hip_angle',
+            'right_torso': 'right_hip_angle'
+        },
+        'feedback': [
+            [
+                {'when': [('avg_hip_angle', '<', 'full_sit_up')], 'tip': 'full_range'},
+                {'when': [('avg_hip_angle', '<', 'mid_range')], 'tip': 'great_range'},
+                {'when': [('avg_hip_angle', '>', 'start_position')], 'tip': 'starting'},
+                {'when': [], 'tip': 'continue_up'}
+            ]
+        ],
+        'rep_transitions': [
+            {'from': 'down', 'to': 'up', 'when': [('avg_hip_angle', '<', 'full_up_position')]},
+            {'from': 'up', 'to': 'down', 'when': [('avg_hip_angle', '>', 'down_position')], 'counts_rep': True}
+        ]
     },
-    
+
     'Pull-ups': {
         'required_landmarks': ['left_shoulder', 'left_elbow', 'left_wrist',
                              'right_shoulder', 'right_elbow', 'right_wrist'],
         'angle_thresholds': {
             'up_position': 100,
             'down_position': 150,
-            'shoulder_elevation_threshold': 0  # Shoulder above elbow
+            'shoulder_elevation_threshold': 0,  # Shoulder above elbow
+            'chin_over_bar_position': 90,
+            'almost_up_position': 120,
+            'dead_hang_position': 160,
+            'shoulder_drop_limit': -20  # Pixels
         },
         'rep_states': ['down', 'up'],
+        'tempo_phases': {'eccentric': 'up', 'concentric': 'down'},
         'form_tips': {
             'chin_over_bar': "Excellent! Chin over bar - now lower",
             'dead_hang': "Dead hang position - now pull up",
-            'keep_pulling': "Keep pulling - engage your lats"
-        }
+            'keep_pulling': "Keep pulling - engage your lats",
+            'almost_there': "Great pull! Almost there",
+            'active_hang': "Hang with arms extended - shoulders active",
+            'good_form': "Good form!"
+        },
+        'missing_feedback': "Please ensure your arms are fully visible",
+        'display_features': {
+            'left_elbow': 'left_elbow_angle',
+            'right_elbow': 'right_elbow_angle',
+            'shoulder_elevation': 'shoulder_elevation'
+        },
+        'feedback': [
+            [
+                {'when': [('avg_elbow_angle', '<', 'chin_over_bar_position'),
+                          ('shoulder_elevation', '>', 'shoulder_elevation_threshold')], 'tip': 'chin_over_bar'},
+                {'when': [('avg_elbow_angle', '<', 'almost_up_position')], 'tip': 'almost_there'},
+                {'when': [('avg_elbow_angle', '>', 'dead_hang_position')], 'tip': 'dead_hang'},
+                {'when': [], 'tip': 'keep_pulling'}
+            ],
+            [
+                {'when': [('avg_elbow_angle', '>', 'dead_hang_position'),
+                          ('shoulder_elevation', '<', 'shoulder_drop_limit')], 'tip': 'active_hang', 'incorrect': True}
+            ]
+        ],
+        'rep_transitions': [
+            {'from': 'down', 'to': 'up', 'when': [('avg_elbow_angle', '<', 'up_position'),
+                                                  ('shoulder_elevation', '>', 'shoulder_elevation_threshold')]},
+            {'from': 'up', 'to': 'down', 'when': [('avg_elbow_angle', '>', 'down_position')], 'counts_rep': True}
+        ]
     },
-    
+
     'Russian Twists': {
         'required_landmarks': ['left_shoulder', 'right_shoulder', 'left_hip', 'right_hip'],
         'angle_thresholds': {
             'torso_lean_min': 100,
             'torso_lean_max': 140,
             'rotation_threshold': 0.25,  # Percentage of shoulder width
-            'center_threshold': 0.5      # Return to center threshold
+            'center_threshold': 0.5,     # Return to center threshold
+            'good_rotation_ratio': 0.3,
+            'small_rotation_ratio': 0.1
         },
-        'rep_states': ['center', 'twisted'],
+        'rep_states': ['center', 'twisted_left', 'twisted_right'],   # Sides in the (mirrored) image
         'form_tips': {
             'lean_back': "Lean back at 45 degrees - engage your core",
             'rotate_more': "Twist more - rotate your torso",
-            'good_rotation': "Good rotation! Now twist to other side"
-        }
+            'good_rotation': "Good rotation! Now twist to other side",
+            'good_form': "Good form!"
+        },
+        'missing_feedback': "Please ensure your torso is visible",
+        'display_features': {
+            'torso_lean': 'left_hip_angle',
+            'rotation_offset': 'rotation_offset',
+            'shoulder_width': 'shoulder_width'
+        },
+        'feature_defaults': {'left_hip_angle': 90},
+        'feedback': [
+            [
+                {'when': [('left_hip_angle', '<', 'torso_lean_min')], 'tip': 'lean_back', 'incorrect': True},
+                {'when': [('left_hip_angle', '>', 'torso_lean_max')], 'tip': 'lean_back', 'incorrect': True}
+            ],
+            [
+                {'when': [('rotation_offset', '>', 'good_rotation_ratio', 'shoulder_width')], 'tip': 'good_rotation'},
+                {'when': [('rotation_offset', '<', 'small_rotation_ratio', 'shoulder_width')], 'tip': 'rotate_more'}
+            ]
+        ],
+        # Every return to center = 1 rep. Fast twists at low frame rates can pass
+        # center between two frames, so the signed offset only has to come back
+        # into the center band or cross to the other side.
+        'rep_transitions': [
+            {'from': 'center', 'to': 'twisted_left',
+             'when': [('rotation_side', '<', (-1, 'rotation_threshold'), 'shoulder_width')]},
+            {'from': 'center', 'to': 'twisted_right',
+             'when': [('rotation_side', '>', 'rotation_threshold', 'shoulder_width')]},
+            {'from': 'twisted_left', 'to': 'center',
+             'when': [('rotation_side', '>', (-1, 'rotation_threshold', 'center_threshold'), 'shoulder_width')],
+             'counts_rep': True},
+            {'from': 'twisted_right', 'to': 'center',
+             'when': [('rotation_side', '<', ('rotation_threshold', 'center_threshold'), 'shoulder_width')],
+             'counts_rep': True}
+        ]
     },
-    
+
     'Jumping Jacks': {
         'required_landmarks': ['left_shoulder', 'right_shoulder', 'left_hip', 'right_hip',
                              'left_ankle', 'right_ankle'],
@@ -148,8 +440,35 @@ EXERCISE_CONFIG = {
         'form_tips': {
             'perfect_jump': "Perfect jump position! Now jump back",
             'raise_arms': "Raise your arms overhead when jumping out",
-            'lower_arms': "Lower arms when feet are together"
-        }
+            'lower_arms': "Lower arms when feet are together",
+            'start_jump': "Starting position - now jump out",
+            'good_form': "Good form!"
+        },
+        'missing_feedback': "Please ensure your full body is visible",
+        'display_features': {
+            'feet_distance': 'feet_distance',
+            'left_arm': 'left_shoulder_angle',
+            'right_arm': 'right_shoulder_angle'
+        },
+        'feature_defaults': {'left_shoulder_angle': 90, 'right_shoulder_angle': 90},
+        'feedback': [
+            [
+                {'when': [('feet_distance', '>', 'feet_apart_ratio', 'hip_width'),
+                          ('avg_shoulder_angle', '>', 'arms_up_angle')], 'tip': 'perfect_jump'},
+                {'when': [('feet_distance', '>', 'feet_apart_ratio', 'hip_width')], 'tip': 'raise_arms', 'incorrect': True},
+                {'when': [('avg_shoulder_angle', '>', 'arms_up_angle')], 'tip': 'lower_arms', 'incorrect': True},
+                {'when': [], 'tip': 'start_jump'}
+            ]
+        ],
+        'rep_transitions': [
+            {'from': 'feet_together', 'to': 'feet_apart',
+             'when': [('feet_distance', '>', 'feet_apart_ratio', 'hip_width'),
+                      ('avg_shoulder_angle', '>', 'arms_up_angle')]},
+            {'from': 'feet_apart', 'to': 'feet_together',
+             'when': [('feet_distance', 'not >', 'feet_apart_ratio', 'hip_width'),
+                      ('avg_shoulder_angle', 'not >', 'arms_up_angle')],
+             'counts_rep': True}
+        ]
     }
 }
 
@@ -168,5 +487,89 @@ UI_CONFIG = {
     'line_thickness': 3,
     'circle_radius': 8,
     'feedback_box_alpha': 0.7,
-    'angle_display_precision': 1  # Decimal places
-}
\ No newline at end of file
+    'angle_display_precision': 1,  # Decimal places
+    'stats_refresh_hz': 4,  # Max refresh rate of the Streamlit statistics panel
+    'heartbeat_interval': 0.5  # Seconds between live-status writes (Streamlit handles clicks only on a write)
+}
+
+# Video transport for the Streamlit apps: 'image' sends frames through st.image,
+# 'mjpeg' encodes once and serves them from a local MJPEG endpoint
+VIDEO_TRANSPORT = {
+    'mode': 'image',
+    'jpeg_quality': 80,
+    'scale': 1.0,               # Downscale factor applied before encoding
+    'host': '127.0.0.1',
+    'port': 8765,
+    'public_url': None          # Override when the browser reaches the stream through a proxy
+}
+
+# Automatic exercise recognition (utils.exercise_recognizer). Per-frame features
+# are summarized over a sliding window (mean, spread and mean absolute velocity)
+# and classified by a softmax model trained with tools/train_recognizer.py.
+RECOGNITION_CONFIG = {
+    'model_path': 'models/exercise_recognizer.npz',   # Relative to the project directory
+    'features': [
+        'left_elbow_angle', 'right_elbow_angle', 'left_knee_angle', 'right_knee_angle',
+        'left_hip_angle', 'right_hip_angle', 'left_shoulder_angle', 'right_shoulder_angle',
+        'torso_incline', 'wrist_height', 'shoulder_width_ratio', 'feet_width_ratio'
+    ],
+    'window': 45,              # Frames (about 1.5 s at 30 FPS)
+    'min_confidence': 0.8,     # Class probability needed to count towards a switch
+    'switch_frames': 20        # Consecutive confident frames before switching exercise
+}
+
+# Change gate (utils.change_gate): a frame whose landmarks all moved less than
+# epsilon pixels since the last analysed frame reuses that frame's analysis
+CHANGE_GATE_CONFIG = {
+    'epsilon': 6.0,
+    'max_reuse': 15            # Frames in a row (about 0.5 s at 30 FPS)
+}
+
+# Landmark quality gate (utils.landmark_quality), run when validate_landmarks is
+# on: frames that fail it are rejected before any landmark extraction or analysis
+QUALITY_GATE_CONFIG = {
+    'min_landmarks': 33,
+    'max_missing_joints': 0,        # Required landmarks of the exercise that may be missing
+    'position_bounds': (0.0, 1.0),  # Normalized bounds of the required landmarks
+    'min_body_height': 0.15,        # Visible body span (the larger of height and width)
+    'max_body_width': None,         # No limit: spread arms and lying exercises fill the frame
+    'min_visibility': 0.5
+}
+
+# Reference-rep matching (utils.rep_templates): counted reps and templates are
+# resampled to `samples` frames and aligned within a band of band x samples frames
+REP_TEMPLATE_CONFIG = {
+    'samples': 24,
+    'band': 0.2,
+    'tolerance': 15.0,         # Mean angle distance (degrees) at which similarity is 1/e
+    'max_rep_frames': 300      # Longest rep kept (about 10 s at 30 FPS)
+}
+REP_TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rep_templates.json')
+
+# Tuned thresholds ({exercise: {threshold: value}}) written by tools/tune_thresholds.py
+TUNED_THRESHOLDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tuned_thresholds.json')
+USE_TUNED_THRESHOLDS = False   # Apply them on import
+
+
+def apply_tuned_thresholds(path=TUNED_THRESHOLDS_PATH):
+    """Override angle_thresholds with the tuned ones in path (if it exists); returns and logs the changes"""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        tuned = json.load(f)
+    logger = logging.getLogger(__name__)
+    changes = {}
+    for exercise, values in tuned.items():
+        if exercise not in EXERCISE_CONFIG:
+            continue
+        thresholds = EXERCISE_CONFIG[exercise]['angle_thresholds']
+        for name, value in values.items():
+            if thresholds.get(name) != value:
+                logger.info("%s: %s %s -> %s (%s)", exercise, name, thresholds.get(name), value, path)
+                changes.setdefault(exercise, {})[name] = (thresholds.get(name), value)
+            thresholds[name] = value
+    return changes
+
+
+if USE_TUNED_THRESHOLDS:
+    apply_tuned_thresholds()
\ No newline at end of file
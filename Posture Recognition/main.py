@@ -1,10 +1,8 @@
 import streamlit as st
-import cv2
-import numpy as np
-import mediapipe as mp
-from utils.pose_detector import PoseDetector
-from utils.exercise_detector import ExerciseDetector
-from utils.ui_components import UIComponents
+from utils.session_worker import SessionWorker
+from utils.video_transport import create_streamer
+from utils.ui_state import UIStateRenderer, build_stats_state
+from config.exercise_config import UI_CONFIG, VIDEO_TRANSPORT
 import time
 
 # Page configuration
@@ -14,6 +12,12 @@ st.set_page_config(
     layout="wide"
 )
 
+@st.cache_resource
+def get_session_worker():
+    """Camera, detectors and counters shared across reruns"""
+    streamer = create_streamer(VIDEO_TRANSPORT)
+    return SessionWorker(streamer=streamer).start()
+
 def main():
     st.title("🏋️ AI Posture Detection & Form Checker")
     
@@ -24,10 +28,9 @@ def main():
         ["Push-ups", "Squats", "Bicep Curls", "Plank Hold", "Crunches", "Sit-ups", "Pull-ups", "Russian Twists", "Jumping Jacks"]
     )
     
-    # Initialize components
-    pose_detector = PoseDetector()
-    exercise_detector = ExerciseDetector()
-    ui_components = UIComponents()
+    # start() brings back a worker thread that has ended
+    worker = get_session_worker().start()
+    worker.set_exercise(exercise)
     
     # Create columns for layout
     col1, col2 = st.columns([3, 1])
@@ -35,6 +38,7 @@ def main():
     with col1:
         # Video display placeholder
         video_placeholder = st.empty()
+        live_placeholder = st.empty()
     
     with col2:
         # Stats display
@@ -49,98 +53,54 @@ def main():
         stop_button = st.button("⏹️ Stop Camera", type="secondary")
         reset_button = st.button("🔄 Reset Counter")
     
-    # Initialize session state
-    if 'camera_active' not in st.session_state:
-        st.session_state.camera_active = False
-    if 'reps' not in st.session_state:
-        st.session_state.reps = 0
-    if 'sets' not in st.session_state:
-        st.session_state.sets = 0
-    
-    # Handle button clicks
+    # Handle button clicks (the worker applies them without reopening the camera)
     if start_button:
-        st.session_state.camera_active = True
+        worker.start_camera()
     if stop_button:
-        st.session_state.camera_active = False
+        worker.stop_camera()
     if reset_button:
-        st.session_state.reps = 0
-        st.session_state.sets = 0
+        worker.reset_counters()
     
-    # Camera processing
-    if st.session_state.camera_active:
-        cap = cv2.VideoCapture(0)
+    # Display snapshots published by the background worker
+    last_frame_id = None
+    if worker.streamer is not None and worker.camera_requested:
+        video_placeholder.markdown(worker.streamer.html(), unsafe_allow_html=True)
+    stats_renderer = UIStateRenderer(UI_CONFIG['stats_refresh_hz'])
+    stats_widgets = {
+        'reps': lambda value: reps_placeholder.metric("Reps", value),
+        'sets': lambda value: sets_placeholder.metric("Sets", value),
+        'status': lambda correct: (status_placeholder.success("✅ Correct Form") if correct
+                                   else status_placeholder.error("❌ Incorrect Form")),
+        'feedback': lambda value: (feedback_placeholder.info(f"💡 {value[1]}") if value[0] == 'info'
+                                   else feedback_placeholder.warning(f"⚠️ {value[1]}"))
+    }
+    last_heartbeat = 0.0
+    while worker.camera_requested and worker.is_alive():
+        # Streamlit only acts on Stop/Reset clicks when the script sends it something,
+        # which the throttled panel and the MJPEG stream may not do for a long time
+        now = time.monotonic()
+        if now - last_heartbeat >= UI_CONFIG['heartbeat_interval']:
+            live_placeholder.caption(f"🟢 Live · {time.strftime('%H:%M:%S')}")
+            last_heartbeat = now
         
-        if not cap.isOpened():
-            st.error("Could not open camera. Please check your webcam connection.")
-            return
+        snapshot = worker.get_snapshot()
+        if snapshot is None or snapshot['frame_id'] == last_frame_id:
+            time.sleep(0.005)
+            continue
+        last_frame_id = snapshot['frame_id']
         
-        # Set camera properties
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        # Only changed stats are written, at most stats_refresh_hz times per second
+        stats_renderer.render(build_stats_state(snapshot), stats_widgets)
         
-        while st.session_state.camera_active:
-            ret, frame = cap.read()
-            if not ret:
-                st.error("Failed to read from camera")
-                break
-            
-            # Flip frame horizontally for mirror effect
-            frame = cv2.flip(frame, 1)
-            
-            # Detect pose
-            results = pose_detector.detect_pose(frame)
-            
-            if results.pose_landmarks:
-                # Extract landmarks
-                landmarks = pose_detector.extract_landmarks(results.pose_landmarks, frame.shape)
-                
-                # Draw pose skeleton
-                annotated_frame = ui_components.draw_pose_skeleton(frame, landmarks)
-                
-                # Detect exercise and get feedback
-                exercise_data = exercise_detector.detect_exercise(exercise, landmarks)
-                
-                # Update rep count
-                if exercise_data['rep_completed']:
-                    st.session_state.reps += 1
-                    if st.session_state.reps % 10 == 0:  # New set every 10 reps
-                        st.session_state.sets += 1
-                
-                # Draw angles and feedback
-                annotated_frame = ui_components.draw_angles(annotated_frame, exercise_data['angles'])
-                annotated_frame = ui_components.draw_feedback(annotated_frame, exercise_data)
-                
-                # Update UI
-                with reps_placeholder.container():
-                    st.metric("Reps", st.session_state.reps)
-                
-                with sets_placeholder.container():
-                    st.metric("Sets", st.session_state.sets)
-                
-                with status_placeholder.container():
-                    if exercise_data['correct_form']:
-                        st.success("✅ Correct Form")
-                    else:
-                        st.error("❌ Incorrect Form")
-                
-                with feedback_placeholder.container():
-                    st.info(f"💡 {exercise_data['feedback']}")
-            
-            else:
-                annotated_frame = frame
-                with feedback_placeholder.container():
-                    st.warning("⚠️ No pose detected. Please ensure you're visible in the camera.")
-            
-            # Convert BGR to RGB for Streamlit
-            annotated_frame_rgb = cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB)
-            
-            # Display frame
-            video_placeholder.image(annotated_frame_rgb, channels="RGB", use_column_width=True)
-            
-            # Small delay to prevent excessive CPU usage
-            time.sleep(0.01)
-        
-        cap.release()
+        # Display frame (the MJPEG stream updates itself)
+        if snapshot['frame'] is not None:
+            video_placeholder.image(snapshot['frame'], channels="RGB", use_column_width=True)
+    
+    if not worker.is_alive():
+        # Restarted on the next rerun
+        worker.stop_camera()
+    if worker.last_error:
+        st.error(worker.last_error)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,12 +1,11 @@
 import streamlit as st
-import cv2
-import numpy as np
-import mediapipe as mp
-from utils.pose_detector import PoseDetector
-from utils.exercise_detector import ExerciseDetector
-from utils.ui_components import UIComponents
+from utils.session_worker import SessionWorker
 from utils.exercise_helpers import ExerciseHelpers
-from config.exercise_config import EXERCISE_CONFIG
+from utils.video_transport import create_streamer
+from utils.ui_state import UIStateRenderer, build_stats_state
+from utils.exercise_recognizer import recognizer_model_path
+from config.exercise_config import EXERCISE_CONFIG, UI_CONFIG, VIDEO_TRANSPORT, RECOGNITION_CONFIG
+import os
 import time
 
 # Page configuration
@@ -16,6 +15,12 @@ st.set_page_config(
     layout="wide"
 )
 
+@st.cache_resource
+def get_session_worker():
+    """Camera, detectors and counters shared across reruns"""
+    streamer = create_streamer(VIDEO_TRANSPORT)
+    return SessionWorker(streamer=streamer, fps=30, validate_landmarks=True, show_rep_counter=True).start()
+
 def main():
     st.title("🏋️ AI Posture Detection & Form Checker - Enhanced Edition")
     
@@ -38,11 +43,13 @@ def main():
     confidence_threshold = st.sidebar.slider("Detection Confidence", 0.1, 1.0, 0.5, 0.1)
     show_angles = st.sidebar.checkbox("Show Angle Measurements", True)
     show_skeleton = st.sidebar.checkbox("Show Pose Skeleton", True)
+    auto_detect = st.sidebar.checkbox("Auto-detect Exercise", False,
+                                      help="Switch to the exercise you are doing automatically")
+    if auto_detect and not os.path.exists(recognizer_model_path(RECOGNITION_CONFIG)):
+        st.sidebar.warning("No recognizer model found - run tools/train_recognizer.py")
     
-    # Initialize components
-    pose_detector = PoseDetector()
-    exercise_detector = ExerciseDetector()
-    ui_components = UIComponents()
+    # start() brings back a worker thread that has ended
+    worker = get_session_worker().start()
     
     # Create columns for layout
     col1, col2 = st.columns([3, 1])
@@ -50,6 +57,7 @@ def main():
     with col1:
         # Video display placeholder
         video_placeholder = st.empty()
+        live_placeholder = st.empty()
         # Exercise name display
         exercise_name_placeholder = st.empty()
         
@@ -65,6 +73,8 @@ def main():
         st.subheader("📈 Performance")
         form_accuracy_placeholder = st.empty()
         current_angle_placeholder = st.empty()
+        tempo_placeholder = st.empty()
+        rep_match_placeholder = st.empty()
         
         # Control buttons
         start_button = st.button("🎥 Start Camera", type="primary")
@@ -90,14 +100,6 @@ def main():
                 st.session_state.selected_exercise = "Jumping Jacks"
     
     # Initialize session state
-    if 'camera_active' not in st.session_state:
-        st.session_state.camera_active = False
-    if 'reps' not in st.session_state:
-        st.session_state.reps = 0
-    if 'sets' not in st.session_state:
-        st.session_state.sets = 0
-    if 'form_accuracy_history' not in st.session_state:
-        st.session_state.form_accuracy_history = []
     if 'selected_exercise' not in st.session_state:
         st.session_state.selected_exercise = exercise
     
@@ -105,142 +107,71 @@ def main():
     if 'selected_exercise' in st.session_state:
         exercise = st.session_state.selected_exercise
     
+    # Switching exercises or settings only sends a command to the worker.
+    # With auto-detection the recognizer picks the exercise instead.
+    if not auto_detect or worker.exercise is None:
+        worker.set_exercise(exercise)
+    worker.update_settings(show_angles=show_angles, show_skeleton=show_skeleton, auto_detect_exercise=auto_detect)
+    
     # Handle button clicks
     if start_button:
-        st.session_state.camera_active = True
+        worker.start_camera()
     if stop_button:
-        st.session_state.camera_active = False
+        worker.stop_camera()
     if reset_button:
-        st.session_state.reps = 0
-        st.session_state.sets = 0
-        st.session_state.form_accuracy_history = []
+        worker.reset_counters()
     
     # Display current exercise
     with exercise_name_placeholder.container():
         st.markdown(f"### Current Exercise: **{exercise}**")
     
-    # Camera processing
-    if st.session_state.camera_active:
-        cap = cv2.VideoCapture(0)
-        
-        if not cap.isOpened():
-            st.error("Could not open camera. Please check your webcam connection.")
-            return
-        
-        # Set camera properties for better performance
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        cap.set(cv2.CAP_PROP_FPS, 30)
+    # Display snapshots published by the background worker
+    if worker.camera_requested:
+        last_frame_id = None
+        if worker.streamer is not None:
+            video_placeholder.markdown(worker.streamer.html(), unsafe_allow_html=True)
+        stats_renderer = UIStateRenderer(UI_CONFIG['stats_refresh_hz'])
+        stats_widgets = {
+            'exercise': lambda value: exercise_name_placeholder.markdown(f"### Current Exercise: **{value}**"),
+            'reps': lambda value: reps_placeholder.metric("Reps", value),
+            'sets': lambda value: sets_placeholder.metric("Sets", value),
+            'status': lambda correct: (status_placeholder.success("✅ Correct Form") if correct
+                                       else status_placeholder.error("❌ Incorrect Form")),
+            'feedback': lambda value: (feedback_placeholder.info(f"💡 {value[1]}") if value[0] == 'info'
+                                       else feedback_placeholder.warning(f"⚠️ {value[1]}")),
+            'form_accuracy': lambda value: form_accuracy_placeholder.metric("Form Accuracy", value),
+            'angles': lambda value: current_angle_placeholder.text(value),
+            'tempo': lambda value: tempo_placeholder.text(f"Tempo: {value}"),
+            'rep_match': lambda value: rep_match_placeholder.text(f"Last rep: {value}")
+        }
         
-        frame_count = 0
-        
-        while st.session_state.camera_active:
-            ret, frame = cap.read()
-            if not ret:
-                st.error("Failed to read from camera")
-                break
-            
-            frame_count += 1
-            
-            # Flip frame horizontally for mirror effect
-            frame = cv2.flip(frame, 1)
-            
-            # Detect pose
-            results = pose_detector.detect_pose(frame)
-            
-            if results.pose_landmarks:
-                # Extract landmarks
-                landmarks = pose_detector.extract_landmarks(results.pose_landmarks, frame.shape)
-                
-                # Validate landmarks for current exercise
-                is_valid, validation_msg = ExerciseHelpers.validate_landmarks(exercise, landmarks)
-                
-                if is_valid:
-                    # Draw pose skeleton if enabled
-                    if show_skeleton:
-                        annotated_frame = ui_components.draw_pose_skeleton(frame, landmarks)
-                    else:
-                        annotated_frame = frame.copy()
-                    
-                    # Detect exercise and get feedback
-                    exercise_data = exercise_detector.detect_exercise(exercise, landmarks)
-                    
-                    # Update rep count
-                    if exercise_data['rep_completed']:
-                        st.session_state.reps += 1
-                        if st.session_state.reps % 10 == 0:  # New set every 10 reps
-                            st.session_state.sets += 1
-                    
-                    # Track form accuracy
-                    st.session_state.form_accuracy_history.append(1 if exercise_data['correct_form'] else 0)
-                    if len(st.session_state.form_accuracy_history) > 30:  # Keep last 30 frames
-                        st.session_state.form_accuracy_history.pop(0)
-                    
-                    # Draw angles if enabled
-                    if show_angles and exercise_data['angles']:
-                        annotated_frame = ui_components.draw_angles(annotated_frame, exercise_data['angles'])
-                    
-                    # Draw feedback
-                    annotated_frame = ui_components.draw_feedback(annotated_frame, exercise_data)
-                    
-                    # Draw rep counter on frame
-                    annotated_frame = ui_components.draw_rep_counter(
-                        annotated_frame, st.session_state.reps, st.session_state.sets
-                    )
-                    
-                    # Update UI metrics
-                    with reps_placeholder.container():
-                        st.metric("Reps", st.session_state.reps)
-                    
-                    with sets_placeholder.container():
-                        st.metric("Sets", st.session_state.sets)
-                    
-                    with status_placeholder.container():
-                        if exercise_data['correct_form']:
-                            st.success("✅ Correct Form")
-                        else:
-                            st.error("❌ Incorrect Form")
-                    
-                    with feedback_placeholder.container():
-                        st.info(f"💡 {exercise_data['feedback']}")
-                    
-                    # Form accuracy percentage
-                    if st.session_state.form_accuracy_history:
-                        accuracy = np.mean(st.session_state.form_accuracy_history) * 100
-                        with form_accuracy_placeholder.container():
-                            st.metric("Form Accuracy", f"{accuracy:.1f}%")
-                    
-                    # Display current key angles
-                    if exercise_data['angles']:
-                        angle_text = []
-                        for angle_name, angle_value in exercise_data['angles'].items():
-                            if isinstance(angle_value, (int, float)):
-                                angle_text.append(f"{angle_name}: {angle_value:.1f}°")
-                        
-                        with current_angle_placeholder.container():
-                            st.text("\n".join(angle_text))
-                
-                else:
-                    annotated_frame = frame
-                    with feedback_placeholder.container():
-                        st.warning(f"⚠️ {validation_msg}")
-            
-            else:
-                annotated_frame = frame
-                with feedback_placeholder.container():
-                    st.warning("⚠️ No pose detected. Please ensure you're visible in the camera.")
+        last_heartbeat = 0.0
+        while worker.camera_requested and worker.is_alive():
+            # Streamlit only acts on Stop/Reset clicks when the script sends it something,
+            # which the throttled panel and the MJPEG stream may not do for a long time
+            now = time.monotonic()
+            if now - last_heartbeat >= UI_CONFIG['heartbeat_interval']:
+                live_placeholder.caption(f"🟢 Live · {time.strftime('%H:%M:%S')}")
+                last_heartbeat = now
             
-            # Convert BGR to RGB for Streamlit
-            annotated_frame_rgb = cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB)
+            snapshot = worker.get_snapshot()
+            if snapshot is None or snapshot['frame_id'] == last_frame_id:
+                time.sleep(0.005)
+                continue
+            last_frame_id = snapshot['frame_id']
             
-            # Display frame
-            video_placeholder.image(annotated_frame_rgb, channels="RGB", use_column_width=True)
+            # Only changed stats are written, at most stats_refresh_hz times per second
+            stats_renderer.render(build_stats_state(snapshot), stats_widgets)
             
-            # Process every few frames to reduce CPU load
-            if frame_count % 3 == 0:
-                time.sleep(0.01)
+            # Display frame (the MJPEG stream updates itself)
+            if snapshot['frame'] is not None:
+                video_placeholder.image(snapshot['frame'], channels="RGB", use_column_width=True)
         
-        cap.release()
+        if not worker.is_alive():
+            # Restarted on the next rerun
+            worker.stop_camera()
+        if worker.last_error:
+            st.error(worker.last_error)
     
     # Display summary when camera is off
     else:
@@ -1,8 +1,27 @@
+import json
+import logging
+import os
 import numpy as np
 from typing import Dict, List, Tuple, Optional
 
+from pose_detector import ANGLE_JOINTS
+from asana_templates import KEY_LANDMARKS, template_features
+from special_checks import SPECIAL_CHECK_LANDMARKS, SPECIAL_CHECKS, FrameContext
+
+# Angle ranges written by tools/tune_thresholds.py (Posture Recognition); the apps pass them to
+# AsanaDetector when config.USE_TUNED_CRITERIA is set
+TUNED_CRITERIA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tuned_asana_criteria.json')
+
 class AsanaDetector:
-    def __init__(self):
+    # Mean of the angle and special-check scores needed for a correct pose
+    MIN_SCORE = 0.8
+    # Template confidence needed to call an asana when classifying with templates
+    TEMPLATE_MIN_CONFIDENCE = 0.6
+    
+    def __init__(self, tuned_criteria_path=None, templates=None):
+        # AsanaTemplates: classify() uses their nearest-neighbour index, and
+        # asanas that only have templates can still be detected
+        self.templates = templates
         # Define angle thresholds for each asana
         self.asana_criteria = {
             "Pranamasana": {
@@ -101,54 +120,256 @@ class AsanaDetector:
                 "special_checks": ["inverted_v", "straight_limbs"]
             }
         }
+        self.load_tuned_ranges(tuned_criteria_path)
+        self.compile_criteria()
+    
+    def compile_criteria(self):
+        """Compile the angle ranges into (asanas x joints) bound matrices over ANGLE_JOINTS.
+
+        Call again after changing asana_criteria.
+        """
+        self.asana_names = tuple(self.asana_criteria)
+        self.asana_index = {name: row for row, name in enumerate(self.asana_names)}
+        self.angle_joints = tuple(ANGLE_JOINTS)
+        shape = (len(self.asana_names), len(self.angle_joints))
+        self.lower_bounds = np.full(shape, -np.inf)
+        self.upper_bounds = np.full(shape, np.inf)
+        self.joint_mask = np.zeros(shape, dtype=bool)
+        for row, asana_name in enumerate(self.asana_names):
+            for joint, (min_angle, max_angle) in self.asana_criteria[asana_name]["angles"].items():
+                if joint not in ANGLE_JOINTS:
+                    raise ValueError(f"{asana_name}: unknown joint {joint!r}")
+                column = self.angle_joints.index(joint)
+                self.lower_bounds[row, column] = min_angle
+                self.upper_bounds[row, column] = max_angle
+                self.joint_mask[row, column] = True
+        self.joint_counts = self.joint_mask.sum(axis=1)
+        # (name, predicate, feedback) of every special check; unknown checks pass (predicate None)
+        self._special_checks = {
+            asana_name: [(check, *SPECIAL_CHECKS.get(check, (None, ""))) for check in criteria["special_checks"]]
+            for asana_name, criteria in self.asana_criteria.items()
+        }
+        # The known checks of all asanas, each run once per frame by criteria_scores, and
+        # (checks x asanas) how often an asana lists each one
+        self.check_names = tuple(dict.fromkeys(
+            check for checks in self._special_checks.values() for check, predicate, _ in checks if predicate is not None))
+        self._check_predicates = [SPECIAL_CHECKS[check][0] for check in self.check_names]
+        self._check_counts = np.zeros((len(self.check_names), len(self.asana_names)))
+        self._unknown_checks = np.zeros(len(self.asana_names))
+        self._check_totals = np.zeros(len(self.asana_names))
+        for row, asana_name in enumerate(self.asana_names):
+            for check, predicate, _ in self._special_checks[asana_name]:
+                if predicate is None:
+                    self._unknown_checks[row] += 1
+                else:
+                    self._check_counts[self.check_names.index(check), row] += 1
+                self._check_totals[row] += 1
     
-    def detect_asana(self, asana_name, angles, landmarks):
+    def angle_vector(self, angles):
+        """Angles dict as an array in angle_joints order (NaN for missing joints)"""
+        return np.array([angles.get(joint, np.nan) for joint in self.angle_joints], dtype=np.float64)
+    
+    def angle_scores(self, angle_vector, rows=slice(None)):
+        """Fraction of the angle criteria met, for every asana (or the given rows) at once"""
+        within = (self.lower_bounds[rows] <= angle_vector) & (angle_vector <= self.upper_bounds[rows])
+        counts = self.joint_counts[rows]
+        return np.where(counts > 0, (within & self.joint_mask[rows]).sum(axis=-1) / np.maximum(counts, 1), 1.0)
+    
+    @property
+    def score_names(self):
+        """Asanas scored by asana_scores, in order"""
+        return self.templates.names if self.templates is not None else self.asana_names
+    
+    def asana_scores(self, angle_vector, landmarks, angles=None, context=None):
+        """Score (0-1) of every asana in score_names order.
+
+        The mean of the angle and special-check scores, or with templates the
+        template probabilities.
+        """
+        if self.templates is not None:
+            return self.templates.probabilities(landmarks, angle_vector)
+        if context is None:
+            if angles is None:
+                angles = dict(zip(self.angle_joints, angle_vector.tolist()))
+            context = FrameContext(landmarks, angles)
+        special = [self.special_check_score(asana_name, angles, landmarks, context)[0] for asana_name in self.asana_names]
+        return (self.angle_scores(angle_vector) + special) / 2
+    
+    def classify(self, angle_vector, landmarks, angles=None, context=None):
+        """The asana the pose matches best and the asana_scores of all asanas.
+
+        The asana is None when its score is below MIN_SCORE (TEMPLATE_MIN_CONFIDENCE with templates).
+        """
+        scores = self.asana_scores(angle_vector, landmarks, angles, context)
+        best = int(np.argmax(scores))
+        threshold = self.TEMPLATE_MIN_CONFIDENCE if self.templates is not None else self.MIN_SCORE
+        return (self.score_names[best] if scores[best] >= threshold else None), scores
+    
+    def best_asanas(self, scores):
+        """Column of the best asana of every row of asana_scores (M, S), -1 where classify finds none"""
+        best = np.argmax(scores, axis=1)
+        threshold = self.TEMPLATE_MIN_CONFIDENCE if self.templates is not None else self.MIN_SCORE
+        return np.where(scores[np.arange(len(scores)), best] >= threshold, best, -1)
+    
+    def criteria_scores(self, angle_vectors, contexts):
+        """Mean of the angle and special-check scores of every asana with criteria, for M frames (M, A).
+        
+        angle_vectors (M, J) in angle_joints order, contexts the M frames'
+        FrameContexts. Each special check runs once per frame, however many
+        asanas list it; row by row the scores equal detect_asana's.
+        """
+        angle_vectors = np.asarray(angle_vectors, dtype=np.float64)
+        passed = np.zeros((len(contexts), len(self.check_names)))
+        for frame, context in enumerate(contexts):
+            if not context.valid:
+                continue
+            refined = context.refined or {}
+            passed[frame] = [refined[check] if check in refined else bool(predicate(context))
+                             for check, predicate in zip(self.check_names, self._check_predicates)]
+        special = np.where(self._check_totals > 0,
+                           (passed @ self._check_counts + self._unknown_checks) / np.maximum(self._check_totals, 1),
+                           1.0)
+        return (self.angle_scores(angle_vectors[:, None, :]) + special) / 2
+    
+    def score_frames(self, asana_names, angle_vectors, landmarks, contexts):
+        """detect_asana (without feedback) and asana_scores for M frames at once.
+        
+        Every frame is checked against its own asana in asana_names (M,) and
+        scored against all asanas. Returns is_correct (M,) and the scores
+        (M, S) in score_names order.
+        """
+        angle_vectors = np.asarray(angle_vectors, dtype=np.float64)
+        criteria = self.criteria_scores(angle_vectors, contexts)
+        rows = np.array([self.asana_index.get(name, -1) for name in asana_names], dtype=np.intp)
+        ranged = rows >= 0
+        is_correct = ranged & (criteria[np.arange(len(rows)), rows] >= self.MIN_SCORE)
+        if self.templates is None:
+            return is_correct, criteria
+        
+        # Asanas with only templates are correct when they are the confident best template
+        scores = self.templates.probabilities_features(template_features(np.asarray(landmarks), angle_vectors))
+        columns = np.array([self.templates.names.index(name) if name in self.templates.names else -1
+                            for name in asana_names], dtype=np.intp)
+        templated = ~ranged & (columns >= 0)
+        own = scores[np.arange(len(rows)), columns]
+        is_correct |= templated & (scores.argmax(axis=1) == columns) & (own >= self.TEMPLATE_MIN_CONFIDENCE)
+        return is_correct, scores
+    
+    def sequence_feedback(self, sequence, step, detected):
+        """Message when the detected asana is not the expected step of a sequence (else None)"""
+        expected = sequence[step]
+        if detected is None or detected == expected or (step > 0 and detected == sequence[step - 1]):
+            return None
+        later = [k for k in range(step + 1, len(sequence)) if sequence[k] == detected]
+        if later:
+            return f"Skipped ahead to {detected} (step {later[0] + 1}) - do {expected} first"
+        return f"{detected} is out of order - do {expected} now"
+    
+    def load_tuned_ranges(self, path):
+        """Replace angle ranges with tuned ones ({asana: {joint: [min, max]}}) if the file exists.
+        Every changed range is logged; returns {asana: {joint: (old, new)}}
+        """
+        if not path or not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            tuned = json.load(f)
+        logger = logging.getLogger(__name__)
+        changes = {}
+        for asana_name, ranges in tuned.items():
+            if asana_name in self.asana_criteria:
+                angles = self.asana_criteria[asana_name]["angles"]
+                for joint, (min_angle, max_angle) in ranges.items():
+                    old, new = angles.get(joint), (min_angle, max_angle)
+                    if old != new:
+                        logger.info("%s: %s %s -> %s (%s)", asana_name, joint, old, new, path)
+                        changes.setdefault(asana_name, {})[joint] = (old, new)
+                    angles[joint] = new
+        if hasattr(self, 'asana_names'):
+            self.compile_criteria()
+        return changes
+    
+    def detect_asana(self, asana_name, angles, landmarks, angle_vector=None, context=None):
         """
         Detect if current pose matches the specified asana
+        angle_vector optionally holds the same angles in angle_joints order,
+        and context the frame's FrameContext
         Returns: (is_correct: bool, feedback: str)
         """
         if asana_name not in self.asana_criteria:
+            if self.templates is not None and asana_name in self.templates.names:
+                return self._detect_with_templates(asana_name, landmarks)
             return False, f"Unknown asana: {asana_name}"
         
-        criteria = self.asana_criteria[asana_name]
-        feedback_messages = []
-        angle_matches = 0
-        total_angles = len(criteria["angles"])
-        
-        # Check angle criteria
-        for joint, (min_angle, max_angle) in criteria["angles"].items():
-            if joint in angles:
-                current_angle = angles[joint]
-                if min_angle <= current_angle <= max_angle:
-                    angle_matches += 1
-                else:
-                    feedback_messages.append(self._get_angle_feedback(joint, current_angle, min_angle, max_angle))
+        # Check angle criteria against the compiled bounds
+        if angle_vector is None:
+            angle_vector = self.angle_vector(angles)
+        row = self.asana_index[asana_name]
+        angle_score = float(self.angle_scores(angle_vector, slice(row, row + 1))[0])
         
         # Check special pose-specific criteria
-        special_checks_passed = 0
-        total_special_checks = len(criteria["special_checks"])
-        
-        for check in criteria["special_checks"]:
-            check_passed, check_feedback = self._perform_special_check(check, landmarks, angles)
-            if check_passed:
-                special_checks_passed += 1
-            else:
-                feedback_messages.append(check_feedback)
+        special_score, special_feedback = self.special_check_score(asana_name, angles, landmarks, context)
         
         # Determine if pose is correct (80% of criteria must be met)
-        angle_score = angle_matches / total_angles if total_angles > 0 else 1.0
-        special_score = special_checks_passed / total_special_checks if total_special_checks > 0 else 1.0
-        
         overall_score = (angle_score + special_score) / 2
-        is_correct = overall_score >= 0.8
+        is_correct = overall_score >= self.MIN_SCORE
         
         # Generate feedback message
         if is_correct:
-            feedback = f"Good {asana_name}!"
-        else:
-            feedback = " | ".join(feedback_messages[:2])  # Show top 2 issues
+            return is_correct, f"Good {asana_name}!"
+        
+        feedback_messages = []
+        for joint, (min_angle, max_angle) in self.asana_criteria[asana_name]["angles"].items():
+            if joint in angles and not min_angle <= angles[joint] <= max_angle:
+                feedback_messages.append(self._get_angle_feedback(joint, angles[joint], min_angle, max_angle))
+        feedback_messages.extend(special_feedback)
+        return is_correct, " | ".join(feedback_messages[:2])  # Show top 2 issues
+    
+    def _detect_with_templates(self, asana_name, landmarks):
+        """detect_asana for an asana that only has templates"""
+        detected, confidence = self.templates.classify(landmarks)
+        if detected == asana_name and confidence >= self.TEMPLATE_MIN_CONFIDENCE:
+            return True, f"Good {asana_name}!"
+        if detected is None or detected == asana_name:
+            return False, f"Move into {asana_name}"
+        return False, f"This looks like {detected} - move into {asana_name}"
+    
+    def frame_context(self, landmarks, angles):
+        """FrameContext to share between the special checks of several asanas on one frame"""
+        return FrameContext(landmarks, angles)
+    
+    def special_check_names(self, asana_name):
+        """Names of the asana's special checks (none for unknown asanas)"""
+        return [check for check, _, _ in self._special_checks.get(asana_name, ())]
+    
+    def required_landmarks(self, asana_name):
+        """Indices of the landmarks the asana is checked on (the template landmarks without criteria)"""
+        criteria = self.asana_criteria.get(asana_name)
+        if criteria is None:
+            return list(KEY_LANDMARKS)
+        indices = {index for joint in criteria["angles"] for index in ANGLE_JOINTS[joint]}
+        for check in criteria["special_checks"]:
+            indices.update(SPECIAL_CHECK_LANDMARKS.get(check, ()))
+        return sorted(indices)
+    
+    def special_check_score(self, asana_name, angles, landmarks, context=None):
+        """Fraction of the asana's special checks passed, and feedback of the failed ones.
         
-        return is_correct, feedback
+        Outcomes refined by the model cascade (context.refined) replace the predicates.
+        """
+        checks = self._special_checks[asana_name]
+        if context is None:
+            context = FrameContext(landmarks, angles)
+        refined = context.refined or {}
+        feedback_messages = []
+        for check, predicate, feedback in checks:
+            if predicate is None:
+                continue
+            if not context.valid:
+                feedback_messages.append(f"Check {check} failed")
+            elif not (refined[check] if check in refined else predicate(context)):
+                feedback_messages.append(feedback)
+        passed = len(checks) - len(feedback_messages)
+        return (passed / len(checks) if checks else 1.0), feedback_messages
     
     def _get_angle_feedback(self, joint, current_angle, min_angle, max_angle):
         """Generate feedback for incorrect joint angles"""
@@ -169,141 +390,6 @@ class AsanaDetector:
             else:
                 return f"Decrease {joint_name} angle"
     
-    def _perform_special_check(self, check_name, landmarks, angles):
-        """Perform special pose-specific checks"""
-        try:
-            if check_name == "hands_together":
-                # Check if hands are close together (for prayer pose)
-                left_wrist = landmarks[15]
-                right_wrist = landmarks[16]
-                distance = np.linalg.norm(left_wrist[:2] - right_wrist[:2])
-                if distance < 0.1:  # Normalized coordinates
-                    return True, ""
-                return False, "Bring hands together"
-            
-            elif check_name == "upright_posture":
-                # Check if person is standing upright
-                head = landmarks[0]
-                hip_center = (landmarks[23] + landmarks[24]) / 2
-                if abs(head[0] - hip_center[0]) < 0.1:  # Vertically aligned
-                    return True, ""
-                return False, "Stand upright"
-            
-            elif check_name == "arms_overhead":
-                # Check if arms are raised overhead
-                left_wrist = landmarks[15]
-                right_wrist = landmarks[16]
-                head = landmarks[0]
-                if left_wrist[1] < head[1] and right_wrist[1] < head[1]:  # Y decreases upward
-                    return True, ""
-                return False, "Raise arms overhead"
-            
-            elif check_name == "forward_fold":
-                # Check if torso is folded forward
-                head = landmarks[0]
-                hip_center = (landmarks[23] + landmarks[24]) / 2
-                if head[1] > hip_center[1]:  # Head below hips
-                    return True, ""
-                return False, "Fold forward more"
-            
-            elif check_name == "straight_legs":
-                # Check if legs are straight
-                left_knee_angle = angles.get("left_knee", 0)
-                right_knee_angle = angles.get("right_knee", 0)
-                if left_knee_angle > 160 and right_knee_angle > 160:
-                    return True, ""
-                return False, "Straighten legs"
-            
-            elif check_name == "lunge_position":
-                # Check for proper lunge stance
-                left_ankle = landmarks[27]
-                right_ankle = landmarks[31] if len(landmarks) > 31 else landmarks[28]
-                stance_width = abs(left_ankle[0] - right_ankle[0])
-                if stance_width > 0.3:  # Wide stance
-                    return True, ""
-                return False, "Widen lunge stance"
-            
-            elif check_name == "back_leg_straight":
-                # Check if back leg is extended
-                right_knee_angle = angles.get("right_knee", 0)
-                if right_knee_angle > 150:
-                    return True, ""
-                return False, "Straighten back leg"
-            
-            elif check_name == "plank_position":
-                # Check for proper plank alignment
-                shoulders = (landmarks[11] + landmarks[12]) / 2
-                hips = (landmarks[23] + landmarks[24]) / 2
-                ankles = (landmarks[27] + landmarks[28]) / 2
-                
-                # Check if body is in straight line
-                shoulder_hip_diff = abs(shoulders[1] - hips[1])
-                hip_ankle_diff = abs(hips[1] - ankles[1])
-                
-                if shoulder_hip_diff < 0.1 and hip_ankle_diff < 0.1:
-                    return True, ""
-                return False, "Align body in straight line"
-            
-            elif check_name == "straight_body":
-                # General straight body check
-                return self._perform_special_check("plank_position", landmarks, angles)
-            
-            elif check_name == "knees_chest_chin_down":
-                # Check for eight-limbed pose
-                chest = (landmarks[11] + landmarks[12]) / 2
-                knees = (landmarks[25] + landmarks[26]) / 2
-                
-                # Both should be relatively low
-                if chest[1] > 0.6 and knees[1] > 0.7:  # Lower values mean higher position
-                    return True, ""
-                return False, "Lower chest and knees"
-            
-            elif check_name == "cobra_arch":
-                # Check for cobra back arch
-                head = landmarks[0]
-                shoulders = (landmarks[11] + landmarks[12]) / 2
-                if head[1] < shoulders[1]:  # Head above shoulders
-                    return True, ""
-                return False, "Lift chest higher"
-            
-            elif check_name == "hips_down":
-                # Check if hips are down (for cobra)
-                hips = (landmarks[23] + landmarks[24]) / 2
-                if hips[1] > 0.7:  # Hips relatively low
-                    return True, ""
-                return False, "Keep hips down"
-            
-            elif check_name == "inverted_v":
-                # Check for downward dog V-shape
-                head = landmarks[0]
-                hips = (landmarks[23] + landmarks[24]) / 2
-                hands = (landmarks[15] + landmarks[16]) / 2
-                feet = (landmarks[27] + landmarks[28]) / 2
-                
-                # Hips should be highest point
-                if hips[1] < head[1] and hips[1] < hands[1] and hips[1] < feet[1]:
-                    return True, ""
-                return False, "Lift hips higher"
-            
-            elif check_name == "straight_limbs":
-                # Check if arms and legs are straight
-                limb_angles = ["left_elbow", "right_elbow", "left_knee", "right_knee"]
-                straight_count = 0
-                for angle_name in limb_angles:
-                    if angle_name in angles and angles[angle_name] > 150:
-                        straight_count += 1
-                
-                if straight_count >= 3:  # Most limbs straight
-                    return True, ""
-                return False, "Straighten arms and legs"
-            
-            else:
-                return True, ""  # Unknown check passes by default
-                
-        except Exception as e:
-            print(f"Error in special check {check_name}: {e}")
-            return False, f"Check {check_name} failed"
-    
     def get_asana_description(self, asana_name):
         """Get description of the asana"""
         if asana_name in self.asana_criteria:
@@ -0,0 +1,165 @@
+"""
+Data-driven asana templates with nearest-neighbour classification.
+
+Instead of hand-written angle ranges, every asana is described by a few
+exemplar feature vectors built from labelled frames: the key landmarks
+relative to the hip center, scaled by the torso length, plus the
+ANGLE_JOINTS angles in radians. The exemplars of an asana are the k-means
+centers of its frames, so different ways of holding the same asana keep
+their own exemplar.
+
+Classification is a brute-force distance matrix with the exemplar norms
+precomputed: one matrix-vector product gives the squared distances to all
+exemplars, the nearest exemplar per asana gives a softmax confidence, and
+frames further than ``max_distance`` from every exemplar are no asana.
+
+A template set is stored as a compressed .npz (float32 exemplars, the asana
+names and optionally the sequence they are practised in), written by
+tools/build_asana_templates.py (Posture Recognition) and loaded on first use,
+so a new sequence only needs labelled recordings.
+"""
+import os
+
+import numpy as np
+
+from pose_detector import joint_angles
+
+ASANA_TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'asana_templates.npz')
+
+# Nose, shoulders, elbows, wrists, hips, knees, ankles
+KEY_LANDMARKS = (0, 11, 12, 13, 14, 15, 16, 23, 24, 25, 26, 27, 28)
+# Positions of the shoulders and hips in KEY_LANDMARKS
+_SHOULDERS = [1, 2]
+_HIPS = [7, 8]
+
+_TEMPLATES = {}
+
+
+def template_features(landmarks, angles=None):
+    """Feature vectors (N, F) of landmark arrays (N, 33, >=2); missing values become 0.
+
+    angles optionally holds the joint_angles (N, J) of the landmarks.
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float64)
+    points = landmarks[:, KEY_LANDMARKS, :2]
+    hips = points[:, _HIPS].sum(axis=1) * 0.5
+    torso = points[:, _SHOULDERS].sum(axis=1) * 0.5 - hips
+    scale = np.fmax(np.sqrt(np.einsum('ni,ni->n', torso, torso)), 1e-6)
+    points -= hips[:, None]
+    points /= scale[:, None, None]
+    if angles is None:
+        angles = joint_angles(landmarks)
+    features = np.concatenate((points.reshape(len(landmarks), -1), np.radians(angles)), axis=1)
+    features[np.isnan(features)] = 0.0
+    return features
+
+
+def _kmeans(points, k, rng, iterations=20):
+    """k-means centers of points (N, F), starting from k random points"""
+    centers = points[rng.choice(len(points), min(k, len(points)), replace=False)].copy()
+    for _ in range(iterations):
+        d2 = ((points[:, None] - centers[None]) ** 2).sum(axis=-1)
+        nearest = d2.argmin(axis=1)
+        for c in range(len(centers)):
+            members = points[nearest == c]
+            if len(members):
+                centers[c] = members.mean(axis=0)
+    return centers
+
+
+class AsanaTemplates:
+    """Exemplars (M, F) of the asanas `names`; labels (M,) indexes names"""
+
+    def __init__(self, names, labels, exemplars, scale, max_distance, sequence=()):
+        self.names = [str(name) for name in names]
+        order = np.argsort(labels, kind='stable')
+        self.labels = np.asarray(labels, dtype=np.intp)[order]
+        self.exemplars = np.asarray(exemplars, dtype=np.float64)[order]
+        self.scale = float(scale)
+        self.max_distance = float(max_distance)
+        self.sequence = [str(name) for name in sequence]
+        if not np.array_equal(np.unique(self.labels), np.arange(len(self.names))):
+            raise ValueError("every asana needs at least one exemplar")
+        self._norms = np.einsum('mf,mf->m', self.exemplars, self.exemplars)
+        self._starts = np.flatnonzero(np.r_[True, np.diff(self.labels) > 0])
+
+    @classmethod
+    def build(cls, landmarks, labels, exemplars_per_asana=8, sequence=(), seed=0):
+        """Templates from labelled frames: landmarks (N, 33, >=2), labels (N,) ('' for none)"""
+        labels = np.asarray(labels).astype(str)
+        features = template_features(landmarks)
+        names = [str(name) for name in dict.fromkeys(labels) if name]
+        if not names:
+            raise ValueError("no labelled frames")
+        rng = np.random.default_rng(seed)
+        centers = [_kmeans(features[labels == name], exemplars_per_asana, rng) for name in names]
+        exemplar_labels = np.concatenate([np.full(len(c), i) for i, c in enumerate(centers)])
+        exemplars = np.concatenate(centers)
+
+        # Distance of the training frames to the nearest exemplar of their own asana
+        held = labels != ''
+        own = np.array([names.index(name) for name in labels[held]])
+        d2 = ((features[held, None] - exemplars[None]) ** 2).sum(axis=-1)
+        d2[own[:, None] != exemplar_labels[None]] = np.inf
+        nearest = np.sqrt(d2.min(axis=1))
+        scale = max(float(np.median(nearest)), 1e-6)
+        max_distance = 2.0 * float(np.percentile(nearest, 99))
+        return cls(names, exemplar_labels, exemplars, scale, max_distance, sequence)
+
+    def distances(self, features):
+        """Distance (..., A) from feature vectors (..., F) to the nearest exemplar of every asana"""
+        d2 = self._norms - 2.0 * (features @ self.exemplars.T)
+        nearest = np.minimum.reduceat(d2, self._starts, axis=-1)
+        nearest += np.einsum('...f,...f->...', features, features)[..., None]
+        return np.sqrt(np.maximum(nearest, 0.0))
+
+    def probabilities_features(self, features):
+        """Probability (..., A) of every asana for feature vectors (..., F); all 0 beyond max_distance"""
+        distances = self.distances(features)
+        nearest = distances.min(axis=-1, keepdims=True)
+        # Softmax of -d^2 / (2 scale^2) over the asanas
+        relative = np.exp(-0.5 * (distances * distances - nearest * nearest) / (self.scale * self.scale))
+        relative /= relative.sum(axis=-1, keepdims=True)
+        return np.where(nearest <= self.max_distance, relative, 0.0)
+
+    def classify_features(self, features):
+        """Best asana index (-1 for none) and its confidence for feature vectors (..., F)"""
+        probabilities = self.probabilities_features(features)
+        best = probabilities.argmax(axis=-1)
+        confidence = np.take_along_axis(probabilities, best[..., None], axis=-1)[..., 0]
+        return np.where(confidence > 0, best, -1), confidence
+
+    def probabilities(self, landmarks, angle_vector=None):
+        """Probabilities (A,) of one landmark array (33, >=2) and optionally its joint angles"""
+        angles = None if angle_vector is None else np.asarray(angle_vector)[None]
+        return self.probabilities_features(template_features(np.asarray(landmarks)[None], angles)[0])
+
+    def classify(self, landmarks, angle_vector=None):
+        """(asana name or None, confidence) of one landmark array (33, >=2) and optionally its joint angles"""
+        probabilities = self.probabilities(landmarks, angle_vector)
+        best = int(probabilities.argmax())
+        return (self.names[best] if probabilities[best] > 0 else None), float(probabilities[best])
+
+    def save(self, path=ASANA_TEMPLATES_PATH):
+        np.savez_compressed(
+            path,
+            names=np.array(self.names),
+            labels=self.labels.astype(np.int16),
+            exemplars=self.exemplars.astype(np.float32),
+            scale=np.array(self.scale),
+            max_distance=np.array(self.max_distance),
+            sequence=np.array(self.sequence, dtype=str)
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['names'].tolist(), data['labels'], data['exemplars'], float(data['scale']),
+                       float(data['max_distance']), data['sequence'].tolist())
+
+
+def get_asana_templates(path=ASANA_TEMPLATES_PATH):
+    """Templates stored at path (loaded once per process), or None when there is no such file"""
+    if path not in _TEMPLATES:
+        _TEMPLATES[path] = AsanaTemplates.load(path) if os.path.exists(path) else None
+    return _TEMPLATES[path]
\ No newline at end of file
@@ -10,7 +10,22 @@ FLIP_CAMERA = True  # Mirror effect for better user experience
 MIN_DETECTION_CONFIDENCE = 0.5  # MediaPipe pose detection confidence
 MIN_TRACKING_CONFIDENCE = 0.5   # MediaPipe pose tracking confidence
 POSE_HOLD_DURATION = 2.0        # Seconds to hold each pose
-STABILITY_THRESHOLD = 0.7       # Pose stability requirement (0-1)
+STABILITY_THRESHOLD = 0.7       # Pose stability requirement (0-1); holds only count while it is met
+STABILITY_WINDOW = 10           # Frames the pose stability is measured over
+CHANGE_GATE_EPSILON = 0.009     # Normalized landmark movement below which the last analysis is reused
+CHANGE_GATE_MAX_REUSE = 15      # Frames in a row that may reuse one analysis
+MODEL_CASCADE = True            # Hand landmarks / full pose model on ambiguous special checks of the current step
+ASANA_CLASSIFIER = 'ranges'     # 'templates': nearest-neighbour asana templates (asana_templates.npz) when built
+USE_TUNED_CRITERIA = False      # Angle ranges of tuned_asana_criteria.json (tools/tune_thresholds.py) override the defaults
+# Online alignment of the flow with the sequence; the apps follow it past steps whose hold was missed
+SEQUENCE_ALIGNER = {
+    'step_seconds': 3.0,       # Mean time spent per step
+    'sharpness': 10.0,         # Step likelihood exp(sharpness * (score - 1))
+    'floor': 1e-3,             # Lowest step likelihood, so missed detections only let time pass
+    'min_confidence': 0.6,     # Probability the next step needs before the flow moves to it
+    'min_score': 0.6,          # Frame score the next step needs (and above the current step's) to move to it
+    'max_dt': 1.0              # Longest gap between frames counted, in seconds
+}
 
 # Visual Settings
 JOINT_RADIUS = 5               # Size of joint dots
@@ -77,12 +92,24 @@ STREAMLIT_CONFIG = {
     'sidebar_width': 300
 }
 
+# Video transport (for Streamlit): 'image' sends frames through st.image,
+# 'mjpeg' encodes once and serves them from a local MJPEG endpoint
+VIDEO_TRANSPORT = {
+    'mode': 'image',
+    'jpeg_quality': 80,
+    'scale': 1.0,
+    'host': '127.0.0.1',
+    'port': 8766,
+    'public_url': None
+}
+
 # UI Settings (for Desktop App)
 DESKTOP_CONFIG = {
     'window_title': 'Surya Namaskar Detection App',
     'window_size': '1200x800',
     'camera_display_width': 640,
-    'update_interval_ms': 33  # ~30 FPS
+    'update_interval_ms': 33,  # ~30 FPS
+    'gui_refresh_hz': 10       # Status panel refreshes per second
 }
 
 # Pose Detection Landmarks (MediaPipe indices)
@@ -108,10 +135,11 @@ LANDMARK_INDICES = {
 # Validation Settings
 POSE_VALIDATION = {
     'min_landmarks': 33,           # Minimum landmarks required
-    'max_missing_joints': 3,       # Max missing key joints allowed
+    'max_missing_joints': 3,       # Max missing key joints allowed (of those the current asana is checked on)
     'position_bounds': (0, 1),     # Normalized coordinate bounds
-    'min_body_height': 0.3,        # Minimum body height in frame
-    'max_body_width': 0.8          # Maximum body width in frame
+    'min_body_height': 0.3,        # Minimum body height in frame (its width for lying poses)
+    'max_body_width': 0.8,         # Maximum body width in frame
+    'min_visibility': 0.5          # Landmarks less visible count as missing
 }
 
 # Audio/Notification Settings (future features)
@@ -1,30 +1,77 @@
-import cv2
-import mediapipe as mp
-import numpy as np
 import streamlit as st
 import time
-from typing import Dict, List, Tuple, Optional
-import math
 
 # Import pose detection modules
 from pose_detector import PoseDetector
-from asana_detector import AsanaDetector
-from pose_angles import calculate_angle
+from asana_detector import TUNED_CRITERIA_PATH, AsanaDetector
+from asana_templates import get_asana_templates
+from model_cascade import ModelCascade
+from sequence_tracker import SequenceTracker
+from config import (ASANA_CLASSIFIER, CHANGE_GATE_EPSILON, CHANGE_GATE_MAX_REUSE, MODEL_CASCADE,
+                    POSE_HOLD_DURATION, POSE_VALIDATION, SEQUENCE_ALIGNER, STABILITY_THRESHOLD, STABILITY_WINDOW,
+                    USE_TUNED_CRITERIA, VIDEO_TRANSPORT)
+import shared_utils  # noqa: F401  (makes the shared utils package importable)
+from utils.landmark_quality import REJECT_MESSAGES
+from utils.lazy_import import lazy_import
+from utils.video_transport import create_streamer
+
+cv2 = lazy_import('cv2')
+
+
+@st.cache_resource
+def get_streamer():
+    """MJPEG endpoint shared across reruns (None when using st.image)"""
+    return create_streamer(VIDEO_TRANSPORT)
+
+
+def get_pose_detector():
+    """Pose model of this browser session, kept across its reruns and warmed up while the page renders
+
+    Not an st.cache_resource: the model tracks one person between frames, so
+    sessions must not share it.
+    """
+    if 'pose_detector' not in st.session_state:
+        detector = PoseDetector()
+        detector.warm_up_async()
+        st.session_state.pose_detector = detector
+    return st.session_state.pose_detector
+
+def draw_status_overlay(frame, step_text, rep_text, is_correct, feedback, progress_text):
+    """Step, reps, status, feedback and hold progress text"""
+    cv2.putText(frame, step_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+    cv2.putText(frame, rep_text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+    
+    status_color = (0, 255, 0) if is_correct else (0, 0, 255)
+    status_text = "✅ Correct" if is_correct else "❌ Incorrect"
+    cv2.putText(frame, status_text, (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, status_color, 2)
+    
+    if feedback:
+        cv2.putText(frame, feedback, (10, 120), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
+    
+    if progress_text:
+        cv2.putText(frame, progress_text, (10, 150), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    return frame
 
 class SuryaNamaskarApp:
     def __init__(self):
-        self.pose_detector = PoseDetector()
-        self.asana_detector = AsanaDetector()
-        self.current_asana = 0  # Current step (0-11)
-        self.rep_count = 0
+        self.pose_detector = get_pose_detector()
+        templates = get_asana_templates() if ASANA_CLASSIFIER == 'templates' else None
+        self.asana_detector = AsanaDetector(TUNED_CRITERIA_PATH if USE_TUNED_CRITERIA else None, templates=templates)
         self.pose_sequence = [
             "Pranamasana", "Hasta Uttanasana", "Padahastasana", 
             "Ashwa Sanchalanasana", "Dandasana", "Ashtanga Namaskara",
             "Bhujangasana", "Adho Mukha Svanasana", "Ashwa Sanchalanasana",
             "Padahastasana", "Hasta Uttanasana", "Pranamasana"
         ]
-        self.pose_hold_time = {}
-        self.min_hold_duration = 2.0  # seconds
+        if templates is not None and templates.sequence:
+            # Sequence recorded with the templates
+            self.pose_sequence = templates.sequence
+        # Step (0-11 for the default sequence), reps and hold timer, fed every detected pose
+        self.tracker = SequenceTracker(
+            self.asana_detector, self.pose_sequence, POSE_HOLD_DURATION, POSE_VALIDATION,
+            stability_window=STABILITY_WINDOW, stability_threshold=STABILITY_THRESHOLD,
+            change_epsilon=CHANGE_GATE_EPSILON, max_reuse=CHANGE_GATE_MAX_REUSE, aligner=SEQUENCE_ALIGNER,
+            cascade=ModelCascade() if MODEL_CASCADE else None)
         self.last_correct_time = None
         
     def run_app(self):
@@ -40,9 +87,9 @@ class SuryaNamaskarApp:
             st.write("4. Follow the sequence order")
             
             st.header("🔄 Current Progress")
-            progress = st.progress(self.current_asana / 12)
-            st.write(f"Step {self.current_asana + 1}/12: {self.pose_sequence[self.current_asana]}")
-            st.write(f"Complete Reps: {self.rep_count}")
+            st.progress(self.tracker.step / len(self.pose_sequence))
+            st.write(f"Step {self.tracker.step + 1}/{len(self.pose_sequence)}: {self.tracker.asana}")
+            st.write(f"Complete Reps: {self.tracker.rep_count}")
         
         # Main camera feed
         col1, col2 = st.columns([2, 1])
@@ -62,6 +109,10 @@ class SuryaNamaskarApp:
         if not cap.isOpened():
             st.error("Cannot access camera")
             return
+        
+        streamer = get_streamer()
+        if streamer is not None:
+            camera_placeholder.markdown(streamer.html(), unsafe_allow_html=True)
             
         while True:
             ret, frame = cap.read()
@@ -74,76 +125,62 @@ class SuryaNamaskarApp:
             # Detect pose
             landmarks = self.pose_detector.detect_pose(frame)
             
-            if landmarks is not None and len(landmarks) > 0:
-                # Draw pose overlay
+            # Quality gate, analysis (reused while the pose holds still), flow and hold timer
+            tracker = self.tracker
+            now = time.time()
+            result = tracker.update(landmarks, now, frame)
+            accepted = result is not None and result.rejection is None
+            
+            if accepted:
+                # Draw pose overlay (after the analysis: the cascade models look at the raw frame)
                 frame = self.pose_detector.draw_pose(frame, landmarks)
+                if result.completed:
+                    st.balloons()  # Celebration effect
                 
-                # Calculate angles
-                angles = self.pose_detector.calculate_all_angles(landmarks)
-                
-                # Detect current asana
-                is_correct, feedback = self.asana_detector.detect_asana(
-                    self.pose_sequence[self.current_asana], angles, landmarks
-                )
-                
-                # Update pose hold time
-                current_time = time.time()
-                if is_correct:
-                    if self.current_asana not in self.pose_hold_time:
-                        self.pose_hold_time[self.current_asana] = current_time
-                    
-                    hold_duration = current_time - self.pose_hold_time[self.current_asana]
-                    
-                    if hold_duration >= self.min_hold_duration:
-                        # Move to next pose
-                        self.current_asana += 1
-                        self.pose_hold_time = {}  # Reset hold times
-                        
-                        if self.current_asana >= 12:
-                            # Complete sequence
-                            self.rep_count += 1
-                            self.current_asana = 0
-                            st.balloons()  # Celebration effect
-                else:
-                    # Reset hold time if pose is incorrect
-                    self.pose_hold_time.pop(self.current_asana, None)
-                
-                # Display current step and feedback
-                cv2.putText(frame, f"Step {self.current_asana + 1}: {self.pose_sequence[self.current_asana]}", 
-                           (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                cv2.putText(frame, f"Reps: {self.rep_count}", 
-                           (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                
-                status_color = (0, 255, 0) if is_correct else (0, 0, 255)
-                status_text = "✅ Correct" if is_correct else "❌ Incorrect"
-                cv2.putText(frame, status_text, (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, status_color, 2)
-                
-                if feedback:
-                    cv2.putText(frame, feedback, (10, 120), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
-                
-                # Display hold progress
-                if self.current_asana in self.pose_hold_time:
-                    hold_duration = current_time - self.pose_hold_time[self.current_asana]
-                    progress_text = f"Hold: {hold_duration:.1f}s / {self.min_hold_duration}s"
-                    cv2.putText(frame, progress_text, (10, 150), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+                # Display current step, feedback and hold progress
+                progress_text = None
+                if tracker.hold_start is not None:
+                    progress_text = f"Hold: {result.hold:.1f}s / {tracker.min_hold}s"
+                elif result.is_correct:
+                    progress_text = f"Hold still (stability {result.stability:.0%})"
+                frame = draw_status_overlay(frame, f"Step {tracker.step + 1}: {tracker.asana}",
+                                            f"Reps: {tracker.rep_count}", result.is_correct, result.feedback,
+                                            progress_text)
             
-            # Convert BGR to RGB for Streamlit
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            camera_placeholder.image(frame_rgb, channels="RGB", use_column_width=True)
+            if streamer is not None:
+                # Encoded once and served by the MJPEG endpoint
+                streamer.publish(frame)
+            else:
+                # Convert BGR to RGB for Streamlit
+                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                camera_placeholder.image(frame_rgb, channels="RGB", use_column_width=True)
             
             # Update sidebar displays
             with col2:
-                if landmarks is not None and len(landmarks) > 0:
+                if accepted and not result.reused:
                     angle_text = "**Joint Angles:**\n"
-                    for joint, angle in angles.items():
+                    for joint, angle in result.angles.items():
                         angle_text += f"- {joint}: {angle:.1f}°\n"
+                    angle_text += f"\nAnalysis reused for {tracker.change_gate.stats()['hit_rate']:.0%} of frames"
+                    angle_text += f"\n\nFrames rejected: {tracker.quality_gate.stats()['reject_rate']:.0%}"
                     angle_placeholder.markdown(angle_text)
                     
-                    feedback_color = "green" if is_correct else "red"
+                    feedback_color = "green" if result.is_correct else "red"
+                    status_text = "✅ Correct" if result.is_correct else "❌ Incorrect"
                     feedback_text = f":{feedback_color}[{status_text}]"
-                    if feedback:
-                        feedback_text += f"\n\n**Guidance:** {feedback}"
+                    feedback_text += f"\n\n**Detected:** {result.detected or 'no asana'}"
+                    aligner = tracker.aligner
+                    feedback_text += (f"\n\n**Flow:** step {aligner.step + 1}, {aligner.asana} "
+                                      f"({aligner.confidence:.0%}), {aligner.progress(now):.0%} of the round")
+                    if aligner.timings:
+                        feedback_text += "\n\n**Step times:** " + ", ".join(
+                            f"{asana} {end - start:.1f}s" for _, asana, start, end in list(aligner.timings)[-3:])
+                    feedback_text += f"\n\n**Stability:** {result.stability:.0%}"
+                    if result.feedback:
+                        feedback_text += f"\n\n**Guidance:** {result.feedback}"
                     feedback_placeholder.markdown(feedback_text)
+                elif result is not None and result.rejection is not None:
+                    feedback_placeholder.markdown(f":orange[⚠️ {REJECT_MESSAGES[result.rejection]}]")
             
             # Break on 'q' key (for local running)
             if cv2.waitKey(1) & 0xFF == ord('q'):
@@ -0,0 +1,163 @@
+"""
+Extra models for special checks the pose landmarks cannot settle.
+
+Some special checks are coarse on the pose landmarks alone: hands_together
+only compares the two wrist points with a 0.1 threshold. A cascade stage
+registered for such a check names the extra detector it needs ('hands':
+MediaPipe hand landmarks, 'pose_full': the highest-complexity pose model),
+when the cheap check is ambiguous (a band around its threshold) and the
+image region the detector looks at.
+
+ModelCascade.refine is given the special checks of the current step only.
+It runs a stage only on ambiguous frames and only on its crop, and stores
+the refined outcomes in the FrameContext, where AsanaDetector.
+special_check_score uses them instead of the predicate. Detectors are
+created on first use, so a flow that never gets ambiguous never loads them.
+"""
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from special_checks import SPECIAL_CHECKS, FrameContext
+import shared_utils  # noqa: F401  (makes the shared utils package importable)
+from utils.lazy_import import lazy_import
+
+cv2 = lazy_import('cv2')
+mp = lazy_import('mediapipe')
+
+# ambiguous(context) -> bool; region(context) -> (center x, center y, half size in frame heights);
+# decide(context, results) -> bool, or None to keep the cheap check
+CascadeStage = namedtuple('CascadeStage', 'detector ambiguous region decide')
+
+# special check name -> CascadeStage
+CASCADE_STAGES = {}
+
+
+def cascade_stage(check, detector, ambiguous, region):
+    """Register decide(context, results) as the refinement of the special check `check`.
+
+    results is the list of landmark arrays (K, 2) the detector found in the
+    crop, in normalized frame coordinates.
+    """
+    def register(decide):
+        CASCADE_STAGES[check] = CascadeStage(detector, ambiguous, region, decide)
+        return decide
+    return register
+
+
+def _hand_detector():
+    hands = mp.solutions.hands.Hands(static_image_mode=True, max_num_hands=2, model_complexity=0,
+                                     min_detection_confidence=0.5)
+
+    def detect(rgb):
+        results = hands.process(rgb)
+        return [np.array([[lm.x, lm.y] for lm in hand.landmark]) for hand in (results.multi_hand_landmarks or [])]
+    return detect
+
+
+def _full_pose_detector():
+    pose = mp.solutions.pose.Pose(static_image_mode=True, model_complexity=2, min_detection_confidence=0.5)
+
+    def detect(rgb):
+        results = pose.process(rgb)
+        if not results.pose_landmarks:
+            return []
+        return [np.array([[lm.x, lm.y] for lm in results.pose_landmarks.landmark])]
+    return detect
+
+
+# detector name -> factory of detect(rgb crop) -> list of landmark arrays (K, 2) normalized to the crop
+DETECTORS = {
+    'hands': _hand_detector,
+    'pose_full': _full_pose_detector
+}
+
+
+def _torso(context):
+    return max(float(np.hypot(context.shoulders[0] - context.hips[0], context.shoulders[1] - context.hips[1])), 0.05)
+
+
+def _wrist_distance(context):
+    return np.hypot(context.left_wrist[0] - context.right_wrist[0], context.left_wrist[1] - context.right_wrist[1])
+
+
+@cascade_stage("hands_together", 'hands',
+               ambiguous=lambda context: abs(_wrist_distance(context) - 0.1) < 0.05,
+               region=lambda context: (context.hands[0], context.hands[1], 0.4 * _torso(context)))
+def hands_together(context, hands):
+    # Palms pressed together are often found as one hand
+    if not hands:
+        return None
+    if len(hands) == 1:
+        return True
+    palms = [hand[[0, 5, 9, 13, 17]].mean(axis=0) for hand in hands[:2]]
+    return float(np.hypot(*(palms[0] - palms[1]))) < 0.25 * _torso(context)
+
+
+@cascade_stage("lunge_position", 'pose_full',
+               ambiguous=lambda context: abs(abs(context.left_ankle[0] - context.lunge_ankle[0]) - 0.3) < 0.05,
+               region=lambda context: (context.hips[0], context.hips[1], 1.5 * _torso(context)))
+def lunge_position(context, poses):
+    # The same check on the landmarks of the full model
+    if not poses:
+        return None
+    return bool(SPECIAL_CHECKS["lunge_position"][0](FrameContext(poses[0], context.angles)))
+
+
+class ModelCascade:
+    def __init__(self, detectors=None):
+        self.factories = dict(DETECTORS if detectors is None else detectors)
+        self._detectors = {}
+
+        # Diagnostics
+        self.frames = 0
+        self.runs = {}
+        self.seconds = {}
+
+    def refine(self, checks, frame, context):
+        """Refine the ambiguous ones of the active step's special checks on the BGR frame.
+
+        The outcomes are stored in context.refined and returned.
+        """
+        self.frames += 1
+        refined = {}
+        if context.valid:
+            height, width = frame.shape[:2]
+            for check in checks:
+                stage = CASCADE_STAGES.get(check)
+                if stage is None or stage.detector not in self.factories or not stage.ambiguous(context):
+                    continue
+                center_x, center_y, half = stage.region(context)
+                half = half * height
+                x0, x1 = int(max(center_x * width - half, 0)), int(min(center_x * width + half, width))
+                y0, y1 = int(max(center_y * height - half, 0)), int(min(center_y * height + half, height))
+                if x1 - x0 < 8 or y1 - y0 < 8:
+                    continue
+
+                start = time.perf_counter()
+                results = self._detector(stage.detector)(cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2RGB))
+                self.runs[stage.detector] = self.runs.get(stage.detector, 0) + 1
+                self.seconds[stage.detector] = self.seconds.get(stage.detector, 0.0) + time.perf_counter() - start
+
+                # Crop coordinates to normalized frame coordinates
+                scale = np.array([(x1 - x0) / width, (y1 - y0) / height])
+                offset = np.array([x0 / width, y0 / height])
+                outcome = stage.decide(context, [points[:, :2] * scale + offset for points in results])
+                if outcome is not None:
+                    refined[check] = outcome
+        context.refined = refined
+        return refined
+
+    def _detector(self, name):
+        if name not in self._detectors:
+            self._detectors[name] = self.factories[name]()
+        return self._detectors[name]
+
+    def stats(self):
+        """Frames seen and, per detector, runs and mean seconds per run"""
+        return {
+            'frames': self.frames,
+            'runs': dict(self.runs),
+            'mean_seconds': {name: self.seconds[name] / runs for name, runs in self.runs.items()}
+        }
\ No newline at end of file
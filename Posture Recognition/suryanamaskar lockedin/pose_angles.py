@@ -1,6 +1,9 @@
 import numpy as np
 import math
 
+# Head, shoulders, wrists, hips, ankles
+STABILITY_KEY_JOINTS = np.array([0, 11, 12, 15, 16, 23, 24, 27, 28])
+
 def calculate_angle(point1, point2, point3):
     """
     Calculate angle between three points
@@ -98,72 +101,173 @@ def get_body_center(landmarks):
     center_y = sum(point[1] for point in torso_points) / len(torso_points)
     return [center_x, center_y]
 
-def calculate_pose_stability(landmarks, previous_landmarks=None):
-    """
-    Calculate pose stability by comparing with previous frame
-    Returns stability score (0-1, higher is more stable)
+class StabilityTracker:
+    """Stability (0-1) of the key joints over the last `window` frames, per session.
+    
+    Per joint the spread (standard deviation of the position) and the jitter
+    (mean frame-to-frame displacement) over the window are kept in running
+    sums, so memory and time per frame do not depend on the window length:
+    a frame adds its sample and subtracts the one leaving the window. The
+    score is 1 - sensitivity * mean(spread + jitter); a frame missing a key
+    joint starts afresh.
+    
+    Every session is a row of the ring buffers and sums: ``update`` advances
+    one session (row 0, as the apps' SequenceTracker does), ``update_rows``
+    many at once (SequenceTable of the sequence server).
     """
-    if previous_landmarks is None:
-        return 1.0
     
-    try:
-        # Calculate movement of key joints
-        key_joints = [0, 11, 12, 15, 16, 23, 24, 27, 28]  # Head, shoulders, wrists, hips, ankles
-        total_movement = 0
-        
-        for joint_idx in key_joints:
-            if joint_idx < len(landmarks) and joint_idx < len(previous_landmarks):
-                current = landmarks[joint_idx]
-                previous = previous_landmarks[joint_idx]
-                movement = calculate_distance_2d(current, previous)
-                total_movement += movement
-        
-        # Normalize movement (lower movement = higher stability)
-        avg_movement = total_movement / len(key_joints)
-        stability = max(0.0, 1.0 - avg_movement * 20)  # Scale factor for sensitivity
+    def __init__(self, window=10, sensitivity=20.0, joints=STABILITY_KEY_JOINTS, sessions=1, resync_every=None):
+        if window < 2:
+            raise ValueError("stability window needs at least 2 frames")
+        self.window = window
+        self.joints = np.asarray(joints)
+        self.sensitivity = sensitivity
+        # Recompute a row's sums now and then so floating point drift cannot build up
+        self.resync_every = resync_every or 64 * window
+        self.sessions = 0
+        n_joints = len(self.joints)
+        self.positions = np.zeros((0, window, n_joints, 2))
+        self.steps = np.zeros((0, window - 1, n_joints))
+        self.position_sum = np.zeros((0, n_joints, 2))
+        self.position_sum_sq = np.zeros((0, n_joints, 2))
+        self.step_sum = np.zeros((0, n_joints))
+        # Frames since the row was reset (the ring buffer slot of the next one) and since its last resync
+        self.count = np.zeros(0, dtype=np.intp)
+        self.pushes = np.zeros(0, dtype=np.intp)
+        self.scores = np.zeros(0)
+        self._first = np.zeros(1, dtype=np.intp)
+        self.grow(sessions)
+    
+    def grow(self, sessions):
+        """Make room for `sessions` rows; new rows start afresh"""
+        old = self.sessions
+        if sessions <= old:
+            return
         
-        return stability
+        def extend(column):
+            grown = np.zeros((sessions,) + column.shape[1:], dtype=column.dtype)
+            grown[:old] = column
+            return grown
         
-    except Exception as e:
-        print(f"Error calculating stability: {e}")
-        return 0.5  # Neutral stability if calculation fails
-
-def validate_pose_landmarks(landmarks):
-    """
-    Validate that pose landmarks are reasonable
-    Returns True if landmarks seem valid, False otherwise
-    """
-    if landmarks is None or len(landmarks) < 33:
-        return False
+        self.positions = extend(self.positions)
+        self.steps = extend(self.steps)
+        self.position_sum = extend(self.position_sum)
+        self.position_sum_sq = extend(self.position_sum_sq)
+        self.step_sum = extend(self.step_sum)
+        self.count = extend(self.count)
+        self.pushes = extend(self.pushes)
+        self.scores = extend(self.scores)
+        self.sessions = sessions
     
-    try:
-        # Check that key landmarks are within reasonable bounds
-        for landmark in landmarks:
-            if not (0 <= landmark[0] <= 1) or not (0 <= landmark[1] <= 1):
-                return False
+    def reset(self, rows=slice(None)):
+        self.count[rows] = 0
+        self.pushes[rows] = 0
+        self.position_sum[rows] = 0.0
+        self.position_sum_sq[rows] = 0.0
+        self.step_sum[rows] = 0.0
+        self.scores[rows] = 0.0
+    
+    @property
+    def score(self):
+        return float(self.scores[0])
+    
+    def update(self, landmarks):
+        """Add one frame (33, >=2) of row 0; returns the stability score (0 until two frames are in)
         
-        # Check basic body proportions
-        head = landmarks[0]
-        left_shoulder = landmarks[11]
-        right_shoulder = landmarks[12]
-        left_hip = landmarks[23]
-        right_hip = landmarks[24]
+        update_rows on a single row, without the fancy indexing.
+        """
+        window = self.window
+        points = np.asarray(landmarks, dtype=np.float64)[self.joints, :2]
+        if np.isnan(points).any():
+            self.reset(0)
+            return 0.0
+        count = int(self.count[0])
+        positions, steps = self.positions[0], self.steps[0]
+        if count:
+            delta = points - positions[(count - 1) % window]
+            step = np.sqrt(np.einsum('ij,ij->i', delta, delta))
+            slot = (count - 1) % (window - 1)
+            self.step_sum[0] += step - steps[slot] if count > window - 1 else step
+            steps[slot] = step
         
-        # Head should be above shoulders
-        if head[1] > left_shoulder[1] or head[1] > right_shoulder[1]:
-            return False
+        slot = count % window
+        if count >= window:
+            leaving = positions[slot]
+            self.position_sum[0] += points - leaving
+            self.position_sum_sq[0] += points * points - leaving * leaving
+        else:
+            self.position_sum[0] += points
+            self.position_sum_sq[0] += points * points
+        positions[slot] = points
+        count += 1
+        self.count[0] = count
+        self.pushes[0] += 1
+        if self.pushes[0] >= self.resync_every:
+            self._resync(self._first)
+        if count < 2:
+            return float(self.scores[0])
         
-        # Shoulders should be above hips
-        if left_shoulder[1] > left_hip[1] or right_shoulder[1] > right_hip[1]:
-            return False
+        n_positions = min(count, window)
+        mean = self.position_sum[0] / n_positions
+        variance = np.maximum(self.position_sum_sq[0] / n_positions - mean * mean, 0.0)
+        spread = np.sqrt(variance.sum(axis=1))
+        jitter = self.step_sum[0] / min(count - 1, window - 1)
+        score = max(0.0, 1.0 - self.sensitivity * float((spread + jitter).mean()))
+        self.scores[0] = score
+        return score
+    
+    def update_rows(self, rows, landmarks):
+        """Add one frame (M, 33, >=2) to each of the distinct rows (M,); returns their scores"""
+        window = self.window
+        all_rows = rows
+        points = landmarks[:, self.joints, :2]
+        broken = np.isnan(points).any(axis=(1, 2))
+        if broken.any():
+            self.reset(rows[broken])
+        kept = np.flatnonzero(~broken)
+        rows, points = rows[kept], points[kept]
+        count = self.count[rows]
         
-        # Shoulders should be reasonably spaced
-        shoulder_distance = calculate_distance_2d(left_shoulder, right_shoulder)
-        if shoulder_distance < 0.05 or shoulder_distance > 0.5:
-            return False
+        # Displacement from the row's previous frame, replacing the oldest one once the window is full
+        following = count > 0
+        moved_rows, moved_count = rows[following], count[following]
+        delta = points[following] - self.positions[moved_rows, (moved_count - 1) % window]
+        step = np.sqrt(np.einsum('mij,mij->mi', delta, delta))
+        slot = (moved_count - 1) % (window - 1)
+        leaving = np.where((moved_count > window - 1)[:, None], self.steps[moved_rows, slot], 0.0)
+        self.steps[moved_rows, slot] = step
+        self.step_sum[moved_rows] += step - leaving
         
-        return True
+        slot = count % window
+        leaving = np.where((count >= window)[:, None, None], self.positions[rows, slot], 0.0)
+        self.positions[rows, slot] = points
+        self.position_sum[rows] += points - leaving
+        self.position_sum_sq[rows] += points * points - leaving * leaving
+        count += 1
+        self.count[rows] = count
+        self.pushes[rows] += 1
+        stale = rows[self.pushes[rows] >= self.resync_every]
+        if len(stale):
+            self._resync(stale)
         
-    except Exception as e:
-        print(f"Error validating landmarks: {e}")
-        return False
\ No newline at end of file
+        scored = count >= 2
+        scored_rows = rows[scored]
+        if len(scored_rows):
+            n_positions = np.minimum(count[scored], window)[:, None, None]
+            mean = self.position_sum[scored_rows] / n_positions
+            variance = np.maximum(self.position_sum_sq[scored_rows] / n_positions - mean * mean, 0.0)
+            spread = np.sqrt(variance.sum(axis=2))
+            jitter = self.step_sum[scored_rows] / np.minimum(count[scored] - 1, window - 1)[:, None]
+            self.scores[scored_rows] = np.maximum(
+                0.0, 1.0 - self.sensitivity * (spread + jitter).mean(axis=1))
+        return self.scores[all_rows]
+    
+    def _resync(self, rows):
+        """Recompute the sums of rows from their ring buffers"""
+        count = self.count[rows]
+        positions = np.where((np.arange(self.window) < count[:, None])[:, :, None, None], self.positions[rows], 0.0)
+        steps = np.where((np.arange(self.window - 1) < count[:, None] - 1)[:, :, None], self.steps[rows], 0.0)
+        self.position_sum[rows] = positions.sum(axis=1)
+        self.position_sum_sq[rows] = (positions * positions).sum(axis=1)
+        self.step_sum[rows] = steps.sum(axis=1)
+        self.pushes[rows] = 0
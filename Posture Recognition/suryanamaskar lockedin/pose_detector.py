@@ -1,8 +1,45 @@
-import cv2
-import mediapipe as mp
 import numpy as np
 from typing import Dict, List, Tuple, Optional
 import math
+import threading
+import shared_utils  # noqa: F401  (makes the shared utils package importable)
+from utils.lazy_import import lazy_import
+
+# Heavy dependencies are imported on first use
+cv2 = lazy_import('cv2')
+mp = lazy_import('mediapipe')
+
+# Joint angles reported by calculate_all_angles: (point, vertex, point) landmark indices
+ANGLE_JOINTS = {
+    'left_shoulder': (13, 11, 23),   # elbow, shoulder, hip
+    'left_elbow': (11, 13, 15),      # shoulder, elbow, wrist
+    'right_shoulder': (14, 12, 24),
+    'right_elbow': (12, 14, 16),
+    'torso': (11, 23, 25),           # shoulder, hip, knee
+    'left_hip': (11, 23, 25),
+    'left_knee': (23, 25, 27),       # hip, knee, ankle
+    'right_hip': (12, 24, 26),
+    'right_knee': (24, 26, 28),
+    'spine': (0, 11, 23)             # nose, shoulder, hip
+}
+
+
+def joint_angles(landmarks):
+    """ANGLE_JOINTS angles in degrees (N, J) for landmark arrays (N, 33, >=2) at once"""
+    triples = np.array(list(ANGLE_JOINTS.values()))
+    v1 = landmarks[:, triples[:, 0], :2] - landmarks[:, triples[:, 1], :2]
+    v2 = landmarks[:, triples[:, 2], :2] - landmarks[:, triples[:, 1], :2]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cosine = (v1 * v2).sum(axis=-1) / (np.linalg.norm(v1, axis=-1) * np.linalg.norm(v2, axis=-1))
+    return np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+
+def all_angles(landmarks, angle_vector):
+    """Angles of calculate_all_angles for one frame (33, >=2) from its joint_angles"""
+    angles = dict(zip(ANGLE_JOINTS, angle_vector.tolist()))
+    # Hip width angle (for stance detection)
+    angles['hip_width'] = abs(landmarks[23][0] - landmarks[24][0])
+    return angles
 
 class PoseDetector:
     def __init__(self):
@@ -36,16 +73,36 @@ class PoseDetector:
             (23, 25), (25, 27), (27, 29), (27, 31),  # Left leg
             (24, 26), (26, 28), (28, 30), (28, 32),  # Right leg
         ]
+        self._warmup_thread = None
+        # The tracking graph is not thread-safe: one process() call at a time
+        self._process_lock = threading.Lock()
+        
+    def warm_up(self, frame_shape=(480, 640, 3)):
+        """Run one dummy inference so graph initialization is not paid on the first real frame"""
+        with self._process_lock:
+            self.pose.process(np.zeros(frame_shape, dtype=np.uint8))
+    
+    def warm_up_async(self, frame_shape=(480, 640, 3)):
+        """Warm up on a background thread; detect_pose waits for it to finish"""
+        self._warmup_thread = threading.Thread(target=self.warm_up, args=(frame_shape,),
+                                               name="pose-warmup", daemon=True)
+        self._warmup_thread.start()
+        return self._warmup_thread
         
     def detect_pose(self, frame):
         """Detect pose landmarks in frame"""
+        warmup_thread = self._warmup_thread
+        if warmup_thread is not None:
+            warmup_thread.join()
+            self._warmup_thread = None
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.pose.process(rgb_frame)
+        with self._process_lock:
+            results = self.pose.process(rgb_frame)
         
         if results.pose_landmarks and results.pose_landmarks.landmark:
             landmarks = []
             for landmark in results.pose_landmarks.landmark:
-                landmarks.append([landmark.x, landmark.y, landmark.z])
+                landmarks.append([landmark.x, landmark.y, landmark.z, landmark.visibility])
             return np.array(landmarks)
         return None
     
@@ -101,65 +158,23 @@ class PoseDetector:
         
         return np.degrees(angle)
     
-    def calculate_all_angles(self, landmarks):
-        """Calculate all relevant joint angles"""
+    def calculate_angle_vector(self, landmarks):
+        """ANGLE_JOINTS angles in degrees as one array (NaN where undefined)"""
+        if landmarks is None or len(landmarks) < 33:
+            return np.full(len(ANGLE_JOINTS), np.nan)
+        return joint_angles(np.asarray(landmarks, dtype=np.float64)[None])[0]
+    
+    def calculate_all_angles(self, landmarks, angle_vector=None):
+        """Calculate all relevant joint angles (from angle_vector when it is already known)"""
         angles = {}
         
         if landmarks is None or len(landmarks) < 33:
             return angles
         
         try:
-            # Left arm angles
-            if len(landmarks) > 15:
-                angles['left_shoulder'] = self.calculate_angle(
-                    landmarks[13], landmarks[11], landmarks[23]  # elbow, shoulder, hip
-                )
-                angles['left_elbow'] = self.calculate_angle(
-                    landmarks[11], landmarks[13], landmarks[15]  # shoulder, elbow, wrist
-                )
-            
-            # Right arm angles  
-            if len(landmarks) > 16:
-                angles['right_shoulder'] = self.calculate_angle(
-                    landmarks[14], landmarks[12], landmarks[24]  # elbow, shoulder, hip
-                )
-                angles['right_elbow'] = self.calculate_angle(
-                    landmarks[12], landmarks[14], landmarks[16]  # shoulder, elbow, wrist
-                )
-            
-            # Torso angle
-            if len(landmarks) > 25:
-                angles['torso'] = self.calculate_angle(
-                    landmarks[11], landmarks[23], landmarks[25]  # shoulder, hip, knee
-                )
-            
-            # Left leg angles
-            if len(landmarks) > 27:
-                angles['left_hip'] = self.calculate_angle(
-                    landmarks[11], landmarks[23], landmarks[25]  # shoulder, hip, knee
-                )
-                angles['left_knee'] = self.calculate_angle(
-                    landmarks[23], landmarks[25], landmarks[27]  # hip, knee, ankle
-                )
-            
-            # Right leg angles
-            if len(landmarks) > 28:
-                angles['right_hip'] = self.calculate_angle(
-                    landmarks[12], landmarks[24], landmarks[26]  # shoulder, hip, knee
-                )
-                angles['right_knee'] = self.calculate_angle(
-                    landmarks[24], landmarks[26], landmarks[28]  # hip, knee, ankle
-                )
-            
-            # Spine angle (head to hip)
-            if len(landmarks) > 23:
-                angles['spine'] = self.calculate_angle(
-                    landmarks[0], landmarks[11], landmarks[23]  # nose, shoulder, hip
-                )
-            
-            # Hip width angle (for stance detection)
-            if len(landmarks) > 24:
-                angles['hip_width'] = abs(landmarks[23][0] - landmarks[24][0])
+            if angle_vector is None:
+                angle_vector = self.calculate_angle_vector(landmarks)
+            angles = all_angles(landmarks, angle_vector)
             
         except Exception as e:
             print(f"Error calculating angles: {e}")
@@ -0,0 +1,179 @@
+"""
+Online alignment of a practised flow against a reference asana sequence.
+
+The steps of the sequence form a cyclic left-to-right hidden Markov model.
+As the reported position only ever moves one step on, just the current
+step and the next one are filtered: from one frame to the next the flow
+keeps its step or moves on, likelier the longer the time between frames,
+with a mean dwell of ``step_seconds`` per step. Every frame the probability
+that the flow has reached the next step (``moved``) is updated with the
+per-asana scores of the frame (AsanaDetector.asana_scores): a step's
+likelihood is exp(sharpness * (score - 1)), never below ``floor``, so a
+frame where nothing is detected only lets time pass, and ``moved`` stays
+below 1 - floor, so frames of the current step can still bring it back.
+
+The reported position (round * steps + step) moves on once ``moved``
+reaches ``min_confidence`` on a frame where the next step scores at least
+``min_score`` and more than the current step. Probabilities alone are
+relative: right after a seek forward (a hold was completed) the pose is
+still the step left, and a next step scoring a little more than the current
+one would win on them. So until the step left scores below ``min_score``
+(``leaving``) the next step has to beat it too. The absolute scores keep
+the flow on the step until the next pose is actually there. The same asana
+on neighbouring steps (the closing Pranamasana and the next round's first)
+cannot be told apart, so such a run is one state: the next step is the
+first with another asana, and the position moves over the whole run when it
+is reached. When a step is left its start and end times are kept in
+``timings``. align_frames runs the same filter over cached
+per-frame scores offline.
+
+``advance`` is the same filter for many flows at once: it takes the state
+of M flows as arrays (position, moved, leaving and the last frame time)
+with one frame each, as SequenceTable keeps them per session row together
+with the timings. The sequence server benchmark checks it against ``update``.
+"""
+import math
+from collections import deque
+
+import numpy as np
+
+
+class SequenceAligner:
+    def __init__(self, sequence, names, step_seconds=3.0, sharpness=10.0, floor=1e-3,
+                 min_confidence=0.6, min_score=0.6, max_dt=1.0):
+        self.sequence = list(sequence)
+        if len(self.sequence) < 3:
+            raise ValueError("a sequence needs at least 3 steps")
+        names = list(names)
+        missing = [asana for asana in self.sequence if asana not in names]
+        if missing:
+            raise ValueError(f"no scores for {', '.join(missing)}")
+        # Column of the frame scores for every step
+        self._columns = np.array([names.index(asana) for asana in self.sequence], dtype=np.intp)
+        # Steps from every step to the next one with another asana
+        count = len(self.sequence)
+        strides = []
+        for step, asana in enumerate(self.sequence):
+            stride = 1
+            while stride < count and self.sequence[(step + stride) % count] == asana:
+                stride += 1
+            strides.append(stride if stride < count else 1)
+        self.strides = np.array(strides, dtype=np.intp)
+        self.step_seconds = step_seconds
+        self.sharpness = sharpness
+        self.floor = floor
+        self.min_confidence = min_confidence
+        self.min_score = min_score
+        self.max_dt = max_dt
+        self.timings = deque(maxlen=4 * len(self.sequence))
+        self.position = 0
+        self.step_start = None
+        self.reset()
+
+    def reset(self, position=0, timestamp=None):
+        """Start at position (round * steps + step) and forget the timings"""
+        self.timings.clear()
+        self.seek(position, timestamp)
+        self.leaving = False
+
+    def seek(self, position, timestamp=None):
+        """Move to position, e.g. when the caller advanced on its own"""
+        if timestamp is not None and self.step_start is not None and position != self.position:
+            self._leave(self.position, timestamp)
+        # The pose is still the step left until it scores below min_score
+        self.leaving = position > self.position
+        self.position = position
+        self.moved = 0.0
+        self.step_start = timestamp
+        self._last_time = timestamp
+
+    @property
+    def step(self):
+        return self.position % len(self.sequence)
+
+    @property
+    def round(self):
+        return self.position // len(self.sequence)
+
+    @property
+    def asana(self):
+        return self.sequence[self.step]
+
+    @property
+    def confidence(self):
+        """Probability that the flow is still on the step"""
+        return 1.0 - self.moved
+
+    def progress(self, timestamp):
+        """Fraction of the round done, counting the current step by its time against step_seconds"""
+        elapsed = 0.0 if self.step_start is None else timestamp - self.step_start
+        return (self.step + min(elapsed / self.step_seconds, 1.0)) / len(self.sequence)
+
+    def update(self, timestamp, scores):
+        """Add one frame's scores (in the names order); returns the position"""
+        dt = 0.0 if self._last_time is None else min(max(timestamp - self._last_time, 0.0), self.max_dt)
+        self._last_time = timestamp
+        if self.step_start is None:
+            self.step_start = timestamp
+
+        moving = 1.0 - math.exp(-dt / self.step_seconds)
+        step_scores = np.asarray(scores, dtype=np.float64)[self._columns]
+        step = self.step
+        stride = int(self.strides[step])
+        following = (step + stride) % len(self.sequence)
+        stay_likelihood, next_likelihood = np.maximum(
+            np.exp(self.sharpness * (step_scores[[step, following]] - 1.0)), self.floor).tolist()
+        stay = (1.0 - self.moved) * (1.0 - moving) * stay_likelihood
+        on = (self.moved + (1.0 - self.moved) * moving) * next_likelihood
+        self.moved = min(on / (stay + on), 1.0 - self.floor)
+
+        if self.leaving and step_scores[step - 1] < self.min_score:
+            self.leaving = False
+        score = step_scores[following]
+        if (self.moved >= self.min_confidence and score >= self.min_score and score > step_scores[step]
+                and not (self.leaving and score <= step_scores[step - 1])):
+            self._leave(self.position, timestamp)
+            self.position += stride
+            self.moved = 0.0
+            self.step_start = timestamp
+        return self.position
+
+    def advance(self, position, moved, leaving, last_time, timestamps, scores):
+        """One frame of the filter for M flows.
+
+        position (M,) (round * steps + step), moved (M,), leaving (M,) and
+        last_time (M,) (NaN before the first frame) are the flows' states,
+        timestamps (M,) and scores (M, names) their frames. Returns the new
+        (position, moved, leaving) and where the position moved on; the
+        frames' timestamps are the new last times.
+        """
+        with np.errstate(invalid='ignore'):
+            dt = np.where(np.isnan(last_time), 0.0, np.clip(timestamps - last_time, 0.0, self.max_dt))
+        moving = 1.0 - np.exp(-dt / self.step_seconds)
+        rows = np.arange(len(position))
+        step_scores = scores[:, self._columns]
+        step = position % len(self.sequence)
+        stride = self.strides[step]
+        current = step_scores[rows, step]
+        score = step_scores[rows, (step + stride) % len(self.sequence)]
+        previous = step_scores[rows, step - 1]
+        stay_likelihood = np.maximum(np.exp(self.sharpness * (current - 1.0)), self.floor)
+        next_likelihood = np.maximum(np.exp(self.sharpness * (score - 1.0)), self.floor)
+        stay = (1.0 - moved) * (1.0 - moving) * stay_likelihood
+        on = (moved + (1.0 - moved) * moving) * next_likelihood
+        moved = np.minimum(on / (stay + on), 1.0 - self.floor)
+
+        leaving = leaving & ~(previous < self.min_score)
+        moved_on = ((moved >= self.min_confidence) & (score >= self.min_score) & (score > current)
+                    & ~(leaving & (score <= previous)))
+        return position + np.where(moved_on, stride, 0), np.where(moved_on, 0.0, moved), leaving, moved_on
+
+    def _leave(self, position, timestamp):
+        self.timings.append((position, self.sequence[position % len(self.sequence)], self.step_start, timestamp))
+
+
+def align_frames(aligner, timestamps, scores):
+    """Positions (N,) after every frame of cached per-frame scores (N, A), from the aligner's current state"""
+    return np.array([aligner.update(timestamp, frame_scores)
+                     for timestamp, frame_scores in zip(np.asarray(timestamps, dtype=np.float64).tolist(), scores)],
+                    dtype=np.intp)
\ No newline at end of file
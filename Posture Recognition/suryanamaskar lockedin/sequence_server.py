@@ -0,0 +1,126 @@
+"""
+Surya Namaskar sequence tracking for many concurrent sessions.
+
+A server receives landmark frames tagged with a session id (``submit``) and
+advances every session that delivered a frame with one ``process`` call per
+tick. The sessions are rows of one SequenceTable: step, completed rounds,
+hold start, aligner belief and step timings, stability sums, change gate
+reference and last analysis are NumPy columns, and the frames of a tick go
+through the pipeline of the apps (quality gate, change gate, asana check and
+classification, flow aligner, stability and hold rule) together, so a
+session moves through the sequence exactly as a SequenceTracker would in
+SuryaNamaskarApp. The asana check and the classification of all frames of
+a tick that need an analysis are one AsanaDetector.score_frames call.
+
+A session id is mapped to its row on the first frame, and sessions without a
+frame for ``ttl`` seconds are evicted and their rows reused. The server time
+of every session's last frame is a column too.
+"""
+import time
+
+import numpy as np
+
+from sequence_tracker import SequenceTable
+
+
+class SequenceServer:
+    def __init__(self, detector, sequence, min_hold=2.0, ttl=60.0, capacity=64, tracker_options=None):
+        """tracker_options: further keyword arguments of the SequenceTable (those of SequenceTracker)"""
+        self.table = SequenceTable(detector, sequence, min_hold, capacity=capacity, **(tracker_options or {}))
+        self.sequence = self.table.sequence
+        self.ttl = ttl
+
+        # Server time of the last frame, for the TTL
+        self.last_seen = np.full(self.table.capacity, np.nan)
+        self.session_ids = [None] * self.table.capacity
+        self.slots = {}
+        self._pending = {}
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.slots)
+
+    # Sessions
+
+    def add_session(self, session_id, now=None):
+        """Row of a session, allocated (at the start of the sequence) on first use"""
+        slot = self.slots.get(session_id)
+        if slot is not None:
+            return slot
+        slot = self.table.add_session()
+        grown = self.table.capacity - len(self.last_seen)
+        if grown > 0:
+            self.last_seen = np.concatenate((self.last_seen, np.full(grown, np.nan)))
+            self.session_ids.extend([None] * grown)
+        self.slots[session_id] = slot
+        self.session_ids[slot] = session_id
+        self.last_seen[slot] = time.monotonic() if now is None else now
+        return slot
+
+    def reset_session(self, session_id):
+        """Restart the sequence of a session"""
+        slot = self.slots.get(session_id)
+        if slot is not None:
+            self.table.reset_session(slot)
+
+    def remove_session(self, session_id):
+        slot = self.slots.pop(session_id, None)
+        if slot is None:
+            return
+        self._pending.pop(session_id, None)
+        self.table.remove_session(slot)
+        self.session_ids[slot] = None
+
+    def evict_idle(self, now=None):
+        """Remove sessions without a frame for ttl seconds; returns their ids"""
+        now = time.monotonic() if now is None else now
+        idle = np.flatnonzero(self.table.active & (now - self.last_seen > self.ttl))
+        expired = [self.session_ids[slot] for slot in idle.tolist()]
+        for session_id in expired:
+            self.remove_session(session_id)
+        self.evicted += len(expired)
+        return expired
+
+    def state(self, session_id):
+        """(step, asana, completed rounds) of a session, or None if it is unknown"""
+        slot = self.slots.get(session_id)
+        if slot is None:
+            return None
+        step = int(self.table.step[slot])
+        return step, self.sequence[step], int(self.table.rep_count[slot])
+
+    def timings(self, session_id):
+        """Steps a session has left, as SequenceAligner.timings (empty if it is unknown)"""
+        slot = self.slots.get(session_id)
+        return [] if slot is None else self.table.timings(slot)
+
+    def positions(self, session_ids):
+        """round * steps + step of known sessions"""
+        return self.table.positions(np.array([self.slots[session_id] for session_id in session_ids], dtype=np.intp))
+
+    # Frames
+
+    def submit(self, session_id, landmarks, timestamp):
+        """Queue one landmark frame (33, >=2 normalized) of a session; a newer frame replaces a queued one"""
+        self._pending[session_id] = (landmarks, timestamp)
+
+    def process(self, now=None):
+        """Advance every session with a queued frame, then evict idle sessions.
+
+        Returns None without frames, else the per-frame results of
+        SequenceTable.evaluate (accepted, is_correct, hold, advanced, step,
+        rep_count, ...) with the session ids in sessions.
+        """
+        now = time.monotonic() if now is None else now
+        pending, self._pending = self._pending, {}
+        results = None
+        if pending:
+            session_ids = list(pending)
+            slots = np.array([self.add_session(session_id, now) for session_id in session_ids], dtype=np.intp)
+            landmarks = np.stack([np.asarray(frame, dtype=np.float64) for frame, _ in pending.values()])
+            timestamps = np.array([timestamp for _, timestamp in pending.values()], dtype=np.float64)
+            results = self.table.evaluate(slots, landmarks, timestamps)
+            results['sessions'] = session_ids
+            self.last_seen[slots] = now
+        self.evict_idle(now)
+        return results
@@ -0,0 +1,456 @@
+"""
+Per-frame Surya Namaskar pipeline shared by the apps and the sequence server.
+
+A SequenceTracker keeps one user's place in the sequence. Every landmark
+frame goes through the same steps: the quality gate rejects frames the
+current step cannot be judged on, the change gate reuses the last analysis
+while the pose has not moved, and otherwise the joint angles are computed
+and the pose is checked against the expected asana and classified against
+all of them. The flow aligner then moves the step on when the flow has gone
+past it (e.g. its hold was never detected), and the hold rule advances it
+once the expected asana has been correct on a still body (StabilityTracker)
+for ``min_hold`` seconds of frame timestamps.
+
+A SequenceTable runs the same pipeline for the sequence server, with one
+row per session (the SessionTable layout of the exercise server): step,
+completed rounds, hold start, the aligner's belief and step timings, the
+change gate reference and the last analysis are NumPy columns, and the
+stability windows are rows of one StabilityTracker. ``evaluate`` advances
+the frames of many sessions at once: the asana check and classification of
+all analysed frames (AsanaDetector.score_frames), the aligner
+(SequenceAligner.advance), the stability and the hold rule are array
+operations over the rows. A row moves exactly as a SequenceTracker would;
+the apps keep the tracker, whose scalar path is faster for a single user.
+
+The thresholds are the apps' config values (POSE_HOLD_DURATION,
+POSE_VALIDATION, STABILITY_*, CHANGE_GATE_*, SEQUENCE_ALIGNER), passed in
+by the caller.
+"""
+from typing import Dict, NamedTuple, Optional
+
+import numpy as np
+
+from pose_angles import StabilityTracker
+from pose_detector import all_angles, joint_angles
+from sequence_aligner import SequenceAligner
+import shared_utils  # noqa: F401  (makes the shared utils package importable)
+from utils.change_gate import ChangeGate
+from utils.landmark_quality import LandmarkQualityGate
+
+# Missing landmarks are compared as this far-away point by the change gate, so
+# one that appears or disappears counts as moved (as utils.change_gate)
+_MISSING_COORD = -1e6
+# MediaPipe pose landmarks per frame
+_POSE_LANDMARKS = 33
+
+
+class FrameResult(NamedTuple):
+    """Outcome of one frame; a rejected frame only has its rejection reason"""
+    rejection: Optional[str] = None
+    reused: bool = False
+    angles: Optional[Dict[str, float]] = None
+    is_correct: bool = False
+    feedback: str = ""
+    detected: Optional[str] = None
+    scores: Optional[np.ndarray] = None
+    stability: float = 0.0
+    hold: float = 0.0
+    advanced: bool = False
+    completed: bool = False
+
+
+class SequenceTracker:
+    def __init__(self, asana_detector, sequence, min_hold=2.0, validation=None, stability_window=10,
+                 stability_threshold=0.7, change_epsilon=0.009, max_reuse=15, aligner=None, cascade=None):
+        """validation and aligner are keyword arguments of LandmarkQualityGate and SequenceAligner"""
+        self.asana_detector = asana_detector
+        self.sequence = list(sequence)
+        self.min_hold = min_hold
+        self.stability_threshold = stability_threshold
+        # Extra models for ambiguous special checks of the current step
+        self.cascade = cascade
+        # Frames the current step cannot be judged on are rejected before any angle computation
+        self.quality_gate = LandmarkQualityGate(**(validation or {}))
+        for asana_name in set(self.sequence):
+            self.quality_gate.require(asana_name, asana_detector.required_landmarks(asana_name))
+        # Angles and asana check are reused while the pose holds still
+        self.change_gate = ChangeGate(change_epsilon, max_reuse)
+        # Where the flow is in the sequence, from the scores of all asanas
+        self.aligner = SequenceAligner(self.sequence, asana_detector.score_names, **(aligner or {}))
+        # Spread and jitter of the key joints over the last frames, for the hold timer
+        self.stability = StabilityTracker(stability_window)
+        self.reset()
+
+    def reset(self):
+        """Restart the sequence"""
+        self.step = 0
+        self.rep_count = 0
+        # Timestamp of the first frame of the current hold (None while not holding)
+        self.hold_start = None
+        self.aligner.reset()
+        self.stability.reset()
+        self.change_gate.invalidate()
+        self.last_analysis = None
+
+    @property
+    def asana(self):
+        return self.sequence[self.step]
+
+    @property
+    def position(self):
+        """round * steps + step"""
+        return self.rep_count * len(self.sequence) + self.step
+
+    def hold_duration(self, timestamp):
+        return 0.0 if self.hold_start is None else timestamp - self.hold_start
+
+    def update(self, landmarks, timestamp, frame=None, angle_vector=None):
+        """Run one landmark frame (33, >=2 normalized; a 4th column is the visibility) through the pipeline.
+
+        Returns None without a pose, else a FrameResult. frame (BGR) is only
+        needed by the model cascade; angle_vector (ANGLE_JOINTS order) may be
+        computed beforehand for many frames at once (joint_angles).
+        """
+        if landmarks is None:
+            return None
+        visibility = landmarks[:, 3] if landmarks.shape[1] > 3 else None
+        accepted, rejection = self.quality_gate.check(landmarks, self.asana, visibility)
+        if not accepted:
+            return FrameResult(rejection=rejection)
+
+        # Reuse the last analysis while the pose has not moved
+        reused = self.last_analysis is not None and self.change_gate.unchanged(landmarks[:, :2], self.step)
+        if not reused:
+            self.last_analysis = self.analyse(landmarks, frame, angle_vector)
+        angles, is_correct, feedback, detected, scores = self.last_analysis
+        is_correct, stability, hold, advanced, completed = self.advance(landmarks, timestamp, is_correct, scores)
+        return FrameResult(None, reused, angles, is_correct, feedback, detected, scores,
+                           stability, hold, advanced, completed)
+
+    def analyse(self, landmarks, frame=None, angle_vector=None):
+        """(angles, is_correct, feedback, detected, scores) of an accepted frame for the current step"""
+        if angle_vector is None:
+            angle_vector = joint_angles(np.asarray(landmarks, dtype=np.float64)[None])[0]
+        angles = all_angles(landmarks, angle_vector)
+
+        # Check the current asana, and which asana the pose actually matches (sharing the special-check context)
+        context = self.asana_detector.frame_context(landmarks, angles)
+        if self.cascade is not None and frame is not None:
+            self.cascade.refine(self.asana_detector.special_check_names(self.asana), frame, context)
+        is_correct, feedback = self.asana_detector.detect_asana(self.asana, angles, landmarks, angle_vector, context)
+        detected, scores = self.asana_detector.classify(angle_vector, landmarks, angles, context)
+        if not is_correct:
+            feedback = self.asana_detector.sequence_feedback(self.sequence, self.step, detected) or feedback
+        return angles, is_correct, feedback, detected, scores
+
+    def advance(self, landmarks, timestamp, is_correct, scores):
+        """Flow, stability and hold rule of an accepted frame; (is_correct, stability, hold, advanced, completed)"""
+        # Follow the flow when it has moved past the expected step (e.g. its hold was never detected)
+        flow_position = self.aligner.update(timestamp, scores)
+        if flow_position > self.position:
+            self.rep_count, self.step = divmod(flow_position, len(self.sequence))
+            self.hold_start = None
+            is_correct = False
+
+        # A pose is only held while the body is still
+        stability = self.stability.update(landmarks)
+        hold = 0.0
+        advanced = completed = False
+        if is_correct and stability >= self.stability_threshold:
+            if self.hold_start is None:
+                self.hold_start = timestamp
+            hold = timestamp - self.hold_start
+            if hold >= self.min_hold:
+                # Move to the next pose; the last one completes a round
+                advanced = True
+                self.step += 1
+                self.hold_start = None
+                if self.step >= len(self.sequence):
+                    self.rep_count += 1
+                    self.step = 0
+                    completed = True
+                self.aligner.seek(self.position, timestamp)
+        else:
+            self.hold_start = None
+        return is_correct, stability, hold, advanced, completed
+
+
+class SequenceTable:
+    def __init__(self, asana_detector, sequence, min_hold=2.0, validation=None, stability_window=10,
+                 stability_threshold=0.7, change_epsilon=0.009, max_reuse=15, aligner=None, cascade=None,
+                 capacity=64):
+        """The arguments of SequenceTracker, and the rows to allocate up front"""
+        self.asana_detector = asana_detector
+        self.sequence = list(sequence)
+        self.min_hold = min_hold
+        self.stability_threshold = stability_threshold
+        self.change_epsilon = change_epsilon
+        self.max_reuse = max_reuse
+        # Extra models for ambiguous special checks of the current step
+        self.cascade = cascade
+        # Frames the current step cannot be judged on are rejected before any angle computation
+        self.quality_gate = LandmarkQualityGate(**(validation or {}))
+        for asana_name in set(self.sequence):
+            self.quality_gate.require(asana_name, asana_detector.required_landmarks(asana_name))
+        # Parameters of the flow filter; the belief of every session is in the columns
+        self.aligner = SequenceAligner(self.sequence, asana_detector.score_names, **(aligner or {}))
+        self.n_scores = len(asana_detector.score_names)
+        # Spread and jitter of the key joints over the last frames, one row per session
+        self.stability = StabilityTracker(stability_window, sessions=0)
+        # Step timings kept per row, as many as the aligner keeps
+        self.max_timings = self.aligner.timings.maxlen
+
+        # Change gate diagnostics
+        self.hits = 0
+        self.misses = 0
+
+        self.capacity = 0
+        self.active = np.zeros(0, dtype=bool)
+        self.step = np.zeros(0, dtype=np.intp)
+        self.rep_count = np.zeros(0, dtype=np.int64)
+        # Timestamp of the first frame of the current hold (NaN while not holding)
+        self.hold_start = np.zeros(0)
+        # Aligner belief: probability the flow moved on, step left still in view, last frame time
+        self.moved = np.zeros(0)
+        self.leaving = np.zeros(0, dtype=bool)
+        self.last_time = np.zeros(0)
+        # Step timings: start of the current step, ring of (position, start, end) of the steps left
+        self.step_start = np.zeros(0)
+        self.timing_position = np.zeros((0, self.max_timings), dtype=np.int64)
+        self.timing_start = np.zeros((0, self.max_timings))
+        self.timing_end = np.zeros((0, self.max_timings))
+        self.timing_count = np.zeros(0, dtype=np.int64)
+        # Change gate: landmarks of the last analysed frame, its step (-1: analyse the next frame)
+        # and the frames that reused its analysis since
+        self.reference = np.zeros((0, _POSE_LANDMARKS, 2))
+        self.reference_step = np.zeros(0, dtype=np.intp)
+        self.reused = np.zeros(0, dtype=np.int64)
+        # Last analysis: expected asana correct, asana_scores, best asana column (-1 for none)
+        self.is_correct = np.zeros(0, dtype=bool)
+        self.scores = np.zeros((0, self.n_scores))
+        self.detected = np.zeros(0, dtype=np.intp)
+        self._free = []
+        self._grow(capacity)
+
+    def __len__(self):
+        return int(self.active.sum())
+
+    def _grow(self, capacity):
+        old = self.capacity
+        if capacity <= old:
+            return
+
+        def extend(column, fill):
+            grown = np.full((capacity,) + column.shape[1:], fill, dtype=column.dtype)
+            grown[:old] = column
+            return grown
+
+        self.active = extend(self.active, False)
+        self.step = extend(self.step, 0)
+        self.rep_count = extend(self.rep_count, 0)
+        self.hold_start = extend(self.hold_start, np.nan)
+        self.moved = extend(self.moved, 0.0)
+        self.leaving = extend(self.leaving, False)
+        self.last_time = extend(self.last_time, np.nan)
+        self.step_start = extend(self.step_start, np.nan)
+        self.timing_position = extend(self.timing_position, 0)
+        self.timing_start = extend(self.timing_start, 0.0)
+        self.timing_end = extend(self.timing_end, 0.0)
+        self.timing_count = extend(self.timing_count, 0)
+        self.reference = extend(self.reference, 0.0)
+        self.reference_step = extend(self.reference_step, -1)
+        self.reused = extend(self.reused, 0)
+        self.is_correct = extend(self.is_correct, False)
+        self.scores = extend(self.scores, 0.0)
+        self.detected = extend(self.detected, -1)
+        self.stability.grow(capacity)
+        self._free.extend(range(capacity - 1, old - 1, -1))
+        self.capacity = capacity
+
+    # Sessions
+
+    def add_session(self):
+        """Allocate a row for a new session (at the start of the sequence) and return its slot"""
+        if not self._free:
+            self._grow(max(2 * self.capacity, 1))
+        slot = self._free.pop()
+        self.active[slot] = True
+        self.reset_session(slot)
+        return slot
+
+    def remove_session(self, slot):
+        if self.active[slot]:
+            self.active[slot] = False
+            self._free.append(slot)
+
+    def reset_session(self, slot):
+        """Restart the sequence of a row (SequenceTracker.reset)"""
+        self.step[slot] = 0
+        self.rep_count[slot] = 0
+        self.hold_start[slot] = np.nan
+        self.moved[slot] = 0.0
+        self.leaving[slot] = False
+        self.last_time[slot] = np.nan
+        self.step_start[slot] = np.nan
+        self.timing_count[slot] = 0
+        self.reference_step[slot] = -1
+        self.stability.reset(slot)
+
+    def positions(self, slots):
+        """round * steps + step of the rows"""
+        return self.rep_count[slots] * len(self.sequence) + self.step[slots]
+
+    def progress(self, slots, timestamps):
+        """SequenceAligner.progress of the rows"""
+        elapsed = np.nan_to_num(np.asarray(timestamps, dtype=np.float64) - self.step_start[slots])
+        return (self.step[slots] + np.minimum(elapsed / self.aligner.step_seconds, 1.0)) / len(self.sequence)
+
+    def timings(self, slot):
+        """Steps a row has left, oldest first, as SequenceAligner.timings: (position, asana, start, end)"""
+        count = int(self.timing_count[slot])
+        ring = np.arange(max(count - self.max_timings, 0), count) % self.max_timings
+        return [(position, self.sequence[position % len(self.sequence)], start, end)
+                for position, start, end in zip(self.timing_position[slot, ring].tolist(),
+                                                self.timing_start[slot, ring].tolist(),
+                                                self.timing_end[slot, ring].tolist())]
+
+    def reuse_stats(self):
+        """Change gate hits and misses, as ChangeGate.stats"""
+        checks = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / checks if checks else 0.0
+        }
+
+    # Frames
+
+    def evaluate(self, slots, landmarks, timestamps, frames=None):
+        """Advance the sessions in slots (each at most once) by one frame each.
+
+        landmarks (M, 33, >=2) are normalized (a 4th column is the
+        visibility), timestamps (M,) in seconds. frames (M BGR images) are
+        only needed by the model cascade. Returns a dict of per-row results:
+        accepted, rejection (reasons, None where accepted), reused,
+        is_correct, scores (M, S; NaN where rejected), detected (score
+        column, -1 for none), stability, hold, advanced, completed, and
+        step and rep_count after the frame.
+        """
+        slots = np.asarray(slots, dtype=np.intp)
+        landmarks = np.asarray(landmarks, dtype=np.float64)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        n_rows = len(slots)
+        steps = self.step[slots]
+        results = {
+            'accepted': np.zeros(n_rows, dtype=bool),
+            'rejection': [None] * n_rows,
+            'reused': np.zeros(n_rows, dtype=bool),
+            'is_correct': np.zeros(n_rows, dtype=bool),
+            'scores': np.full((n_rows, self.n_scores), np.nan),
+            'detected': np.full(n_rows, -1, dtype=np.intp),
+            'stability': np.zeros(n_rows),
+            'hold': np.zeros(n_rows),
+            'advanced': np.zeros(n_rows, dtype=bool),
+            'completed': np.zeros(n_rows, dtype=bool)
+        }
+
+        # Quality gate of every frame's expected asana
+        visibility = landmarks[:, :, 3] if landmarks.shape[2] > 3 else [None] * n_rows
+        accepted = results['accepted']
+        for row, (points, step) in enumerate(zip(landmarks, steps.tolist())):
+            accepted[row], results['rejection'][row] = self.quality_gate.check(points, self.sequence[step],
+                                                                                visibility[row])
+        rows = np.flatnonzero(accepted)
+        if not len(rows):
+            results['step'], results['rep_count'] = self.step[slots], self.rep_count[slots]
+            return results
+
+        # Reuse the last analysis while the pose has not moved
+        accepted_slots = slots[rows]
+        points = np.fmax(landmarks[rows, :, :2], _MISSING_COORD)
+        delta = points - self.reference[accepted_slots]
+        reused = ((self.reference_step[accepted_slots] == steps[rows]) &
+                  (self.reused[accepted_slots] < self.max_reuse) &
+                  (np.einsum('mij,mij->mi', delta, delta).max(axis=1) < self.change_epsilon ** 2))
+        self.reused[accepted_slots[reused]] += 1
+        self.hits += int(reused.sum())
+        self.misses += int(len(reused) - reused.sum())
+        analysed = rows[~reused]
+        if len(analysed):
+            analysed_slots = slots[analysed]
+            self.reference[analysed_slots] = points[~reused]
+            self.reference_step[analysed_slots] = steps[analysed]
+            self.reused[analysed_slots] = 0
+            self._analyse(analysed, analysed_slots, landmarks, steps, frames)
+
+        # Flow, stability and hold rule
+        results['reused'][rows] = reused
+        results['scores'][rows] = self.scores[accepted_slots]
+        results['detected'][rows] = self.detected[accepted_slots]
+        (results['is_correct'][rows], results['stability'][rows], results['hold'][rows],
+         results['advanced'][rows], results['completed'][rows]) = self._advance(
+            accepted_slots, landmarks[rows], timestamps[rows], self.is_correct[accepted_slots],
+            self.scores[accepted_slots])
+        results['step'], results['rep_count'] = self.step[slots], self.rep_count[slots]
+        return results
+
+    def _analyse(self, rows, slots, landmarks, steps, frames):
+        """Check the frames of rows against their expected asanas and classify them; cached per slot"""
+        detector = self.asana_detector
+        frame_landmarks = landmarks[rows]
+        angle_vectors = joint_angles(frame_landmarks)
+        asana_names = [self.sequence[step] for step in steps[rows].tolist()]
+        # The special-check context is shared by the asana check and the classification
+        contexts = [detector.frame_context(points, all_angles(points, angle_vector))
+                    for points, angle_vector in zip(frame_landmarks, angle_vectors)]
+        if self.cascade is not None and frames is not None:
+            for row, asana_name, context in zip(rows.tolist(), asana_names, contexts):
+                self.cascade.refine(detector.special_check_names(asana_name), frames[row], context)
+        is_correct, scores = detector.score_frames(asana_names, angle_vectors, frame_landmarks, contexts)
+        self.is_correct[slots] = is_correct
+        self.scores[slots] = scores
+        self.detected[slots] = detector.best_asanas(scores)
+
+    def _advance(self, slots, landmarks, timestamps, is_correct, scores):
+        """Flow, stability and hold rule of accepted frames; (is_correct, stability, hold, advanced, completed)"""
+        n_steps = len(self.sequence)
+        self.step_start[slots] = np.where(np.isnan(self.step_start[slots]), timestamps, self.step_start[slots])
+        # Follow the flow when it has moved past the expected step (e.g. its hold was never detected)
+        positions = self.positions(slots)
+        position, moved, leaving, flowed = self.aligner.advance(
+            positions, self.moved[slots], self.leaving[slots], self.last_time[slots], timestamps, scores)
+        self.last_time[slots] = timestamps
+        self._leave(slots[flowed], positions[flowed], timestamps[flowed])
+        rep_count, step = np.divmod(position, n_steps)
+        is_correct = is_correct & ~flowed
+
+        # A pose is only held while the body is still
+        stability = self.stability.update_rows(slots, landmarks)
+        holding = is_correct & (stability >= self.stability_threshold)
+        hold_start = self.hold_start[slots]
+        hold_start = np.where(holding & np.isnan(hold_start), timestamps, hold_start)
+        hold = np.where(holding, timestamps - hold_start, 0.0)
+
+        # Move to the next pose; the last one completes a round
+        advanced = holding & (hold >= self.min_hold)
+        self._leave(slots[advanced], position[advanced], timestamps[advanced])
+        step = step + advanced
+        completed = step >= n_steps
+        rep_count = rep_count + completed
+        step[completed] = 0
+        self.hold_start[slots] = np.where(holding & ~advanced, hold_start, np.nan)
+        self.step[slots] = step
+        self.rep_count[slots] = rep_count
+        # The aligner follows a completed hold (SequenceAligner.seek)
+        self.moved[slots] = np.where(advanced, 0.0, moved)
+        self.leaving[slots] = leaving | advanced
+        return is_correct, stability, hold, advanced, completed
+
+    def _leave(self, slots, positions, timestamps):
+        """Keep the timing of the steps the rows leave at timestamps; the next steps start there"""
+        ring = self.timing_count[slots] % self.max_timings
+        self.timing_position[slots, ring] = positions
+        self.timing_start[slots, ring] = self.step_start[slots]
+        self.timing_end[slots, ring] = timestamps
+        self.timing_count[slots] += 1
+        self.step_start[slots] = timestamps
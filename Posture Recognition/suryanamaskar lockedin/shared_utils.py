@@ -0,0 +1,15 @@
+"""
+Make the shared Posture Recognition ``utils`` package importable.
+
+The Surya Namaskar apps run as standalone scripts from this directory, so the
+parent project directory is appended (not prepended) to ``sys.path``: local
+modules such as ``config`` and ``pose_detector`` keep priority, while
+``from utils.<module> import ...`` resolves to the shared package.
+"""
+import os
+import sys
+
+POSTURE_RECOGNITION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if POSTURE_RECOGNITION_DIR not in sys.path:
+    sys.path.append(POSTURE_RECOGNITION_DIR)
\ No newline at end of file
@@ -0,0 +1,136 @@
+"""
+Pose-specific special checks as registered predicates.
+
+Every check is a predicate registered under its name with @special_check,
+together with the feedback shown when it fails. A predicate receives the
+FrameContext of the frame: the landmark points and midpoints the checks use
+(normalized x, y; y grows downwards), computed once per frame and shared by
+all the checks of all asanas. AsanaDetector binds the predicates of every
+asana when it compiles its criteria. The landmark indices a check reads are
+registered with it, for the landmark quality gate.
+"""
+import math
+
+import numpy as np
+
+# name -> (predicate, feedback)
+SPECIAL_CHECKS = {}
+# name -> indices of the landmarks the check reads (besides the joint angles)
+SPECIAL_CHECK_LANDMARKS = {}
+
+
+def special_check(name, feedback, landmarks=()):
+    """Register predicate(context) -> bool as the special check `name`"""
+    def register(predicate):
+        SPECIAL_CHECKS[name] = (predicate, feedback)
+        SPECIAL_CHECK_LANDMARKS[name] = tuple(landmarks)
+        return predicate
+    return register
+
+
+def _midpoint(a, b):
+    return ((a[0] + b[0]) / 2, (a[1] + b[1]) / 2)
+
+
+class FrameContext:
+    """Landmark points and midpoints of one frame, shared by the special checks.
+
+    valid is False when the landmarks do not cover the legs (then every
+    check fails). refined holds check outcomes settled by the model cascade.
+    """
+    __slots__ = ('angles', 'valid', 'refined', 'head', 'left_wrist', 'right_wrist', 'left_ankle', 'lunge_ankle',
+                 'shoulders', 'hips', 'knees', 'ankles', 'hands')
+
+    def __init__(self, landmarks, angles):
+        self.angles = angles
+        self.refined = None
+        self.valid = landmarks is not None and len(landmarks) > 28
+        if not self.valid:
+            return
+        points = np.asarray(landmarks)[:, :2].tolist()
+        self.head = points[0]
+        self.left_wrist, self.right_wrist = points[15], points[16]
+        self.left_ankle = points[27]
+        self.lunge_ankle = points[31] if len(points) > 31 else points[28]
+        self.shoulders = _midpoint(points[11], points[12])
+        self.hips = _midpoint(points[23], points[24])
+        self.knees = _midpoint(points[25], points[26])
+        self.ankles = _midpoint(points[27], points[28])
+        self.hands = _midpoint(self.left_wrist, self.right_wrist)
+
+
+@special_check("hands_together", "Bring hands together", landmarks=(15, 16))
+def hands_together(context):
+    # Prayer pose: wrists close together
+    dx = context.left_wrist[0] - context.right_wrist[0]
+    dy = context.left_wrist[1] - context.right_wrist[1]
+    return math.sqrt(dx * dx + dy * dy) < 0.1
+
+
+@special_check("upright_posture", "Stand upright", landmarks=(0, 23, 24))
+def upright_posture(context):
+    # Head vertically aligned with the hips
+    return abs(context.head[0] - context.hips[0]) < 0.1
+
+
+@special_check("arms_overhead", "Raise arms overhead", landmarks=(0, 15, 16))
+def arms_overhead(context):
+    return context.left_wrist[1] < context.head[1] and context.right_wrist[1] < context.head[1]
+
+
+@special_check("forward_fold", "Fold forward more", landmarks=(0, 23, 24))
+def forward_fold(context):
+    # Head below the hips
+    return context.head[1] > context.hips[1]
+
+
+@special_check("straight_legs", "Straighten legs")
+def straight_legs(context):
+    return context.angles.get("left_knee", 0) > 160 and context.angles.get("right_knee", 0) > 160
+
+
+@special_check("lunge_position", "Widen lunge stance", landmarks=(27, 31))
+def lunge_position(context):
+    return abs(context.left_ankle[0] - context.lunge_ankle[0]) > 0.3
+
+
+@special_check("back_leg_straight", "Straighten back leg")
+def back_leg_straight(context):
+    return context.angles.get("right_knee", 0) > 150
+
+
+@special_check("plank_position", "Align body in straight line", landmarks=(11, 12, 23, 24, 27, 28))
+@special_check("straight_body", "Align body in straight line", landmarks=(11, 12, 23, 24, 27, 28))
+def straight_body(context):
+    # Shoulders, hips and ankles at about the same height
+    return abs(context.shoulders[1] - context.hips[1]) < 0.1 and abs(context.hips[1] - context.ankles[1]) < 0.1
+
+
+@special_check("knees_chest_chin_down", "Lower chest and knees", landmarks=(11, 12, 25, 26))
+def knees_chest_chin_down(context):
+    return context.shoulders[1] > 0.6 and context.knees[1] > 0.7
+
+
+@special_check("cobra_arch", "Lift chest higher", landmarks=(0, 11, 12))
+def cobra_arch(context):
+    return context.head[1] < context.shoulders[1]
+
+
+@special_check("hips_down", "Keep hips down", landmarks=(23, 24))
+def hips_down(context):
+    return context.hips[1] > 0.7
+
+
+@special_check("inverted_v", "Lift hips higher", landmarks=(0, 15, 16, 23, 24, 27, 28))
+def inverted_v(context):
+    # Hips are the highest point
+    hips = context.hips[1]
+    return hips < context.head[1] and hips < context.hands[1] and hips < context.ankles[1]
+
+
+@special_check("straight_limbs", "Straighten arms and legs")
+def straight_limbs(context):
+    angles = context.angles
+    straight = sum(1 for joint in ("left_elbow", "right_elbow", "left_knee", "right_knee")
+                   if joint in angles and angles[joint] > 150)
+    return straight >= 3
\ No newline at end of file
@@ -1,32 +1,73 @@
-import cv2
-import mediapipe as mp
 import numpy as np
 import time
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, NamedTuple, Tuple, Optional
 import tkinter as tk
 from tkinter import ttk
 import threading
 
 # Import our modules
 from pose_detector import PoseDetector
-from asana_detector import AsanaDetector
+from asana_detector import TUNED_CRITERIA_PATH, AsanaDetector
+from asana_templates import get_asana_templates
+from model_cascade import ModelCascade
+from sequence_tracker import SequenceTracker
+from tk_display import FrameBuffer, TkFrameDisplay
+from config import (ASANA_CLASSIFIER, CHANGE_GATE_EPSILON, CHANGE_GATE_MAX_REUSE, DESKTOP_CONFIG, MODEL_CASCADE,
+                    POSE_HOLD_DURATION, POSE_VALIDATION, SEQUENCE_ALIGNER, STABILITY_THRESHOLD, STABILITY_WINDOW,
+                    USE_TUNED_CRITERIA)
+import shared_utils  # noqa: F401  (makes the shared utils package importable)
+from utils.landmark_quality import REJECT_MESSAGES
+from utils.lazy_import import lazy_import
+from utils.ui_state import UIStateRenderer
+
+cv2 = lazy_import('cv2')
+
+
+class GuiState(NamedTuple):
+    """What the status panel shows, published by the detection thread as one immutable snapshot"""
+    progress: Tuple[str, int]
+    reps: str
+    status: str
+    feedback: str
+    hold: str
+    angles: Tuple[str, ...]
+
 
 class SuryaNamaskarDesktopApp:
     def __init__(self):
         self.pose_detector = PoseDetector()
-        self.asana_detector = AsanaDetector()
-        self.current_asana = 0
-        self.rep_count = 0
+        # Graph initialization overlaps with building the window
+        self.pose_detector.warm_up_async()
+        templates = get_asana_templates() if ASANA_CLASSIFIER == 'templates' else None
+        self.asana_detector = AsanaDetector(TUNED_CRITERIA_PATH if USE_TUNED_CRITERIA else None, templates=templates)
         self.pose_sequence = [
             "Pranamasana", "Hasta Uttanasana", "Padahastasana", 
             "Ashwa Sanchalanasana", "Dandasana", "Ashtanga Namaskara",
             "Bhujangasana", "Adho Mukha Svanasana", "Ashwa Sanchalanasana",
             "Padahastasana", "Hasta Uttanasana", "Pranamasana"
         ]
-        self.pose_hold_time = {}
-        self.min_hold_duration = 2.0
+        if templates is not None and templates.sequence:
+            # Sequence recorded with the templates
+            self.pose_sequence = templates.sequence
+        # Step, reps and hold timer, fed every detected pose
+        self.tracker = SequenceTracker(
+            self.asana_detector, self.pose_sequence, POSE_HOLD_DURATION, POSE_VALIDATION,
+            stability_window=STABILITY_WINDOW, stability_threshold=STABILITY_THRESHOLD,
+            change_epsilon=CHANGE_GATE_EPSILON, max_reuse=CHANGE_GATE_MAX_REUSE, aligner=SEQUENCE_ALIGNER,
+            cascade=ModelCascade() if MODEL_CASCADE else None)
         self.is_running = False
-        self.cap = None
+        # Newest annotated frame, shown by the Tk thread at the display rate
+        self.frame_buffer = FrameBuffer()
+        # Newest GuiState; the Tk thread applies the changed fields at the refresh rate
+        self._state_lock = threading.Lock()
+        self._gui_state = None
+        self._reset_requested = threading.Event()
+        # Set to end the detection loop; the loop releases its camera on the way out
+        self._stop_requested = threading.Event()
+        self.detection_thread = None
+        self.gui_renderer = UIStateRenderer(DESKTOP_CONFIG['gui_refresh_hz'])
+        self._angle_lines = ()
+        self._publish_state(self.initial_gui_state())
         
         # Create GUI
         self.setup_gui()
@@ -55,13 +96,13 @@ class SuryaNamaskarDesktopApp:
         progress_frame = ttk.LabelFrame(left_panel, text="Current Progress", padding=10)
         progress_frame.pack(fill=tk.X, pady=(0, 10))
         
-        self.progress_var = tk.StringVar(value="Step 1/12: Pranamasana")
+        self.progress_var = tk.StringVar(value=f"Step 1/{len(self.pose_sequence)}: {self.pose_sequence[0]}")
         self.progress_label = ttk.Label(progress_frame, textvariable=self.progress_var)
         self.progress_label.pack()
         
         self.progress_bar = ttk.Progressbar(progress_frame, length=200, mode='determinate')
         self.progress_bar.pack(pady=(5, 0))
-        self.progress_bar['maximum'] = 12
+        self.progress_bar['maximum'] = len(self.pose_sequence)
         self.progress_bar['value'] = 1
         
         self.rep_var = tk.StringVar(value="Complete Reps: 0")
@@ -82,7 +123,7 @@ class SuryaNamaskarDesktopApp:
         self.feedback_label.pack(pady=(10, 0))
         
         # Hold timer
-        self.hold_var = tk.StringVar(value="Hold: 0.0s / 2.0s")
+        self.hold_var = tk.StringVar(value=f"Hold: 0.0s / {self.tracker.min_hold}s")
         self.hold_label = ttk.Label(status_frame, textvariable=self.hold_var)
         self.hold_label.pack(pady=(10, 0))
         
@@ -111,6 +152,18 @@ class SuryaNamaskarDesktopApp:
         
         self.camera_label = ttk.Label(self.camera_frame, text="Camera feed will appear here")
         self.camera_label.pack(expand=True)
+        self.display = TkFrameDisplay(self.root, self.camera_label, self.frame_buffer,
+                                      DESKTOP_CONFIG['camera_display_width'], DESKTOP_CONFIG['update_interval_ms'])
+        
+        self.gui_widgets = {
+            'progress': self.show_progress,
+            'reps': self.rep_var.set,
+            'status': self.status_var.set,
+            'feedback': self.feedback_var.set,
+            'hold': self.hold_var.set,
+            'angles': self.show_angle_lines
+        }
+        self.root.after(0, self.refresh_gui)
         
     def toggle_detection(self):
         """Start or stop pose detection"""
@@ -121,37 +174,64 @@ class SuryaNamaskarDesktopApp:
     
     def start_detection(self):
         """Start pose detection"""
-        self.cap = cv2.VideoCapture(0)
-        if not self.cap.isOpened():
+        # A loop that is still running keeps the camera until it has finished
+        self.join_detection()
+        cap = cv2.VideoCapture(0)
+        if not cap.isOpened():
+            cap.release()
             tk.messagebox.showerror("Error", "Cannot access camera")
             return
         
         self.is_running = True
         self.start_button.config(text="Stop Detection")
+        self.display.start()
         
-        # Start detection in separate thread
-        self.detection_thread = threading.Thread(target=self.detection_loop)
+        # Start detection in separate thread, which owns the camera from here on
+        self._stop_requested.clear()
+        self.detection_thread = threading.Thread(target=self.detection_loop, args=(cap,))
         self.detection_thread.daemon = True
         self.detection_thread.start()
     
     def stop_detection(self):
         """Stop pose detection"""
         self.is_running = False
-        if self.cap:
-            self.cap.release()
+        self.join_detection()
         self.start_button.config(text="Start Detection")
         
         # Clear camera display
-        self.camera_label.config(image='', text="Camera feed stopped")
+        self.display.stop("Camera feed stopped")
+    
+    def join_detection(self):
+        """Signal the detection loop and wait until it has released the camera (Tk thread)"""
+        if self.detection_thread is not None:
+            self._stop_requested.set()
+            self.detection_thread.join()
+            self.detection_thread = None
+    
+    def detection_loop(self, cap):
+        """Main detection loop; releases cap when it stops"""
+        try:
+            self._detect_frames(cap)
+        finally:
+            cap.release()
+        
+        # A reset asked for while the loop was stopping
+        if self._reset_requested.is_set():
+            self._reset_requested.clear()
+            self.reset_sequence()
     
-    def detection_loop(self):
-        """Main detection loop"""
-        while self.is_running:
-            if not self.cap or not self.cap.isOpened():
+    def _detect_frames(self, cap):
+        while not self._stop_requested.is_set():
+            if self._reset_requested.is_set():
+                self._reset_requested.clear()
+                self.reset_sequence()
+            if not cap.isOpened():
                 break
                 
-            ret, frame = self.cap.read()
+            ret, frame = cap.read()
             if not ret:
+                # Small delay to prevent high CPU usage while the camera has no frame
+                time.sleep(0.03)
                 continue
             
             # Flip frame for mirror effect
@@ -160,80 +240,45 @@ class SuryaNamaskarDesktopApp:
             # Detect pose
             landmarks = self.pose_detector.detect_pose(frame)
             
-            if landmarks is not None and len(landmarks) > 0:
-                # Draw pose overlay
+            # Quality gate, analysis (reused while the pose holds still), flow and hold timer
+            now = time.time()
+            result = self.tracker.update(landmarks, now, frame)
+            
+            if result is not None and result.rejection is None:
+                # Draw pose overlay (after the analysis: the cascade models look at the raw frame)
                 frame = self.pose_detector.draw_pose(frame, landmarks)
                 
-                # Calculate angles
-                angles = self.pose_detector.calculate_all_angles(landmarks)
-                
-                # Detect current asana
-                current_asana_name = self.pose_sequence[self.current_asana]
-                is_correct, feedback = self.asana_detector.detect_asana(
-                    current_asana_name, angles, landmarks
-                )
-                
-                # Update pose hold time
-                current_time = time.time()
-                if is_correct:
-                    if self.current_asana not in self.pose_hold_time:
-                        self.pose_hold_time[self.current_asana] = current_time
-                    
-                    hold_duration = current_time - self.pose_hold_time[self.current_asana]
-                    
-                    if hold_duration >= self.min_hold_duration:
-                        # Move to next pose
-                        self.current_asana += 1
-                        self.pose_hold_time = {}
-                        
-                        if self.current_asana >= 12:
-                            # Complete sequence
-                            self.rep_count += 1
-                            self.current_asana = 0
-                else:
-                    # Reset hold time if pose is incorrect
-                    self.pose_hold_time.pop(self.current_asana, None)
-                
-                # Update GUI
-                self.update_gui(angles, is_correct, feedback, current_time)
+                # Hand the panel state to the Tk thread
+                self._publish_state(self.build_gui_state(result, now))
                 
                 # Add overlay text to frame
-                self.add_frame_overlay(frame, is_correct, feedback, current_time)
-            
-            # Convert frame for display
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # Resize frame for display
-            height, width = frame_rgb.shape[:2]
-            display_width = 640
-            display_height = int(height * display_width / width)
-            frame_resized = cv2.resize(frame_rgb, (display_width, display_height))
+                self.add_frame_overlay(frame, result)
+            elif result is not None:
+                # Body parts of the current step hidden or out of view, or the body too small or too close
+                # (the worker thread is the only writer of the panel state)
+                self._publish_state(self._gui_state._replace(status="⚠️ Adjust Position",
+                                                             feedback=REJECT_MESSAGES[result.rejection]))
             
-            # Convert to PhotoImage and display
-            from PIL import Image, ImageTk
-            img = Image.fromarray(frame_resized)
-            photo = ImageTk.PhotoImage(image=img)
-            
-            # Update camera display (must be done in main thread)
-            self.root.after(0, self.update_camera_display, photo)
-            
-            # Small delay to prevent high CPU usage
-            time.sleep(0.03)
-    
-    def update_camera_display(self, photo):
-        """Update camera display in main thread"""
-        if self.is_running:
-            self.camera_label.config(image=photo, text='')
-            self.camera_label.image = photo  # Keep a reference
+            # Hand the frame to the display; the Tk thread converts only the newest one
+            self.frame_buffer.publish(frame)
     
-    def add_frame_overlay(self, frame, is_correct, feedback, current_time):
+    def add_frame_overlay(self, frame, result):
         """Add text overlay to camera frame"""
+        tracker = self.tracker
+        progress_text = None
+        if tracker.hold_start is not None:
+            progress_text = f"Hold: {result.hold:.1f}s / {tracker.min_hold}s"
+        elif result.is_correct:
+            progress_text = f"Hold still (stability {result.stability:.0%})"
+        self.draw_frame_text(frame, f"Step {tracker.step + 1}/{len(self.pose_sequence)}: {tracker.asana}",
+                             f"Reps: {tracker.rep_count}", result.is_correct, result.feedback, progress_text)
+    
+    def draw_frame_text(self, frame, step_text, rep_text, is_correct, feedback, progress_text):
+        """Draw the overlay text on a frame"""
         # Current step
-        step_text = f"Step {self.current_asana + 1}/12: {self.pose_sequence[self.current_asana]}"
         cv2.putText(frame, step_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
         
         # Rep count
-        rep_text = f"Reps: {self.rep_count}"
         cv2.putText(frame, rep_text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
         
         # Status
@@ -246,54 +291,90 @@ class SuryaNamaskarDesktopApp:
             cv2.putText(frame, feedback, (10, 120), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
         
         # Hold progress
-        if self.current_asana in self.pose_hold_time:
-            hold_duration = current_time - self.pose_hold_time[self.current_asana]
-            progress_text = f"Hold: {hold_duration:.1f}s / {self.min_hold_duration}s"
+        if progress_text:
             cv2.putText(frame, progress_text, (10, 150), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        return frame
     
-    def update_gui(self, angles, is_correct, feedback, current_time):
-        """Update GUI elements"""
-        # Update progress
-        self.progress_var.set(f"Step {self.current_asana + 1}/12: {self.pose_sequence[self.current_asana]}")
-        self.progress_bar['value'] = self.current_asana + 1
-        
-        # Update rep count
-        self.rep_var.set(f"Complete Reps: {self.rep_count}")
-        
-        # Update status
-        status_text = "✅ Correct Pose" if is_correct else "❌ Incorrect Pose"
-        self.status_var.set(status_text)
-        
-        # Update feedback
-        self.feedback_var.set(feedback if feedback else "Keep holding the pose")
-        
-        # Update hold timer
-        if self.current_asana in self.pose_hold_time:
-            hold_duration = current_time - self.pose_hold_time[self.current_asana]
-            self.hold_var.set(f"Hold: {hold_duration:.1f}s / {self.min_hold_duration}s")
+    def build_gui_state(self, result, timestamp):
+        """Panel state of the current frame (detection thread)"""
+        tracker = self.tracker
+        if tracker.hold_start is not None:
+            hold_text = f"Hold: {result.hold:.1f}s / {tracker.min_hold}s"
         else:
-            self.hold_var.set("Hold: 0.0s / 2.0s")
-        
-        # Update angles
-        self.angles_text.delete(1.0, tk.END)
-        angle_text = "Joint Angles:\n"
-        for joint, angle in angles.items():
-            angle_text += f"{joint.replace('_', ' ').title()}: {angle:.1f}°\n"
-        self.angles_text.insert(1.0, angle_text)
+            hold_text = f"Hold: 0.0s / {tracker.min_hold}s"
+        
+        aligner = tracker.aligner
+        angle_lines = [f"Detected: {result.detected or 'no asana'}",
+                       f"Flow: step {aligner.step + 1}, {aligner.asana} ({aligner.confidence:.0%})",
+                       f"Round: {aligner.progress(timestamp):.0%} done"]
+        angle_lines += [f"{asana}: {end - start:.1f}s" for _, asana, start, end in list(aligner.timings)[-3:]]
+        angle_lines += ["", "Joint Angles:"]
+        angle_lines += [f"{joint.replace('_', ' ').title()}: {angle:.1f}°" for joint, angle in result.angles.items()]
+        angle_lines += ["", f"Stability: {result.stability:.0%}",
+                        f"Analysis reused: {tracker.change_gate.stats()['hit_rate']:.0%} of frames",
+                        f"Frames rejected: {tracker.quality_gate.stats()['reject_rate']:.0%}"]
+        
+        return GuiState(
+            progress=(f"Step {tracker.step + 1}/{len(self.pose_sequence)}: {tracker.asana}", tracker.step + 1),
+            reps=f"Complete Reps: {tracker.rep_count}",
+            status="✅ Correct Pose" if result.is_correct else "❌ Incorrect Pose",
+            feedback=result.feedback if result.feedback else "Keep holding the pose",
+            hold=hold_text,
+            angles=tuple(angle_lines)
+        )
+    
+    def initial_gui_state(self):
+        """Panel state before any pose is detected"""
+        return GuiState(
+            progress=(f"Step 1/{len(self.pose_sequence)}: {self.pose_sequence[0]}", 1),
+            reps="Complete Reps: 0",
+            status="❌ Not Detected",
+            feedback="Position yourself in camera view",
+            hold=f"Hold: 0.0s / {self.tracker.min_hold}s",
+            angles=()
+        )
+    
+    def _publish_state(self, state):
+        with self._state_lock:
+            self._gui_state = state
+    
+    def refresh_gui(self):
+        """Apply the changed fields of the newest GuiState (Tk thread, at the refresh rate)"""
+        with self._state_lock:
+            state = self._gui_state
+        self.gui_renderer.render(state._asdict(), self.gui_widgets)
+        self.root.after(max(1, int(self.gui_renderer.refresh_interval * 1000)), self.refresh_gui)
+    
+    def show_progress(self, progress):
+        text, value = progress
+        self.progress_var.set(text)
+        self.progress_bar['value'] = value
+    
+    def show_angle_lines(self, lines):
+        """Rewrite only the changed lines of the angles panel"""
+        text = self.angles_text
+        for row, line in enumerate(lines, 1):
+            if row > len(self._angle_lines):
+                text.insert(tk.END, ("\n" if row > 1 else "") + line)
+            elif self._angle_lines[row - 1] != line:
+                text.delete(f"{row}.0", f"{row}.end")
+                text.insert(f"{row}.0", line)
+        if len(lines) < len(self._angle_lines):
+            text.delete(f"{len(lines)}.end" if lines else "1.0", tk.END)
+        self._angle_lines = tuple(lines)
+    
+    def reset_sequence(self):
+        """Restart the sequence (detection thread, or Tk thread while detection is stopped)"""
+        self.tracker.reset()
+        self._publish_state(self.initial_gui_state())
     
     def reset_progress(self):
-        """Reset all progress"""
-        self.current_asana = 0
-        self.rep_count = 0
-        self.pose_hold_time = {}
-        
-        # Update GUI
-        self.progress_var.set("Step 1/12: Pranamasana")
-        self.progress_bar['value'] = 1
-        self.rep_var.set("Complete Reps: 0")
-        self.status_var.set("❌ Not Detected")
-        self.feedback_var.set("Position yourself in camera view")
-        self.hold_var.set("Hold: 0.0s / 2.0s")
+        """Reset all progress (done by the detection thread while it runs)"""
+        self._reset_requested.set()
+        if self.detection_thread is None or not self.detection_thread.is_alive():
+            if self._reset_requested.is_set():
+                self._reset_requested.clear()
+                self.reset_sequence()
     
     def run(self):
         """Run the application"""
@@ -306,8 +387,8 @@ class SuryaNamaskarDesktopApp:
     def on_closing(self):
         """Handle application closing"""
         self.is_running = False
-        if self.cap:
-            self.cap.release()
+        self.join_detection()
+        self.display.stop()
         cv2.destroyAllWindows()
         self.root.destroy()
 
@@ -0,0 +1,124 @@
+"""
+Camera display pipeline for the Tk desktop app.
+
+The detection thread must not touch Tk, and queueing a ``root.after`` call
+per frame piles up callbacks whenever Tk falls behind. Instead the worker
+publishes each annotated frame into a FrameBuffer: the frame is copied into
+the back buffer, which is then swapped with the front one. TkFrameDisplay
+polls the buffer from the Tk thread every ``interval_ms`` and converts only
+the newest frame (resize and BGR to RGB into reused arrays), pasting it into
+one PhotoImage that lives as long as the display. Frames superseded before
+the display got to them are dropped and counted.
+"""
+import threading
+
+import numpy as np
+
+import shared_utils  # noqa: F401  (makes the shared utils package importable)
+from utils.lazy_import import lazy_import
+
+cv2 = lazy_import('cv2')
+Image = lazy_import('PIL.Image')
+ImageTk = lazy_import('PIL.ImageTk')
+
+
+class FrameBuffer:
+    """Double buffer handing the newest frame from one writer thread to one reader"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._front = None
+        self._back = None
+        self._seq = 0
+        self._read_seq = 0
+
+        # Diagnostics
+        self.frames_published = 0
+        self.frames_dropped = 0
+
+    def publish(self, frame):
+        """Copy frame into the back buffer and make it the newest frame"""
+        if self._back is None or self._back.shape != frame.shape or self._back.dtype != frame.dtype:
+            self._back = np.empty_like(frame)
+        np.copyto(self._back, frame)
+        with self._lock:
+            self._front, self._back = self._back, self._front
+            if self._seq > self._read_seq:
+                self.frames_dropped += 1
+            self._seq += 1
+            self.frames_published += 1
+
+    def read(self, convert):
+        """Call convert(frame) on the newest frame if it was not read yet; returns its result or None.
+
+        The front buffer stays locked while convert runs, so convert must not
+        keep a reference to the frame.
+        """
+        with self._lock:
+            if self._front is None or self._seq == self._read_seq:
+                return None
+            self._read_seq = self._seq
+            return convert(self._front)
+
+    def clear(self):
+        with self._lock:
+            self._front = None
+            self._read_seq = self._seq
+
+
+class TkFrameDisplay:
+    def __init__(self, root, label, frame_buffer, display_width=640, interval_ms=33):
+        self.root = root
+        self.label = label
+        self.frame_buffer = frame_buffer
+        self.display_width = display_width
+        self.interval_ms = interval_ms
+        self._after_id = None
+        self._resized = None
+        self._rgb = None
+        self._photo = None
+        self._attached = False
+        self.frames_shown = 0
+
+    def start(self):
+        """Poll for frames from the Tk thread until stop()"""
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._poll)
+
+    def stop(self, text=None):
+        """Stop polling and detach the image from the label (showing text instead)"""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        self.frame_buffer.clear()
+        self._attached = False
+        self.label.config(image='', text=text or '')
+
+    def _poll(self):
+        self._after_id = None
+        image = self.frame_buffer.read(self._convert)
+        if image is not None:
+            self._show(image)
+        self._after_id = self.root.after(self.interval_ms, self._poll)
+
+    def _convert(self, frame):
+        """Display-sized RGB PIL image of a BGR frame, built in reused arrays"""
+        height, width = frame.shape[:2]
+        size = (self.display_width, max(1, int(height * self.display_width / width)))
+        if self._resized is None or self._resized.shape[:2] != (size[1], size[0]):
+            self._resized = np.empty((size[1], size[0], 3), dtype=np.uint8)
+            self._rgb = np.empty_like(self._resized)
+        cv2.resize(frame, size, dst=self._resized)
+        cv2.cvtColor(self._resized, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        return Image.frombuffer('RGB', size, self._rgb, 'raw', 'RGB', 0, 1)
+
+    def _show(self, image):
+        if self._photo is None or (self._photo.width(), self._photo.height()) != image.size:
+            self._photo = ImageTk.PhotoImage(image=image)
+            self._attached = False
+        else:
+            self._photo.paste(image)
+        if not self._attached:
+            self.label.config(image=self._photo, text='')
+            self._attached = True
+        self.frames_shown += 1
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""
+Align Surya Namaskar rounds against the reference sequence offline.
+
+Synthetic rounds (or a .npz with landmarks (N, 33, 3) normalized and
+timestamps (N,)) are scored once per frame with AsanaDetector.asana_scores,
+and SequenceAligner runs over the cached scores. To see how the flow copes
+with missed detections, --miss-rate of the frames (in bursts of up to
+--miss-burst frames) get all-zero scores.
+
+For synthetic rounds the true step of every frame is known; the aligner is
+compared with the apps' strict rule (advance only after the expected asana
+scored MIN_SCORE on every frame for --hold seconds) and with both together
+as SequenceTracker runs them (the hold rule seeks the aligner; the flow
+crosses into the next round over the closing Pranamasana and the next
+round's first, the same asana, once Hasta Uttanasana shows): steps reached, per-frame
+step accuracy and the delay entering each step (frames moving to an asana
+count as its step). The time per
+aligner update is reported, and the step timings of a recording are printed.
+
+Usage:
+    python tools/align_asana_rounds.py
+    python tools/align_asana_rounds.py --rounds 3 --miss-rate 0.2 --templates
+    python tools/align_asana_rounds.py session.npz
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+sys.path.append(os.path.join(PROJECT_DIR, 'suryanamaskar lockedin'))
+
+from synthetic_motion import ASANA_SEQUENCE, generate_asana_round  # noqa: E402
+from asana_detector import AsanaDetector  # noqa: E402
+from asana_templates import AsanaTemplates  # noqa: E402
+from pose_detector import ANGLE_JOINTS, joint_angles  # noqa: E402
+from sequence_aligner import SequenceAligner, align_frames  # noqa: E402
+
+
+def frame_scores(detector, landmarks):
+    """asana_scores (N, A) of every frame"""
+    all_angles = joint_angles(landmarks)
+    scores = []
+    for points, angle_vector in zip(landmarks, all_angles):
+        angles = dict(zip(ANGLE_JOINTS, angle_vector.tolist()))
+        angles['hip_width'] = abs(points[23][0] - points[24][0])
+        scores.append(detector.asana_scores(angle_vector, points, angles))
+    return np.array(scores)
+
+
+def drop_frames(scores, rng, rate, burst):
+    """Copy of scores where bursts of frames, about `rate` of all, score 0 for every asana"""
+    scores = scores.copy()
+    frame = 0
+    while frame < len(scores):
+        length = int(rng.integers(1, burst + 1))
+        if rng.random() < rate:
+            scores[frame:frame + length] = 0.0
+        frame += length
+    return scores
+
+
+def strict_positions(scores, timestamps, columns, min_score, hold):
+    """Positions of the apps' hold rule: advance after `hold` seconds of the expected asana scoring min_score"""
+    positions, position, hold_start = [], 0, None
+    for frame_scores, timestamp in zip(scores, timestamps):
+        if frame_scores[columns[position % len(columns)]] >= min_score:
+            if hold_start is None:
+                hold_start = timestamp
+            if timestamp - hold_start >= hold:
+                position += 1
+                hold_start = None
+        else:
+            hold_start = None
+        positions.append(position)
+    return np.array(positions)
+
+
+def tracked_positions(aligner, scores, timestamps, columns, min_score, hold):
+    """Positions of the aligner with the hold rule seeking it on every advance, as in SequenceTracker"""
+    positions, hold_start = [], None
+    for frame_scores, timestamp in zip(scores, timestamps):
+        position = aligner.position
+        if aligner.update(timestamp, frame_scores) > position:
+            hold_start = None
+        if frame_scores[columns[aligner.step]] >= min_score:
+            if hold_start is None:
+                hold_start = timestamp
+            if timestamp - hold_start >= hold:
+                aligner.seek(aligner.position + 1, timestamp)
+                hold_start = None
+        else:
+            hold_start = None
+        positions.append(aligner.position)
+    return np.array(positions)
+
+
+def entry_delays(positions, truth, timestamps):
+    """Seconds from a true step starting to the positions reaching it, negative when early (steps reached only)"""
+    delays = []
+    for step in range(1, truth.max() + 1):
+        true_start = np.argmax(truth >= step)
+        reached = np.flatnonzero(positions >= step)
+        if len(reached):
+            delays.append(timestamps[reached[0]] - timestamps[true_start])
+    return np.array(delays)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Align Surya Namaskar rounds against the reference sequence")
+    parser.add_argument('recording', nargs='?', help=".npz with landmarks and timestamps (default: synthetic rounds)")
+    parser.add_argument('--rounds', type=int, default=2, help="synthetic rounds in one session")
+    parser.add_argument('--hold-frames', type=int, default=60, help="synthetic frames per held asana")
+    parser.add_argument('--fps', type=float, default=20)
+    parser.add_argument('--miss-rate', type=float, default=0.15, help="fraction of frames with no detection")
+    parser.add_argument('--miss-burst', type=int, default=8, help="longest run of missed frames")
+    parser.add_argument('--hold', type=float, default=2.0, help="strict rule: seconds to hold each asana")
+    parser.add_argument('--templates', action='store_true', help="score with templates built from 4 other rounds")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    templates = None
+    if args.templates:
+        training = [generate_asana_round(rng) for _ in range(4)]
+        templates = AsanaTemplates.build(np.concatenate([lm for lm, _ in training]),
+                                         np.concatenate([labels for _, labels in training]))
+    detector = AsanaDetector(templates=templates)
+
+    truth = None
+    if args.recording:
+        with np.load(args.recording) as data:
+            landmarks, timestamps = data['landmarks'], data['timestamps'].astype(np.float64)
+    else:
+        landmarks, truth = [], []
+        transition_frames = 15
+        for round_index in range(args.rounds):
+            round_landmarks, _ = generate_asana_round(rng, args.hold_frames, transition_frames)
+            landmarks.append(round_landmarks)
+            # Frames moving to the next asana count as its step
+            step = np.minimum((np.arange(len(round_landmarks)) + transition_frames) //
+                              (args.hold_frames + transition_frames), len(ASANA_SEQUENCE) - 1)
+            truth.append(round_index * len(ASANA_SEQUENCE) + step)
+        landmarks, truth = np.concatenate(landmarks), np.concatenate(truth)
+        timestamps = np.arange(len(landmarks)) / args.fps
+
+    scores = drop_frames(frame_scores(detector, landmarks), rng, args.miss_rate, args.miss_burst)
+    aligner = SequenceAligner(ASANA_SEQUENCE, detector.score_names)
+    start = time.perf_counter()
+    positions = align_frames(aligner, timestamps, scores)
+    per_frame = (time.perf_counter() - start) / len(scores)
+    print(f"{len(scores)} frames, {np.mean(~scores.any(axis=1)):.0%} without a detection; "
+          f"aligner {per_frame * 1e6:.1f} us per frame")
+
+    if truth is not None:
+        columns = [detector.score_names.index(asana) for asana in ASANA_SEQUENCE]
+        min_score = detector.TEMPLATE_MIN_CONFIDENCE if templates is not None else detector.MIN_SCORE
+        strict = strict_positions(scores, timestamps, columns, min_score, args.hold)
+        tracked = tracked_positions(SequenceAligner(ASANA_SEQUENCE, detector.score_names), scores, timestamps,
+                                    columns, min_score, args.hold)
+        for name, result in (('aligner', positions), ('strict hold', strict), ('aligner+hold', tracked)):
+            delays = entry_delays(result, truth, timestamps)
+            delay = f"median entry delay {np.median(delays):+.2f}s" if len(delays) else "no step reached"
+            print(f"{name:<12} reached step {result[-1]} of {truth[-1]}, {np.mean(result == truth):.1%} of frames "
+                  f"on the true step, {delay}")
+    else:
+        for position, asana, begin, end in aligner.timings:
+            print(f"    round {position // len(ASANA_SEQUENCE) + 1} step {position % len(ASANA_SEQUENCE) + 1:>2} "
+                  f"{asana:<22} {begin:7.2f}s - {end:7.2f}s ({end - begin:.2f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,128 @@
+"""
+Check the compiled asana criteria against per-joint scoring.
+
+Synthetic Surya Namaskar rounds are scored frame by frame twice: with the
+per-joint path the apps used before (one angle at a time, one dict lookup per
+criterion, only the expected asana) and with AsanaDetector's compiled bound
+matrices. The angles and the detect_asana result of every asana must be
+identical on every frame. The asana classify() picks is compared with the
+frame labels. The time per frame of both paths is reported for the same
+work twice: checking only the expected asana (what the apps did before
+classifying), and checking it and scoring all 8 asanas (the per-joint path
+running its check for every asana, the compiled path classify()).
+
+Usage:
+    python tools/asana_scoring_check.py
+    python tools/asana_scoring_check.py --rounds 5 --seed 3
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+sys.path.append(os.path.join(PROJECT_DIR, 'suryanamaskar lockedin'))
+
+from synthetic_motion import generate_asana_round  # noqa: E402
+from asana_detector import AsanaDetector  # noqa: E402
+from pose_detector import ANGLE_JOINTS, PoseDetector  # noqa: E402
+
+
+def per_joint_angles(pose_detector, landmarks):
+    """Angles dict computed one joint at a time"""
+    angles = {joint: pose_detector.calculate_angle(landmarks[a], landmarks[b], landmarks[c])
+              for joint, (a, b, c) in ANGLE_JOINTS.items()}
+    angles['hip_width'] = abs(landmarks[23][0] - landmarks[24][0])
+    return angles
+
+
+def per_joint_detect(detector, asana_name, angles, landmarks):
+    """detect_asana checking the criteria one joint at a time"""
+    criteria = detector.asana_criteria[asana_name]
+    feedback_messages = []
+    angle_matches = 0
+    for joint, (min_angle, max_angle) in criteria["angles"].items():
+        if joint in angles:
+            if min_angle <= angles[joint] <= max_angle:
+                angle_matches += 1
+            else:
+                feedback_messages.append(detector._get_angle_feedback(joint, angles[joint], min_angle, max_angle))
+    special_score, special_feedback = detector.special_check_score(asana_name, angles, landmarks)
+    feedback_messages.extend(special_feedback)
+    total_angles = len(criteria["angles"])
+    angle_score = angle_matches / total_angles if total_angles > 0 else 1.0
+    is_correct = (angle_score + special_score) / 2 >= detector.MIN_SCORE
+    return is_correct, f"Good {asana_name}!" if is_correct else " | ".join(feedback_messages[:2])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check compiled asana scoring against per-joint scoring")
+    parser.add_argument('--rounds', type=int, default=3, help="synthetic Surya Namaskar rounds")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    # Only the angle helpers are used, so the MediaPipe model is not loaded
+    pose_detector = PoseDetector.__new__(PoseDetector)
+    detector = AsanaDetector()
+
+    mismatches, n_frames = 0, 0
+    # Seconds of the per-joint and compiled paths: expected asana only, expected asana and all asanas
+    per_joint_time, compiled_time = np.zeros(2), np.zeros(2)
+    held, recognised, confusions = 0, 0, {}
+    for _ in range(args.rounds):
+        round_landmarks, labels = generate_asana_round(rng)
+        expected = labels.copy()
+        # The asana the apps would be waiting for: the last one labelled
+        for frame in range(1, len(expected)):
+            if not expected[frame]:
+                expected[frame] = expected[frame - 1]
+
+        for landmarks, label, asana_name in zip(round_landmarks, labels, expected):
+            start = time.perf_counter()
+            reference_angles = per_joint_angles(pose_detector, landmarks)
+            per_joint_detect(detector, asana_name, reference_angles, landmarks)
+            checked = time.perf_counter()
+            for name in detector.asana_names:
+                per_joint_detect(detector, name, reference_angles, landmarks)
+            per_joint_time += (checked - start, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            angle_vector = pose_detector.calculate_angle_vector(landmarks)
+            angles = pose_detector.calculate_all_angles(landmarks, angle_vector)
+            context = detector.frame_context(landmarks, angles)
+            detector.detect_asana(asana_name, angles, landmarks, angle_vector, context)
+            checked = time.perf_counter()
+            detected, _ = detector.classify(angle_vector, landmarks, angles, context)
+            compiled_time += (checked - start, time.perf_counter() - start)
+            n_frames += 1
+
+            same_angles = all(np.isclose(angles[joint], value, rtol=0, atol=1e-9, equal_nan=True)
+                              for joint, value in reference_angles.items())
+            same_results = all(detector.detect_asana(name, angles, landmarks, angle_vector) ==
+                               per_joint_detect(detector, name, angles, landmarks)
+                               for name in detector.asana_names)
+            mismatches += not (same_angles and same_results)
+
+            if label:
+                held += 1
+                recognised += detected == label
+                if detected != label:
+                    confusions[(label, detected)] = confusions.get((label, detected), 0) + 1
+
+    print(f"{n_frames} frames: {mismatches} mismatches against per-joint scoring")
+    print(f"classify: {recognised}/{held} held frames recognised ({recognised / max(held, 1):.1%})")
+    for (label, detected), count in sorted(confusions.items(), key=lambda item: -item[1])[:5]:
+        print(f"    {label} -> {detected or 'no asana'}: {count} frames")
+    per_joint_us, compiled_us = per_joint_time / n_frames * 1e6, compiled_time / n_frames * 1e6
+    print(f"per frame, expected asana only: {per_joint_us[0]:.1f} us per-joint, {compiled_us[0]:.1f} us compiled")
+    print(f"per frame, expected asana + all {len(detector.asana_names)}: {per_joint_us[1]:.1f} us per-joint, "
+          f"{compiled_us[1]:.1f} us compiled")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
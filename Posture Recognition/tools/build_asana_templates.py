@@ -0,0 +1,122 @@
+"""
+Build nearest-neighbour asana templates from labelled frames.
+
+Training frames are .npz files with landmarks (N, 33, 3) normalized and
+labels (N,) ('' for frames between asanas), optionally with the sequence
+the asanas are practised in, and/or synthetic Surya Namaskar rounds. Every
+asana gets --exemplars k-means exemplars; the templates are written to
+suryanamaskar lockedin/asana_templates.npz, which the apps use with
+ASANA_CLASSIFIER = 'templates' (and whose sequence replaces the default one).
+
+The templates are then checked on fresh synthetic rounds: per-frame accuracy
+on held asanas, against the compiled angle ranges, and the time per frame of
+one classification.
+
+Usage:
+    python tools/build_asana_templates.py --synthetic-rounds 6
+    python tools/build_asana_templates.py my_sequence.npz --synthetic-rounds 0 --test-rounds 0
+    python tools/build_asana_templates.py --synthetic-rounds 4 --exemplars 4 --dry-run
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+sys.path.append(os.path.join(PROJECT_DIR, 'suryanamaskar lockedin'))
+
+from synthetic_motion import ASANA_SEQUENCE, generate_asana_round  # noqa: E402
+from asana_detector import AsanaDetector  # noqa: E402
+from asana_templates import ASANA_TEMPLATES_PATH, AsanaTemplates  # noqa: E402
+from pose_detector import joint_angles  # noqa: E402
+
+
+def load_frames(paths, rounds, rng):
+    """Landmarks, labels and the sequence of the first file that has one"""
+    landmarks, labels, sequence = [], [], None
+    for path in paths:
+        with np.load(path) as data:
+            landmarks.append(data['landmarks'])
+            labels.append(data['labels'].astype(str))
+            if sequence is None and 'sequence' in data:
+                sequence = data['sequence'].astype(str).tolist()
+    for _ in range(rounds):
+        round_landmarks, round_labels = generate_asana_round(rng)
+        landmarks.append(round_landmarks)
+        labels.append(round_labels)
+    if not landmarks:
+        raise ValueError("no labelled frames: pass .npz files or --synthetic-rounds")
+    return np.concatenate(landmarks), np.concatenate(labels), sequence
+
+
+def evaluate(templates, landmarks, labels):
+    """Held frames recognised by the templates and by the angle ranges, and seconds per classification"""
+    range_detector = AsanaDetector()
+    template_detector = AsanaDetector(templates=templates)
+    angle_vectors = joint_angles(landmarks)
+    held = labels != ''
+    by_templates = by_ranges = 0
+    timings = []
+    for frame in np.flatnonzero(held):
+        start = time.perf_counter()
+        detected, _ = template_detector.classify(angle_vectors[frame], landmarks[frame])
+        timings.append(time.perf_counter() - start)
+        by_templates += detected == labels[frame]
+        by_ranges += range_detector.classify(angle_vectors[frame], landmarks[frame])[0] == labels[frame]
+    return int(held.sum()), by_templates, by_ranges, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build nearest-neighbour asana templates")
+    parser.add_argument('recordings', nargs='*', metavar='FRAMES', help="labelled .npz files")
+    parser.add_argument('--synthetic-rounds', type=int, default=6, help="synthetic Surya Namaskar rounds to add")
+    parser.add_argument('--exemplars', type=int, default=8, help="exemplars per asana")
+    parser.add_argument('--sequence', nargs='+', metavar='ASANA', help="sequence stored with the templates")
+    parser.add_argument('--test-rounds', type=int, default=3, help="fresh synthetic rounds to check on")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=ASANA_TEMPLATES_PATH)
+    parser.add_argument('--dry-run', action='store_true', help="report without writing")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    landmarks, labels, sequence = load_frames(args.recordings, args.synthetic_rounds, rng)
+    if args.sequence:
+        sequence = args.sequence
+    elif sequence is None and not args.recordings:
+        sequence = list(ASANA_SEQUENCE)
+    templates = AsanaTemplates.build(landmarks, labels, args.exemplars, sequence or (), seed=args.seed)
+    print(f"{len(templates.names)} asanas, {len(templates.exemplars)} exemplars of {templates.exemplars.shape[1]} "
+          f"features from {int((labels != '').sum())} labelled frames")
+
+    # What the apps load: float32 exemplars
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'templates.npz')
+        templates.save(path)
+        stored = AsanaTemplates.load(path)
+        print(f"stored size {os.path.getsize(path) / 1024:.1f} KiB")
+
+    if args.test_rounds:
+        test = [generate_asana_round(rng) for _ in range(args.test_rounds)]
+        test_landmarks = np.concatenate([round_landmarks for round_landmarks, _ in test])
+        test_labels = np.concatenate([round_labels for _, round_labels in test])
+        held, by_templates, by_ranges, timings = evaluate(stored, test_landmarks, test_labels)
+        print(f"held frames recognised: {by_templates}/{held} ({by_templates / max(held, 1):.1%}) by templates, "
+              f"{by_ranges}/{held} ({by_ranges / max(held, 1):.1%}) by angle ranges")
+        if timings:
+            median, p99 = np.percentile(timings, [50, 99]) * 1e6
+            print(f"classify: {median:.1f} us median, {p99:.1f} us 99th percentile per frame")
+
+    if args.dry_run:
+        print(f"dry run: {args.output} not written")
+    else:
+        templates.save(args.output)
+        print(f"wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,107 @@
+"""
+Change-gated analysis on sessions with holds and rests.
+
+Synthetic sessions alternate stretches of reps with stretches where the
+figure holds still (only tracker noise of --hold-jitter pixels). Every frame
+is analysed as SessionWorker does, once with the ChangeGate and once
+without; the gate hit rate, the analysis time per frame of both paths and
+the rep counts of both paths are reported.
+
+Usage:
+    python tools/change_gate_benchmark.py
+    python tools/change_gate_benchmark.py --sessions 3 --hold-jitter 2.0 --epsilon 4
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.exercise_config import CHANGE_GATE_CONFIG, FEATURE_DEFINITIONS  # noqa: E402
+from utils.change_gate import ChangeGate, landmark_points  # noqa: E402
+from utils.exercise_detector import ExerciseDetector  # noqa: E402
+from utils.feature_graph import FeatureGraph  # noqa: E402
+from utils.pose_detector import LANDMARK_INDICES  # noqa: E402
+from utils.session_recording import SessionRecording  # noqa: E402
+from synthetic_motion import generate_dataset  # noqa: E402
+
+
+def with_holds(recording, rng, move_frames, hold_frames, jitter, fps):
+    """Copy of a recording where every move_frames frames the figure holds still for hold_frames"""
+    result = SessionRecording(recording.landmark_names)
+    for frame, exercise in enumerate(recording.exercises):
+        landmarks = recording.landmarks(frame)
+        result.append(landmarks, exercise, len(result) / fps)
+        if (frame + 1) % move_frames:
+            continue
+        for _ in range(hold_frames):
+            held = {name: dict(point, x=int(round(point['x'] + rng.normal(0.0, jitter))),
+                               y=int(round(point['y'] + rng.normal(0.0, jitter))))
+                    for name, point in landmarks.items()}
+            result.append(held, exercise, len(result) / fps)
+    return result
+
+
+def analyse(recording, gate):
+    """Per-frame results and analysis seconds of a recording, gated when gate is not None"""
+    detector = ExerciseDetector()
+    graph = FeatureGraph(FEATURE_DEFINITIONS)
+    frames = [(recording.landmarks(frame), exercise, recording.timestamps[frame])
+              for frame, exercise in enumerate(recording.exercises)]
+    results, last = [], None
+    start = time.perf_counter()
+    for landmarks, exercise, timestamp in frames:
+        if gate is not None and last is not None and \
+                gate.unchanged(landmark_points(landmarks, LANDMARK_INDICES), exercise):
+            result = last
+        else:
+            result = detector.detect_exercise(exercise, landmarks, graph.new_frame(landmarks), timestamp)
+            last = dict(result, rep_completed=False)
+        results.append(result)
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark change-gated analysis")
+    parser.add_argument('--sessions', type=int, default=1, help="synthetic sessions per exercise")
+    parser.add_argument('--frames', type=int, default=300, help="moving frames per session")
+    parser.add_argument('--move-frames', type=int, default=60, help="moving frames between holds")
+    parser.add_argument('--hold-frames', type=int, default=60, help="frames per hold")
+    parser.add_argument('--hold-jitter', type=float, default=1.0, help="landmark noise during holds (pixels)")
+    parser.add_argument('--epsilon', type=float, default=CHANGE_GATE_CONFIG['epsilon'])
+    parser.add_argument('--max-reuse', type=int, default=CHANGE_GATE_CONFIG['max_reuse'])
+    parser.add_argument('--fps', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    recordings = [with_holds(recording, rng, args.move_frames, args.hold_frames, args.hold_jitter, args.fps)
+                  for recording in generate_dataset(args.sessions, args.frames, seed=args.seed, fps=args.fps)]
+
+    gate = ChangeGate(args.epsilon, args.max_reuse)
+    n_frames, plain_time, gated_time, changed_counts = 0, 0.0, 0.0, 0
+    for recording in recordings:
+        exercise = recording.exercises[0]
+        plain, seconds = analyse(recording, None)
+        plain_time += seconds
+        gated, seconds = analyse(recording, gate)
+        gated_time += seconds
+        n_frames += len(plain)
+        plain_reps = sum(result['rep_completed'] for result in plain)
+        gated_reps = sum(result['rep_completed'] for result in gated)
+        changed_counts += plain_reps != gated_reps
+        print(f"{exercise}: {len(plain)} frames, reps {plain_reps} ungated / {gated_reps} gated")
+
+    stats = gate.stats()
+    print(f"gate hit rate {stats['hit_rate']:.1%} ({stats['hits']}/{stats['hits'] + stats['misses']} frames)")
+    print(f"analysis: {plain_time / n_frames * 1e6:.1f} us/frame ungated, {gated_time / n_frames * 1e6:.1f} us/frame gated "
+          f"({plain_time / max(gated_time, 1e-12):.2f}x)")
+    print(f"{changed_counts} sessions with different rep counts")
+    return 1 if changed_counts else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,124 @@
+"""
+How often the model cascade runs its extra detectors.
+
+Synthetic Surya Namaskar rounds are replayed with the step each frame
+belongs to (frames moving to an asana count as its step), and
+ModelCascade.refine is called as the apps call it: with the special checks
+of the current step only. The detectors are replaced by counters that find
+nothing, so the cheap checks decide. The synthetic prayer pose keeps the
+wrists clearly together; with --loose-hands that share of the Pranamasana
+frames has the wrists 0.02 to 0.2 apart instead. Reported: the share of
+frames on which each detector would run, overall and per step, and refine's
+own time on frames where nothing runs.
+
+With MediaPipe's solutions API installed, the hand model is also timed on
+the crop refine hands it against the full frame.
+
+Usage:
+    python tools/model_cascade_check.py
+    python tools/model_cascade_check.py --rounds 4 --hold-frames 60 --loose-hands 0.5
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+sys.path.append(os.path.join(PROJECT_DIR, 'suryanamaskar lockedin'))
+
+from synthetic_motion import ASANA_SEQUENCE, generate_asana_round  # noqa: E402
+from asana_detector import AsanaDetector  # noqa: E402
+from model_cascade import CASCADE_STAGES, DETECTORS, ModelCascade  # noqa: E402
+from pose_detector import ANGLE_JOINTS, joint_angles  # noqa: E402
+
+
+def counting_detectors():
+    """Detector factories that find nothing"""
+    return {name: (lambda: (lambda rgb: [])) for name in DETECTORS}
+
+
+def loosen_hands(landmarks, labels, rng, share):
+    """Move the wrists of `share` of the Pranamasana frames 0.02 to 0.2 apart (horizontally)"""
+    frames = np.flatnonzero((labels == 'Pranamasana') & (rng.random(len(labels)) < share))
+    gaps = rng.uniform(0.02, 0.2, len(frames))
+    center = (landmarks[frames, 15, 0] + landmarks[frames, 16, 0]) / 2
+    landmarks[frames, 15, 0] = center + gaps / 2
+    landmarks[frames, 16, 0] = center - gaps / 2
+
+
+def time_hand_model(frame_size, crop_size, runs=20):
+    """Seconds per hand-model run on a blank crop and on the full frame, or None without the solutions API"""
+    try:
+        detect = DETECTORS['hands']()
+    except AttributeError:
+        return None
+    timings = []
+    for shape in ((crop_size, crop_size, 3), (frame_size[1], frame_size[0], 3)):
+        image = np.zeros(shape, dtype=np.uint8)
+        detect(image)
+        start = time.perf_counter()
+        for _ in range(runs):
+            detect(image)
+        timings.append((time.perf_counter() - start) / runs)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count the extra detector runs of the model cascade")
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--hold-frames', type=int, default=45)
+    parser.add_argument('--loose-hands', type=float, default=0.0, help="share of prayer frames with hands apart")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    transition_frames = 15
+    frame_size = (640, 480)
+    detector = AsanaDetector()
+    cascade = ModelCascade(counting_detectors())
+    frame = np.zeros((frame_size[1], frame_size[0], 3), dtype=np.uint8)
+
+    runs_per_step = np.zeros(len(ASANA_SEQUENCE), dtype=np.int64)
+    frames_per_step = np.zeros(len(ASANA_SEQUENCE), dtype=np.int64)
+    idle_times = []
+    for _ in range(args.rounds):
+        landmarks, labels = generate_asana_round(rng, args.hold_frames, transition_frames)
+        loosen_hands(landmarks, labels, rng, args.loose_hands)
+        steps = np.minimum((np.arange(len(landmarks)) + transition_frames) //
+                           (args.hold_frames + transition_frames), len(ASANA_SEQUENCE) - 1)
+        for points, angle_vector, step in zip(landmarks, joint_angles(landmarks), steps.tolist()):
+            angles = dict(zip(ANGLE_JOINTS, angle_vector.tolist()))
+            context = detector.frame_context(points, angles)
+            checks = detector.special_check_names(ASANA_SEQUENCE[step])
+            before = sum(cascade.runs.values())
+            start = time.perf_counter()
+            cascade.refine(checks, frame, context)
+            elapsed = time.perf_counter() - start
+            ran = sum(cascade.runs.values()) - before
+            if not ran:
+                idle_times.append(elapsed)
+            runs_per_step[step] += ran
+            frames_per_step[step] += 1
+
+    stats = cascade.stats()
+    print(f"{stats['frames']} frames; stages for {', '.join(sorted(CASCADE_STAGES))}")
+    for name in DETECTORS:
+        print(f"  {name:<10} runs on {stats['runs'].get(name, 0) / stats['frames']:.1%} of frames")
+    for step, asana in enumerate(ASANA_SEQUENCE):
+        if runs_per_step[step]:
+            print(f"  step {step + 1:>2} {asana:<22} {runs_per_step[step] / frames_per_step[step]:.1%} of its frames")
+    print(f"refine without a run: {np.median(idle_times) * 1e6:.1f} us median")
+
+    timings = time_hand_model(frame_size, 160)
+    if timings is None:
+        print("MediaPipe solutions API not available: hand model not timed")
+    else:
+        print(f"hand model: {timings[0] * 1e3:.1f} ms on a 160 px crop, {timings[1] * 1e3:.1f} ms on the full frame")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,267 @@
+"""
+Check where the landmark quality gate pays for itself.
+
+Exercises: synthetic sessions (landmark dicts in pixels of a --width x
+--height frame, about 1% of the landmarks dropped) are turned into the raw
+MediaPipe landmark list the worker receives. The worker's former path
+(extract_landmarks, a per-name visibility check of the landmark dict, then
+the change gate on accepted frames) is compared with its path now
+(extract_landmarks and the change gate; for frames that are not reused,
+landmark_array and the gate on it (check_landmark_quality)): decisions on
+every frame and time per accepted frame (reused or analysed) and per
+rejected frame, next to the analysis a frame rejected only by the gate saves
+(detect_exercise).
+From these, the share of such frames above which the gate pays off.
+
+Asanas: synthetic Surya Namaskar rounds are checked as the apps check them,
+against the required landmarks of the step each frame belongs to, with the
+suryanamaskar POSE_VALIDATION thresholds. The gate's time is compared with
+the analysis it saves on a rejected frame (joint angles, detect_asana and
+classify), and with the reject rate above which it pays off.
+
+In both, a share (--degrade) of the frames is spoiled in one of three ways:
+hidden (4 required landmarks with visibility 0.1), shifted (the body moved
+half a frame to the side) or shrunk (the body scaled to a quarter around its
+center). Reported: the rejection reasons per kind of frame.
+
+Usage:
+    python tools/quality_gate_check.py
+    python tools/quality_gate_check.py --sessions 5 --rounds 4 --degrade 0.5
+"""
+import argparse
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+sys.path.append(os.path.join(PROJECT_DIR, 'suryanamaskar lockedin'))
+
+from synthetic_motion import ASANA_SEQUENCE, generate_asana_round, generate_dataset  # noqa: E402
+from config.exercise_config import CHANGE_GATE_CONFIG, EXERCISE_CONFIG, FEATURE_DEFINITIONS  # noqa: E402
+from utils.change_gate import ChangeGate, landmark_points  # noqa: E402
+from utils.exercise_detector import ExerciseDetector  # noqa: E402
+from utils.exercise_helpers import ExerciseHelpers  # noqa: E402
+from utils.feature_graph import FeatureGraph  # noqa: E402
+from utils.landmark_quality import REJECT_REASONS, LandmarkQualityGate  # noqa: E402
+from utils.pose_detector import LANDMARK_INDICES, PoseDetector  # noqa: E402
+from asana_detector import AsanaDetector  # noqa: E402
+from pose_detector import ANGLE_JOINTS, joint_angles  # noqa: E402
+
+# Values of the suryanamaskar config (not importable next to the shared config package)
+POSE_VALIDATION = {
+    'min_landmarks': 33,
+    'max_missing_joints': 3,
+    'position_bounds': (0, 1),
+    'min_body_height': 0.3,
+    'max_body_width': 0.8,
+    'min_visibility': 0.5
+}
+
+KINDS = ('clean', 'hidden', 'shifted', 'shrunk')
+
+
+def per_name_check(exercise_name, landmarks):
+    """The worker's former check: every required landmark in the dict with visibility >= 0.5"""
+    required = EXERCISE_CONFIG[exercise_name]['required_landmarks']
+    return all(lm in landmarks and landmarks[lm]['visibility'] >= 0.5 for lm in required)
+
+
+def break_even(extra, saved):
+    """Share of rejected frames above which a check costing `extra` per frame saves time"""
+    return extra / (extra + saved) if extra > 0 else 0.0
+
+
+def spoil(points, visibility, required, kind, rng):
+    """Spoil one frame (normalized points (33, 2), visibility (33,)) in place"""
+    if kind == 'hidden':
+        visibility[rng.choice(required, min(4, len(required)), replace=False)] = 0.1
+    elif kind == 'shifted':
+        points[:, 0] += 0.5 * rng.choice((-1, 1))
+    elif kind == 'shrunk':
+        center = np.nanmean(points, axis=0)
+        points[:] = center + 0.25 * (points - center)
+
+
+def raw_pose_landmarks(points, visibility):
+    """Stand-in for MediaPipe's pose_landmarks with 33 landmarks"""
+    return SimpleNamespace(landmark=[SimpleNamespace(x=x, y=y, visibility=v)
+                                     for (x, y), v in zip(points.tolist(), visibility.tolist())])
+
+
+def exercise_frames(args, rng):
+    """(exercise, normalized points (33, 2), visibility (33,), kind) of every synthetic exercise frame"""
+    size = np.array([args.width, args.height], dtype=np.float64)
+    frames = []
+    for recording in generate_dataset(args.sessions, args.frames, seed=args.seed):
+        for frame in range(len(recording)):
+            landmarks = recording.landmarks(frame)
+            exercise = recording.exercises[frame]
+            points = rng.uniform(0.0, 1.0, (33, 2))
+            visibility = rng.uniform(0.0, 0.3, 33)
+            for name, point in landmarks.items():
+                points[LANDMARK_INDICES[name]] = (point['x'], point['y']) / size
+                visibility[LANDMARK_INDICES[name]] = point['visibility']
+            kind = rng.choice(KINDS[1:]) if rng.random() < args.degrade else 'clean'
+            required = [LANDMARK_INDICES[lm] for lm in EXERCISE_CONFIG[exercise]['required_landmarks']]
+            spoil(points, visibility, required, kind, rng)
+            frames.append((exercise, points, visibility, kind))
+    return frames
+
+
+def check_exercises(args, rng):
+    frames = exercise_frames(args, rng)
+    gate = ExerciseHelpers.create_quality_gate()
+    shape = (args.height, args.width, 3)
+    reasons = {kind: dict.fromkeys(('accepted',) + REJECT_REASONS, 0) for kind in KINDS}
+    detector = ExerciseDetector()
+    graph = FeatureGraph(FEATURE_DEFINITIONS)
+    agree = dict.fromkeys(KINDS, 0)
+    old_only, new_only = dict.fromkeys(KINDS, 0), dict.fromkeys(KINDS, 0)
+    # Each path with its own change gate, reusing only after an analysed frame
+    old_change, new_change = (ChangeGate(CHANGE_GATE_CONFIG['epsilon'], CHANGE_GATE_CONFIG['max_reuse'])
+                              for _ in range(2))
+    old_analysed = new_analysed = False
+    old_times, new_times = {True: [], False: []}, {True: [], False: []}
+    reused_times, gate_times = [], []
+    analysis_times = []
+    for exercise, points, visibility, kind in frames:
+        raw = raw_pose_landmarks(points, visibility)
+
+        # The worker's former path: the per-name check, then the change gate on accepted frames
+        start = time.perf_counter()
+        landmarks = PoseDetector.extract_landmarks(None, raw, shape)
+        old_valid = per_name_check(exercise, landmarks)
+        if old_valid:
+            old_analysed = (old_analysed and
+                            old_change.unchanged(landmark_points(landmarks, LANDMARK_INDICES), exercise)) or True
+        old_times[old_valid].append(time.perf_counter() - start)
+
+        # The worker's path: the change gate first, the gate only on frames that are not reused
+        start = time.perf_counter()
+        landmarks = PoseDetector.extract_landmarks(None, raw, shape)
+        reuse = new_analysed and new_change.unchanged(landmark_points(landmarks, LANDMARK_INDICES), exercise)
+        new_valid = True
+        if not reuse:
+            array = PoseDetector.landmark_array(raw)
+            gate_start = time.perf_counter()
+            new_valid, _ = ExerciseHelpers.check_landmark_quality(gate, exercise, array[:, :2], array[:, 2])
+            gate_times.append(time.perf_counter() - gate_start)
+            if not new_valid:
+                new_analysed = False
+                new_change.invalidate()
+        elapsed = time.perf_counter() - start
+        if reuse:
+            reused_times.append(elapsed)
+        else:
+            new_times[new_valid].append(elapsed)
+            new_analysed = new_analysed or new_valid
+
+        # Decisions of the gate on every frame, reused or not
+        array = PoseDetector.landmark_array(raw)
+        accepted, reason = gate.check(array[:, :2], exercise, array[:, 2])
+        if old_valid and not accepted:
+            # Analysed by the worker, rejected by the gate
+            start = time.perf_counter()
+            detector.detect_exercise(exercise, landmarks, graph.new_frame(landmarks))
+            analysis_times.append(time.perf_counter() - start)
+
+        reasons[kind]['accepted' if accepted else reason] += 1
+        agree[kind] += old_valid == accepted
+        old_only[kind] += old_valid and not accepted
+        new_only[kind] += accepted and not old_valid
+
+    print(f"exercises: {len(frames)} frames, {len(reused_times)} reused by the change gate without the gate")
+    for label, kinds in (('clean frames', KINDS[:1]), ('frames of all kinds', KINDS)):
+        total = sum(sum(reasons[kind].values()) for kind in kinds)
+        print(f"  the worker's check and the gate agree on {sum(agree[kind] for kind in kinds) / total:.1%} "
+              f"of the {total} {label} ({sum(old_only[kind] for kind in kinds)} rejected only by the gate, "
+              f"{sum(new_only[kind] for kind in kinds)} only by the worker's check)")
+    print_reasons(reasons)
+    old_accepted = np.mean(old_times[True])
+    new_accepted = np.mean(new_times[True] + reused_times)
+    print(f"  per accepted frame: former path {old_accepted * 1e6:.1f} us, worker path {new_accepted * 1e6:.1f} us "
+          f"(mean; reused {np.median(reused_times) * 1e6:.1f} us, analysed {np.median(new_times[True]) * 1e6:.1f} us, "
+          f"of which the gate {np.median(gate_times) * 1e6:.1f} us, median)")
+    print(f"  per rejected frame: former path {np.median(old_times[False]) * 1e6:.1f} us, "
+          f"worker path {np.median(new_times[False]) * 1e6:.1f} us (median)")
+    if analysis_times:
+        saved = np.median(analysis_times) + old_accepted - np.median(new_times[False])
+        print(f"  analysis saved on a frame only the gate rejects: {np.median(analysis_times) * 1e6:.1f} us (median); "
+              f"the gate pays off above {break_even(new_accepted - old_accepted, saved):.0%} of such frames")
+
+
+def check_asanas(args, rng):
+    detector = AsanaDetector()
+    gate = LandmarkQualityGate(**POSE_VALIDATION)
+    for asana_name in set(ASANA_SEQUENCE):
+        gate.require(asana_name, detector.required_landmarks(asana_name))
+
+    transition_frames = 15
+    reasons = {kind: dict.fromkeys(('accepted',) + REJECT_REASONS, 0) for kind in KINDS}
+    gate_times, analysis_times = [], []
+    for _ in range(args.rounds):
+        landmarks, _ = generate_asana_round(rng, args.hold_frames, transition_frames)
+        steps = np.minimum((np.arange(len(landmarks)) + transition_frames) //
+                           (args.hold_frames + transition_frames), len(ASANA_SEQUENCE) - 1)
+        # The apps' landmarks: x, y, z and visibility
+        landmarks = np.concatenate((landmarks, rng.uniform(0.6, 1.0, landmarks.shape[:2] + (1,))), axis=2)
+        for points, step in zip(landmarks, steps.tolist()):
+            asana_name = ASANA_SEQUENCE[step]
+            kind = rng.choice(KINDS[1:]) if rng.random() < args.degrade else 'clean'
+            spoil(points[:, :2], points[:, 3], detector.required_landmarks(asana_name), kind, rng)
+
+            start = time.perf_counter()
+            accepted, reason = gate.check(points, asana_name, points[:, 3])
+            gate_times.append(time.perf_counter() - start)
+            reasons[kind]['accepted' if accepted else reason] += 1
+
+            if accepted:
+                start = time.perf_counter()
+                angle_vector = joint_angles(points[None])[0]
+                angles = dict(zip(ANGLE_JOINTS, angle_vector.tolist()))
+                context = detector.frame_context(points, angles)
+                detector.detect_asana(asana_name, angles, points, angle_vector, context)
+                detector.classify(angle_vector, points, angles, context)
+                analysis_times.append(time.perf_counter() - start)
+
+    stats = gate.stats()
+    print(f"asanas: {stats['frames']} frames, {stats['reject_rate']:.1%} rejected")
+    print_reasons(reasons)
+    gate_time, analysis_time = np.median(gate_times), np.median(analysis_times)
+    print(f"  per frame: gate {gate_time * 1e6:.1f} us, analysis saved on a rejected frame "
+          f"{analysis_time * 1e6:.1f} us (median); the gate pays off above "
+          f"{break_even(gate_time, analysis_time):.0%} rejected frames")
+
+
+def print_reasons(reasons):
+    for kind, counts in reasons.items():
+        total = sum(counts.values())
+        if total:
+            print(f"  {kind:<8} " + ", ".join(f"{reason} {count / total:.1%}"
+                                             for reason, count in counts.items() if count))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the landmark quality gate on synthetic frames")
+    parser.add_argument('--sessions', type=int, default=2, help="synthetic sessions per exercise")
+    parser.add_argument('--frames', type=int, default=300, help="frames per exercise session")
+    parser.add_argument('--rounds', type=int, default=3, help="synthetic Surya Namaskar rounds")
+    parser.add_argument('--hold-frames', type=int, default=45)
+    parser.add_argument('--degrade', type=float, default=0.3, help="share of spoiled frames")
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    check_exercises(args, rng)
+    check_asanas(args, rng)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
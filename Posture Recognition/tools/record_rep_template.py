@@ -0,0 +1,180 @@
+"""
+Record reference-rep templates and score sessions against them.
+
+A coach's SessionRecording is replayed through an ExerciseDetector that keeps
+the frames of every rep; one counted rep per exercise (the one of median
+duration, or --rep N) becomes that exercise's RepTemplate and is merged into
+config/rep_templates.json, which ExerciseDetector loads. Recordings passed
+with --score (or synthetic sessions) are then replayed against the new
+templates: the similarity and worst phase of their counted reps and the time
+per alignment are reported. The banded DTW is checked against a plain
+dynamic program on random cost matrices first.
+
+Usage:
+    python tools/record_rep_template.py coach_squats.npz --score athlete.npz
+    python tools/record_rep_template.py coach.npz --exercise Squats --rep 3 --output my_templates.json
+    python tools/record_rep_template.py --synthetic --score-synthetic 2 --dry-run
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.exercise_config import REP_TEMPLATES_PATH  # noqa: E402
+from utils.exercise_detector import ExerciseDetector  # noqa: E402
+from utils.rep_templates import (RepTemplate, RepTemplateMatcher, banded_dtw,  # noqa: E402
+                                 save_rep_templates)
+from utils.session_recording import SessionRecording  # noqa: E402
+from synthetic_motion import generate_dataset  # noqa: E402
+
+
+def reference_dtw(cost, band):
+    """Plain dynamic program for the banded DTW, cell by cell"""
+    n_rows, n_cols = cost.shape
+    scale = max(n_rows - 1, 1)
+    accumulated = np.full(cost.shape, np.inf)
+    for i in range(n_rows):
+        for j in range(n_cols):
+            if abs(j * scale - i * (n_cols - 1)) > band * scale:
+                continue
+            if i == 0 and j == 0:
+                accumulated[i, j] = cost[i, j]
+                continue
+            best = min(accumulated[i - 1, j] if i else np.inf,
+                       accumulated[i - 1, j - 1] if i and j else np.inf,
+                       accumulated[i, j - 1] if j else np.inf)
+            accumulated[i, j] = cost[i, j] + best
+    return accumulated
+
+
+def check_dtw(rng, trials=200):
+    """Number of random cost matrices where banded_dtw differs from the plain dynamic program"""
+    mismatches = 0
+    for _ in range(trials):
+        n_rows, n_cols = rng.integers(2, 40, size=2)
+        band = int(rng.integers(1, 20))
+        cost = rng.random((n_rows, n_cols))
+        mismatches += not np.allclose(banded_dtw(cost, band), reference_dtw(cost, band))
+    return mismatches
+
+
+def recorded_reps(recording):
+    """Counted reps of a recording: (exercise, frames (N, J), phases, angle labels)"""
+    detector = ExerciseDetector(templates={})
+    detector.rep_templates = RepTemplateMatcher({}, record=True)
+    reps = []
+    for frame, exercise in enumerate(recording.exercises):
+        if not exercise:
+            continue
+        result = detector.detect_exercise(exercise, recording.landmarks(frame), timestamp=recording.timestamps[frame])
+        if result['rep_completed']:
+            name, frames, phases = detector.rep_templates.last_rep
+            labels = tuple(result['angles'])
+            reps.append((name, frames, phases, labels))
+    return reps
+
+
+def score(recording, templates):
+    """Rep matches of a recording against templates, and the seconds each alignment took"""
+    detector = ExerciseDetector(templates=templates)
+    matcher = detector.rep_templates
+    timings = []
+    match_rep = matcher.match
+
+    def timed_match(exercise, values):
+        start = time.perf_counter()
+        result = match_rep(exercise, values)
+        timings.append(time.perf_counter() - start)
+        return result
+
+    matcher.match = timed_match
+    matches = []
+    for frame, exercise in enumerate(recording.exercises):
+        if not exercise:
+            continue
+        result = detector.detect_exercise(exercise, recording.landmarks(frame), timestamp=recording.timestamps[frame])
+        if result['rep_match'] is not None:
+            matches.append((exercise, result['rep_match']))
+    return matches, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record reference-rep templates and score sessions against them")
+    parser.add_argument('recordings', nargs='*', metavar='RECORDING', help="coach SessionRecording .npz files")
+    parser.add_argument('--exercise', help="only record this exercise")
+    parser.add_argument('--rep', type=int, help="counted rep to use (1-based, default: the median duration)")
+    parser.add_argument('--tolerance', type=float, help="similarity tolerance stored with the templates")
+    parser.add_argument('--synthetic', action='store_true', help="record from one synthetic session per exercise")
+    parser.add_argument('--score', nargs='+', default=[], metavar='RECORDING', help="recordings to score")
+    parser.add_argument('--score-synthetic', type=int, default=0, help="synthetic sessions per exercise to score")
+    parser.add_argument('--frames', type=int, default=600, help="frames per synthetic session")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=REP_TEMPLATES_PATH, help="templates file (default: the one the app loads)")
+    parser.add_argument('--dry-run', action='store_true', help="report without writing")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    mismatches = check_dtw(rng)
+    print(f"banded DTW vs plain dynamic program: {mismatches} mismatches")
+
+    coach = [SessionRecording.load(path) for path in args.recordings]
+    if args.synthetic:
+        coach += generate_dataset(1, args.frames, seed=args.seed)
+    if not coach:
+        parser.error("pass coach recordings or --synthetic")
+
+    reps = {}
+    for recording in coach:
+        for exercise, frames, phases, labels in recorded_reps(recording):
+            if args.exercise is None or exercise == args.exercise:
+                reps.setdefault(exercise, []).append((frames, phases, labels))
+
+    templates = {}
+    for exercise, candidates in reps.items():
+        if args.rep is not None:
+            if args.rep > len(candidates):
+                print(f"{exercise}: only {len(candidates)} counted reps, skipped")
+                continue
+            chosen = args.rep - 1
+        else:
+            lengths = [len(frames) for frames, _, _ in candidates]
+            chosen = int(np.argsort(lengths)[len(lengths) // 2])
+        frames, phases, labels = candidates[chosen]
+        templates[exercise] = RepTemplate(labels, frames, phases, args.tolerance)
+        print(f"{exercise}: rep {chosen + 1} of {len(candidates)}, {len(frames)} frames of {', '.join(labels)}")
+    if not templates:
+        print("no counted reps to record")
+        return 1
+
+    scored = [SessionRecording.load(path) for path in args.score]
+    if args.score_synthetic:
+        scored += generate_dataset(args.score_synthetic, args.frames, seed=args.seed + 1,
+                                   exercises=list(templates))
+    timings = []
+    for recording in scored:
+        matches, seconds = score(recording, templates)
+        timings += seconds
+        for exercise in dict.fromkeys(name for name, _ in matches):
+            similarity = [match['similarity'] for name, match in matches if name == exercise]
+            worst = [match['worst_phase'] for name, match in matches if name == exercise]
+            print(f"    {exercise}: {len(similarity)} reps, similarity {np.mean(similarity):.2f} "
+                  f"(min {np.min(similarity):.2f}), worst phase mostly {max(set(worst), key=worst.count)}")
+    if timings:
+        median, p99 = np.percentile(timings, [50, 99]) * 1e3
+        print(f"alignment: {median:.3f} ms median, {p99:.3f} ms 99th percentile, {np.max(timings) * 1e3:.3f} ms max "
+              f"over {len(timings)} reps")
+
+    if args.dry_run:
+        print(f"dry run: {args.output} not written")
+    else:
+        save_rep_templates(templates, args.output)
+        print(f"wrote {len(templates)} templates to {args.output}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
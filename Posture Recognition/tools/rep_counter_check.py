@@ -0,0 +1,129 @@
+"""
+Equivalence check and throughput benchmark for the batch rep counter.
+
+Every exercise is evaluated twice over the same frames: once through the
+streaming path (``ExerciseProgram.evaluate_frame`` frame by frame, as the live
+detector does) and once through ``evaluate_landmark_sequence``. Per-frame rep
+states, rep events, form flags and feedback must match exactly.
+
+The frames come from a synthetic random walk of the landmarks (with dropped
+landmarks and collapsed points that produce NaN angles) and, optionally, from
+sessions saved with ``SessionWorker.stop_recording``.
+
+Usage:
+    python tools/rep_counter_check.py
+    python tools/rep_counter_check.py --frames 50000 --seed 3 session.npz
+    python tools/rep_counter_check.py --benchmark-frames 2000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.exercise_detector import get_exercise_programs  # noqa: E402
+from utils.session_recording import SessionRecording  # noqa: E402
+
+
+def synthetic_recording(n_frames, seed, exercises):
+    """Random-walk landmarks that regularly cross the exercise thresholds"""
+    rng = np.random.default_rng(seed)
+    recording = SessionRecording()
+    n_landmarks = len(recording.landmark_names)
+    hip = recording.landmark_names.index('left_hip')
+    position = rng.integers(50, 450, size=(n_landmarks, 2)).astype(np.float64)
+    for frame in range(n_frames):
+        moving = rng.random(n_landmarks) < 0.3
+        position[moving] += rng.integers(-60, 61, size=(moving.sum(), 2))
+        position = np.clip(position, 0, 640)
+        if rng.random() < 0.01:
+            position[rng.integers(n_landmarks)] = position[hip]   # degenerate angle
+        landmarks = {
+            name: {'x': int(position[i, 0]), 'y': int(position[i, 1]), 'visibility': 0.9}
+            for i, name in enumerate(recording.landmark_names) if rng.random() >= 0.03
+        }
+        recording.append(landmarks, exercises[(frame * len(exercises)) // n_frames])
+    return recording
+
+
+def streaming(program, recording, exercise):
+    """Per-frame results of the live code path"""
+    states, reps, form, feedback = [], [], [], []
+    state = program.initial_state
+    for frame, name in enumerate(recording.exercises):
+        if name != exercise:
+            continue
+        result, state = program.evaluate_frame(recording.landmarks(frame), state)
+        states.append(state)
+        reps.append(result['rep_completed'])
+        form.append(result['correct_form'])
+        feedback.append(result['feedback'])
+    return np.array(states, dtype=np.intp), np.array(reps, dtype=bool), np.array(form, dtype=bool), feedback
+
+
+def check(programs, recording, label):
+    """Compare streaming and batch results; returns the number of mismatching frames"""
+    mismatches = 0
+    for exercise, program in programs.items():
+        states, reps, form, feedback = streaming(program, recording, exercise)
+        if not len(states):
+            continue
+        coords, present = recording.arrays(program.landmark_names, exercise)
+        batch = program.evaluate_landmark_sequence(coords, present)
+
+        bad = (states != batch['states']) | (reps != batch['rep_completed']) | (form != batch['correct_form'])
+        bad |= np.array(feedback, dtype=object) != program.feedback_messages(batch['feedback'])
+        mismatches += int(bad.sum())
+        print(f"{label:<12} {exercise:<16} {len(states):>8} frames {len(batch['run_starts']) - 1:>6} state changes "
+              f"{int(reps.sum()):>6} reps {int(bad.sum()):>6} mismatches")
+    return mismatches
+
+
+def benchmark(programs, n_frames, seed):
+    """Batch frames per second, features included, on tiled synthetic frames"""
+    recording = synthetic_recording(min(n_frames, 20000), seed, list(programs))
+    for exercise, program in programs.items():
+        coords, present = recording.arrays(program.landmark_names)
+        reps = -(-n_frames // len(coords))
+        coords = np.tile(coords, (reps, 1, 1))[:n_frames]
+        present = np.tile(present, (reps, 1))[:n_frames]
+
+        start = time.perf_counter()
+        features = program.compute_features(coords, present)
+        valid = program.has_required(present)
+        middle = time.perf_counter()
+        program.evaluate_sequence(features, valid)
+        end = time.perf_counter()
+        print(f"{exercise:<16} {n_frames / (end - start) / 1e6:>6.2f}M frames/s "
+              f"(rules and rep states only: {n_frames / (end - middle) / 1e6:.2f}M frames/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the batch rep counter against the streaming detector")
+    parser.add_argument('recordings', nargs='*', metavar='RECORDING', help="recorded sessions (.npz) to check")
+    parser.add_argument('--frames', type=int, default=20000, help="synthetic frames per exercise")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--benchmark-frames', type=int, default=1000000,
+                        help="frames per exercise for the throughput benchmark (0 to skip)")
+    args = parser.parse_args()
+
+    programs = get_exercise_programs()
+    mismatches = 0
+    with np.errstate(invalid='ignore'):
+        synthetic = synthetic_recording(args.frames * len(programs), args.seed, list(programs))
+        mismatches += check(programs, synthetic, 'synthetic')
+        for path in args.recordings:
+            mismatches += check(programs, SessionRecording.load(path), os.path.basename(path))
+
+        if args.benchmark_frames:
+            benchmark(programs, args.benchmark_frames, args.seed)
+
+    print(f"{mismatches} mismatching frames")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,150 @@
+"""
+Check the ring buffers and rolling windows of utils.rolling_stats.
+
+Random scalar and per-landmark samples are pushed into RollingWindows of
+several capacities with a short resync period, and after every push the
+window's values, mean and variance are compared with a plain list of the
+last `capacity` samples. RingBuffer.values and last are also checked on a
+buffer whose oldest samples were dropped after it wrapped (count lowered
+below capacity with head elsewhere than count), where the buffered values
+are not data[:count].
+
+The other windows get the same treatment: EWMA against the explicitly
+weighted mean and variance of every sample so far, TimeWindow (with a short
+resync period, so the sums are rebuilt over windows that lost samples to the
+horizon) against the samples newer than the horizon, and RollingHistogram
+percentiles against the inverted-CDF np.percentile of the window (the
+sample whose rank the histogram interpolates towards), in bin widths.
+
+Usage:
+    python tools/rolling_stats_check.py
+    python tools/rolling_stats_check.py --pushes 20000
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from utils.rolling_stats import EWMA, RingBuffer, RollingHistogram, RollingWindow, TimeWindow  # noqa: E402
+
+
+def check_windows(pushes, rng):
+    """Largest error of values, mean and variance against brute force"""
+    errors = {'values': 0.0, 'mean': 0.0, 'variance': 0.0}
+    for capacity in (1, 4, 7, 30):
+        for shape in ((), (33, 2)):
+            window = RollingWindow(capacity, shape, resync_every=3 * capacity + 1)
+            samples = []
+            for _ in range(pushes):
+                value = rng.normal(0.0, 1.0, shape)
+                window.push(value)
+                samples = (samples + [value])[-capacity:]
+                expected = np.array(samples)
+                errors['values'] = max(errors['values'], float(np.abs(window.values() - expected).max()))
+                errors['mean'] = max(errors['mean'], float(np.abs(window.mean() - expected.mean(axis=0)).max()))
+                errors['variance'] = max(errors['variance'],
+                                         float(np.abs(window.variance() - expected.var(axis=0)).max()))
+    return errors
+
+
+def check_drained(rng):
+    """Mismatches of values/last on wrapped buffers with their oldest samples dropped"""
+    mismatches = cases = 0
+    for capacity in (2, 4, 9):
+        for pushes in range(capacity, 4 * capacity):
+            for dropped in range(capacity):
+                buffer = RingBuffer(capacity)
+                samples = rng.normal(0.0, 1.0, pushes)
+                for value in samples:
+                    buffer.push(value)
+                # As an expiring window drops its oldest samples
+                buffer.count -= dropped
+                expected = samples[-capacity:][dropped:]
+                cases += 1
+                mismatches += not np.array_equal(buffer.values(), expected)
+                mismatches += not np.array_equal(buffer.last(2), expected[-2:])
+    return mismatches, cases
+
+
+def check_ewma(pushes, rng):
+    """Largest error of the EWMA mean and variance against the weighted sums"""
+    errors = {'mean': 0.0, 'variance': 0.0}
+    for alpha in (0.05, 0.3, 1.0):
+        ewma = EWMA(alpha=alpha)
+        samples = rng.normal(0.0, 1.0, pushes)
+        for n in range(1, pushes + 1):
+            ewma.push(samples[n - 1])
+            # The first sample carries the weight left over by the later ones
+            weights = alpha * (1.0 - alpha) ** np.arange(n - 1, -1, -1)
+            weights[0] = (1.0 - alpha) ** (n - 1)
+            mean = float(weights @ samples[:n])
+            variance = float(weights @ (samples[:n] - mean) ** 2)
+            errors['mean'] = max(errors['mean'], abs(float(ewma.value) - mean))
+            errors['variance'] = max(errors['variance'], abs(float(ewma.var) - variance))
+    return errors
+
+
+def check_time_windows(pushes, rng):
+    """Largest error of TimeWindow length, mean and variance against brute force"""
+    errors = {'length': 0, 'mean': 0.0, 'variance': 0.0}
+    for horizon, capacity in ((0.5, 64), (0.5, 8), (2.0, 16)):
+        window = TimeWindow(horizon, capacity)
+        window.window.resync_every = 3 * capacity + 1
+        # 30 fps on average, with the odd stall long enough to empty the window
+        gaps = rng.exponential(1 / 30, pushes)
+        gaps[rng.random(pushes) < 0.02] = 3 * horizon
+        times = np.cumsum(gaps)
+        samples = rng.normal(0.0, 1.0, pushes)
+        for n in range(pushes):
+            window.push(times[n], samples[n])
+            live = samples[max(0, n + 1 - capacity):n + 1][times[max(0, n + 1 - capacity):n + 1] >= times[n] - horizon]
+            errors['length'] = max(errors['length'], abs(len(window) - len(live)))
+            errors['mean'] = max(errors['mean'], abs(float(window.mean()) - live.mean()))
+            errors['variance'] = max(errors['variance'], abs(float(window.variance()) - live.var()))
+    return errors
+
+
+def check_histograms(pushes, rng):
+    """Largest percentile error of RollingHistogram, in bin widths"""
+    worst = 0.0
+    for capacity, bins in ((30, 64), (120, 32)):
+        histogram = RollingHistogram(capacity, 0.0, 180.0, bins)
+        samples = np.clip(rng.normal(110.0, 35.0, pushes), 0.0, 180.0)
+        for n in range(pushes):
+            histogram.push(samples[n])
+            window = samples[max(0, n + 1 - capacity):n + 1]
+            for q in (10, 50, 90):
+                error = abs(histogram.percentile(q) - np.percentile(window, q, method='inverted_cdf')) / histogram.bin_width
+                worst = max(worst, float(error))
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the rolling statistics against brute force")
+    parser.add_argument('--pushes', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    errors = check_windows(args.pushes, rng)
+    print("rolling windows, largest error: " + ", ".join(f"{name} {error:.1e}" for name, error in errors.items()))
+    mismatches, cases = check_drained(rng)
+    print(f"wrapped buffers with dropped samples: {mismatches} mismatches in {cases} cases")
+    ewma_errors = check_ewma(args.pushes, rng)
+    print("EWMA, largest error: " + ", ".join(f"{name} {error:.1e}" for name, error in ewma_errors.items()))
+    time_errors = check_time_windows(args.pushes, rng)
+    print(f"time windows, largest error: length {time_errors['length']}, "
+          f"mean {time_errors['mean']:.1e}, variance {time_errors['variance']:.1e}")
+    histogram_error = check_histograms(args.pushes, rng)
+    print(f"histograms, largest percentile error: {histogram_error:.2f} bin widths")
+    exact = max(max(errors.values()), max(ewma_errors.values()), time_errors['mean'], time_errors['variance'])
+    ok = mismatches == 0 and time_errors['length'] == 0 and exact < 1e-9 and histogram_error <= 1.0
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
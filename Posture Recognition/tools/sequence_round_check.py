@@ -0,0 +1,119 @@
+"""
+Check that one clean Surya Namaskar round is counted as exactly one round.
+
+Synthetic rounds with still holds (every held asana is the frame of its
+hold the quality gate accepts and the detector scores highest, held for
+--hold seconds) are replayed
+through SequenceTracker with the apps' settings. Every step must be
+entered once, one step at a time, by the hold rule or by the flow aligner
+(synthetic Ashwa Sanchalanasana never passes its stance check, so the flow
+has to follow past it): 12 advances and the round counted, at position 12.
+Each replay prints the advances it made; the exit code is 1 if any replay
+differs.
+
+Usage:
+    python tools/sequence_round_check.py
+    python tools/sequence_round_check.py --rounds 20 --hold 3
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+sys.path.append(os.path.join(PROJECT_DIR, 'suryanamaskar lockedin'))
+
+from synthetic_motion import ASANA_SEQUENCE, generate_asana_round  # noqa: E402
+from asana_detector import AsanaDetector  # noqa: E402
+from pose_detector import all_angles, joint_angles  # noqa: E402
+from sequence_tracker import SequenceTracker  # noqa: E402
+from utils.landmark_quality import LandmarkQualityGate  # noqa: E402
+
+# Values of the suryanamaskar config (not importable next to the shared config package)
+POSE_HOLD_DURATION = 2.0
+TRACKER_OPTIONS = {
+    'stability_window': 10,
+    'stability_threshold': 0.7,
+    'change_epsilon': 0.009,
+    'max_reuse': 15,
+    'validation': {
+        'min_landmarks': 33,
+        'max_missing_joints': 3,
+        'position_bounds': (0, 1),
+        'min_body_height': 0.3,
+        'max_body_width': 0.8,
+        'min_visibility': 0.5
+    },
+    'aligner': {
+        'step_seconds': 3.0,
+        'sharpness': 10.0,
+        'floor': 1e-3,
+        'min_confidence': 0.6,
+        'min_score': 0.6,
+        'max_dt': 1.0
+    }
+}
+
+
+def still_round(rng, detector, gate, hold_frames, transition_frames):
+    """One synthetic round (N, 33, 4) with visibility, every hold replaced by its best accepted frame"""
+    landmarks, _ = generate_asana_round(rng, hold_frames, transition_frames)
+    landmarks = np.concatenate((landmarks, np.full(landmarks.shape[:2] + (1,), 0.9)), axis=2)
+    angle_vectors = joint_angles(landmarks)
+    for step, asana_name in enumerate(ASANA_SEQUENCE):
+        start = step * (hold_frames + transition_frames)
+        column = detector.score_names.index(asana_name)
+        scores = [detector.asana_scores(angle_vectors[frame], landmarks[frame],
+                                        all_angles(landmarks[frame], angle_vectors[frame]))[column]
+                  if gate.check(landmarks[frame], asana_name, landmarks[frame, :, 3])[0] else -1.0
+                  for frame in range(start, start + hold_frames)]
+        landmarks[start:start + hold_frames] = landmarks[start + int(np.argmax(scores))]
+    return landmarks
+
+
+def replay(tracker, landmarks, fps):
+    """(position before, position after, 'hold' or 'flow') of every change of the tracker's position"""
+    moves = []
+    for frame, points in enumerate(landmarks):
+        position = tracker.position
+        result = tracker.update(points, frame / fps)
+        if tracker.position != position:
+            moves.append((position, tracker.position, 'hold' if result.advanced else 'flow'))
+    return moves
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that a clean Surya Namaskar round counts once")
+    parser.add_argument('--rounds', type=int, default=10, help="synthetic rounds, each replayed on its own")
+    parser.add_argument('--hold', type=float, default=4.0, help="seconds every asana is held")
+    parser.add_argument('--fps', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    detector = AsanaDetector()
+    gate = LandmarkQualityGate(**TRACKER_OPTIONS['validation'])
+    for asana_name in set(ASANA_SEQUENCE):
+        gate.require(asana_name, detector.required_landmarks(asana_name))
+    steps = len(ASANA_SEQUENCE)
+    failed = 0
+    for round_index in range(args.rounds):
+        landmarks = still_round(rng, detector, gate, int(args.hold * args.fps), transition_frames=15)
+        tracker = SequenceTracker(detector, ASANA_SEQUENCE, POSE_HOLD_DURATION, **TRACKER_OPTIONS)
+        moves = replay(tracker, landmarks, args.fps)
+        held = sum(kind == 'hold' for _, _, kind in moves)
+        # Every step entered once, one at a time, ending on the next round's first step
+        ok = [move[:2] for move in moves] == [(position, position + 1) for position in range(steps)]
+        failed += not ok
+        print(f"round {round_index + 1}: {len(moves)} advances ({held} held, {len(moves) - held} followed), "
+              f"position {tracker.position}, {tracker.rep_count} rounds counted{'' if ok else '  FAILED'}")
+        if not ok:
+            print("    " + ", ".join(f"{before}->{after} {kind}" for before, after, kind in moves))
+    print(f"{args.rounds - failed} of {args.rounds} clean rounds counted as exactly one round")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
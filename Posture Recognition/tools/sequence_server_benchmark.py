@@ -0,0 +1,133 @@
+"""
+Per-session app trackers vs the SequenceServer.
+
+Simulates --sessions concurrent Surya Namaskar sessions, each replaying one
+of --rounds synthetic rounds from its first frame (a round boundary, where
+the trackers start) at --fps frames per second, by default for one round;
+a share of them (--leave) stops sending halfway and has to be evicted after
+the TTL. Every tick all frames are submitted and advanced with one
+SequenceServer.process call. The first --reference sessions are also run
+through a SequenceTracker of their own, as SuryaNamaskarApp tracks its user;
+their correctness, advances, steps and rounds must match the server's on
+every frame, and their step timings at the end (row reuse and eviction must
+not mix up the sessions' rows).
+Synthetic holds sway more than a real held pose, so the stability threshold
+is lowered (--stability-threshold) for the hold rule to advance.
+
+Reported: how far the sessions got (median and max position) and how the
+reference sessions advanced (held steps, flow jumps), CPU time per session
+frame of both paths and how many sessions were evicted.
+
+Usage:
+    python tools/sequence_server_benchmark.py
+    python tools/sequence_server_benchmark.py --sessions 2000 --ticks 200 --reference 100
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+sys.path.append(os.path.join(PROJECT_DIR, 'suryanamaskar lockedin'))
+
+from synthetic_motion import ASANA_SEQUENCE, generate_asana_round  # noqa: E402
+from asana_detector import AsanaDetector  # noqa: E402
+from sequence_server import SequenceServer  # noqa: E402
+from sequence_tracker import SequenceTracker  # noqa: E402
+
+# Values of the suryanamaskar config (not importable next to the shared config package);
+# the stability and change gate defaults of SequenceTracker are the config's
+TRACKER_OPTIONS = {
+    'validation': {
+        'min_landmarks': 33,
+        'max_missing_joints': 3,
+        'position_bounds': (0, 1),
+        'min_body_height': 0.3,
+        'max_body_width': 0.8,
+        'min_visibility': 0.5
+    },
+    'aligner': {
+        'step_seconds': 3.0,
+        'sharpness': 10.0,
+        'floor': 1e-3,
+        'min_confidence': 0.6,
+        'min_score': 0.6,
+        'max_dt': 1.0
+    }
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the batched Surya Namaskar sequence server")
+    parser.add_argument('--sessions', type=int, default=500)
+    parser.add_argument('--ticks', type=int, default=540, help="ticks to run (a round is 525 frames by default)")
+    parser.add_argument('--fps', type=float, default=20)
+    parser.add_argument('--reference', type=int, default=100, help="sessions also run by their own tracker and compared")
+    parser.add_argument('--leave', type=float, default=0.1, help="share of sessions that stop halfway")
+    parser.add_argument('--min-hold', type=float, default=0.25,
+                        help="seconds to hold (synthetic holds rarely stay correct for the apps' 2 s)")
+    parser.add_argument('--stability-threshold', type=float, default=0.4)
+    parser.add_argument('--hold-frames', type=int, default=30, help="frames per synthetic hold")
+    parser.add_argument('--ttl', type=float, default=2.0, help="seconds without a frame before eviction")
+    parser.add_argument('--rounds', type=int, default=6, help="distinct synthetic rounds replayed")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    rounds = [generate_asana_round(rng, hold_frames=args.hold_frames)[0] for _ in range(args.rounds)]
+    replay = rng.integers(0, args.rounds, args.sessions)
+    leaves = rng.random(args.sessions) < args.leave
+    leaves[:args.reference] = False
+
+    detector = AsanaDetector()
+    options = dict(TRACKER_OPTIONS, stability_threshold=args.stability_threshold)
+    server = SequenceServer(detector, ASANA_SEQUENCE, min_hold=args.min_hold, ttl=args.ttl, tracker_options=options)
+    reference = [SequenceTracker(detector, ASANA_SEQUENCE, args.min_hold, **options)
+                 for _ in range(min(args.reference, args.sessions))]
+
+    server_time = reference_time = 0.0
+    server_frames = mismatches = held = jumps = 0
+    for tick in range(args.ticks):
+        timestamp = tick / args.fps
+        sending = np.flatnonzero(~leaves | (tick < args.ticks // 2))
+        frames = [rounds[replay[s]][tick % len(rounds[replay[s]])] for s in sending.tolist()]
+
+        start = time.perf_counter()
+        for s, landmarks in zip(sending.tolist(), frames):
+            server.submit(s, landmarks, timestamp)
+        results = server.process(now=timestamp)
+        server_time += time.perf_counter() - start
+        server_frames += len(sending)
+
+        start = time.perf_counter()
+        positions = [tracker.position for tracker in reference]
+        expected = [tracker.update(frames[s], timestamp) for s, tracker in enumerate(reference)]
+        reference_time += time.perf_counter() - start
+        for s, tracker in enumerate(reference):
+            row = results['sessions'].index(s)
+            if (results['is_correct'][row] != expected[s].is_correct or
+                    results['advanced'][row] != expected[s].advanced or
+                    results['step'][row] != tracker.step or results['rep_count'][row] != tracker.rep_count):
+                mismatches += 1
+            held += expected[s].advanced
+            jumps += tracker.position > positions[s] and not expected[s].advanced
+
+    compared = len(reference) * args.ticks
+    timing_mismatches = sum(server.timings(s) != list(tracker.aligner.timings) for s, tracker in enumerate(reference))
+    steps = server.positions(server.slots)
+    print(f"{args.sessions} sessions x {args.ticks} ticks: {mismatches} mismatches in {compared} compared frames; "
+          f"sessions reached position {np.median(steps):.0f} (median), {steps.max()} (max) "
+          f"of {len(ASANA_SEQUENCE)} steps per round")
+    print(f"reference sessions advanced {held} times by a hold and {jumps} times with the flow; "
+          f"{timing_mismatches} of {len(reference)} differ in their step timings")
+    print(f"per session frame: server {server_time / server_frames * 1e6:.1f} us, "
+          f"own tracker {reference_time / max(compared, 1) * 1e6:.1f} us")
+    print(f"{len(server)} sessions live, {server.evicted} evicted ({int(leaves.sum())} left)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""
+Per-object dispatch vs the struct-of-arrays SessionTable.
+
+Simulates M concurrent sessions that each deliver one frame per tick
+(synthetic stick-figure motion, a mix of all exercises, some sessions
+switching exercise halfway and some with no supported exercise). Every tick
+is evaluated both with one ExerciseDetector per session and with a single
+SessionTable.evaluate call; results must be identical, and the CPU time per
+session frame of both paths is reported. Converting landmark dicts to arrays
+is timed separately: a server running batched pose inference hands the table
+arrays directly (SessionTable.pack_pose_arrays).
+
+Usage:
+    python tools/session_table_benchmark.py
+    python tools/session_table_benchmark.py --sessions 5000 --ticks 50
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.exercise_detector import ExerciseDetector  # noqa: E402
+from utils.session_table import REPS_PER_SET, SessionTable  # noqa: E402
+from synthetic_motion import generate_dataset  # noqa: E402
+
+
+def same_result(expected, actual):
+    if (expected['correct_form'], expected['feedback'], expected['rep_completed']) != \
+            (actual['correct_form'], actual['feedback'], actual['rep_completed']):
+        return False
+    if list(expected['angles']) != list(actual['angles']):
+        return False
+    return all(a == b or (math.isnan(a) and math.isnan(b))
+               for a, b in zip(expected['angles'].values(), actual['angles'].values()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-session detectors with the batched session table")
+    parser.add_argument('--sessions', type=int, default=2000)
+    parser.add_argument('--ticks', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    pool = generate_dataset(2, args.ticks, seed=args.seed)
+    table = SessionTable()
+    names = table.exercise_names + [None]
+
+    sessions = []
+    for _ in range(args.sessions):
+        exercise = names[rng.integers(len(names))]
+        switch_to = names[rng.integers(len(names))] if rng.random() < 0.2 else exercise
+        sessions.append({
+            'slot': table.add_session(exercise),
+            'detector': ExerciseDetector(),
+            'exercise': exercise,
+            'switch_to': switch_to,
+            'frames': pool[rng.integers(len(pool))],
+            'reps': 0,
+            'sets': 0
+        })
+
+    slots = np.array([session['slot'] for session in sessions])
+    object_time = pack_time = table_time = 0.0
+    mismatches = 0
+    for tick in range(args.ticks):
+        if tick == args.ticks // 2:
+            for session in sessions:
+                session['exercise'] = session['switch_to']
+                table.set_exercise(session['slot'], session['exercise'])
+        frames = [session['frames'].landmarks(tick) for session in sessions]
+
+        # One detector object per session
+        start = time.perf_counter()
+        expected = []
+        for session, landmarks in zip(sessions, frames):
+            result = session['detector'].detect_exercise(session['exercise'], landmarks)
+            if result['rep_completed']:
+                session['reps'] += 1
+                if session['reps'] % REPS_PER_SET == 0:
+                    session['sets'] += 1
+            expected.append(result)
+        object_time += time.perf_counter() - start
+
+        # All sessions of the tick in one batch
+        start = time.perf_counter()
+        coords, present = table.pack_landmarks(frames)
+        middle = time.perf_counter()
+        results = table.evaluate(slots, coords, present)
+        end = time.perf_counter()
+        pack_time += middle - start
+        table_time += end - middle
+
+        for row, session in enumerate(sessions):
+            ok = same_result(expected[row], table.session_result(session['slot'], results, row))
+            ok = ok and (session['reps'], session['sets']) == (results['reps'][row], results['sets'][row])
+            mismatches += not ok
+
+    session_frames = args.sessions * args.ticks
+    print(f"{args.sessions} sessions x {args.ticks} ticks, "
+          f"{int(table.reps.sum())} reps counted, {mismatches} mismatching session frames")
+    print(f"per-object detectors: {object_time / session_frames * 1e6:7.2f}us per session frame")
+    print(f"session table:        {table_time / session_frames * 1e6:7.2f}us per session frame "
+          f"({object_time / table_time:.1f}x less CPU)")
+    print(f"  + packing dicts:    {pack_time / session_frames * 1e6:7.2f}us per session frame "
+          f"({object_time / (table_time + pack_time):.1f}x less CPU when landmarks arrive as dicts)")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+Check the windowed pose-stability tracker the apps gate holds on.
+
+On synthetic Surya Namaskar rounds StabilityTracker.update (the apps'
+SequenceTracker) is compared with a brute-force computation over the last
+--window frames (per-joint standard deviation of the position plus mean
+frame-to-frame displacement), and so is update_rows (the sequence server's
+SequenceTable): --sessions rows replay the rounds from different offsets,
+each tick only some of them get a frame, and the sums are resynced often.
+The synthetic holds sway by a few degrees per joint every frame; for still
+holds every held asana is replaced by its mean pose plus --noise pixels of
+landmark noise. The fraction of frames meeting STABILITY_THRESHOLD is
+reported for both kinds of hold and for the moves between asanas. The time
+per update is measured for several window lengths, which should not change
+it, and the time per session frame of update_rows for 10 and 1000 rows.
+
+Usage:
+    python tools/stability_check.py
+    python tools/stability_check.py --window 20 --rounds 3
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+sys.path.append(os.path.join(PROJECT_DIR, 'suryanamaskar lockedin'))
+
+from synthetic_motion import generate_asana_round  # noqa: E402
+from pose_angles import STABILITY_KEY_JOINTS, StabilityTracker  # noqa: E402
+
+# Values of the suryanamaskar config (not importable next to the shared config package)
+STABILITY_THRESHOLD = 0.7
+STABILITY_WINDOW = 10
+
+
+def brute_force(landmarks, window, sensitivity=20.0):
+    """Stability of every frame (N,) recomputed from the last `window` frames (NaN before two frames)"""
+    points = landmarks[:, STABILITY_KEY_JOINTS, :2]
+    scores = np.full(len(points), np.nan)
+    for frame in range(1, len(points)):
+        recent = points[max(0, frame - window + 1):frame + 1]
+        steps = np.linalg.norm(np.diff(recent, axis=0), axis=-1)
+        spread = np.sqrt(recent.var(axis=0).sum(axis=-1))
+        scores[frame] = max(0.0, 1.0 - sensitivity * float((spread + steps.mean(axis=0)).mean()))
+    return scores
+
+
+def rows_error(landmarks, window, sessions, rng):
+    """Largest difference of update_rows to brute force, sessions replaying from different offsets"""
+    tracker = StabilityTracker(window, sessions=sessions, resync_every=3 * window + 1)
+    replays = [landmarks[rng.integers(0, len(landmarks) // 2):] for _ in range(sessions)]
+    scores = [[] for _ in range(sessions)]
+    position = np.zeros(sessions, dtype=np.intp)
+    while True:
+        rows = np.flatnonzero((rng.random(sessions) < 0.7) & (position < [len(replay) for replay in replays]))
+        if not len(rows):
+            if all(position[s] >= len(replays[s]) for s in range(sessions)):
+                break
+            continue
+        frames = np.stack([replays[s][position[s]] for s in rows.tolist()])
+        for s, score in zip(rows.tolist(), tracker.update_rows(rows, frames).tolist()):
+            scores[s].append(score)
+        position[rows] += 1
+    return max(np.nanmax(np.abs(np.array(scores[s][1:]) - brute_force(replays[s], window)[1:]))
+               for s in range(sessions))
+
+
+def steady_holds(landmarks, labels, rng, noise, frame_size=(640, 480)):
+    """Copy of landmarks where every run of held frames is its mean pose plus `noise` pixels of noise"""
+    landmarks = landmarks.copy()
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    for start, end in zip(starts, np.r_[starts[1:], len(labels)]):
+        if labels[start] != '':
+            mean = landmarks[start:end].mean(axis=0)
+            landmarks[start:end] = mean
+            landmarks[start:end, :, :2] += rng.normal(0.0, noise, (end - start, 33, 2)) / frame_size
+    return landmarks
+
+
+def stable_fraction(landmarks, window, threshold):
+    """Whether every frame (N,) meets the threshold"""
+    tracker = StabilityTracker(window)
+    return np.array([tracker.update(points) for points in landmarks]) >= threshold
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the windowed pose-stability tracker")
+    parser.add_argument('--rounds', type=int, default=2)
+    parser.add_argument('--window', type=int, default=STABILITY_WINDOW)
+    parser.add_argument('--threshold', type=float, default=STABILITY_THRESHOLD)
+    parser.add_argument('--noise', type=float, default=2.0, help="landmark noise of still holds in pixels")
+    parser.add_argument('--sessions', type=int, default=8, help="rows of the update_rows check")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    rounds = [generate_asana_round(rng) for _ in range(args.rounds)]
+    landmarks = np.concatenate([round_landmarks for round_landmarks, _ in rounds])
+    labels = np.concatenate([round_labels for _, round_labels in rounds])
+
+    tracker = StabilityTracker(args.window)
+    scores = np.array([tracker.update(points) for points in landmarks])
+    expected = brute_force(landmarks, args.window)
+    error = np.nanmax(np.abs(scores[1:] - expected[1:]))
+    print(f"{len(landmarks)} frames, window {args.window}: largest difference to brute force {error:.2e}")
+    error = rows_error(landmarks, args.window, args.sessions, np.random.default_rng(args.seed + 1))
+    print(f"{args.sessions} rows (update_rows): largest difference to brute force {error:.2e}")
+
+    held = labels != ''
+    swaying = stable_fraction(landmarks, args.window, args.threshold)
+    still = stable_fraction(steady_holds(landmarks, labels, rng, args.noise), args.window, args.threshold)
+    print(f"stable at {args.threshold}: {still[held].mean():.1%} of still held frames, "
+          f"{swaying[held].mean():.1%} of swaying held frames, "
+          f"{still[~held].mean():.1%} of frames between asanas")
+
+    for window in (5, 30, 120):
+        tracker = StabilityTracker(window)
+        start = time.perf_counter()
+        for points in landmarks:
+            tracker.update(points)
+        per_frame = (time.perf_counter() - start) / len(landmarks)
+        print(f"window {window:>3}: {per_frame * 1e6:.1f} us per update")
+    for sessions in (10, 1000):
+        tracker = StabilityTracker(args.window, sessions=sessions)
+        rows = np.arange(sessions)
+        frames = np.repeat(landmarks[:, None], sessions, axis=1)
+        start = time.perf_counter()
+        for tick in range(200):
+            tracker.update_rows(rows, frames[tick])
+        per_frame = (time.perf_counter() - start) / (200 * sessions)
+        print(f"{sessions:>4} rows: {per_frame * 1e6:.2f} us per session frame (update_rows)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
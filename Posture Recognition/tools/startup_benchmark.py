@@ -0,0 +1,147 @@
+"""
+Startup benchmark for the app entry points.
+
+Each entry point is loaded in a fresh interpreter (so nothing is cached
+between measurements) with a non-``__main__`` run name, which imports the
+module without starting the UI. The benchmark then builds a pose detector and
+pushes one synthetic frame through it, recording:
+
+- import:       loading the entry point module
+- detector:     constructing the pose detector (heavy imports land here)
+- first_frame:  the first detect_pose call after a blocking warm-up
+- cold_frame:   the first detect_pose call without warm-up
+
+Usage:
+    python tools/startup_benchmark.py
+    python tools/startup_benchmark.py --repeat 5 --json startup.json
+    python tools/startup_benchmark.py --max-import-seconds 1.5   # CI gate
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(PROJECT_DIR)
+SURYA_DIR = os.path.join(PROJECT_DIR, 'suryanamaskar lockedin')
+
+# name -> (script path, working directory, pose detector module or None)
+ENTRY_POINTS = {
+    'main': (os.path.join(PROJECT_DIR, 'main.py'), PROJECT_DIR, 'utils.pose_detector'),
+    'main_enhanced': (os.path.join(PROJECT_DIR, 'main_enhanced.py'), PROJECT_DIR, 'utils.pose_detector'),
+    'suryanamaskar': (os.path.join(SURYA_DIR, 'main.py'), SURYA_DIR, 'pose_detector'),
+    'suryanamaskar_desktop': (os.path.join(SURYA_DIR, 'standalone_app.py'), SURYA_DIR, 'pose_detector'),
+    'mygpt': (os.path.join(REPO_DIR, 'myGPT', 'main.py'), os.path.join(REPO_DIR, 'myGPT'), None),
+}
+
+# Runs inside the child interpreter; prints one JSON line with the timings
+CHILD_SCRIPT = r'''
+import importlib, json, runpy, sys, time
+script, detector_module, warm = sys.argv[1], sys.argv[2], sys.argv[3] == "1"
+sys.path.insert(0, ".")
+result = {}
+try:
+    start = time.perf_counter()
+    runpy.run_path(script, run_name="__startup_benchmark__")
+    result["import"] = time.perf_counter() - start
+    if detector_module:
+        import numpy as np
+        start = time.perf_counter()
+        detector = importlib.import_module(detector_module).PoseDetector()
+        result["detector"] = time.perf_counter() - start
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        if warm:
+            detector.warm_up(frame.shape)
+        start = time.perf_counter()
+        detector.detect_pose(frame)
+        result["first_frame" if warm else "cold_frame"] = time.perf_counter() - start
+except Exception as e:
+    # Keep the timings measured so far
+    result["error"] = f"{type(e).__name__}: {e}"
+print(json.dumps(result))
+'''
+
+
+def run_once(name, warm):
+    """Measure one entry point in a fresh interpreter"""
+    script, cwd, detector_module = ENTRY_POINTS[name]
+    completed = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT, script, detector_module or '', '1' if warm else '0'],
+        cwd=cwd, capture_output=True, text=True
+    )
+    output = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not output:
+        error = completed.stderr.strip().splitlines()
+        return {'error': error[-1] if error else f"exit code {completed.returncode}"}
+    return json.loads(output[-1])
+
+
+def benchmark(names, repeat):
+    """Collect median timings per entry point"""
+    report = {}
+    for name in names:
+        samples = {}
+        error = None
+        for _ in range(repeat):
+            for warm in (False, True):
+                result = run_once(name, warm)
+                error = result.pop('error', None)
+                for key, value in result.items():
+                    samples.setdefault(key, []).append(value)
+                if error:
+                    break
+            if error:
+                break
+
+        report[name] = {key: statistics.median(values) for key, values in samples.items()}
+        if error:
+            report[name]['error'] = error
+    return report
+
+
+def print_report(report):
+    columns = ['import', 'detector', 'cold_frame', 'first_frame']
+    print(f"{'entry point':<24}" + "".join(f"{column:>14}" for column in columns))
+    for name, timings in report.items():
+        row = f"{name:<24}"
+        for column in columns:
+            value = timings.get(column)
+            row += f"{value * 1000:>12.1f}ms" if value is not None else f"{'-':>14}"
+        print(row)
+        if 'error' in timings:
+            print(f"    error: {timings['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and time to first processed frame")
+    parser.add_argument('entry_points', nargs='*', metavar='ENTRY_POINT',
+                        help=f"entry points to measure (default: all of {', '.join(ENTRY_POINTS)})")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per entry point (median is reported)")
+    parser.add_argument('--json', dest='json_path', help="also write the report to this file")
+    parser.add_argument('--max-import-seconds', type=float,
+                        help="exit with status 1 if any entry point imports slower than this")
+    args = parser.parse_args()
+    unknown = [name for name in args.entry_points if name not in ENTRY_POINTS]
+    if unknown:
+        parser.error(f"unknown entry point(s): {', '.join(unknown)}")
+
+    report = benchmark(args.entry_points or list(ENTRY_POINTS), args.repeat)
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.max_import_seconds is not None:
+        slow = [name for name, timings in report.items()
+                if timings.get('import', 0.0) > args.max_import_seconds]
+        if slow:
+            print(f"Import time above {args.max_import_seconds:.2f}s: {', '.join(slow)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
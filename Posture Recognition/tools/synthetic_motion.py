@@ -0,0 +1,250 @@
+"""
+Synthetic exercise sessions from a 2D stick figure.
+
+Every exercise is described by two key poses (start and end of a rep) given as
+world-frame segment directions in degrees (0 = down, 90 = right, 180 = up).
+Frames are interpolated between them with a smooth, slightly irregular tempo,
+and each session gets its own body proportions, scale, position, camera roll,
+landmark jitter and dropped landmarks. The result is a SessionRecording with
+the same landmark dicts the pose detector produces, used to train and check
+the offline tools when no recorded sessions are at hand. The number of full
+start -> end -> start cycles is stored as the session's true rep count.
+
+Surya Namaskar rounds are generated the same way from one key pose per asana,
+as normalized (N, 33, 3) landmark arrays with a per-frame asana label.
+"""
+import math
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.pose_detector import LANDMARK_INDICES  # noqa: E402
+from utils.session_recording import SessionRecording  # noqa: E402
+
+# Segment lengths in pixels at scale 1.0
+SEGMENTS = {'torso': 110, 'upper': 55, 'fore': 50, 'thigh': 80, 'shin': 72, 'head': 30}
+SHOULDER_HALF_WIDTH = 34
+HIP_HALF_WIDTH = 22
+
+# facing: 1.0 faces the camera (limbs mirrored left/right), small values are side views.
+# Limb keys apply to both sides; 'l_'/'r_' prefixed keys override one side.
+# root_dy moves the hips between the key poses; head turns the head away from the torso line. reps_per_cycle is the number of reps
+# the rep counter should see per start -> end -> start cycle (default 1).
+EXERCISE_POSES = {
+    'Push-ups': {
+        'facing': 0.15, 'root': (330, 330),
+        'start': {'torso': 100, 'upper': 0, 'fore': 0, 'thigh': -80, 'shin': -84},
+        'end': {'torso': 93, 'upper': -50, 'fore': 50, 'thigh': -86, 'shin': -88, 'root_dy': 45}
+    },
+    'Plank Hold': {
+        'facing': 0.15, 'root': (330, 360), 'reps_per_cycle': 0,
+        'start': {'torso': 95, 'upper': 0, 'fore': 90, 'thigh': -85, 'shin': -87},
+        'end': {'torso': 97, 'upper': 2, 'fore': 90, 'thigh': -86, 'shin': -88, 'root_dy': 3}
+    },
+    'Squats': {
+        'facing': 0.25, 'root': (320, 260),
+        'start': {'torso': 180, 'upper': 5, 'fore': 5, 'thigh': 0, 'shin': 0},
+        'end': {'torso': 140, 'upper': 90, 'fore': 90, 'thigh': 85, 'shin': -25, 'root_dy': 75}
+    },
+    'Bicep Curls': {
+        'facing': 1.0, 'root': (320, 270),
+        'start': {'torso': 180, 'upper': 5, 'fore': 5, 'thigh': 3, 'shin': 0},
+        'end': {'torso': 180, 'upper': 12, 'fore': 165, 'thigh': 3, 'shin': 0}
+    },
+    'Crunches': {
+        'facing': 0.2, 'root': (360, 380),
+        'start': {'torso': -90, 'upper': -150, 'fore': 60, 'thigh': 112, 'shin': 30},
+        'end': {'torso': -128, 'upper': -175, 'fore': 40, 'thigh': 112, 'shin': 30}
+    },
+    'Sit-ups': {
+        'facing': 0.2, 'root': (360, 380),
+        'start': {'torso': -95, 'upper': -100, 'fore': -95, 'thigh': 110, 'shin': 30},
+        'end': {'torso': -200, 'upper': 100, 'fore': 110, 'thigh': 110, 'shin': 30}
+    },
+    'Pull-ups': {
+        'facing': 1.0, 'root': (320, 330),
+        'start': {'torso': 180, 'upper': 168, 'fore': 175, 'thigh': 5, 'shin': -5},
+        'end': {'torso': 180, 'upper': 75, 'fore': 195, 'thigh': 8, 'shin': -10, 'root_dy': -70}
+    },
+    'Russian Twists': {
+        'facing': 0.9, 'root': (320, 330), 'reps_per_cycle': 2,   # Every return to center counts
+        'start': {'torso': 160, 'l_upper': 35, 'r_upper': 35, 'l_fore': 25, 'r_fore': 25, 'thigh': 40, 'shin': -20},
+        'end': {'torso': 200, 'l_upper': -35, 'r_upper': -35, 'l_fore': -25, 'r_fore': -25, 'thigh': 40, 'shin': -20}
+    },
+    'Jumping Jacks': {
+        'facing': 1.0, 'root': (320, 270),
+        'start': {'torso': 180, 'upper': 5, 'fore': 5, 'thigh': 3, 'shin': 3},
+        'end': {'torso': 180, 'upper': 165, 'fore': 172, 'thigh': 22, 'shin': 24, 'root_dy': -12}
+    }
+}
+
+
+# One key pose per asana (side views), keyed like AsanaDetector.asana_criteria
+ASANA_POSES = {
+    'Pranamasana': {'root': (320, 270), 'torso': 180, 'upper': 50, 'fore': 150, 'thigh': 0, 'shin': 0},
+    'Hasta Uttanasana': {'root': (320, 270), 'torso': 185, 'upper': 175, 'fore': 178, 'thigh': 0, 'shin': 0},
+    'Padahastasana': {'root': (300, 200), 'torso': 60, 'head': -110, 'upper': 5, 'fore': 5, 'thigh': 0, 'shin': 0},
+    'Ashwa Sanchalanasana': {'root': (320, 300), 'torso': 170, 'head': 40, 'upper': 0, 'fore': 0,
+                             'l_thigh': 80, 'l_shin': 0, 'r_thigh': -50, 'r_shin': -60},
+    'Dandasana': {'root': (320, 300), 'torso': 95, 'upper': 0, 'fore': 0, 'thigh': -85, 'shin': -85},
+    'Ashtanga Namaskara': {'root': (320, 320), 'torso': 80, 'head': 40, 'upper': -20, 'fore': 60,
+                           'thigh': -30, 'shin': -110},
+    'Bhujangasana': {'root': (300, 370), 'torso': 130, 'head': 40, 'upper': 10, 'fore': -20,
+                     'thigh': -90, 'shin': -90},
+    'Adho Mukha Svanasana': {'root': (300, 230), 'torso': 40, 'upper': 40, 'fore': 40, 'thigh': -40, 'shin': -40}
+}
+# Same order as SURYA_NAMASKAR_SEQUENCE in suryanamaskar lockedin/config.py
+ASANA_SEQUENCE = [
+    'Pranamasana', 'Hasta Uttanasana', 'Padahastasana', 'Ashwa Sanchalanasana', 'Dandasana',
+    'Ashtanga Namaskara', 'Bhujangasana', 'Adho Mukha Svanasana', 'Ashwa Sanchalanasana',
+    'Padahastasana', 'Hasta Uttanasana', 'Pranamasana'
+]
+# MediaPipe landmarks the stick figure lacks, placed on the nearest one it has
+POSE_LANDMARK_FILL = {
+    1: 'left_eye', 3: 'left_eye', 4: 'right_eye', 6: 'right_eye', 9: 'nose', 10: 'nose',
+    17: 'left_wrist', 19: 'left_wrist', 21: 'left_wrist', 18: 'right_wrist', 20: 'right_wrist', 22: 'right_wrist'
+}
+
+
+def _direction(degrees):
+    radians = math.radians(degrees)
+    return np.array([math.sin(radians), math.cos(radians)])
+
+
+def _pose_value(pose, key, side):
+    return pose.get(f'{side}_{key}', pose.get(key, 0.0))
+
+
+def stick_figure(pose, facing, root, scale=1.0, roll=0.0, proportions=None):
+    """Landmark positions (name -> (x, y)) for one pose"""
+    lengths = {name: length * scale * (proportions or {}).get(name, 1.0) for name, length in SEGMENTS.items()}
+    hip_mid = np.array([root[0], root[1] + pose.get('root_dy', 0.0) * scale])
+    torso = pose['torso'] + roll
+    shoulder_mid = hip_mid + lengths['torso'] * _direction(torso)
+    across = _direction(torso + 90)
+
+    points = {'nose': shoulder_mid + lengths['head'] * _direction(torso + pose.get('head', 0.0))}
+    for side, sign in (('left', 1.0), ('right', -1.0)):
+        # Facing the camera, the left limbs mirror the right ones
+        mirror = -1.0 if facing >= 0.5 and side == 'left' else 1.0
+        s = side[0]
+        shoulder = shoulder_mid + sign * facing * SHOULDER_HALF_WIDTH * scale * across
+        hip = hip_mid + sign * facing * HIP_HALF_WIDTH * scale * across
+        upper = _pose_value(pose, 'upper', s)
+        fore = _pose_value(pose, 'fore', s)
+        thigh = _pose_value(pose, 'thigh', s)
+        shin = _pose_value(pose, 'shin', s)
+        if f'{s}_upper' not in pose:
+            upper, fore = mirror * upper, mirror * fore
+        if f'{s}_thigh' not in pose:
+            thigh, shin = mirror * thigh, mirror * shin
+
+        elbow = shoulder + lengths['upper'] * _direction(upper + roll)
+        knee = hip + lengths['thigh'] * _direction(thigh + roll)
+        ankle = knee + lengths['shin'] * _direction(shin + roll)
+        points.update({
+            f'{side}_shoulder': shoulder,
+            f'{side}_elbow': elbow,
+            f'{side}_wrist': elbow + lengths['fore'] * _direction(fore + roll),
+            f'{side}_hip': hip,
+            f'{side}_knee': knee,
+            f'{side}_ankle': ankle,
+            f'{side}_heel': ankle + 6 * scale * _direction(shin + roll),
+            f'{side}_foot_index': ankle + 18 * scale * _direction(shin + roll + 90 * mirror),
+            f'{side}_eye': points['nose'] + 6 * scale * sign * across + 4 * scale * _direction(torso),
+            f'{side}_ear': points['nose'] + 14 * scale * sign * across
+        })
+    return points
+
+
+def _interpolate(start, end, phase):
+    keys = set(start) | set(end)
+    return {key: start.get(key, 0.0) + (end.get(key, 0.0) - start.get(key, 0.0)) * phase for key in keys}
+
+
+def generate_session(exercise, n_frames, rng, recording=None, fps=30):
+    """Append n_frames synthetic frames of one exercise to a SessionRecording"""
+    recording = SessionRecording() if recording is None else recording
+    spec = EXERCISE_POSES[exercise]
+
+    scale = rng.uniform(0.75, 1.25)
+    roll = rng.normal(0.0, 3.0)
+    root = (spec['root'][0] + rng.normal(0, 25), spec['root'][1] + rng.normal(0, 15))
+    proportions = {name: rng.uniform(0.9, 1.1) for name in SEGMENTS}
+    rep_seconds = rng.uniform(1.2, 2.8)
+    jitter = rng.uniform(1.0, 3.0)
+    phase = first_phase = rng.uniform(0, 2 * math.pi)
+
+    for frame in range(n_frames):
+        # Tempo drifts a little from rep to rep
+        phase += 2 * math.pi / (rep_seconds * fps) * rng.uniform(0.8, 1.2)
+        progress = (1 - math.cos(phase)) / 2
+        pose = _interpolate(spec['start'], spec['end'], progress)
+        points = stick_figure(pose, spec['facing'], root, scale, roll, proportions)
+
+        landmarks = {}
+        for name in recording.landmark_names:
+            if name not in points or rng.random() < 0.01:
+                continue
+            x, y = points[name] + rng.normal(0.0, jitter, 2)
+            landmarks[name] = {'x': int(round(x)), 'y': int(round(y)), 'visibility': float(rng.uniform(0.6, 1.0))}
+        recording.append(landmarks, exercise, frame / fps)
+
+    # Reps whose end pose (phase pi + 2 pi k) and return to the start pose both fall in the session
+    first_end = math.ceil((first_phase - math.pi) / (2 * math.pi))
+    last_return = math.floor(phase / (2 * math.pi)) - 1
+    reps = max(last_return - first_end + 1, 0) * spec.get('reps_per_cycle', 1)
+    recording.rep_counts[exercise] = recording.rep_counts.get(exercise, 0) + reps
+    return recording
+
+
+def generate_dataset(sessions_per_exercise, frames_per_session, seed=0, exercises=None, fps=30):
+    """List of synthetic sessions (one SessionRecording each) for every exercise"""
+    rng = np.random.default_rng(seed)
+    return [generate_session(exercise, frames_per_session, rng, fps=fps)
+            for exercise in exercises or EXERCISE_POSES
+            for _ in range(sessions_per_exercise)]
+
+
+def generate_asana_round(rng, hold_frames=45, transition_frames=15, sequence=None, frame_size=(640, 480)):
+    """One synthetic round: (landmarks (N, 33, 3) normalized, labels (N,)).
+
+    Every asana is held for hold_frames with a little sway; the frames moving
+    between asanas are labelled ''.
+    """
+    sequence = ASANA_SEQUENCE if sequence is None else sequence
+    scale = rng.uniform(0.8, 1.2)
+    roll = rng.normal(0.0, 2.0)
+    shift = np.array([rng.normal(0, 20), rng.normal(0, 8)])
+    proportions = {name: rng.uniform(0.9, 1.1) for name in SEGMENTS}
+    jitter = rng.uniform(1.0, 3.0)
+
+    poses, labels = [], []
+    for i, asana in enumerate(sequence):
+        for _ in range(hold_frames):
+            poses.append({key: value + rng.normal(0.0, 4.0) if key != 'root' else value
+                          for key, value in ASANA_POSES[asana].items()})
+            labels.append(asana)
+        if i + 1 < len(sequence):
+            following = ASANA_POSES[sequence[i + 1]]
+            for step in range(1, transition_frames + 1):
+                phase = step / (transition_frames + 1)
+                pose = _interpolate({k: v for k, v in ASANA_POSES[asana].items() if k != 'root'},
+                                    {k: v for k, v in following.items() if k != 'root'}, phase)
+                pose['root'] = tuple(np.add(ASANA_POSES[asana]['root'],
+                                            phase * np.subtract(following['root'], ASANA_POSES[asana]['root'])))
+                poses.append(pose)
+                labels.append('')
+
+    landmarks = np.zeros((len(poses), 33, 3))
+    for frame, pose in enumerate(poses):
+        points = stick_figure(pose, 0.2, np.add(pose['root'], shift), scale, roll, proportions)
+        for name, index in LANDMARK_INDICES.items():
+            landmarks[frame, index, :2] = points[name] + rng.normal(0.0, jitter, 2)
+        for index, name in POSE_LANDMARK_FILL.items():
+            landmarks[frame, index, :2] = landmarks[frame, LANDMARK_INDICES[name], :2]
+    landmarks[:, :, :2] /= frame_size
+    return landmarks, np.array(labels)
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+Benchmark the desktop app's camera display pipeline.
+
+A writer thread publishes --fps frames (--width x --height BGR) into a
+FrameBuffer for --seconds while the reader polls it every --interval-ms, as
+TkFrameDisplay does on the Tk thread. Reported: frames published, converted
+and dropped and the worker's time per publish. The conversion into the
+reused arrays is timed against the old per-frame path (cvtColor, resize and
+Image.fromarray with fresh arrays), and the frame memory the pipeline holds
+is compared with the old path once Tk has fallen behind by --backlog frames
+(each queued root.after callback holding its own image).
+
+With a display, the PhotoImage step is timed too: a new PhotoImage per frame
+(the old path) against paste into one PhotoImage.
+
+Usage:
+    python tools/tk_display_benchmark.py
+    python tools/tk_display_benchmark.py --fps 60 --interval-ms 16 --seconds 5
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+sys.path.append(os.path.join(PROJECT_DIR, 'suryanamaskar lockedin'))
+
+import cv2  # noqa: E402
+from PIL import Image  # noqa: E402
+from tk_display import FrameBuffer, TkFrameDisplay  # noqa: E402
+
+
+def old_convert(frame, display_width):
+    """The per-frame conversion the app did before, with fresh arrays every frame"""
+    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    height, width = frame_rgb.shape[:2]
+    frame_resized = cv2.resize(frame_rgb, (display_width, int(height * display_width / width)))
+    return Image.fromarray(frame_resized)
+
+
+def run_pipeline(frames, fps, seconds, interval, display):
+    """Publish frames from a thread while polling like the Tk thread; returns publish and convert timings"""
+    publish_times, convert_times = [], []
+    stop = threading.Event()
+
+    def writer():
+        count = 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            display.frame_buffer.publish(frames[count % len(frames)])
+            publish_times.append(time.perf_counter() - start)
+            count += 1
+            time.sleep(1.0 / fps)
+
+    thread = threading.Thread(target=writer, daemon=True)
+    thread.start()
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        if display.frame_buffer.read(display._convert) is not None:
+            convert_times.append(time.perf_counter() - start)
+        time.sleep(interval)
+    stop.set()
+    thread.join()
+    return publish_times, convert_times
+
+
+def time_photo_images(images):
+    """Seconds per frame of a new PhotoImage per frame and of paste into one, or None without a display"""
+    import tkinter as tk
+    from PIL import ImageTk
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return None
+    try:
+        start = time.perf_counter()
+        for image in images:
+            ImageTk.PhotoImage(image=image)
+        new_photo = (time.perf_counter() - start) / len(images)
+        photo = ImageTk.PhotoImage(image=images[0])
+        start = time.perf_counter()
+        for image in images:
+            photo.paste(image)
+        paste = (time.perf_counter() - start) / len(images)
+    finally:
+        root.destroy()
+    return new_photo, paste
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the desktop camera display pipeline")
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--display-width', type=int, default=640)
+    parser.add_argument('--fps', type=float, default=30)
+    parser.add_argument('--interval-ms', type=float, default=33)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--backlog', type=int, default=30, help="frames queued in the old path")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    frames = [rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8) for _ in range(8)]
+
+    display = TkFrameDisplay(None, None, FrameBuffer(), args.display_width, args.interval_ms)
+    publish_times, convert_times = run_pipeline(frames, args.fps, args.seconds, args.interval_ms / 1000, display)
+    buffer = display.frame_buffer
+    print(f"{buffer.frames_published} frames published at {args.fps:g} fps, {len(convert_times)} converted "
+          f"every {args.interval_ms:g} ms, {buffer.frames_dropped} dropped as stale; "
+          f"publish {np.median(publish_times) * 1e3:.2f} ms median")
+
+    timings = {}
+    for name, convert in (('reused arrays', display._convert),
+                          ('old per-frame path', lambda frame: old_convert(frame, args.display_width))):
+        start = time.perf_counter()
+        for i in range(200):
+            image = convert(frames[i % len(frames)])
+        timings[name] = (time.perf_counter() - start) / 200
+    print("convert: " + ", ".join(f"{name} {seconds * 1e3:.2f} ms" for name, seconds in timings.items()))
+
+    held = 2 * frames[0].nbytes + display._resized.nbytes + display._rgb.nbytes
+    queued = args.backlog * image.width * image.height * 3
+    print(f"frame memory: pipeline {held / 2 ** 20:.1f} MiB whatever the session length, "
+          f"old path {queued / 2 ** 20:.1f} MiB with {args.backlog} callbacks queued")
+
+    photo_times = time_photo_images([old_convert(frame, args.display_width) for frame in frames])
+    if photo_times is None:
+        print("no display: PhotoImage creation vs paste not timed")
+    else:
+        print(f"new PhotoImage {photo_times[0] * 1e3:.2f} ms, paste {photo_times[1] * 1e3:.2f} ms per frame")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,126 @@
+"""
+Train the exercise recognizer used for automatic exercise switching.
+
+Training data are recorded sessions (``SessionWorker.stop_recording`` .npz
+files, labelled by the exercise selected while recording) and/or synthetic
+stick-figure sessions from tools/synthetic_motion.py. Per-frame features come
+from the same FeatureGraph definitions the live app uses; their sliding-window
+summaries are fitted with a softmax model and written as a small .npz.
+
+The model is then checked on freshly generated synthetic sessions (per-frame
+accuracy of the raw prediction and of the switching recognizer) and the
+streaming per-frame latency is reported.
+
+Usage:
+    python tools/train_recognizer.py
+    python tools/train_recognizer.py session1.npz session2.npz --synthetic-sessions 0
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from config.exercise_config import EXERCISE_CONFIG, FEATURE_DEFINITIONS, RECOGNITION_CONFIG  # noqa: E402
+from utils.exercise_recognizer import ExerciseRecognizer, train_model, window_summary  # noqa: E402
+from utils.feature_graph import FeatureGraph  # noqa: E402
+from utils.session_recording import SessionRecording  # noqa: E402
+from synthetic_motion import generate_dataset  # noqa: E402
+
+
+def session_values(recording, feature_names):
+    """(N, F) per-frame recognition features of a session (NaN where missing)"""
+    graph = FeatureGraph(FEATURE_DEFINITIONS)
+    values = np.full((len(recording), len(feature_names)), np.nan)
+    for frame in range(len(recording)):
+        features = graph.new_frame(recording.landmarks(frame))
+        for i, name in enumerate(feature_names):
+            value = features.get(name)
+            if value is not None:
+                values[frame, i] = value
+    return values
+
+
+def build_dataset(recordings, classes, feature_names, window, fill=None):
+    """Window summaries and class labels of all labelled frames"""
+    values = [session_values(recording, feature_names) for recording in recordings]
+    if fill is None:
+        fill = np.nan_to_num(np.nanmean(np.concatenate(values), axis=0))
+
+    summaries, labels = [], []
+    class_index = {name: i for i, name in enumerate(classes)}
+    for recording, session in zip(recordings, values):
+        session = np.where(np.isnan(session), fill, session)
+        frame_labels = np.array([class_index.get(name, -1) for name in recording.exercises])
+        keep = frame_labels >= 0
+        summaries.append(window_summary(session, window)[keep])
+        labels.append(frame_labels[keep])
+    return np.concatenate(summaries), np.concatenate(labels), fill
+
+
+def evaluate(model, recordings, settings):
+    """Per-frame accuracy of the raw prediction and of the switching recognizer"""
+    summaries, labels, _ = build_dataset(recordings, model.classes, model.feature_names, model.window, model.fill)
+    predicted = model.predict_proba(summaries).argmax(axis=1)
+    print(f"raw window accuracy: {np.mean(predicted == labels):.3f}")
+    for i, name in enumerate(model.classes):
+        mask = labels == i
+        if mask.any():
+            print(f"    {name:<16} {np.mean(predicted[mask] == i):.3f}")
+
+    graph = FeatureGraph(FEATURE_DEFINITIONS)
+    correct = total = 0
+    elapsed = 0.0
+    for recording in recordings:
+        recognizer = ExerciseRecognizer(model, **settings)
+        for frame in range(len(recording)):
+            features = graph.new_frame(recording.landmarks(frame))
+            start = time.perf_counter()
+            recognized = recognizer.update(features)
+            elapsed += time.perf_counter() - start
+            correct += recognized == recording.exercises[frame]
+            total += 1
+    print(f"switching recognizer accuracy: {correct / total:.3f} "
+          f"({elapsed / total * 1e6:.0f}us per frame, feature extraction included)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the exercise recognizer")
+    parser.add_argument('recordings', nargs='*', metavar='RECORDING', help="recorded sessions (.npz)")
+    parser.add_argument('--synthetic-sessions', type=int, default=12, help="synthetic sessions per exercise")
+    parser.add_argument('--frames', type=int, default=450, help="frames per synthetic session")
+    parser.add_argument('--window', type=int, default=RECOGNITION_CONFIG['window'])
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=os.path.join(PROJECT_DIR, RECOGNITION_CONFIG['model_path']))
+    args = parser.parse_args()
+
+    recordings = [SessionRecording.load(path) for path in args.recordings]
+    if args.synthetic_sessions:
+        recordings += generate_dataset(args.synthetic_sessions, args.frames, seed=args.seed)
+    if not recordings:
+        parser.error("no training data: pass recordings or --synthetic-sessions")
+
+    classes = list(EXERCISE_CONFIG)
+    feature_names = RECOGNITION_CONFIG['features']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        summaries, labels, fill = build_dataset(recordings, classes, feature_names, args.window)
+        print(f"training on {len(labels)} frames from {len(recordings)} sessions")
+        model = train_model(summaries, labels, classes, feature_names, args.window, fill,
+                            iterations=args.iterations)
+
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        model.save(args.output)
+        print(f"saved {args.output} ({os.path.getsize(args.output)} bytes)")
+
+        settings = {key: RECOGNITION_CONFIG[key] for key in ('min_confidence', 'switch_frames')}
+        evaluate(model, generate_dataset(2, args.frames, seed=args.seed + 1), settings)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
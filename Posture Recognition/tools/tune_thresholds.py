@@ -0,0 +1,239 @@
+"""
+Tune exercise thresholds and asana angle ranges against labelled sessions.
+
+exercise: sessions with true rep counts (SessionRecording .npz files with
+rep_counts, or PATH=REPS for a recording of one exercise, or synthetic
+sessions). For every exercise the angle_thresholds that can change rep counts
+are searched (random or grid, around the current values) with a vectorized
+replay of the cached landmarks; the candidate with the lowest mean absolute
+rep-count error wins (ties: higher F1, then the current values). Improvements
+are merged into config/tuned_thresholds.json, which exercise_config applies
+on import when USE_TUNED_THRESHOLDS is set.
+
+asana: frames labelled with the asana being held (.npz with landmarks
+(N, 33, 3) and labels (N,), '' for none, or synthetic Surya Namaskar
+rounds). The angle ranges of every asana are searched for the best per-frame
+detection F1 and written to suryanamaskar lockedin/tuned_asana_criteria.json,
+which the apps pass to AsanaDetector when USE_TUNED_CRITERIA is set in their
+config.py.
+
+Both searches start from the values in the code unless tuned values were
+opted into; every value the apps then take from the files is logged.
+
+Usage:
+    python tools/tune_thresholds.py exercise --synthetic-sessions 8
+    python tools/tune_thresholds.py exercise squats.npz curls.npz=24 --search grid --points 7
+    python tools/tune_thresholds.py exercise --synthetic-sessions 16 --fps 6 --only "Russian Twists" --dry-run
+    python tools/tune_thresholds.py asana --synthetic-rounds 6 --candidates 20000
+    python tools/tune_thresholds.py asana labelled_round.npz --dry-run
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SURYANAMASKAR_DIR = os.path.join(PROJECT_DIR, 'suryanamaskar lockedin')
+sys.path.insert(0, PROJECT_DIR)
+sys.path.append(SURYANAMASKAR_DIR)
+
+from config.exercise_config import TUNED_THRESHOLDS_PATH  # noqa: E402
+from utils.exercise_detector import get_exercise_programs  # noqa: E402
+from utils.session_recording import SessionRecording  # noqa: E402
+from utils.threshold_tuning import (ExerciseReplay, RangeReplay, grid_candidates,  # noqa: E402
+                                    random_candidates, rep_count_metrics)
+from synthetic_motion import generate_asana_round, generate_dataset  # noqa: E402
+from asana_detector import TUNED_CRITERIA_PATH, AsanaDetector  # noqa: E402
+from pose_detector import ANGLE_JOINTS, joint_angles  # noqa: E402
+
+
+def candidates_for(args, base, low, high, rng):
+    if args.search == 'grid':
+        return grid_candidates(base, low, high, args.points)
+    return random_candidates(base, low, high, args.candidates, rng)
+
+
+def merge_json(path, updates):
+    tuned = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            tuned = json.load(f)
+    for name, values in updates.items():
+        tuned.setdefault(name, {}).update(values)
+    with open(path, 'w') as f:
+        json.dump(tuned, f, indent=4)
+
+
+# Exercises
+
+def load_labelled_recordings(paths):
+    """Recordings with rep_counts; PATH=REPS labels a recording of a single exercise"""
+    recordings = []
+    for spec in paths:
+        path, _, reps = spec.partition('=')
+        recording = SessionRecording.load(path)
+        if reps:
+            exercises = sorted(set(recording.exercises) - {''})
+            if len(exercises) != 1:
+                raise ValueError(f"{path}: PATH=REPS needs a recording of one exercise, found {exercises}")
+            recording.rep_counts = {exercises[0]: int(reps)}
+        if not recording.rep_counts:
+            print(f"skipping {path}: no rep counts")
+            continue
+        recordings.append(recording)
+    return recordings
+
+
+def tune_exercises(args, rng):
+    recordings = load_labelled_recordings(args.recordings)
+    if args.synthetic_sessions:
+        recordings += generate_dataset(args.synthetic_sessions, args.frames, seed=args.seed, fps=args.fps)
+    if not recordings:
+        raise ValueError("no labelled sessions: pass recordings or --synthetic-sessions")
+
+    programs = get_exercise_programs()
+    updates = {}
+    for name, program in programs.items():
+        if args.only and name not in args.only:
+            continue
+        sessions, truth = [], []
+        for recording in recordings:
+            if name in recording.rep_counts:
+                coords, present = recording.arrays(program.landmark_names, name)
+                if len(coords):
+                    sessions.append((coords, present))
+                    truth.append(recording.rep_counts[name])
+        replay = ExerciseReplay(program, sessions) if sessions else None
+        if replay is None or not replay.threshold_names:
+            continue
+
+        base = replay.base_values()
+        spread = args.spread * np.maximum(np.abs(base), 1e-3)
+        candidates = candidates_for(args, base, base - spread, base + spread, rng)
+        start = time.perf_counter()
+        metrics = rep_count_metrics(replay.rep_counts(candidates), np.array(truth))
+        elapsed = time.perf_counter() - start
+        best = int(np.lexsort((-metrics['f1'], metrics['mae']))[0])
+
+        print(f"{name}: {len(sessions)} sessions, {replay.n_frames} frames, {len(candidates)} candidates "
+              f"in {elapsed:.2f}s ({len(candidates) / elapsed:.0f} candidates/s)")
+        for label, row in (('current', 0), ('best', best)):
+            print(f"    {label:<8} MAE {metrics['mae'][row]:6.2f} reps  precision {metrics['precision'][row]:.3f}"
+                  f"  recall {metrics['recall'][row]:.3f}")
+        if best != 0 and metrics['mae'][best] < metrics['mae'][0]:
+            values = {key: round(float(value), 4) for key, value in zip(replay.threshold_names, candidates[best])
+                      if not np.isclose(value, program.threshold_values[key])}
+            for key, value in values.items():
+                print(f"    {key}: {program.threshold_values[key]:g} -> {value:g}")
+            updates[name] = values
+    return updates
+
+
+# Asanas
+
+def load_labelled_frames(paths, rounds, seed):
+    landmarks, labels = [], []
+    for path in paths:
+        with np.load(path) as data:
+            landmarks.append(data['landmarks'])
+            labels.append(data['labels'].astype(str))
+    rng = np.random.default_rng(seed)
+    for _ in range(rounds):
+        round_landmarks, round_labels = generate_asana_round(rng)
+        landmarks.append(round_landmarks)
+        labels.append(round_labels)
+    if not landmarks:
+        raise ValueError("no labelled frames: pass .npz files or --synthetic-rounds")
+    return np.concatenate(landmarks), np.concatenate(labels)
+
+
+def tune_asanas(args, rng):
+    landmarks, labels = load_labelled_frames(args.recordings, args.synthetic_rounds, args.seed)
+    detector = AsanaDetector()
+    angle_names = list(ANGLE_JOINTS)
+    all_angles = joint_angles(landmarks)
+    frame_angles = [dict(zip(angle_names, row)) for row in all_angles.tolist()]
+    for angles, points in zip(frame_angles, landmarks):
+        angles['hip_width'] = abs(points[23][0] - points[24][0])
+    # Midpoints of every frame are computed once for the special checks of all asanas
+    contexts = [detector.frame_context(points, angles) for angles, points in zip(frame_angles, landmarks)]
+
+    updates = {}
+    for name, criteria in detector.asana_criteria.items():
+        if args.only and name not in args.only:
+            continue
+        joints = list(criteria['angles'])
+        columns = [all_angles[:, angle_names.index(joint)] if joint in angle_names
+                   else np.full(len(landmarks), np.nan) for joint in joints]
+        special = np.array([detector.special_check_score(name, angles, points, context)[0]
+                            for angles, points, context in zip(frame_angles, landmarks, contexts)])
+        replay = RangeReplay(np.stack(columns, axis=1), special, labels == name, detector.MIN_SCORE)
+
+        base = np.array([criteria['angles'][joint] for joint in joints], dtype=np.float64).ravel()
+        low, high = np.clip(base - args.degrees, 0, 180), np.clip(base + args.degrees, 0, 180)
+        candidates = candidates_for(args, base, low, high, rng).reshape(-1, len(joints), 2)
+        candidates.sort(axis=2)
+        start = time.perf_counter()
+        metrics = replay.metrics(candidates)
+        elapsed = time.perf_counter() - start
+        best = int(np.argmax(metrics['f1']))
+
+        print(f"{name}: {int(replay.positive.sum())}/{len(landmarks)} labelled frames, {len(candidates)} candidates "
+              f"in {elapsed:.2f}s ({len(candidates) / elapsed:.0f} candidates/s)")
+        for label, row in (('current', 0), ('best', best)):
+            print(f"    {label:<8} precision {metrics['precision'][row]:.3f}  recall {metrics['recall'][row]:.3f}"
+                  f"  F1 {metrics['f1'][row]:.3f}")
+        if metrics['f1'][best] > metrics['f1'][0]:
+            ranges = {joint: [round(float(lo), 1), round(float(hi), 1)]
+                      for joint, (lo, hi) in zip(joints, candidates[best])}
+            for joint, (lo, hi) in ranges.items():
+                print(f"    {joint}: {criteria['angles'][joint]} -> ({lo:g}, {hi:g})")
+            updates[name] = ranges
+    return updates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune exercise thresholds and asana angle ranges")
+    parser.add_argument('target', choices=('exercise', 'asana'))
+    parser.add_argument('recordings', nargs='*', metavar='RECORDING',
+                        help="labelled recordings (.npz); exercise mode also accepts PATH=REPS")
+    parser.add_argument('--search', choices=('random', 'grid'), default='random')
+    parser.add_argument('--candidates', type=int, default=5000, help="random search: candidates per exercise/asana")
+    parser.add_argument('--points', type=int, default=5, help="grid search: values per threshold")
+    parser.add_argument('--spread', type=float, default=0.3, help="exercise: search +-spread x current value")
+    parser.add_argument('--degrees', type=float, default=15.0, help="asana: search +-degrees around each bound")
+    parser.add_argument('--synthetic-sessions', type=int, default=0, help="synthetic sessions per exercise")
+    parser.add_argument('--frames', type=int, default=600, help="frames per synthetic session")
+    parser.add_argument('--fps', type=float, default=30, help="frame rate of synthetic sessions")
+    parser.add_argument('--synthetic-rounds', type=int, default=0, help="synthetic Surya Namaskar rounds")
+    parser.add_argument('--only', nargs='+', metavar='NAME', help="exercises or asanas to tune")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="override file (default: the one the app loads)")
+    parser.add_argument('--dry-run', action='store_true', help="report without writing")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    try:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if args.target == 'exercise':
+                updates, output = tune_exercises(args, rng), args.output or TUNED_THRESHOLDS_PATH
+            else:
+                updates, output = tune_asanas(args, rng), args.output or TUNED_CRITERIA_PATH
+    except ValueError as e:
+        parser.error(str(e))
+
+    if not updates:
+        print("no improvements found")
+    elif args.dry_run:
+        print(f"dry run: {output} not written")
+    else:
+        merge_json(output, updates)
+        print(f"wrote {len(updates)} tuned entries to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+Change-gated analysis: reuse results while the pose has not moved.
+
+During holds and rest periods the landmarks barely move, yet detectors and
+overlays were recomputed every frame. A ChangeGate compares each frame's
+landmark points with those of the last frame that was actually analysed;
+while the largest displacement stays below ``epsilon`` (and the analysis
+context is the same) the caller reuses its previous result. Comparing with
+the last analysed frame, not the previous frame, keeps slow drift from
+accumulating unnoticed, and ``max_reuse`` bounds how many frames in a row can
+reuse a result. Time-based state (hold timers) is still advanced by the
+caller on every frame.
+"""
+import numpy as np
+
+# Missing landmarks are compared as this far-away point, so one that appears
+# or disappears counts as moved
+_MISSING_COORD = -1e6
+
+
+def landmark_points(landmarks, names):
+    """(L, 2) points of a landmark dict in `names` order, NaN for missing landmarks"""
+    coords = []
+    for name in names:
+        point = landmarks.get(name)
+        coords += (point['x'], point['y']) if point is not None else (np.nan, np.nan)
+    return np.array(coords, dtype=np.float64).reshape(-1, 2)
+
+
+class ChangeGate:
+    def __init__(self, epsilon, max_reuse=15):
+        self.epsilon = epsilon
+        self.max_reuse = max_reuse
+        self.hits = 0
+        self.misses = 0
+        self._reference = None
+        self._context = None
+        self._reused = 0
+
+    def unchanged(self, points, context=None):
+        """True if the caller may reuse the analysis of the last analysed frame.
+
+        points is an (L, 2) array (NaN for missing landmarks) and context any
+        value the analysis depends on besides the points (e.g. the exercise).
+        A False answer makes this frame the new reference.
+        """
+        points = np.fmax(points, _MISSING_COORD)
+        reference = self._reference
+        if (reference is not None and context == self._context and self._reused < self.max_reuse
+                and reference.shape == points.shape):
+            # No landmark moved more than epsilon
+            delta = points - reference
+            if np.einsum('ij,ij->i', delta, delta).max(initial=0.0) < self.epsilon * self.epsilon:
+                self._reused += 1
+                self.hits += 1
+                return True
+
+        self._reference = points
+        self._context = context
+        self._reused = 0
+        self.misses += 1
+        return False
+
+    def invalidate(self):
+        """Force the next frame to be analysed"""
+        self._reference = None
+
+    def stats(self):
+        checks = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / checks if checks else 0.0
+        }
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
@@ -2,22 +2,63 @@
 Helper functions for exercise-specific calculations and validations
 """
 import numpy as np
-from config.exercise_config import EXERCISE_CONFIG
+from config.exercise_config import EXERCISE_CONFIG, QUALITY_GATE_CONFIG
+from utils.landmark_quality import REJECT_MESSAGES, LandmarkQualityGate
+from utils.pose_detector import LANDMARK_INDICES
+from utils.rolling_stats import RollingWindow
+
+# Recommended time between rep phases for different exercises (seconds)
+RECOMMENDED_TIMING = {
+    "Push-ups": (1.5, 3.0),
+    "Squats": (2.0, 4.0),
+    "Bicep Curls": (2.0, 3.5),
+    "Crunches": (2.0, 3.0),
+    "Sit-ups": (2.5, 4.0),
+    "Pull-ups": (3.0, 5.0),
+    "Russian Twists": (1.0, 2.0),
+    "Jumping Jacks": (0.5, 1.5)
+}
+
+# Number of recent intervals averaged by check_exercise_timing
+TIMING_WINDOW = 2
+
+LANDMARK_NAMES = {idx: name for name, idx in LANDMARK_INDICES.items()}
 
 class ExerciseHelpers:
     @staticmethod
-    def validate_landmarks(exercise_name, landmarks):
-        """Validate if required landmarks are present for the exercise"""
-        if exercise_name not in EXERCISE_CONFIG:
+    def create_quality_gate(**overrides):
+        """LandmarkQualityGate (QUALITY_GATE_CONFIG) with the required landmarks of every exercise"""
+        gate = LandmarkQualityGate(**dict(QUALITY_GATE_CONFIG, **overrides))
+        for name, config in EXERCISE_CONFIG.items():
+            gate.require(name, [LANDMARK_INDICES[lm] for lm in config['required_landmarks']])
+        return gate
+    
+    @staticmethod
+    def check_landmark_quality(gate, exercise_name, points, visibility=None):
+        """Validate raw normalized landmarks (L, >=2) for the exercise with a quality gate"""
+        if exercise_name not in gate.required:
             return False, "Exercise not supported"
         
-        required = EXERCISE_CONFIG[exercise_name]['required_landmarks']
-        missing = [lm for lm in required if lm not in landmarks or landmarks[lm]['visibility'] < 0.5]
-        
-        if missing:
-            return False, f"Please ensure these body parts are visible: {', '.join(missing)}"
-        
-        return True, "All required landmarks detected"
+        accepted, reason = gate.check(points, exercise_name, visibility)
+        if accepted:
+            return True, "All required landmarks detected"
+        if reason == 'missing':
+            missing = gate.missing(points, exercise_name, visibility)
+            return False, f"Please ensure these body parts are visible: {', '.join(LANDMARK_NAMES[i] for i in missing)}"
+        return False, REJECT_MESSAGES[reason]
+    
+    @staticmethod
+    def validate_landmarks(exercise_name, landmarks):
+        """Validate if required landmarks are present for the exercise (landmark dict in pixels)"""
+        # Pixel coordinates: only the visibility of the required landmarks is checked
+        points = np.full((max(LANDMARK_NAMES) + 1, 2), np.nan)
+        visibility = np.zeros(len(points))
+        for name, point in landmarks.items():
+            idx = LANDMARK_INDICES.get(name)
+            if idx is not None:
+                points[idx] = point['x'], point['y']
+                visibility[idx] = point['visibility']
+        return ExerciseHelpers.check_landmark_quality(_PIXEL_GATE, exercise_name, points, visibility)
     
     @staticmethod
     def calculate_body_alignment(landmarks):
@@ -110,29 +151,19 @@ class ExerciseHelpers:
         return "Maintain good form"
     
     @staticmethod
-    def check_exercise_timing(timestamps, exercise_name):
-        """Check if exercise is being performed at appropriate speed"""
-        if len(timestamps) < 3:
+    def check_exercise_timing(intervals, exercise_name):
+        """Check if exercise is being performed at appropriate speed
+        
+        intervals is a RollingWindow of the most recent rep-phase intervals in
+        seconds, so the average is read in O(1) instead of re-diffing timestamps.
+        """
+        if len(intervals) < TIMING_WINDOW:
             return "Continue movement"
         
-        # Calculate movement speed (time between rep phases)
-        recent_intervals = np.diff(timestamps[-3:])
-        avg_interval = np.mean(recent_intervals)
-        
-        # Recommended timing for different exercises (seconds)
-        recommended_timing = {
-            "Push-ups": (1.5, 3.0),
-            "Squats": (2.0, 4.0),
-            "Bicep Curls": (2.0, 3.5),
-            "Crunches": (2.0, 3.0),
-            "Sit-ups": (2.5, 4.0),
-            "Pull-ups": (3.0, 5.0),
-            "Russian Twists": (1.0, 2.0),
-            "Jumping Jacks": (0.5, 1.5)
-        }
+        avg_interval = intervals.mean()
         
-        if exercise_name in recommended_timing:
-            min_time, max_time = recommended_timing[exercise_name]
+        if exercise_name in RECOMMENDED_TIMING:
+            min_time, max_time = RECOMMENDED_TIMING[exercise_name]
             
             if avg_interval < min_time:
                 return "Slow down - control the movement"
@@ -143,6 +174,11 @@ class ExerciseHelpers:
         
         return "Maintain steady rhythm"
     
+    @staticmethod
+    def new_timing_window():
+        """Create the interval window consumed by check_exercise_timing"""
+        return RollingWindow(TIMING_WINDOW)
+    
     @staticmethod
     def get_exercise_tips(exercise_name):
         """Get general tips for proper exercise form"""
@@ -240,4 +276,7 @@ class ExerciseHelpers:
                 if elbow_drift > 50:
                     mistakes.append("Keep elbows stationary at your sides")
         
-        return mistakes if mistakes else ["Good form!"]
\ No newline at end of file
+        return mistakes if mistakes else ["Good form!"]
+
+# Gate for landmark dicts, whose pixel coordinates have no fixed bounds
+_PIXEL_GATE = ExerciseHelpers.create_quality_gate(min_landmarks=0, position_bounds=None, min_body_height=0.0)
\ No newline at end of file
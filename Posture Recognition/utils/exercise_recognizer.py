@@ -0,0 +1,214 @@
+"""
+Automatic exercise recognition from a sliding window of per-frame features.
+
+Each frame contributes the RECOGNITION_CONFIG features (joint angles plus
+body-size independent posture ratios) read from the shared FrameFeatures view,
+so nothing is computed twice alongside rep counting. Over the last ``window``
+frames the recognizer keeps the mean, the spread and the mean absolute
+frame-to-frame velocity of every feature in O(1) rolling windows, and a small
+softmax model turns that summary into class probabilities. The recognized
+exercise only changes after ``switch_frames`` consecutive confident frames.
+
+``window_summary`` computes the same summaries for a whole sequence at once
+and, with ``train_model``, is used offline by tools/train_recognizer.py.
+"""
+import os
+
+import numpy as np
+
+from utils.rolling_stats import RollingWindow
+
+
+class RecognizerModel:
+    """Softmax classifier over standardized window summaries"""
+
+    def __init__(self, classes, feature_names, window, fill, mean, scale, weights, bias):
+        self.classes = list(classes)
+        self.feature_names = list(feature_names)
+        self.window = int(window)
+        self.fill = np.asarray(fill, dtype=np.float64)      # Used for missing features
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.bias = np.asarray(bias, dtype=np.float64)
+
+    def predict_proba(self, summaries):
+        """Class probabilities for summaries of shape (..., 3F)"""
+        logits = ((summaries - self.mean) / self.scale) @ self.weights + self.bias
+        logits -= logits.max(axis=-1, keepdims=True)
+        probabilities = np.exp(logits)
+        return probabilities / probabilities.sum(axis=-1, keepdims=True)
+
+    def save(self, path):
+        np.savez_compressed(
+            path,
+            classes=np.array(self.classes),
+            feature_names=np.array(self.feature_names),
+            window=np.array(self.window),
+            fill=self.fill,
+            mean=self.mean,
+            scale=self.scale,
+            weights=self.weights,
+            bias=self.bias
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data['classes'].tolist(), data['feature_names'].tolist(), int(data['window']),
+                data['fill'], data['mean'], data['scale'], data['weights'], data['bias']
+            )
+
+
+def window_summary(values, window):
+    """Sliding-window summaries for a (N, F) sequence without missing values.
+
+    Row t summarizes frames max(0, t - window + 1)..t exactly like the
+    streaming recognizer: [mean, standard deviation, mean |velocity|].
+    """
+    values = np.asarray(values, dtype=np.float64)
+    velocity = np.zeros_like(values)
+    velocity[1:] = np.abs(np.diff(values, axis=0))
+
+    n_frames = len(values)
+    counts = np.minimum(np.arange(1, n_frames + 1), window)[:, None]
+    starts = np.maximum(np.arange(n_frames) - window + 1, 0)
+
+    totals = np.concatenate((np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)))
+    squares = np.concatenate((np.zeros((1, values.shape[1])), np.cumsum(values * values, axis=0)))
+    speeds = np.concatenate((np.zeros((1, values.shape[1])), np.cumsum(velocity, axis=0)))
+    ends = np.arange(1, n_frames + 1)
+
+    mean = (totals[ends] - totals[starts]) / counts
+    variance = np.maximum((squares[ends] - squares[starts]) / counts - mean * mean, 0.0)
+    speed = (speeds[ends] - speeds[starts]) / counts
+    return np.concatenate((mean, np.sqrt(variance), speed), axis=1)
+
+
+def train_model(summaries, labels, classes, feature_names, window, fill,
+                iterations=500, learning_rate=0.5, l2=1e-3):
+    """Fit a softmax model with full-batch gradient descent.
+
+    labels are indices into classes; fill holds the per-feature values that
+    replaced missing features when the summaries were computed.
+    """
+    mean = summaries.mean(axis=0)
+    scale = summaries.std(axis=0)
+    scale[scale < 1e-6] = 1.0
+    x = (summaries - mean) / scale
+    targets = np.eye(len(classes))[labels]
+
+    weights = np.zeros((x.shape[1], len(classes)))
+    bias = np.zeros(len(classes))
+    for _ in range(iterations):
+        logits = x @ weights + bias
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        error = (probabilities - targets) / len(x)
+        weights -= learning_rate * (x.T @ error + l2 * weights)
+        bias -= learning_rate * error.sum(axis=0)
+
+    return RecognizerModel(classes, feature_names, window, fill, mean, scale, weights, bias)
+
+
+class ExerciseRecognizer:
+    def __init__(self, model, min_confidence=0.8, switch_frames=20):
+        self.model = model
+        self.min_confidence = min_confidence
+        self.switch_frames = switch_frames
+
+        n_features = len(model.feature_names)
+        self._values = np.empty(n_features)
+        self._previous = None
+        self._window = RollingWindow(model.window, (n_features,))
+        self._speed = RollingWindow(model.window, (n_features,))
+        self._summary = np.empty(3 * n_features)
+
+        self.current = None
+        self.confidence = 0.0
+        self._candidate = None
+        self._streak = 0
+
+    @classmethod
+    def load(cls, path, **settings):
+        return cls(RecognizerModel.load(path), **settings)
+
+    def frame_values(self, frame_features):
+        """Recognition features of one frame; missing ones take the model fill value"""
+        values = self._values
+        for i, name in enumerate(self.model.feature_names):
+            value = frame_features.get(name)
+            values[i] = self.model.fill[i] if value is None or value != value else value
+        return values
+
+    def update(self, frame_features):
+        """Add one frame; returns the recognized exercise (None until confident)"""
+        values = self.frame_values(frame_features)
+        self._window.push(values)
+        if self._previous is None:
+            self._previous = values.copy()
+        self._speed.push(np.abs(values - self._previous))
+        self._previous[:] = values
+        return self._recognize()
+
+    def repeat(self):
+        """Add a frame with the features of the previous one (landmarks that did not move)"""
+        if self._previous is None:
+            return self.current
+        self._window.push(self._previous)
+        self._speed.push(np.zeros_like(self._previous))
+        return self._recognize()
+
+    def _recognize(self):
+        n = len(self.model.feature_names)
+        summary = self._summary
+        summary[:n] = self._window.mean()
+        summary[n:2 * n] = self._window.std()
+        summary[2 * n:] = self._speed.mean()
+
+        probabilities = self.model.predict_proba(summary)
+        best = int(probabilities.argmax())
+        self.confidence = float(probabilities[best])
+
+        # Hysteresis: a new exercise has to win switch_frames confident frames in a row
+        if self.confidence >= self.min_confidence and self.model.classes[best] != self.current:
+            if best == self._candidate:
+                self._streak += 1
+            else:
+                self._candidate, self._streak = best, 1
+            if self._streak >= self.switch_frames:
+                self.current = self.model.classes[best]
+                self._candidate, self._streak = None, 0
+        else:
+            self._candidate, self._streak = None, 0
+        return self.current
+
+    def reset(self):
+        self._window.clear()
+        self._speed.clear()
+        self._previous = None
+        self.current = None
+        self.confidence = 0.0
+        self._candidate, self._streak = None, 0
+
+
+def recognizer_model_path(recognition_config):
+    """Absolute model path; relative paths are resolved against the project directory"""
+    path = recognition_config['model_path']
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
+    return path
+
+
+def create_recognizer(recognition_config):
+    """Load the trained recognizer, or return None if no model has been trained"""
+    path = recognizer_model_path(recognition_config)
+    if not os.path.exists(path):
+        return None
+    return ExerciseRecognizer.load(
+        path,
+        min_confidence=recognition_config.get('min_confidence', 0.8),
+        switch_frames=recognition_config.get('switch_frames', 20)
+    )
\ No newline at end of file
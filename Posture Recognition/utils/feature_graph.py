@@ -0,0 +1,130 @@
+"""
+Per-frame feature graph with lazily computed, memoized named features.
+
+Features are declared once as ``name -> (kind, *inputs)``, where each input is
+either a landmark name or another feature. A ``FrameFeatures`` view computes a
+feature on first access, caches it for the rest of the frame and records cache
+hits on the graph, so detectors, helpers and renderers can all ask for e.g.
+``avg_elbow_angle`` without recomputing it. Values already computed elsewhere
+(e.g. by the rule engine in one vectorized pass) are published into the frame.
+
+A feature whose landmarks are missing evaluates to None.
+"""
+import math
+
+
+def _angle(a, b, c):
+    bax, bay = a['x'] - b['x'], a['y'] - b['y']
+    bcx, bcy = c['x'] - b['x'], c['y'] - b['y']
+    norms = math.sqrt(bax * bax + bay * bay) * math.sqrt(bcx * bcx + bcy * bcy)
+    if norms == 0:
+        return math.nan
+    cosine = min(max((bax * bcx + bay * bcy) / norms, -1.0), 1.0)
+    return math.degrees(math.acos(cosine))
+
+
+def _ratio(a, b):
+    return a / b if b else math.nan
+
+
+FEATURE_FUNCTIONS = {
+    'angle': _angle,
+    'abs_dx': lambda a, b: abs(a['x'] - b['x']),
+    'dy': lambda a, b: b['y'] - a['y'],
+    'distance': lambda a, b: math.sqrt((a['x'] - b['x']) ** 2 + (a['y'] - b['y']) ** 2),
+    'mid_dx': lambda a, b, c, d: (a['x'] + b['x']) / 2 - (c['x'] + d['x']) / 2,
+    'mid_abs_dx': lambda a, b, c, d: abs((a['x'] + b['x']) / 2 - (c['x'] + d['x']) / 2),
+    'midpoint': lambda a, b: {'x': (a['x'] + b['x']) / 2, 'y': (a['y'] + b['y']) / 2},
+    'mean': lambda a, b: (a + b) / 2,
+    'ratio': _ratio
+}
+
+
+class FeatureGraph:
+    """Feature definitions plus cache statistics shared by all frames"""
+
+    def __init__(self, definitions):
+        for name, (kind, *inputs) in definitions.items():
+            if kind not in FEATURE_FUNCTIONS:
+                raise ValueError(f"Unknown kind '{kind}' for feature '{name}'")
+        self.definitions = dict(definitions)
+        self.hits = 0
+        self.misses = 0
+        self.published = 0
+
+    def new_frame(self, landmarks):
+        """Start a new frame; cached values from the previous frame are dropped"""
+        return FrameFeatures(self, landmarks)
+
+    def dependencies(self, name):
+        """Landmarks a feature depends on, directly or through other features"""
+        landmarks = set()
+        for dependency in self.definitions[name][1:]:
+            if dependency in self.definitions:
+                landmarks |= self.dependencies(dependency)
+            else:
+                landmarks.add(dependency)
+        return landmarks
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'published': self.published,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.published = 0
+
+
+class FrameFeatures:
+    """Lazily evaluated features of one frame"""
+
+    def __init__(self, graph, landmarks):
+        self.graph = graph
+        self.landmarks = landmarks
+        self._cache = {}
+
+    def __getitem__(self, name):
+        value = self.get(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def get(self, name, default=None):
+        """Return a feature (computing it on first use) or default if unavailable"""
+        cache = self._cache
+        if name in cache:
+            self.graph.hits += 1
+            value = cache[name]
+        else:
+            self.graph.misses += 1
+            value = cache[name] = self._compute(name)
+        return default if value is None else value
+
+    def _resolve(self, name):
+        # Inputs are landmarks or other features (numbers or points such as midpoints)
+        if name in self.graph.definitions:
+            return self.get(name)
+        return self.landmarks.get(name)
+
+    def publish(self, values):
+        """Seed the cache with values computed elsewhere for this frame"""
+        self._cache.update(values)
+        self.graph.published += len(values)
+
+    def _compute(self, name):
+        if name not in self.graph.definitions:
+            raise KeyError(f"Unknown feature '{name}'")
+        kind, *inputs = self.graph.definitions[name]
+        args = []
+        for input_name in inputs:
+            value = self._resolve(input_name)
+            if value is None:
+                return None
+            args.append(value)
+        return FEATURE_FUNCTIONS[kind](*args)
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""
+Fast-reject quality gate in front of the landmark analysis.
+
+A frame whose required body parts are not visible, lie outside the image or
+belong to a body far too small or too close to the camera cannot be judged,
+yet it used to go through the whole analysis. A LandmarkQualityGate is built
+once with the thresholds and the required landmark indices of every
+exercise or asana (``require``); ``check`` then picks those landmarks out of
+the raw landmark array, decides on them with Python builtins (per-landmark
+masks are built only for a frame that fails) and counts the reason of every
+rejection.
+
+On accepted exercise and asana frames it takes about 15 us
+(tools/quality_gate_check.py). The Surya Namaskar SequenceTracker runs it on
+its landmark array. The exercise worker runs it
+(ExerciseHelpers.check_landmark_quality) on PoseDetector.landmark_array only
+for frames it analyses: a frame whose pose the ChangeGate finds unchanged
+since the last analysed frame, which passed the gate, reuses that result
+without reading the array or running the gate (at most max_reuse frames in
+a row).
+
+Reasons, in the order they are tested: 'no_pose' (fewer landmarks than
+expected), 'missing' (too many required landmarks invisible or NaN),
+'out_of_bounds' (too many required landmarks outside position_bounds),
+'too_small' (the usable required landmarks span less than min_body_height in
+both directions, so lying poses are not rejected; when they do, the span of
+every usable landmark decides, as the required ones may be only the upper
+body) and 'too_close' (the required landmarks span more than max_body_width
+horizontally).
+"""
+import math
+
+import numpy as np
+
+REJECT_REASONS = ('no_pose', 'missing', 'out_of_bounds', 'too_small', 'too_close')
+
+# Default messages for the rejection reasons
+REJECT_MESSAGES = {
+    'no_pose': "No pose detected. Please ensure you're visible in the camera.",
+    'missing': "Please ensure your whole body is visible",
+    'out_of_bounds': "Please step back into the camera view",
+    'too_small': "Please move closer to the camera",
+    'too_close': "Please move further from the camera"
+}
+
+
+class LandmarkQualityGate:
+    def __init__(self, min_landmarks=33, max_missing_joints=0, position_bounds=(0.0, 1.0),
+                 min_body_height=0.0, max_body_width=None, min_visibility=0.5):
+        """Thresholds in normalized coordinates; None disables position_bounds or max_body_width"""
+        self.min_landmarks = min_landmarks
+        self.max_missing_joints = max_missing_joints
+        self.position_bounds = position_bounds
+        self.min_body_height = min_body_height
+        self.max_body_width = max_body_width
+        self.min_visibility = min_visibility
+        # key -> required landmark indices (and the same as a list, for check)
+        self.required = {}
+        self._required_lists = {}
+
+        # Diagnostics
+        self.frames = 0
+        self.rejections = dict.fromkeys(REJECT_REASONS, 0)
+
+    def require(self, key, indices):
+        """Set the landmark indices that must be usable for `key` (an exercise or asana)"""
+        self.required[key] = np.unique(np.asarray(indices, dtype=np.intp))
+        self._required_lists[key] = self.required[key].tolist()
+
+    def usable(self, points, visibility=None):
+        """(L,) mask of the landmarks that are finite and visible"""
+        points = np.asarray(points, dtype=np.float64)
+        usable = np.isfinite(points[:, 0] + points[:, 1])
+        if visibility is not None:
+            usable &= np.asarray(visibility) >= self.min_visibility
+        return usable
+
+    def missing(self, points, key=None, visibility=None):
+        """Indices of the required landmarks of `key` that are not usable"""
+        required = self.required.get(key)
+        if required is None:
+            required = np.arange(len(points))
+        return required[~self.usable(points, visibility)[required]]
+
+    def check(self, points, key=None, visibility=None):
+        """(accepted, reason) for landmark points (L, >=2) normalized to the frame.
+
+        Keys without required indices require every landmark. reason is None
+        for an accepted frame.
+        """
+        self.frames += 1
+        if points is None or len(points) < self.min_landmarks:
+            return self._reject('no_pose')
+        # Plain Python from here on: after one conversion per column, picking and reducing
+        # the handful of required landmarks with builtins beats any NumPy call on them
+        body = np.asarray(points, dtype=np.float64)[:, :2].T.tolist()
+        xs, ys = body
+        if visibility is not None:
+            visibility = np.asarray(visibility, dtype=np.float64).tolist()
+            body.append(visibility)
+        required = self._required_lists.get(key)
+        if required is not None:
+            xs, ys = [xs[i] for i in required], [ys[i] for i in required]
+            if visibility is not None:
+                visibility = [visibility[i] for i in required]
+        if not xs:
+            return True, None
+
+        missing = 0
+        # A NaN or infinite coordinate makes the sum non-finite; a NaN visibility fails the
+        # comparison. Only then are the usable landmarks picked out one by one.
+        if not math.isfinite(sum(xs) + sum(ys)) or (
+                visibility is not None and not all(v >= self.min_visibility for v in visibility)):
+            usable = [math.isfinite(x + y) for x, y in zip(xs, ys)]
+            if visibility is not None:
+                usable = [u and v >= self.min_visibility for u, v in zip(usable, visibility)]
+            missing = usable.count(False)
+            if missing > self.max_missing_joints:
+                return self._reject('missing')
+            xs = [x for x, u in zip(xs, usable) if u]
+            ys = [y for y, u in zip(ys, usable) if u]
+            if not xs:
+                return True, None
+
+        x_min, x_max, y_min, y_max = min(xs), max(xs), min(ys), max(ys)
+        if self.position_bounds is not None:
+            low, high = self.position_bounds
+            # Only a body reaching past the bounds needs the per-landmark test
+            if min(x_min, y_min) < low or max(x_max, y_max) > high:
+                outside = sum(not (low <= x <= high and low <= y <= high) for x, y in zip(xs, ys))
+                if missing + outside > self.max_missing_joints:
+                    return self._reject('out_of_bounds')
+
+        width = x_max - x_min
+        if required is not None and max(width, y_max - y_min) < self.min_body_height:
+            # The required landmarks may cover only part of the body (the upper body of
+            # a standing asana): only then is the body measured on every usable landmark
+            x_min, x_max, y_min, y_max = self._extent(*body)
+            width = x_max - x_min
+        if max(width, y_max - y_min) < self.min_body_height:
+            return self._reject('too_small')
+        if self.max_body_width is not None and width > self.max_body_width:
+            return self._reject('too_close')
+        return True, None
+
+    def _extent(self, xs, ys, visibility=None):
+        """(x_min, x_max, y_min, y_max) of the usable landmarks (NaN if none)"""
+        if visibility is None:
+            usable = [(x, y) for x, y in zip(xs, ys) if math.isfinite(x + y)]
+        else:
+            usable = [(x, y) for x, y, v in zip(xs, ys, visibility)
+                      if v >= self.min_visibility and math.isfinite(x + y)]
+        if not usable:
+            return (math.nan,) * 4
+        xs, ys = zip(*usable)
+        return min(xs), max(xs), min(ys), max(ys)
+
+    def _reject(self, reason):
+        self.rejections[reason] += 1
+        return False, reason
+
+    def stats(self):
+        rejected = sum(self.rejections.values())
+        return {
+            'frames': self.frames,
+            'rejected': rejected,
+            'reject_rate': rejected / self.frames if self.frames else 0.0,
+            'reasons': dict(self.rejections)
+        }
+
+    def reset_stats(self):
+        self.frames = 0
+        self.rejections = dict.fromkeys(REJECT_REASONS, 0)
\ No newline at end of file
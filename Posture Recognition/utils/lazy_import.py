@@ -0,0 +1,41 @@
+"""
+Deferred imports for heavy dependencies.
+
+``cv2`` and ``mediapipe`` take a noticeable share of app start-up time. Modules
+bind them through ``lazy_import`` so the import only happens on first
+attribute access, typically on the background worker thread rather than while
+the first page render is waiting.
+"""
+import importlib
+import threading
+import types
+
+
+class LazyModule(types.ModuleType):
+    def __init__(self, name):
+        super().__init__(name)
+        self._lazy_module = None
+        self._lazy_lock = threading.Lock()
+
+    def _load(self):
+        if self._lazy_module is None:
+            with self._lazy_lock:
+                if self._lazy_module is None:
+                    self._lazy_module = importlib.import_module(self.__name__)
+        return self._lazy_module
+
+    @property
+    def is_loaded(self):
+        return self._lazy_module is not None
+
+    def __getattr__(self, attr):
+        # Only called for attributes missing on the proxy itself
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name):
+    """Return a proxy for ``name`` that imports the module on first use"""
+    return LazyModule(name)
\ No newline at end of file
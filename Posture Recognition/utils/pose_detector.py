@@ -1,6 +1,30 @@
-import cv2
-import mediapipe as mp
+import itertools
+import operator
+import threading
 import numpy as np
+from utils.lazy_import import lazy_import
+
+# Heavy dependencies are imported on first use (see utils.lazy_import)
+cv2 = lazy_import('cv2')
+mp = lazy_import('mediapipe')
+
+# MediaPipe indices of the key points extracted for analysis
+LANDMARK_INDICES = {
+    'nose': 0,
+    'left_eye': 2, 'right_eye': 5,
+    'left_ear': 7, 'right_ear': 8,
+    'left_shoulder': 11, 'right_shoulder': 12,
+    'left_elbow': 13, 'right_elbow': 14,
+    'left_wrist': 15, 'right_wrist': 16,
+    'left_hip': 23, 'right_hip': 24,
+    'left_knee': 25, 'right_knee': 26,
+    'left_ankle': 27, 'right_ankle': 28,
+    'left_heel': 29, 'right_heel': 30,
+    'left_foot_index': 31, 'right_foot_index': 32
+}
+
+# The values landmark_array reads from each MediaPipe landmark
+_LANDMARK_VALUES = operator.attrgetter('x', 'y', 'visibility')
 
 class PoseDetector:
     def __init__(self):
@@ -16,11 +40,31 @@ class PoseDetector:
         )
         self.mp_drawing = mp.solutions.drawing_utils
         self.mp_drawing_styles = mp.solutions.drawing_styles
+        self._warmup_thread = None
+        # The tracking graph is not thread-safe: one process() call at a time
+        self._process_lock = threading.Lock()
+        
+    def warm_up(self, frame_shape=(480, 640, 3)):
+        """Run one dummy inference so graph initialization is not paid on the first real frame"""
+        with self._process_lock:
+            self.pose.process(np.zeros(frame_shape, dtype=np.uint8))
+    
+    def warm_up_async(self, frame_shape=(480, 640, 3)):
+        """Warm up on a background thread; detect_pose waits for it to finish"""
+        self._warmup_thread = threading.Thread(target=self.warm_up, args=(frame_shape,),
+                                               name="pose-warmup", daemon=True)
+        self._warmup_thread.start()
+        return self._warmup_thread
         
     def detect_pose(self, frame):
         """Detect pose landmarks in the frame"""
+        warmup_thread = self._warmup_thread
+        if warmup_thread is not None:
+            warmup_thread.join()
+            self._warmup_thread = None
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.pose.process(rgb_frame)
+        with self._process_lock:
+            results = self.pose.process(rgb_frame)
         return results
     
     def extract_landmarks(self, pose_landmarks, frame_shape):
@@ -28,22 +72,7 @@ class PoseDetector:
         landmarks = {}
         h, w = frame_shape[:2]
         
-        # Define landmark indices for key points
-        landmark_indices = {
-            'nose': 0,
-            'left_eye': 2, 'right_eye': 5,
-            'left_ear': 7, 'right_ear': 8,
-            'left_shoulder': 11, 'right_shoulder': 12,
-            'left_elbow': 13, 'right_elbow': 14,
-            'left_wrist': 15, 'right_wrist': 16,
-            'left_hip': 23, 'right_hip': 24,
-            'left_knee': 25, 'right_knee': 26,
-            'left_ankle': 27, 'right_ankle': 28,
-            'left_heel': 29, 'right_heel': 30,
-            'left_foot_index': 31, 'right_foot_index': 32
-        }
-        
-        for name, idx in landmark_indices.items():
+        for name, idx in LANDMARK_INDICES.items():
             if idx < len(pose_landmarks.landmark):
                 landmark = pose_landmarks.landmark[idx]
                 landmarks[name] = {
@@ -54,6 +83,13 @@ class PoseDetector:
         
         return landmarks
     
+    @staticmethod
+    def landmark_array(pose_landmarks):
+        """(L, 3) array of the normalized x, y and visibility of all landmarks"""
+        landmarks = pose_landmarks.landmark
+        values = itertools.chain.from_iterable(map(_LANDMARK_VALUES, landmarks))
+        return np.fromiter(values, dtype=np.float64, count=3 * len(landmarks)).reshape(-1, 3)
+    
     @staticmethod
     def calculate_angle(point1, point2, point3):
         """Calculate angle between three points"""
@@ -0,0 +1,198 @@
+"""
+Timestamped rep events and incremental tempo analytics.
+
+Instead of every consumer polling the per-frame ``rep_completed`` flag, an
+ExerciseDetector with an EventBus turns rep state changes into events:
+
+- phase_entered: the rep state machine entered a phase (rep state)
+- phase_exited: a phase ended, with its duration; ``ends_rep`` marks the
+  transition that completes a rep (counted or not)
+- rep_completed: a counted rep, with its duration and the range of motion
+  of the exercise's rep feature (the first feature of its rep transitions)
+
+Timestamps are monotonic. Subscribers (rep counters, TempoAnalytics, the
+EventLogWriter export, UI panels) are called synchronously on the thread that
+publishes, in subscription order.
+"""
+import json
+import math
+import time
+
+from utils.exercise_helpers import ExerciseHelpers
+
+PHASE_ENTERED = 'phase_entered'
+PHASE_EXITED = 'phase_exited'
+REP_COMPLETED = 'rep_completed'
+
+
+class RepEvent:
+    __slots__ = ('kind', 'timestamp', 'exercise', 'phase', 'duration', 'rep', 'feature', 'value_range', 'ends_rep')
+
+    def __init__(self, kind, timestamp, exercise, phase=None, duration=None, rep=None,
+                 feature=None, value_range=None, ends_rep=False):
+        self.kind = kind
+        self.timestamp = timestamp
+        self.exercise = exercise
+        self.phase = phase
+        self.duration = duration
+        self.rep = rep                      # Per-exercise number of the counted rep
+        self.feature = feature              # Rep feature and its (min, max) over the rep
+        self.value_range = value_range
+        self.ends_rep = ends_rep
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__ if getattr(self, name) is not None}
+
+    def __repr__(self):
+        return f"RepEvent({self.to_dict()})"
+
+
+class EventBus:
+    def __init__(self):
+        self._subscribers = ()
+
+    def subscribe(self, callback):
+        """Call callback(event) for every published event; returns callback"""
+        # Replaced, never mutated, so publishing needs no lock
+        self._subscribers = self._subscribers + (callback,)
+        return callback
+
+    def unsubscribe(self, callback):
+        self._subscribers = tuple(subscriber for subscriber in self._subscribers if subscriber != callback)
+
+    def publish(self, event):
+        for callback in self._subscribers:
+            callback(event)
+
+
+class RepEventTracker:
+    """Turns the per-frame rep state of an ExerciseDetector into events"""
+
+    def __init__(self, bus, clock=time.monotonic):
+        self.bus = bus
+        self.clock = clock
+        self.reset()
+
+    def update(self, program, state_before, state_after, rep_completed, value=None, timestamp=None):
+        """Record one evaluated frame; value is the rep feature of the frame (None if unknown)"""
+        now = self.clock() if timestamp is None else timestamp
+        now = self.last_timestamp = max(now, self.last_timestamp)
+
+        if program.name != self.exercise:
+            self._switch(program, state_before, now)
+
+        if value is not None and value == value:
+            self._low = value if self._low is None else min(self._low, value)
+            self._high = value if self._high is None else max(self._high, value)
+
+        if state_after == state_before:
+            return
+        phase = program.states[state_after]
+        ends_rep = (state_before, state_after) in program.rep_edges
+        self._exit(program.name, now, ends_rep)
+        if rep_completed:
+            count = self.rep_counts[program.name] = self.rep_counts.get(program.name, 0) + 1
+            value_range = (self._low, self._high) if self._low is not None else None
+            self.bus.publish(RepEvent(REP_COMPLETED, now, program.name, duration=now - self._rep_start, rep=count,
+                                      feature=program.rep_feature, value_range=value_range))
+        if ends_rep:
+            self._rep_start = now
+            self._low = self._high = None
+        self._enter(program.name, phase, now)
+
+    def reset(self):
+        """Forget the open phase and rep; the next frame starts a new phase without an exit event"""
+        self.exercise = None
+        self.last_timestamp = -math.inf
+        self.rep_counts = {}
+        self._phase = None
+        self._phase_start = None
+        self._rep_start = None
+        self._low = self._high = None
+
+    def _switch(self, program, state, now):
+        if self.exercise is not None:
+            self._exit(self.exercise, now, False)
+        self.exercise = program.name
+        self._rep_start = now
+        self._low = self._high = None
+        self._enter(program.name, program.states[state], now)
+
+    def _enter(self, exercise, phase, now):
+        self._phase, self._phase_start = phase, now
+        self.bus.publish(RepEvent(PHASE_ENTERED, now, exercise, phase=phase))
+
+    def _exit(self, exercise, now, ends_rep):
+        self.bus.publish(RepEvent(PHASE_EXITED, now, exercise, phase=self._phase,
+                                  duration=now - self._phase_start, ends_rep=ends_rep))
+
+
+class TempoAnalytics:
+    """Per-exercise rep durations, eccentric/concentric split and tempo verdicts.
+
+    tempo_phases maps an exercise to {'eccentric': phase, 'concentric': phase};
+    exercises without it only report durations. Every event is O(1).
+    """
+
+    def __init__(self, tempo_phases=None):
+        self.tempo_phases = dict(tempo_phases or {})
+        self.stats = {}
+        self._phase_time = {}   # Per exercise: seconds per phase in the current rep
+        self._closed = {}       # Per exercise: phase times of the rep that just ended
+
+    def on_event(self, event):
+        exercise = event.exercise
+        if event.kind == PHASE_EXITED:
+            phase_time = self._phase_time.setdefault(exercise, {})
+            phase_time[event.phase] = phase_time.get(event.phase, 0.0) + event.duration
+            if event.ends_rep:
+                self._closed[exercise] = phase_time
+                self._phase_time[exercise] = {}
+        elif event.kind == REP_COMPLETED:
+            self._record_rep(exercise, event)
+
+    def _record_rep(self, exercise, event):
+        stats = self.stats.get(exercise)
+        if stats is None:
+            stats = self.stats[exercise] = {'reps': 0, 'total_duration': 0.0,
+                                            'intervals': ExerciseHelpers.new_timing_window()}
+        phase_time = self._closed.pop(exercise, {})
+        phases = self.tempo_phases.get(exercise, {})
+
+        stats['reps'] += 1
+        stats['total_duration'] += event.duration
+        stats['intervals'].push(event.duration)
+        stats['last'] = {
+            'duration': event.duration,
+            'eccentric': phase_time.get(phases['eccentric']) if 'eccentric' in phases else None,
+            'concentric': phase_time.get(phases['concentric']) if 'concentric' in phases else None,
+            'value_range': event.value_range
+        }
+        stats['verdict'] = ExerciseHelpers.check_exercise_timing(stats['intervals'], exercise)
+
+    def summary(self, exercise):
+        """Tempo of an exercise as a plain dict (None before its first rep)"""
+        stats = self.stats.get(exercise)
+        if stats is None:
+            return None
+        return dict(stats['last'], reps=stats['reps'], verdict=stats['verdict'],
+                    average_duration=stats['total_duration'] / stats['reps'])
+
+    def reset(self):
+        self.stats.clear()
+        self._phase_time.clear()
+        self._closed.clear()
+
+
+class EventLogWriter:
+    """Export subscriber: appends every event as one JSON line"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a')
+
+    def __call__(self, event):
+        self._file.write(json.dumps(event.to_dict()) + '\n')
+
+    def close(self):
+        self._file.close()
\ No newline at end of file
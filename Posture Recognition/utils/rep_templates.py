@@ -0,0 +1,246 @@
+"""
+Reference-rep templates scored with banded dynamic time warping.
+
+A RepTemplate is one rep of an exercise recorded from a coach: the displayed
+angles of every frame (M, J) and the rep state (phase) each frame was in.
+When a rep is counted, RepTemplateMatcher aligns the frames of that rep with
+the template of its exercise:
+
+- both are resampled to ``samples`` frames, so the cost of an alignment does
+  not depend on how long the rep took (tempo is TempoAnalytics' job);
+- DTW aligns them within a Sakoe-Chiba band of ``band`` x samples frames
+  around the diagonal, one vectorized row update per frame;
+- the mean frame distance (RMS over the angles) along the alignment gives the
+  similarity exp(-distance / tolerance), and the mean distance per template
+  phase names the worst-matching phase.
+
+Templates are stored as JSON, {exercise: {'angles': [...], 'frames': [[...]],
+'phases': [...]}} (plus an optional per-template 'tolerance'), in
+config/rep_templates.json; tools/record_rep_template.py writes them.
+"""
+import json
+import math
+import os
+
+import numpy as np
+
+from config.exercise_config import REP_TEMPLATE_CONFIG, REP_TEMPLATES_PATH
+
+_TEMPLATES = None
+
+
+def resample(values, samples):
+    """values (N, J) linearly resampled to (samples, J); NaN gaps are interpolated over"""
+    values = np.asarray(values, dtype=np.float64)
+    n_frames = len(values)
+    positions = np.linspace(0.0, n_frames - 1, samples)
+    frames = np.arange(n_frames)
+    result = np.empty((samples, values.shape[1]))
+    for j in range(values.shape[1]):
+        column = values[:, j]
+        valid = ~np.isnan(column)
+        result[:, j] = np.interp(positions, frames[valid], column[valid]) if valid.any() else np.nan
+    return result
+
+
+def frame_distances(query, reference):
+    """RMS distance (N, M) between every query and reference frame"""
+    diff = query[:, None, :] - reference[None, :, :]
+    return np.sqrt(np.einsum('nmj,nmj->nm', diff, diff) / query.shape[1])
+
+
+def banded_dtw(cost, band):
+    """Accumulated cost (N, M) of DTW over a frame cost matrix, within `band` frames of the diagonal.
+
+    Each row is one vectorized update: with E the best predecessor from the
+    previous row plus the cell cost and C the row's cumulative cost, moves
+    along the row give D = C + running minimum of (E - C).
+    """
+    n_rows, n_cols = cost.shape
+    # |j - i (M - 1) / (N - 1)| > band, in integers to keep the band edges exact
+    scale = max(n_rows - 1, 1)
+    outside = np.abs(np.arange(n_cols)[None, :] * scale -
+                     np.arange(n_rows)[:, None] * (n_cols - 1)) > band * scale
+    penalty = np.where(outside, np.inf, 0.0)
+    cumulative = np.cumsum(cost, axis=1)
+    # Per row: E - C = best predecessor + (cost + penalty - C), and D = running minimum + (C + penalty)
+    offset = cost + penalty - cumulative
+    restore = cumulative + penalty
+
+    accumulated = np.empty_like(cost)
+    accumulated[0] = restore[0]
+    entry = np.empty(n_cols)
+    for i in range(1, n_rows):
+        previous = accumulated[i - 1]
+        entry[0] = previous[0]
+        np.minimum(previous[1:], previous[:-1], out=entry[1:])
+        entry += offset[i]
+        row = accumulated[i]
+        np.minimum.accumulate(entry, out=row)
+        row += restore[i]
+    return accumulated
+
+
+def dtw_path(accumulated):
+    """Cheapest alignment path from (0, 0) to the last cell, as arrays of rows and columns"""
+    rows = accumulated.tolist()
+    i, j = len(rows) - 1, len(rows[0]) - 1
+    path_rows, path_columns = [i], [j]
+    while i or j:
+        if i and j:
+            diagonal, up, left = rows[i - 1][j - 1], rows[i - 1][j], rows[i][j - 1]
+            if diagonal <= up and diagonal <= left:
+                i, j = i - 1, j - 1
+            elif up <= left:
+                i -= 1
+            else:
+                j -= 1
+        elif i:
+            i -= 1
+        else:
+            j -= 1
+        path_rows.append(i)
+        path_columns.append(j)
+    return np.array(path_rows[::-1]), np.array(path_columns[::-1])
+
+
+class RepTemplate:
+    """A reference rep: frames (M, J) of the displayed angles `angles` and the phase of each frame"""
+
+    def __init__(self, angles, frames, phases, tolerance=None):
+        self.angles = tuple(angles)
+        self.frames = np.asarray(frames, dtype=np.float64).reshape(-1, len(self.angles))
+        self.phases = tuple(phases)
+        self.tolerance = tolerance
+        if len(self.phases) != len(self.frames):
+            raise ValueError("a rep template needs one phase per frame")
+
+    def to_dict(self):
+        data = {'angles': list(self.angles), 'frames': np.round(self.frames, 2).tolist(),
+                'phases': list(self.phases)}
+        if self.tolerance is not None:
+            data['tolerance'] = self.tolerance
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['angles'], data['frames'], data['phases'], data.get('tolerance'))
+
+
+def load_rep_templates(path=REP_TEMPLATES_PATH):
+    """Templates per exercise stored in a JSON file (empty when there is none)"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return {exercise: RepTemplate.from_dict(data) for exercise, data in json.load(f).items()}
+
+
+def save_rep_templates(templates, path=REP_TEMPLATES_PATH):
+    """Add or replace the templates of some exercises in a JSON file"""
+    stored = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            stored = json.load(f)
+    stored.update({exercise: template.to_dict() for exercise, template in templates.items()})
+    with open(path, 'w') as f:
+        json.dump(stored, f, indent=1)
+
+
+def get_rep_templates():
+    """Templates from REP_TEMPLATES_PATH (loaded once per process)"""
+    global _TEMPLATES
+    if _TEMPLATES is None:
+        _TEMPLATES = load_rep_templates()
+    return _TEMPLATES
+
+
+class RepTemplateMatcher:
+    """Collects the frames of the current rep per exercise and scores counted reps against templates.
+
+    With record=True the frames of every exercise are collected, and last_rep
+    holds (exercise, frames, phases) of the last rep that ended, counted or not.
+    """
+
+    def __init__(self, templates, samples=REP_TEMPLATE_CONFIG['samples'], band=REP_TEMPLATE_CONFIG['band'],
+                 tolerance=REP_TEMPLATE_CONFIG['tolerance'], max_rep_frames=REP_TEMPLATE_CONFIG['max_rep_frames'],
+                 record=False):
+        self.samples = samples
+        self.band = max(1, int(round(band * samples)))
+        self.tolerance = tolerance
+        self.max_rep_frames = max_rep_frames
+        self.record = record
+        self.last_rep = None
+        self.templates = {}
+        # Per exercise: resampled template frames, their phase numbers and the phase names
+        self._references = {}
+        self._reps = {}
+        for exercise, template in templates.items():
+            self.add_template(exercise, template)
+
+    def add_template(self, exercise, template):
+        self.templates[exercise] = template
+        positions = np.rint(np.linspace(0, len(template.frames) - 1, self.samples)).astype(np.intp)
+        names = tuple(dict.fromkeys(template.phases))
+        phases = np.array([names.index(phase) for phase in template.phases], dtype=np.intp)[positions]
+        self._references[exercise] = (resample(template.frames, self.samples), phases, names)
+
+    def update(self, program, state_before, state_after, angles, rep_completed):
+        """Record one evaluated frame; returns the match of a counted rep against its template (else None)"""
+        exercise = program.name
+        if not (self.record or exercise in self.templates):
+            return None
+        frames = self._reps.get(exercise)
+        if frames is None:
+            frames = self._reps[exercise] = []
+        if angles:
+            frames.append((angles, program.states[state_before]))
+            if len(frames) > 2 * self.max_rep_frames:
+                del frames[:-self.max_rep_frames]
+
+        if (state_before, state_after) not in program.rep_edges:
+            return None
+        frames = frames[-self.max_rep_frames:]
+        self._reps[exercise] = []
+        if self.record and frames:
+            labels = tuple(frames[0][0])
+            self.last_rep = (exercise, np.array([[values.get(label, np.nan) for label in labels]
+                                                 for values, _ in frames]), [phase for _, phase in frames])
+        if not rep_completed or exercise not in self.templates or len(frames) < 2:
+            return None
+        template = self.templates[exercise]
+        values = np.array([[values.get(label, np.nan) for label in template.angles] for values, _ in frames])
+        return self.match(exercise, values)
+
+    def match(self, exercise, values):
+        """Score rep frames (N, J), in the template's angle order, against the exercise's template.
+
+        Returns {'similarity', 'distance', 'worst_phase', 'phase_distances'}
+        or None when no angle of the template was seen during the rep.
+        """
+        reference, phases, names = self._references[exercise]
+        query = resample(values, self.samples)
+        seen = ~np.isnan(query[0]) & ~np.isnan(reference[0])
+        if not seen.any():
+            return None
+        cost = frame_distances(query[:, seen], reference[:, seen])
+        rows, columns = dtw_path(banded_dtw(cost, self.band))
+        steps = cost[rows, columns]
+        distance = float(steps.mean())
+
+        # Mean distance of the path steps on each template phase
+        step_phases = phases[columns]
+        counts = np.bincount(step_phases, minlength=len(names))
+        totals = np.bincount(step_phases, steps, minlength=len(names))
+        means = (totals / np.maximum(counts, 1)).tolist()
+        phase_distances = {names[phase]: means[phase] for phase in np.flatnonzero(counts).tolist()}
+        tolerance = self.templates[exercise].tolerance or self.tolerance
+        return {
+            'similarity': math.exp(-distance / tolerance),
+            'distance': distance,
+            'worst_phase': max(phase_distances, key=phase_distances.get),
+            'phase_distances': phase_distances
+        }
+
+    def reset(self):
+        self._reps.clear()
+        self.last_rep = None
\ No newline at end of file
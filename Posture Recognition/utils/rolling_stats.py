@@ -0,0 +1,250 @@
+"""
+Constant-time rolling statistics over fixed-size windows.
+
+All windows are backed by preallocated NumPy ring buffers, so pushing a sample
+never allocates or shifts data. Means and variances are maintained
+incrementally from running sums; values may be scalars or fixed-shape arrays
+(e.g. one row per landmark), in which case every statistic is element-wise.
+"""
+import math
+
+import numpy as np
+
+
+class RingBuffer:
+    def __init__(self, capacity, shape=(), dtype=np.float64):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = int(capacity)
+        self.data = np.zeros((self.capacity,) + tuple(shape), dtype=dtype)
+        self.head = 0   # Index of the next write
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def is_full(self):
+        return self.count == self.capacity
+
+    def push(self, value):
+        """Append a value, returning the evicted value (or None)"""
+        evicted = None
+        if self.count == self.capacity:
+            evicted = self.data[self.head].copy()
+        else:
+            self.count += 1
+        self.data[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        return evicted
+
+    def newest(self, offset=0):
+        """Return the value pushed ``offset`` pushes ago (0 = latest)"""
+        if offset >= self.count:
+            raise IndexError("ring buffer index out of range")
+        return self.data[(self.head - 1 - offset) % self.capacity]
+
+    def oldest(self):
+        if self.count == 0:
+            raise IndexError("ring buffer is empty")
+        return self.data[(self.head - self.count) % self.capacity]
+
+    def values(self):
+        """Return the buffered values in chronological order (a copy)"""
+        return self.last(self.count)
+
+    def last(self, n):
+        """Return the ``n`` most recent values in chronological order (a copy)"""
+        n = min(n, self.count)
+        # Indexed from head: after a wrap the live values are not data[:count]
+        indices = (self.head - n + np.arange(n)) % self.capacity
+        return np.take(self.data, indices, axis=0)
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+
+
+class RollingWindow:
+    """Mean and variance over the last ``capacity`` samples in O(1) per push"""
+
+    def __init__(self, capacity, shape=(), resync_every=None):
+        self.buffer = RingBuffer(capacity, shape)
+        self.sum = np.zeros(shape)
+        self.sum_sq = np.zeros(shape)
+        # Recompute the sums now and then so floating point drift cannot build up
+        self.resync_every = resync_every or 64 * self.buffer.capacity
+        self._pushes = 0
+
+    def __len__(self):
+        return len(self.buffer)
+
+    @property
+    def is_full(self):
+        return self.buffer.is_full
+
+    def push(self, value):
+        value = np.asarray(value, dtype=np.float64)
+        evicted = self.buffer.push(value)
+        self.sum += value
+        self.sum_sq += value * value
+        if evicted is not None:
+            self.sum -= evicted
+            self.sum_sq -= evicted * evicted
+
+        self._pushes += 1
+        if self._pushes >= self.resync_every:
+            self._resync()
+        return evicted
+
+    def _resync(self):
+        values = self.buffer.values()
+        self.sum = values.sum(axis=0)
+        self.sum_sq = (values * values).sum(axis=0)
+        self._pushes = 0
+
+    def mean(self):
+        if len(self.buffer) == 0:
+            return np.nan if self.sum.ndim == 0 else np.full(self.sum.shape, np.nan)
+        return self.sum / len(self.buffer)
+
+    def variance(self):
+        n = len(self.buffer)
+        if n == 0:
+            return np.nan if self.sum.ndim == 0 else np.full(self.sum.shape, np.nan)
+        mean = self.sum / n
+        return np.maximum(self.sum_sq / n - mean * mean, 0.0)
+
+    def std(self):
+        return np.sqrt(self.variance())
+
+    def newest(self, offset=0):
+        return self.buffer.newest(offset)
+
+    def values(self):
+        return self.buffer.values()
+
+    def clear(self):
+        self.buffer.clear()
+        self.sum = np.zeros_like(self.sum)
+        self.sum_sq = np.zeros_like(self.sum_sq)
+        self._pushes = 0
+
+
+class EWMA:
+    """Exponentially weighted moving average and variance"""
+
+    def __init__(self, alpha=None, span=None):
+        if alpha is None:
+            if span is None:
+                raise ValueError("either alpha or span is required")
+            alpha = 2.0 / (span + 1.0)
+        self.alpha = alpha
+        self.value = None
+        self.var = None
+
+    def push(self, value):
+        value = np.asarray(value, dtype=np.float64)
+        if self.value is None:
+            self.value = value.copy()
+            self.var = np.zeros_like(value)
+        else:
+            delta = value - self.value
+            self.value = self.value + self.alpha * delta
+            self.var = (1.0 - self.alpha) * (self.var + self.alpha * delta * delta)
+        return self.value
+
+    def std(self):
+        return None if self.var is None else np.sqrt(self.var)
+
+    def clear(self):
+        self.value = None
+        self.var = None
+
+
+class TimeWindow:
+    """Mean over samples newer than ``horizon`` seconds (amortized O(1))"""
+
+    def __init__(self, horizon, capacity=256):
+        self.horizon = horizon
+        self.times = RingBuffer(capacity)
+        self.window = RollingWindow(capacity)
+
+    def __len__(self):
+        return len(self.window)
+
+    def push(self, timestamp, value):
+        self.times.push(timestamp)
+        self.window.push(value)
+        self.expire(timestamp)
+
+    def expire(self, now):
+        """Drop samples older than the horizon relative to ``now``"""
+        buffer = self.window.buffer
+        while buffer.count and self.times.oldest() < now - self.horizon:
+            evicted = buffer.oldest()
+            self.window.sum -= evicted
+            self.window.sum_sq -= evicted * evicted
+            buffer.count -= 1
+            self.times.count -= 1
+
+    def mean(self):
+        return self.window.mean()
+
+    def variance(self):
+        return self.window.variance()
+
+    def rate(self):
+        """Samples per second over the buffered span"""
+        if len(self.times) < 2:
+            return 0.0
+        span = self.times.newest() - self.times.oldest()
+        return (len(self.times) - 1) / span if span > 0 else 0.0
+
+    def clear(self):
+        self.times.clear()
+        self.window.clear()
+
+
+class RollingHistogram:
+    """Approximate percentiles over a sliding window using fixed-width bins"""
+
+    def __init__(self, capacity, low, high, bins=64):
+        self.low = low
+        self.high = high
+        self.bins = bins
+        self.bin_width = (high - low) / bins
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.buffer = RingBuffer(capacity, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def _bin(self, value):
+        index = int((value - self.low) / self.bin_width) if not math.isnan(value) else 0
+        return min(max(index, 0), self.bins - 1)
+
+    def push(self, value):
+        index = self._bin(value)
+        evicted = self.buffer.push(index)
+        self.counts[index] += 1
+        if evicted is not None:
+            self.counts[int(evicted)] -= 1
+
+    def percentile(self, q):
+        """Approximate q-th percentile (0-100), interpolated within the bin"""
+        n = len(self.buffer)
+        if n == 0:
+            return np.nan
+        target = q / 100.0 * n
+        cumulative = np.cumsum(self.counts)
+        index = int(np.searchsorted(cumulative, target, side='left'))
+        index = min(index, self.bins - 1)
+        below = cumulative[index - 1] if index > 0 else 0
+        in_bin = self.counts[index]
+        fraction = (target - below) / in_bin if in_bin else 0.0
+        return self.low + (index + fraction) * self.bin_width
+
+    def clear(self):
+        self.counts[:] = 0
+        self.buffer.clear()
\ No newline at end of file
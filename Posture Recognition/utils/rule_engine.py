@@ -0,0 +1,608 @@
+"""
+Compiler and interpreter for the declarative exercise specs in EXERCISE_CONFIG.
+
+Each exercise is compiled once into flat index and threshold arrays:
+
+- features: one gather of landmark-to-landmark vectors, sliced per geometric kind
+- predicates: (feature, threshold, scale feature, comparison) rows
+- feedback rules and rep transitions: 0/1 clause matrices over the predicates
+
+Evaluating a frame is then a fixed sequence of array operations, and every
+step also accepts leading batch dimensions (e.g. a whole recording at once).
+"""
+import numpy as np
+
+FEATURE_KINDS = ('angle', 'abs_dx', 'dy', 'distance', 'mid_dx', 'mid_abs_dx')
+# Kinds derived from point-to-point vectors: (head role, tail role) per vector
+VECTOR_ROLES = {'angle': ((0, 1), (2, 1)), 'abs_dx': ((0, 1),), 'dy': ((1, 0),), 'distance': ((0, 1),)}
+KIND_ARITY = {'angle': 3, 'abs_dx': 2, 'dy': 2, 'mid_dx': 4, 'mid_abs_dx': 4, 'distance': 2}
+# Up to this many sequences side by side, machines of 3+ states are propagated by
+# composing per-frame maps (_propagate_states) rather than frame by frame
+SCAN_MAX_BATCH = 64
+
+# Every comparison is rewritten as lo < hi or lo <= hi, negating both sides for > and >=.
+# 'not' forms negate the result, so they are true (not false) for NaN features.
+COMPARISONS = {
+    '<': (False, True, False),   # (swap, strict, negate)
+    '<=': (False, False, False),
+    '>': (True, True, False),
+    '>=': (True, False, False),
+    'not <': (False, True, True),
+    'not <=': (False, False, True),
+    'not >': (True, True, True),
+    'not >=': (True, False, True)
+}
+
+
+class RuleCompileError(ValueError):
+    pass
+
+
+def _threshold_terms(value, thresholds, exercise_name):
+    """Split a threshold expression into (constant factor, threshold names)"""
+    if isinstance(value, tuple):
+        constant, names = 1.0, []
+        for part in value:
+            part_constant, part_names = _threshold_terms(part, thresholds, exercise_name)
+            constant *= part_constant
+            names.extend(part_names)
+        return constant, names
+    if isinstance(value, str):
+        if value not in thresholds:
+            raise RuleCompileError(f"{exercise_name}: unknown threshold '{value}'")
+        return 1.0, [value]
+    return float(value), []
+
+
+def _resolve_threshold(value, thresholds, exercise_name):
+    if isinstance(value, tuple):
+        product = 1.0
+        for part in value:
+            product *= _resolve_threshold(part, thresholds, exercise_name)
+        return product
+    if isinstance(value, str):
+        if value not in thresholds:
+            raise RuleCompileError(f"{exercise_name}: unknown threshold '{value}'")
+        return float(thresholds[value])
+    return float(value)
+
+
+class ExerciseProgram:
+    """One exercise spec compiled into flat arrays"""
+
+    def __init__(self, name, spec, feature_definitions):
+        self.name = name
+        thresholds = spec.get('angle_thresholds', {})
+        self.threshold_values = {key: float(value) for key, value in thresholds.items()}
+        tips = spec.get('form_tips', {})
+
+        self.required_landmarks = tuple(spec['required_landmarks'])
+        self.missing_feedback = spec.get('missing_feedback', "Please ensure your full body is visible")
+        self.states = tuple(spec.get('rep_states') or ('idle',))
+        self.initial_state = 0
+
+        display = spec.get('display_features', {})
+        feedback_stages = spec.get('feedback', [])
+        transitions = spec.get('rep_transitions', [])
+
+        # Collect the features the spec references, dependencies first
+        referenced = list(display.values())
+        for stage in feedback_stages:
+            for rule in stage:
+                referenced.extend(self._clause_features(rule['when']))
+        for transition in transitions:
+            referenced.extend(self._clause_features(transition['when']))
+
+        features = []
+        for feature in referenced:
+            self._add_feature(feature, features, feature_definitions)
+        # Group features by kind so each kind fills one contiguous slice; means go last
+        kind_order = FEATURE_KINDS + ('mean',)
+        self.feature_names = sorted(features, key=lambda f: kind_order.index(feature_definitions[f][0]))
+        self.feature_index = {feature: i for i, feature in enumerate(self.feature_names)}
+
+        self._compile_features(feature_definitions, spec.get('feature_defaults', {}),
+                               spec.get('feature_requires', {}))
+
+        self.display_labels = tuple(display)
+        self.display_index = np.array([self.feature_index[f] for f in display.values()], dtype=np.intp)
+
+        # Predicates are shared between feedback rules and transitions
+        self._predicates = {}
+        pred_feature, pred_scale, pred_threshold, pred_sign, pred_strict, pred_negate = [], [], [], [], [], []
+        # Per predicate: constant factor and angle_thresholds names of its threshold
+        self.pred_terms = []
+
+        def clause_row(clauses):
+            row = []
+            for clause in clauses:
+                feature, op, threshold = clause[:3]
+                scale = clause[3] if len(clause) > 3 else None
+                if op not in COMPARISONS:
+                    raise RuleCompileError(f"{name}: unsupported comparison '{op}'")
+                # Keyed by the threshold expression so that separately named
+                # thresholds stay separate predicates even when equal
+                key = (feature, op, threshold, scale)
+                if key not in self._predicates:
+                    self._predicates[key] = len(pred_feature)
+                    swap, strict, negate = COMPARISONS[op]
+                    pred_feature.append(self.feature_index[feature])
+                    # Unscaled thresholds multiply the constant-one column
+                    pred_scale.append(self.feature_index[scale] if scale else len(self.feature_names))
+                    pred_threshold.append(_resolve_threshold(threshold, thresholds, name))
+                    self.pred_terms.append(_threshold_terms(threshold, thresholds, name))
+                    # a > b is evaluated as -a < -b, which is exact and keeps NaN
+                    pred_sign.append(-1.0 if swap else 1.0)
+                    pred_strict.append(strict)
+                    pred_negate.append(negate)
+                row.append(self._predicates[key])
+            return row
+
+        # Feedback rules; rule 0 is the default feedback that always fires
+        default_tip = spec.get('default_tip', 'good_form')
+        rule_rows = [[]]
+        self.rule_messages = [self._tip(tips, default_tip)]
+        rule_incorrect = [False]
+        rule_stage_start = [0]
+        for stage in feedback_stages:
+            stage_start = len(rule_rows)
+            for rule in stage:
+                rule_rows.append(clause_row(rule['when']))
+                self.rule_messages.append(self._tip(tips, rule['tip']))
+                rule_incorrect.append(bool(rule.get('incorrect', False)))
+                rule_stage_start.append(stage_start)
+
+        transition_rows = []
+        transition_from, transition_to, transition_counts = [], [], []
+        for transition in transitions:
+            transition_rows.append(clause_row(transition['when']))
+            transition_from.append(self._state(transition['from']))
+            transition_to.append(self._state(transition['to']))
+            transition_counts.append(bool(transition.get('counts_rep', False)))
+
+        self.pred_feature = np.array(pred_feature, dtype=np.intp)
+        self.pred_scale = np.array(pred_scale, dtype=np.intp)
+        self.pred_sign = np.array(pred_sign, dtype=np.float64)
+        self.pred_threshold = np.array(pred_threshold, dtype=np.float64) * self.pred_sign
+        self.pred_strict = np.array(pred_strict, dtype=bool)
+        self.pred_negate = np.array(pred_negate, dtype=bool)
+
+        self.rule_matrix, self.rule_lengths = self._clause_matrix(rule_rows)
+        self.rule_incorrect = np.array(rule_incorrect, dtype=np.float64)
+        self.rule_stage = np.array(rule_stage_start, dtype=np.intp)
+        self.rule_numbers = np.arange(len(rule_rows))
+        # stage_prefix[j, i] = 1 when rule j precedes or is rule i within the same stage,
+        # so fired @ stage_prefix counts the rules fired so far in each stage
+        self.stage_prefix = ((self.rule_stage[:, None] == self.rule_stage[None, :]) &
+                             (self.rule_numbers[:, None] <= self.rule_numbers[None, :])).astype(np.float64)
+
+        self.transition_matrix, self.transition_lengths = self._clause_matrix(transition_rows)
+        self.transition_from = np.array(transition_from, dtype=np.intp)
+        self.transition_to = np.array(transition_to, dtype=np.intp)
+        self.transition_counts = np.array(transition_counts, dtype=bool)
+        # Transitions leaving each state, in spec order
+        self.outgoing = [np.flatnonzero(self.transition_from == state).tolist() for state in range(len(self.states))]
+        # (from, to) state pairs that complete a rep, the feature whose range of
+        # motion is reported per rep, and the phases timed as eccentric/concentric
+        self.rep_edges = {(int(a), int(b)) for a, b, counts in
+                          zip(self.transition_from, self.transition_to, self.transition_counts) if counts}
+        self.rep_feature = transitions[0]['when'][0][0] if transitions else None
+        self.tempo_phases = dict(spec.get('tempo_phases', {}))
+        for phase in self.tempo_phases.values():
+            self._state(phase)
+
+        # Reused per-frame buffers for the landmark dict conversion
+        self._coords = np.zeros((len(self.landmark_names), 2))
+        self._present = np.zeros(len(self.landmark_names), dtype=bool)
+
+    # Compilation helpers
+
+    @staticmethod
+    def _clause_features(clauses):
+        for clause in clauses:
+            yield clause[0]
+            if len(clause) > 3:
+                yield clause[3]
+
+    def _add_feature(self, feature, features, feature_definitions):
+        if feature in features:
+            return
+        if feature not in feature_definitions:
+            raise RuleCompileError(f"{self.name}: unknown feature '{feature}'")
+        kind, *args = feature_definitions[feature]
+        if kind == 'mean':
+            if len(args) != 2 or any(feature_definitions.get(arg, ('mean',))[0] == 'mean' for arg in args):
+                raise RuleCompileError(f"{self.name}: '{feature}' must average two geometric features")
+            for dependency in args:
+                self._add_feature(dependency, features, feature_definitions)
+        elif kind not in KIND_ARITY or len(args) != KIND_ARITY[kind]:
+            raise RuleCompileError(f"{self.name}: bad definition for feature '{feature}'")
+        features.append(feature)
+
+    def _compile_features(self, feature_definitions, defaults, extra_requires):
+        landmark_names = list(self.required_landmarks)
+        landmark_index = {lm: i for i, lm in enumerate(landmark_names)}
+
+        def landmark(name):
+            if name not in landmark_index:
+                landmark_index[name] = len(landmark_names)
+                landmark_names.append(name)
+            return landmark_index[name]
+
+        n_features = len(self.feature_names)
+        kind_points = {kind: [] for kind in FEATURE_KINDS}
+        mean_sources = []
+        requires = [[] for _ in range(n_features)]
+
+        for i, feature in enumerate(self.feature_names):
+            kind, *args = feature_definitions[feature]
+            if kind == 'mean':
+                mean_sources.append([self.feature_index[arg] for arg in args])
+                continue
+            points = [landmark(arg) for arg in args]
+            kind_points[kind].append(points)
+            requires[i] = points + [landmark(lm) for lm in extra_requires.get(feature, [])]
+
+        self.landmark_names = tuple(landmark_names)
+
+        # Vector kinds share one gather of head - tail vectors, laid out kind by kind and
+        # vector role by role, so every feature of a kind reads contiguous slices
+        heads, tails, self.vector_layout = [], [], []
+        feature_start = 0
+        for kind, roles in VECTOR_ROLES.items():
+            points = kind_points[kind]
+            if points:
+                self.vector_layout.append((kind, len(heads), feature_start, len(points)))
+                for head, tail in roles:
+                    heads.extend(p[head] for p in points)
+                    tails.extend(p[tail] for p in points)
+                feature_start += len(points)
+        self.vector_heads = np.array(heads, dtype=np.intp)
+        self.vector_tails = np.array(tails, dtype=np.intp)
+
+        # Midpoint offsets gather their four points role by role, signed ones first
+        midpoints = kind_points['mid_dx'] + kind_points['mid_abs_dx']
+        self.midpoint_index = np.array([p[role] for role in range(4) for p in midpoints], dtype=np.intp)
+        self.midpoint_slice = slice(feature_start, feature_start + len(midpoints))
+        self.midpoint_abs_slice = slice(feature_start + len(kind_points['mid_dx']), self.midpoint_slice.stop)
+        self.geometric_count = feature_start + len(midpoints)
+        mean_sources = np.array(mean_sources, dtype=np.intp).reshape(-1, 2)
+        self.mean_first = np.ascontiguousarray(mean_sources[:, 0])
+        self.mean_second = np.ascontiguousarray(mean_sources[:, 1])
+
+
+        # Landmarks each geometric feature needs; a missing one selects the default (NaN if none)
+        self.requirement_matrix = np.zeros((n_features + 1, len(landmark_names)))
+        for i, points in enumerate(requires):
+            self.requirement_matrix[i, points] = 1.0
+        self.requirement_counts = self.requirement_matrix.sum(axis=1)
+        # Trailing constant column: unscaled predicate thresholds multiply it
+        self.feature_defaults = np.array([float(defaults.get(f, np.nan)) for f in self.feature_names] + [1.0])
+        self.required_count = len(self.required_landmarks)
+
+    def _tip(self, tips, key):
+        if key not in tips:
+            raise RuleCompileError(f"{self.name}: unknown form tip '{key}'")
+        return tips[key]
+
+    def _state(self, state):
+        if state not in self.states:
+            raise RuleCompileError(f"{self.name}: unknown rep state '{state}'")
+        return self.states.index(state)
+
+    def _clause_matrix(self, rows):
+        matrix = np.zeros((len(rows), len(self.pred_feature)))
+        for r, row in enumerate(rows):
+            matrix[r, row] = 1.0
+        return matrix, matrix.sum(axis=1)
+
+    # Evaluation
+
+    def landmark_arrays(self, landmarks):
+        """Convert a landmark dict into (coords, present) arrays (reused buffers)"""
+        coords, present = self._coords, self._present
+        for i, name in enumerate(self.landmark_names):
+            point = landmarks.get(name)
+            if point is None:
+                present[i] = False
+            else:
+                present[i] = True
+                coords[i, 0] = point['x']
+                coords[i, 1] = point['y']
+        return coords, present
+
+    def has_required(self, present):
+        """True where every required landmark is present"""
+        return present[..., :self.required_count].all(axis=-1)
+
+    def available_features(self, present):
+        """True for every feature whose landmarks are all present"""
+        return (present.astype(np.float64) @ self.requirement_matrix.T) == self.requirement_counts
+
+    def compute_features(self, coords, present):
+        """Feature values for coords (..., L, 2) and present (..., L).
+
+        The result has one extra trailing column fixed at 1.0, used by
+        unscaled predicates.
+        """
+        batch_shape = coords.shape[:-2]
+        features = np.empty(batch_shape + (len(self.feature_names) + 1,))
+        features[..., -1] = 1.0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if len(self.vector_heads):
+                vectors = coords[..., self.vector_heads, :] - coords[..., self.vector_tails, :]
+                dx, dy = vectors[..., 0], vectors[..., 1]
+                norms = np.sqrt(dx * dx + dy * dy)
+
+            for kind, start, first, n in self.vector_layout:
+                target = slice(first, first + n)
+                vector = slice(start, start + n)
+                if kind == 'angle':
+                    other = slice(start + n, start + 2 * n)   # b->a and b->c
+                    cosine = (dx[..., vector] * dx[..., other] + dy[..., vector] * dy[..., other]) / (
+                        norms[..., vector] * norms[..., other])
+                    cosine = np.minimum(np.maximum(cosine, -1.0), 1.0)
+                    features[..., target] = np.degrees(np.arccos(cosine))
+                elif kind == 'abs_dx':
+                    features[..., target] = np.abs(dx[..., vector])
+                elif kind == 'dy':
+                    features[..., target] = dy[..., vector]
+                else:  # distance
+                    features[..., target] = norms[..., vector]
+
+            if len(self.midpoint_index):
+                x = coords[..., self.midpoint_index, 0]
+                n = len(self.midpoint_index) // 4
+                features[..., self.midpoint_slice] = (
+                    (x[..., :n] + x[..., n:2 * n]) / 2 - (x[..., 2 * n:3 * n] + x[..., 3 * n:]) / 2)
+                features[..., self.midpoint_abs_slice] = np.abs(features[..., self.midpoint_abs_slice])
+
+        # Features whose landmarks are missing fall back to their default (NaN if none)
+        features = np.where(self.available_features(present), features, self.feature_defaults)
+
+        if len(self.mean_first):
+            means = slice(self.geometric_count, len(self.feature_names))
+            features[..., means] = (features[..., self.mean_first] + features[..., self.mean_second]) / 2
+        return features
+
+    def evaluate_predicates(self, features):
+        """Predicate values as 0.0/1.0 floats; plain comparisons with NaN are false"""
+        lo = features[..., self.pred_feature] * self.pred_sign
+        hi = self.pred_threshold * features[..., self.pred_scale]
+        return (np.where(self.pred_strict, lo < hi, lo <= hi) != self.pred_negate).astype(np.float64)
+
+    def evaluate_form(self, predicates):
+        """Return (correct_form, feedback rule index) for predicate values"""
+        fired = ((predicates @ self.rule_matrix.T) == self.rule_lengths).astype(np.float64)
+        # Keep only the first rule that fired within each stage (an if/elif chain)
+        chosen = fired * ((fired @ self.stage_prefix) == 1.0)
+
+        correct_form = (chosen @ self.rule_incorrect) == 0.0
+        # The last stage with a chosen rule provides the feedback
+        last_rule = (chosen * self.rule_numbers).max(axis=-1).astype(np.intp)
+        return correct_form, last_rule
+
+    def evaluate_transitions(self, predicates):
+        """Which rep transitions have their condition satisfied"""
+        return (predicates @ self.transition_matrix.T) == self.transition_lengths
+
+    def step(self, state, transitions_fired, correct_form):
+        """Advance the rep state machine by one frame; returns (state, rep_completed)"""
+        for transition in self.outgoing[state]:
+            if transitions_fired[transition]:
+                return int(self.transition_to[transition]), bool(self.transition_counts[transition] and correct_form)
+        return state, False
+
+    def step_batch(self, states, transitions_fired, correct_form):
+        """step() for many independent state machines (one row each) at once"""
+        rows = np.arange(len(states))
+        taken = self._first_transitions(transitions_fired)[states, rows]
+        # Index -1 (no transition taken) picks the appended entries
+        new_states = np.where(taken >= 0, np.append(self.transition_to, 0)[taken], states)
+        return new_states, np.append(self.transition_counts, False)[taken] & correct_form
+
+    def _first_transitions(self, fired):
+        """Per state and row, the first outgoing transition that fired (-1 for none)"""
+        return self._select_first(fired, np.arange(len(self.transition_to)), -1)
+
+    def _select_first(self, fired, values, default):
+        """Per state: values of its first outgoing transition that fired, default (per state) if none.
+
+        Selects with integer arithmetic (row += (value - row) * fired), which is
+        much faster than masked assignment for large batches.
+        """
+        dtype = np.int8 if len(self.transition_to) < 64 and len(self.states) < 64 else np.intp
+        default = np.broadcast_to(default, len(self.states))
+        result = np.empty((len(self.states),) + fired.shape[:-1], dtype=dtype)
+        for state, transitions in enumerate(self.outgoing):
+            row = result[state]
+            row[...] = default[state]
+            for transition in reversed(transitions):
+                row += (dtype(values[transition]) - row) * fired[..., transition]
+        return result
+
+    def evaluate_frame(self, landmarks, state, frame_features=None):
+        """Evaluate one landmark dict; returns (result dict, new state).
+
+        When a FrameFeatures view is given, the computed features (except those
+        that fell back to a default) are published into it.
+        """
+        coords, present = self.landmark_arrays(landmarks)
+        if not present[:self.required_count].all():
+            return {
+                'correct_form': False,
+                'feedback': self.missing_feedback,
+                'angles': {},
+                'rep_completed': False
+            }, state
+
+        features = self.compute_features(coords, present)
+        predicates = self.evaluate_predicates(features)
+        correct_form, rule = self.evaluate_form(predicates)
+        correct_form = bool(correct_form)
+        state, rep_completed = self.step(state, self.evaluate_transitions(predicates), correct_form)
+
+        if frame_features is not None:
+            available = self.available_features(present)
+            values = features.tolist()
+            frame_features.publish({name: values[i] for i, name in enumerate(self.feature_names) if available[i]})
+
+        display_values = features[self.display_index].tolist()
+        return {
+            'correct_form': correct_form,
+            'feedback': self.rule_messages[int(rule)],
+            'angles': dict(zip(self.display_labels, display_values)),
+            'rep_completed': rep_completed
+        }, state
+
+    # Whole sessions
+
+    def evaluate_sequence(self, features, valid=None, initial_state=None):
+        """Evaluate a session of feature rows (N, F + 1) in one batch.
+
+        Gives the same per-frame results as calling evaluate_frame on every
+        frame in order. Frames where valid is False (required landmarks
+        missing) keep the rep state and report feedback index -1. Returns a
+        dict of per-frame arrays (states after each frame, rep_completed,
+        correct_form, feedback) plus rep_frames and the run-length encoded
+        state sequence (run_starts, run_states).
+        """
+        n_frames = len(features)
+        valid = np.ones(n_frames, dtype=bool) if valid is None else np.asarray(valid, dtype=bool)
+        initial_state = self.initial_state if initial_state is None else initial_state
+
+        predicates = self.evaluate_predicates(features)
+        correct_form, rule = self.evaluate_form(predicates)
+        correct_form &= valid
+        fired = self.evaluate_transitions(predicates) & valid[:, None]
+
+        states, taken = self._propagate_states(fired, initial_state)
+        states = states.astype(np.intp)
+        # Index -1 (no transition taken) picks the appended False
+        rep_completed = np.append(self.transition_counts, False)[taken] & correct_form
+
+        changes = np.flatnonzero(states[1:] != states[:-1]) + 1
+        run_starts = np.concatenate(([0], changes)) if n_frames else changes
+        return {
+            'states': states,
+            'rep_completed': rep_completed,
+            'correct_form': correct_form,
+            'feedback': np.where(valid, rule, -1),
+            'rep_frames': np.flatnonzero(rep_completed),
+            'run_starts': run_starts,
+            'run_states': states[run_starts],
+            'final_state': int(states[-1]) if n_frames else initial_state
+        }
+
+    def evaluate_landmark_sequence(self, coords, present, initial_state=None):
+        """evaluate_sequence for coords (N, L, 2) and present (N, L) in landmark_names order"""
+        features = self.compute_features(coords, present)
+        return self.evaluate_sequence(features, self.has_required(present), initial_state)
+
+    def feedback_messages(self, feedback):
+        """Feedback strings for the rule indices returned by evaluate_sequence"""
+        messages = np.array(self.rule_messages + [self.missing_feedback], dtype=object)
+        return messages[np.asarray(feedback)]
+
+    # Threshold tuning
+
+    def rep_thresholds(self):
+        """angle_thresholds names that can change rep counts: those used by the
+        rep transitions or by a feedback stage that can mark the form incorrect"""
+        if not len(self.transition_matrix):
+            return []
+        gate = np.isin(self.rule_stage, self.rule_stage[self.rule_incorrect > 0])
+        used = self.transition_matrix.any(axis=0) | self.rule_matrix[gate].any(axis=0)
+        names = []
+        for pred in np.flatnonzero(used):
+            names.extend(name for name in self.pred_terms[pred][1] if name not in names)
+        return names
+
+    def candidate_thresholds(self, names, values):
+        """Signed predicate thresholds (K, P) for K candidate values (K, len(names))
+        of the named angle_thresholds; the others keep their configured values"""
+        values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+        column = {name: i for i, name in enumerate(names)}
+        thresholds = np.repeat(self.pred_threshold[None], len(values), axis=0)
+        for pred, (constant, terms) in enumerate(self.pred_terms):
+            if not any(term in column for term in terms):
+                continue
+            product = np.full(len(values), constant * self.pred_sign[pred])
+            for term in terms:
+                product = product * (values[:, column[term]] if term in column else self.threshold_values[term])
+            thresholds[:, pred] = product
+        return thresholds
+
+    def _propagate_states(self, fired, initial_state, starts=None):
+        """States after each frame and the transition taken (-1 for none).
+
+        fired is (..., N, T) with any leading batch dimensions. starts
+        optionally gives, per frame, the first frame of its session: the state
+        machine restarts from initial_state there (concatenated sessions).
+        States and transitions use the compact dtype of _first_transitions.
+        """
+        n_frames, n_states = fired.shape[-2], len(self.states)
+        frames = np.arange(n_frames, dtype=np.int32 if n_frames < 2 ** 31 else np.intp)
+        starts = np.zeros(n_frames, dtype=frames.dtype) if starts is None else np.asarray(starts, dtype=frames.dtype)
+        restart = starts == frames
+
+        choice = self._first_transitions(fired)
+        target = self._select_first(fired, self.transition_to, np.arange(n_states))
+
+        if n_states == 1:
+            states = np.zeros(choice.shape[1:], dtype=choice.dtype)
+        elif n_states == 2:
+            # Each frame maps {0, 1} to a constant, itself, or the swap. The state
+            # after a frame is the last constant (set/reset) value, flipped once per
+            # swap since then: forward fills plus a running swap parity.
+            # Last frames (1-based, 0 for none) that set the state to one and to zero
+            constant = target[0] == target[1]
+            one = target[0].astype(bool)
+            last_one = np.maximum.accumulate((constant & one) * (frames + 1), axis=-1)
+            last_zero = np.maximum.accumulate((constant & ~one) * (frames + 1), axis=-1)
+            anchored = np.maximum(last_one, last_zero) > starts
+            states = (anchored & (last_one > last_zero)) | (~anchored & bool(initial_state))
+            states = states.astype(choice.dtype)
+            swaps = one & ~target[1].astype(bool)
+            if swaps.any():
+                # parity[..., i] = parity of the swaps before frame i
+                parity = np.zeros(swaps.shape[:-1] + (n_frames + 1,), dtype=np.uint8)
+                np.bitwise_xor.accumulate(swaps, axis=-1, out=parity[..., 1:])
+                since = np.where(anchored, np.maximum(last_one, last_zero), starts)
+                states ^= parity[..., 1:] ^ np.take_along_axis(parity, since, axis=-1)
+        elif np.prod(choice.shape[1:-1], dtype=np.intp) <= SCAN_MAX_BATCH:
+            # Larger machines are not expressible as set/reset/toggle. Each frame
+            # maps every state to its next state (a restart maps all of them as
+            # initial_state would); the state after frame i is the composition of
+            # the maps up to i applied to initial_state. Compose them by doubling:
+            # after each pass maps[..., i] covers twice as many frames, and once
+            # every map sends all states alike further passes change nothing.
+            maps = target.copy()
+            maps[..., restart] = target[initial_state][..., restart]
+            span = 1
+            while span < n_frames and not (maps == maps[:1]).all():
+                maps[..., span:] = np.take_along_axis(maps[..., span:], maps[..., :-span], axis=0)
+                span *= 2
+            states = maps[initial_state]
+        else:
+            # Wide batches (e.g. threshold candidates): one step per frame costs
+            # less than log2(N) passes over the whole batch
+            states = np.empty(choice.shape[1:], dtype=choice.dtype)
+            state = np.full(choice.shape[1:-1], initial_state, dtype=choice.dtype)
+            for i in range(n_frames):
+                if restart[i]:
+                    state[...] = initial_state
+                state = np.take_along_axis(target[..., i], state[None], axis=0).reshape(state.shape)
+                states[..., i] = state
+
+        previous = np.empty_like(states)
+        previous[..., 1:] = states[..., :-1]
+        previous[..., np.flatnonzero(restart)] = initial_state
+        if n_states == 2:
+            return states, choice[0] + (choice[1] - choice[0]) * previous
+        return states, np.take_along_axis(choice, previous[None], axis=0)[0]
+
+
+def compile_exercises(exercise_config, feature_definitions):
+    """Compile every exercise spec; raises RuleCompileError on a bad spec"""
+    return {name: ExerciseProgram(name, spec, feature_definitions) for name, spec in exercise_config.items()}
\ No newline at end of file
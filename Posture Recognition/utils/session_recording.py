@@ -0,0 +1,105 @@
+"""
+Recorded exercise sessions for offline re-scoring.
+
+A recording keeps the landmarks of every analysed frame as dense arrays
+(coords, present, visibility) plus the selected exercise and a timestamp, and
+is stored as a compressed ``.npz``. ``arrays`` returns the frames of one
+exercise in the landmark order of a compiled ExerciseProgram, ready for
+``ExerciseProgram.evaluate_landmark_sequence``. ``rep_counts`` optionally
+holds the true number of reps per exercise, used by tools/tune_thresholds.py.
+"""
+import time
+
+import numpy as np
+
+from utils.pose_detector import LANDMARK_INDICES
+
+
+class SessionRecording:
+    def __init__(self, landmark_names=None):
+        self.landmark_names = list(landmark_names or LANDMARK_INDICES)
+        self._index = {name: i for i, name in enumerate(self.landmark_names)}
+        self._coords = []
+        self._present = []
+        self._visibility = []
+        self.exercises = []
+        self.timestamps = []
+        self.rep_counts = {}
+
+    def __len__(self):
+        return len(self.exercises)
+
+    def append(self, landmarks, exercise=None, timestamp=None):
+        """Record the landmark dict of one frame"""
+        coords = np.zeros((len(self.landmark_names), 2))
+        present = np.zeros(len(self.landmark_names), dtype=bool)
+        visibility = np.zeros(len(self.landmark_names))
+        for name, point in landmarks.items():
+            i = self._index.get(name)
+            if i is not None:
+                coords[i] = point['x'], point['y']
+                present[i] = True
+                visibility[i] = point.get('visibility', 1.0)
+
+        self._coords.append(coords)
+        self._present.append(present)
+        self._visibility.append(visibility)
+        self.exercises.append(exercise or '')
+        self.timestamps.append(time.time() if timestamp is None else timestamp)
+
+    def landmarks(self, frame):
+        """Landmark dict of one recorded frame (as passed to the detector)"""
+        coords, present, visibility = self._coords[frame], self._present[frame], self._visibility[frame]
+        return {
+            name: {'x': coords[i, 0], 'y': coords[i, 1], 'visibility': visibility[i]}
+            for i, name in enumerate(self.landmark_names) if present[i]
+        }
+
+    def arrays(self, landmark_names=None, exercise=None):
+        """Return (coords (N, L, 2), present (N, L)) for the given landmark order.
+
+        With an exercise name, only the frames recorded for that exercise are
+        returned. Landmarks that were never recorded are marked missing.
+        """
+        frames = np.arange(len(self))
+        if exercise is not None:
+            frames = np.flatnonzero(np.array(self.exercises, dtype=object) == exercise)
+
+        names = self.landmark_names if landmark_names is None else list(landmark_names)
+        columns = np.array([self._index.get(name, -1) for name in names], dtype=np.intp)
+        known = columns >= 0
+
+        coords = np.zeros((len(frames), len(names), 2))
+        present = np.zeros((len(frames), len(names)), dtype=bool)
+        if len(frames) and known.any():
+            coords[:, known] = np.stack(self._coords)[frames][:, columns[known]]
+            present[:, known] = np.stack(self._present)[frames][:, columns[known]]
+        return coords, present
+
+    def save(self, path):
+        n, n_landmarks = len(self), len(self.landmark_names)
+        np.savez_compressed(
+            path,
+            landmark_names=np.array(self.landmark_names),
+            coords=np.stack(self._coords) if n else np.zeros((0, n_landmarks, 2)),
+            present=np.stack(self._present) if n else np.zeros((0, n_landmarks), dtype=bool),
+            visibility=np.stack(self._visibility) if n else np.zeros((0, n_landmarks)),
+            exercises=np.array(self.exercises, dtype=str),
+            timestamps=np.array(self.timestamps, dtype=np.float64),
+            rep_count_exercises=np.array(list(self.rep_counts), dtype=str),
+            rep_count_values=np.array(list(self.rep_counts.values()), dtype=np.int64)
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            recording = cls(data['landmark_names'].tolist())
+            recording._coords = list(data['coords'])
+            recording._present = list(data['present'])
+            recording._visibility = list(data['visibility'])
+            recording.exercises = data['exercises'].tolist()
+            recording.timestamps = data['timestamps'].tolist()
+            if 'rep_count_exercises' in data.files:
+                recording.rep_counts = dict(zip(data['rep_count_exercises'].tolist(),
+                                                data['rep_count_values'].tolist()))
+        return recording
\ No newline at end of file
@@ -0,0 +1,210 @@
+"""
+Struct-of-arrays table of concurrent exercise sessions.
+
+A server handling many clients keeps one row per session instead of one
+ExerciseDetector object each: the selected exercise, the rep state of every
+exercise and the counters are NumPy columns. ``evaluate`` takes the landmarks
+of all sessions that delivered a frame in the same tick, groups the rows by
+exercise, runs each compiled ExerciseProgram once over its whole group and
+scatters the new states, counters and per-session results back.
+
+Results match one ExerciseDetector per session (plus the rep/set counting of
+SessionWorker) frame for frame.
+"""
+import numpy as np
+
+from utils.exercise_detector import get_exercise_programs
+from utils.pose_detector import LANDMARK_INDICES
+
+REPS_PER_SET = 10
+UNSUPPORTED_FEEDBACK = 'Exercise not supported'
+
+
+class SessionTable:
+    def __init__(self, capacity=64, landmark_names=None):
+        self.programs = get_exercise_programs()
+        self.exercise_names = list(self.programs)
+        self.exercise_ids = {name: i for i, name in enumerate(self.exercise_names)}
+        self.landmark_names = list(landmark_names or LANDMARK_INDICES)
+        self._landmark_index = {name: i for i, name in enumerate(self.landmark_names)}
+
+        # Per exercise: its landmark columns in the table order, feedback strings
+        # (the last one is the missing-landmarks message) and initial rep state
+        self._columns, self._messages = [], []
+        for name in self.exercise_names:
+            program = self.programs[name]
+            missing = [lm for lm in program.landmark_names if lm not in self._landmark_index]
+            if missing:
+                raise ValueError(f"{name}: landmarks {missing} are not in the table's landmark names")
+            self._columns.append(np.array([self._landmark_index[lm] for lm in program.landmark_names], dtype=np.intp))
+            self._messages.append(np.array(program.rule_messages + [program.missing_feedback], dtype=object))
+        self._initial_states = np.array([self.programs[name].initial_state for name in self.exercise_names],
+                                        dtype=np.intp)
+        self.max_display = max((len(self.programs[name].display_labels) for name in self.exercise_names), default=0)
+
+        self.capacity = 0
+        self.active = np.zeros(0, dtype=bool)
+        self.exercise_id = np.zeros(0, dtype=np.intp)
+        self.rep_states = np.zeros((0, len(self.exercise_names)), dtype=np.intp)
+        self.reps = np.zeros(0, dtype=np.int64)
+        self.sets = np.zeros(0, dtype=np.int64)
+        self.frames = np.zeros(0, dtype=np.int64)
+        self.correct_frames = np.zeros(0, dtype=np.int64)
+        self._free = []
+        self._grow(capacity)
+
+    def __len__(self):
+        return int(self.active.sum())
+
+    def _grow(self, capacity):
+        old = self.capacity
+        if capacity <= old:
+            return
+
+        def extend(column, fill):
+            grown = np.full((capacity,) + column.shape[1:], fill, dtype=column.dtype)
+            grown[:old] = column
+            return grown
+
+        self.active = extend(self.active, False)
+        self.exercise_id = extend(self.exercise_id, -1)
+        self.rep_states = extend(self.rep_states, 0)
+        self.reps = extend(self.reps, 0)
+        self.sets = extend(self.sets, 0)
+        self.frames = extend(self.frames, 0)
+        self.correct_frames = extend(self.correct_frames, 0)
+        self._free.extend(range(capacity - 1, old - 1, -1))
+        self.capacity = capacity
+
+    # Session management
+
+    def add_session(self, exercise=None):
+        """Allocate a row for a new session and return its slot"""
+        if not self._free:
+            self._grow(max(2 * self.capacity, 1))
+        slot = self._free.pop()
+        self.active[slot] = True
+        self.rep_states[slot] = self._initial_states
+        self.reset_counters(slot)
+        self.set_exercise(slot, exercise)
+        return slot
+
+    def remove_session(self, slot):
+        if self.active[slot]:
+            self.active[slot] = False
+            self.exercise_id[slot] = -1
+            self._free.append(slot)
+
+    def set_exercise(self, slot, exercise):
+        """Select an exercise by name; unknown names (or None) report 'not supported'"""
+        self.exercise_id[slot] = self.exercise_ids.get(exercise, -1)
+
+    def reset_counters(self, slot):
+        self.reps[slot] = 0
+        self.sets[slot] = 0
+        self.frames[slot] = 0
+        self.correct_frames[slot] = 0
+
+    def form_accuracy(self, slot):
+        """Percentage of frames with correct form since the last reset (None before any frame)"""
+        frames = self.frames[slot]
+        return 100.0 * self.correct_frames[slot] / frames if frames else None
+
+    # Evaluation
+
+    def pack_landmarks(self, landmark_dicts):
+        """Convert landmark dicts into (coords (M, L, 2), present (M, L)) in landmark_names order"""
+        coords = np.zeros((len(landmark_dicts), len(self.landmark_names), 2))
+        present = np.zeros((len(landmark_dicts), len(self.landmark_names)), dtype=bool)
+        index = self._landmark_index
+        for row, landmarks in enumerate(landmark_dicts):
+            row_coords, row_present = coords[row], present[row]
+            for name, point in landmarks.items():
+                i = index.get(name)
+                if i is not None:
+                    row_coords[i, 0] = point['x']
+                    row_coords[i, 1] = point['y']
+                    row_present[i] = True
+        return coords, present
+
+    def pack_pose_arrays(self, points, frame_shape):
+        """Convert raw pose output (M, 33, >=2 normalized x, y) like PoseDetector.extract_landmarks"""
+        h, w = frame_shape[:2]
+        indices = np.array([LANDMARK_INDICES[name] for name in self.landmark_names], dtype=np.intp)
+        coords = np.trunc(points[:, indices, :2] * (w, h))
+        return coords, np.ones(coords.shape[:2], dtype=bool)
+
+    def evaluate(self, slots, coords, present):
+        """Advance the sessions in slots by one frame each.
+
+        coords (M, L, 2) and present (M, L) hold one frame per slot in
+        landmark_names order; a slot may appear at most once per tick.
+        Returns a dict of per-row arrays: valid (exercise supported and
+        required landmarks present), correct_form, rep_completed, feedback
+        (strings), reps, sets and display_values (M, max_display, NaN padded;
+        labels in the exercise program's display_labels).
+        """
+        slots = np.asarray(slots, dtype=np.intp)
+        n_rows = len(slots)
+        valid_rows = np.zeros(n_rows, dtype=bool)
+        correct_form = np.zeros(n_rows, dtype=bool)
+        rep_completed = np.zeros(n_rows, dtype=bool)
+        feedback = np.full(n_rows, UNSUPPORTED_FEEDBACK, dtype=object)
+        display_values = np.full((n_rows, self.max_display), np.nan)
+
+        exercise_ids = self.exercise_id[slots]
+        for exercise in np.unique(exercise_ids):
+            if exercise < 0:
+                continue
+            program = self.programs[self.exercise_names[exercise]]
+            rows = np.flatnonzero(exercise_ids == exercise)
+            columns = self._columns[exercise]
+            group_present = present[rows[:, None], columns]
+            valid = program.has_required(group_present)
+
+            with np.errstate(invalid='ignore', divide='ignore'):
+                features = program.compute_features(coords[rows[:, None], columns], group_present)
+            predicates = program.evaluate_predicates(features)
+            group_correct, rule = program.evaluate_form(predicates)
+            group_correct &= valid
+            fired = program.evaluate_transitions(predicates) & valid[:, None]
+
+            group_slots = slots[rows]
+            states, group_reps = program.step_batch(self.rep_states[group_slots, exercise], fired, group_correct)
+            self.rep_states[group_slots, exercise] = states
+
+            valid_rows[rows] = valid
+            correct_form[rows] = group_correct
+            rep_completed[rows] = group_reps
+            feedback[rows] = self._messages[exercise][np.where(valid, rule, -1)]
+            n_display = len(program.display_index)
+            display_values[rows, :n_display] = features[:, program.display_index]
+
+        # Counters, as SessionWorker keeps them
+        self.reps[slots] += rep_completed
+        self.sets[slots] += rep_completed & (self.reps[slots] % REPS_PER_SET == 0)
+        self.frames[slots] += 1
+        self.correct_frames[slots] += correct_form
+
+        return {
+            'valid': valid_rows,
+            'correct_form': correct_form,
+            'rep_completed': rep_completed,
+            'feedback': feedback,
+            'reps': self.reps[slots],
+            'sets': self.sets[slots],
+            'display_values': display_values
+        }
+
+    def session_result(self, slot, results, row):
+        """One row of evaluate() results as an ExerciseDetector.detect_exercise dict"""
+        angles = {}
+        if results['valid'][row]:
+            labels = self.programs[self.exercise_names[self.exercise_id[slot]]].display_labels
+            angles = dict(zip(labels, results['display_values'][row, :len(labels)].tolist()))
+        return {
+            'correct_form': bool(results['correct_form'][row]),
+            'feedback': results['feedback'][row],
+            'angles': angles,
+            'rep_completed': bool(results['rep_completed'][row])
+        }
\ No newline at end of file
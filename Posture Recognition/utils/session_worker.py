@@ -0,0 +1,374 @@
+"""
+Long-lived background worker that owns the camera, detectors and rep counters.
+
+Streamlit reruns the whole script on every widget interaction. Keeping the
+capture, inference and analysis loop on its own thread (stored with
+``st.cache_resource``) means a rerun only sends control commands and reads the
+latest snapshot, so the camera and pose model are never reinitialized.
+
+Rep counting, tempo analytics and the optional event log are subscribers of
+the worker's rep event bus; their callbacks run on the worker thread. While
+the pose holds still, the change gate reuses the last analysis.
+"""
+import queue
+import threading
+
+from utils.lazy_import import lazy_import
+from utils.pose_detector import LANDMARK_INDICES, PoseDetector
+from utils.exercise_detector import ExerciseDetector
+from utils.ui_components import UIComponents
+from utils.exercise_helpers import ExerciseHelpers
+from utils.rolling_stats import RollingWindow
+from utils.feature_graph import FeatureGraph
+from utils.session_recording import SessionRecording
+from utils.exercise_recognizer import create_recognizer
+from utils.rep_events import REP_COMPLETED, EventBus, EventLogWriter, TempoAnalytics
+from utils.change_gate import ChangeGate, landmark_points
+from config.exercise_config import CHANGE_GATE_CONFIG, EXERCISE_CONFIG, FEATURE_DEFINITIONS, RECOGNITION_CONFIG
+
+cv2 = lazy_import('cv2')
+
+NO_POSE_MESSAGE = "No pose detected. Please ensure you're visible in the camera."
+
+
+class SessionWorker:
+    def __init__(self, camera_index=0, width=640, height=480, fps=None, streamer=None, **settings):
+        self.camera_index = camera_index
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.streamer = streamer
+        self.settings = {
+            'show_skeleton': True,
+            'show_angles': True,
+            'validate_landmarks': False,
+            'show_rep_counter': False,
+            'auto_detect_exercise': False,
+            'change_gate': True,
+            'form_accuracy_window': 30
+        }
+        self.settings.update(settings)
+
+        # State owned by the worker thread
+        self.exercise = None
+        self.reps = 0
+        self.sets = 0
+        self.form_accuracy_history = RollingWindow(self.settings['form_accuracy_window'])
+        self.cap = None
+        self.pose_detector = None
+        self.exercise_detector = None
+        self.ui_components = None
+        self.exercise_recognizer = None
+        # Frames that cannot be judged are rejected before the analysis (validate_landmarks)
+        self.quality_gate = ExerciseHelpers.create_quality_gate()
+        # Analysis reuse while the pose holds still
+        self.change_gate = ChangeGate(CHANGE_GATE_CONFIG['epsilon'], CHANGE_GATE_CONFIG['max_reuse'])
+        self.last_exercise_data = None
+        # Per-frame feature cache shared by the detector and helpers
+        self.feature_graph = FeatureGraph(FEATURE_DEFINITIONS)
+        # Landmarks of analysed frames while recording (for offline re-scoring)
+        self.recording = None
+        # Phase and rep events of the exercise detector
+        self.events = EventBus()
+        self.tempo = TempoAnalytics({name: spec.get('tempo_phases', {}) for name, spec in EXERCISE_CONFIG.items()})
+        self.events.subscribe(self._count_rep)
+        self.events.subscribe(self.tempo.on_event)
+        self.event_log = None
+        # Last reference-rep match per exercise
+        self.rep_matches = {}
+
+        # State shared with the Streamlit script thread
+        self.camera_requested = False
+        self.last_error = None
+        self._commands = queue.Queue()
+        self._snapshot_lock = threading.Lock()
+        self._snapshot = None
+        self._frame_id = 0
+        self._shutdown = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the worker thread (idempotent; restarts a thread that has ended)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="session-worker", daemon=True)
+            self._thread.start()
+        return self
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def shutdown(self):
+        """Stop the worker thread and release the camera"""
+        self._shutdown.set()
+        self._commands.put(('noop', None))
+
+    # Control commands (called from the Streamlit script thread)
+
+    def start_camera(self):
+        self.camera_requested = True
+        if self.is_alive():
+            # A thread that ended keeps its error until it is restarted
+            self.last_error = None
+        self._commands.put(('start_camera', None))
+
+    def stop_camera(self):
+        self.camera_requested = False
+        self._commands.put(('stop_camera', None))
+
+    def reset_counters(self):
+        self._commands.put(('reset_counters', None))
+
+    def set_exercise(self, exercise):
+        if exercise != self.exercise:
+            self._commands.put(('set_exercise', exercise))
+
+    def start_recording(self):
+        self._commands.put(('start_recording', None))
+
+    def stop_recording(self, path):
+        """Stop recording and save the session to path (.npz)"""
+        self._commands.put(('stop_recording', path))
+
+    def start_event_log(self, path):
+        """Append every rep event to path as JSON lines until stop_event_log"""
+        self._commands.put(('start_event_log', path))
+
+    def stop_event_log(self):
+        self._commands.put(('stop_event_log', None))
+
+    def subscribe(self, callback):
+        """Receive rep events; callback(event) runs on the worker thread and must be quick"""
+        return self.events.subscribe(callback)
+
+    def update_settings(self, **settings):
+        changed = {key: value for key, value in settings.items() if self.settings.get(key) != value}
+        if changed:
+            self._commands.put(('update_settings', changed))
+
+    def get_snapshot(self):
+        """Return the most recently published snapshot (or None)"""
+        with self._snapshot_lock:
+            return self._snapshot
+
+    # Worker thread
+
+    def _run(self):
+        try:
+            self._set_up()
+        except Exception as e:
+            self._fail(f"Could not start pose detection: {e}")
+            return
+
+        while not self._shutdown.is_set():
+            try:
+                self._step()
+            except Exception as e:
+                # The thread keeps serving commands; the camera stays off until started again
+                self._fail(f"Frame processing failed: {e}")
+
+        self._release_camera()
+        self._close_event_log()
+
+    def _set_up(self):
+        # Heavy imports and graph initialization happen here, while the page renders
+        self.pose_detector = PoseDetector()
+        self.pose_detector.warm_up((self.height, self.width, 3))
+        self.exercise_detector = ExerciseDetector(self.events)
+        self.ui_components = UIComponents()
+        self.exercise_recognizer = create_recognizer(RECOGNITION_CONFIG)
+
+    def _step(self):
+        self._drain_commands(block=self.cap is None)
+        if self.cap is None:
+            return
+
+        ret, frame = self.cap.read()
+        if not ret:
+            self._fail("Failed to read from camera")
+            return
+
+        self._publish(self._process_frame(frame))
+
+    def _drain_commands(self, block):
+        try:
+            command = self._commands.get(timeout=0.1) if block else self._commands.get_nowait()
+        except queue.Empty:
+            return
+
+        while True:
+            self._handle_command(*command)
+            try:
+                command = self._commands.get_nowait()
+            except queue.Empty:
+                return
+
+    def _handle_command(self, name, value):
+        if name == 'start_camera':
+            self._open_camera()
+        elif name == 'stop_camera':
+            self._release_camera()
+        elif name == 'reset_counters':
+            self.reps = 0
+            self.sets = 0
+            self.form_accuracy_history.clear()
+            self.tempo.reset()
+            # Otherwise a rep half done before the reset would be counted after it
+            self.exercise_detector.reset()
+            self.last_exercise_data = None
+            self.change_gate.reset_stats()
+            self.rep_matches.clear()
+        elif name == 'set_exercise':
+            self.exercise = value
+        elif name == 'update_settings':
+            self.settings.update(value)
+        elif name == 'start_recording':
+            self.recording = SessionRecording()
+        elif name == 'stop_recording':
+            if self.recording is not None:
+                self.recording.save(value)
+                self.recording = None
+        elif name == 'start_event_log':
+            self._close_event_log()
+            self.event_log = self.events.subscribe(EventLogWriter(value))
+        elif name == 'stop_event_log':
+            self._close_event_log()
+
+    def _close_event_log(self):
+        if self.event_log is not None:
+            self.events.unsubscribe(self.event_log)
+            self.event_log.close()
+            self.event_log = None
+
+    def _count_rep(self, event):
+        if event.kind == REP_COMPLETED:
+            self.reps += 1
+            if self.reps % 10 == 0:  # New set every 10 reps
+                self.sets += 1
+
+    def _open_camera(self):
+        if self.cap is not None:
+            return
+
+        cap = cv2.VideoCapture(self.camera_index)
+        if not cap.isOpened():
+            self._fail("Could not open camera. Please check your webcam connection.")
+            return
+
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        if self.fps:
+            cap.set(cv2.CAP_PROP_FPS, self.fps)
+        self.cap = cap
+
+    def _release_camera(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def _fail(self, message):
+        self.last_error = message
+        self.camera_requested = False
+        self._release_camera()
+
+    def _publish(self, snapshot):
+        self._frame_id += 1
+        snapshot['frame_id'] = self._frame_id
+        with self._snapshot_lock:
+            self._snapshot = snapshot
+
+    def _process_frame(self, frame):
+        """Run detection and analysis on one frame and build a snapshot"""
+        settings = self.settings
+        exercise = self.exercise
+
+        # Flip frame horizontally for mirror effect
+        frame = cv2.flip(frame, 1)
+        annotated_frame = frame
+        exercise_data = None
+        message = None
+
+        results = self.pose_detector.detect_pose(frame)
+
+        if results.pose_landmarks:
+            landmarks = self.pose_detector.extract_landmarks(results.pose_landmarks, frame.shape)
+            # Only a frame that passed the gate is reused, so an unchanged pose skips the gate as well
+            reuse = (settings['change_gate'] and self.last_exercise_data is not None and
+                     self.change_gate.unchanged(landmark_points(landmarks, LANDMARK_INDICES), exercise))
+            is_valid = True
+            if settings['validate_landmarks'] and not reuse:
+                raw = self.pose_detector.landmark_array(results.pose_landmarks)
+                is_valid, message = ExerciseHelpers.check_landmark_quality(
+                    self.quality_gate, exercise, raw[:, :2], raw[:, 2])
+                if not is_valid:
+                    # Nothing is reused across a rejected frame
+                    self.last_exercise_data = None
+                    self.change_gate.invalidate()
+
+            if is_valid:
+                message = None
+                if settings['show_skeleton']:
+                    annotated_frame = self.ui_components.draw_pose_skeleton(frame, landmarks)
+
+                recognizer = self.exercise_recognizer if settings['auto_detect_exercise'] else None
+                if reuse:
+                    exercise_data = self.last_exercise_data
+                    recognized = recognizer.repeat() if recognizer is not None else None
+                else:
+                    features = self.feature_graph.new_frame(landmarks)
+                    # Completed reps arrive through the event bus (_count_rep)
+                    exercise_data = self.exercise_detector.detect_exercise(exercise, landmarks, features)
+                    if exercise_data.get('rep_match') is not None:
+                        self.rep_matches[exercise] = exercise_data['rep_match']
+                    # A reused analysis does not complete the rep again
+                    self.last_exercise_data = dict(exercise_data, rep_completed=False, rep_match=None)
+                    # After the analysis, so the features it published are not computed again
+                    recognized = recognizer.update(features) if recognizer is not None else None
+
+                # Switch from the next frame once the recognizer is confident about a different exercise
+                if recognized is not None and recognized != exercise:
+                    self.exercise = recognized
+
+                if self.recording is not None:
+                    self.recording.append(landmarks, exercise)
+
+                # Track form accuracy over the last form_accuracy_window frames
+                self.form_accuracy_history.push(1.0 if exercise_data['correct_form'] else 0.0)
+
+                counter = (self.reps, self.sets) if settings['show_rep_counter'] else None
+                angles = exercise_data['angles'] if settings['show_angles'] else {}
+                annotated_frame = self._draw_overlay(annotated_frame, exercise_data, angles, counter)
+        else:
+            message = NO_POSE_MESSAGE
+
+        form_accuracy = None
+        if len(self.form_accuracy_history):
+            form_accuracy = 100.0 * float(self.form_accuracy_history.mean())
+
+        # With the MJPEG transport the frame is encoded once and never sent through st.image
+        if self.streamer is not None:
+            self.streamer.publish(annotated_frame)
+            display_frame = None
+        else:
+            display_frame = cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB)
+
+        return {
+            'exercise': exercise,
+            'frame': display_frame,
+            'exercise_data': exercise_data,
+            'message': message,
+            'reps': self.reps,
+            'sets': self.sets,
+            'form_accuracy': form_accuracy,
+            'tempo': self.tempo.summary(exercise),
+            'rep_match': self.rep_matches.get(exercise),
+            'change_gate': self.change_gate.stats(),
+            'quality_gate': self.quality_gate.stats()
+        }
+
+    def _draw_overlay(self, canvas, exercise_data, angles, counter):
+        if angles:
+            canvas = self.ui_components.draw_angles(canvas, angles)
+        canvas = self.ui_components.draw_feedback(canvas, exercise_data)
+        if counter is not None:
+            canvas = self.ui_components.draw_rep_counter(canvas, *counter)
+        return canvas
\ No newline at end of file
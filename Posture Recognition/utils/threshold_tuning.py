@@ -0,0 +1,208 @@
+"""
+Vectorized replay of labelled sessions for offline threshold tuning.
+
+Tuning replays the same cached landmarks under thousands of candidate
+threshold sets. Everything that does not depend on the thresholds (features,
+scale features, landmark validity, pose-specific checks) is computed once;
+a chunk of K candidates is then evaluated as (K, N) boolean arrays:
+
+- ExerciseReplay: rep counts of an ExerciseProgram per candidate and session.
+  Only the predicates that can change rep counts are evaluated (the rep
+  transitions and the feedback stages that mark the form incorrect), and the
+  rep state machine runs over concatenated sessions with per-session restarts.
+- RangeReplay: pose detection from "angle within [min, max]" criteria, the
+  scoring AsanaDetector uses, against per-frame pose labels.
+
+The search helpers draw candidates around the current values (random or
+grid); row 0 is always the current configuration so it can be compared.
+"""
+import itertools
+
+import numpy as np
+
+
+def rep_count_metrics(counts, truth):
+    """Rep counting quality of candidates: counts (K, S) against true counts (S,).
+
+    Precision and recall treat every rep as an event: matched reps are
+    min(counted, true) per session.
+    """
+    counts = np.asarray(counts)
+    truth = np.asarray(truth)
+    matched = np.minimum(counts, truth).sum(axis=-1)
+    counted = counts.sum(axis=-1)
+    total = truth.sum()
+    precision = np.where(counted > 0, matched / np.maximum(counted, 1), 1.0 if total == 0 else 0.0)
+    recall = matched / total if total else np.ones(len(counts))
+    return {
+        'mae': np.abs(counts - truth).mean(axis=-1),
+        'precision': precision,
+        'recall': recall,
+        'f1': _f1(precision, recall)
+    }
+
+
+def detection_metrics(predicted, positive):
+    """Frame detection quality of candidates: predicted (K, N) against labels (N,)"""
+    positive = np.asarray(positive, dtype=bool)
+    true_positive = (predicted & positive).sum(axis=-1)
+    detected = predicted.sum(axis=-1)
+    precision = np.where(detected > 0, true_positive / np.maximum(detected, 1), 0.0)
+    recall = true_positive / max(int(positive.sum()), 1)
+    return {'precision': precision, 'recall': recall, 'f1': _f1(precision, recall)}
+
+
+def _f1(precision, recall):
+    total = precision + recall
+    return np.where(total > 0, 2 * precision * recall / np.where(total > 0, total, 1.0), 0.0)
+
+
+def random_candidates(base, low, high, n, rng):
+    """n candidates drawn uniformly within [low, high] per column; row 0 is base"""
+    base = np.asarray(base, dtype=np.float64)
+    candidates = rng.uniform(low, high, size=(n, len(base)))
+    candidates[0] = base
+    return candidates
+
+
+def grid_candidates(base, low, high, points, limit=1_000_000):
+    """Every combination of `points` evenly spaced values per column; row 0 is base"""
+    base = np.asarray(base, dtype=np.float64)
+    size = points ** len(base)
+    if size > limit:
+        raise ValueError(f"grid of {size} candidates exceeds the limit of {limit}; "
+                         f"use fewer points or random search")
+    axes = [np.linspace(lo, hi, points) for lo, hi in zip(np.broadcast_to(low, base.shape),
+                                                           np.broadcast_to(high, base.shape))]
+    grid = np.array(list(itertools.product(*axes)), dtype=np.float64).reshape(-1, len(base))
+    return np.vstack((base, grid))
+
+
+class ExerciseReplay:
+    """Labelled sessions of one exercise, replayed for many threshold candidates.
+
+    sessions is a list of (coords (N, L, 2), present (N, L)) in the program's
+    landmark order; each session starts from the initial rep state.
+    """
+
+    def __init__(self, program, sessions, threshold_names=None):
+        self.program = program
+        self.threshold_names = list(program.rep_thresholds() if threshold_names is None else threshold_names)
+
+        lengths = [len(coords) for coords, _ in sessions]
+        coords = np.concatenate([coords for coords, _ in sessions])
+        present = np.concatenate([present for _, present in sessions])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            features = program.compute_features(coords, present)
+        self.valid = program.has_required(present)
+        self.n_frames = len(features)
+
+        # Session starts, and per frame the first frame of its session
+        self.session_starts = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.intp)
+        self.frame_starts = np.repeat(self.session_starts, lengths)
+
+        # Predicates that can change rep counts
+        gate = np.isin(program.rule_stage, program.rule_stage[program.rule_incorrect > 0])
+        self.gate_stages = []
+        for stage in np.unique(program.rule_stage[gate]):
+            rules = np.flatnonzero(program.rule_stage == stage)
+            self.gate_stages.append([(np.flatnonzero(program.rule_matrix[rule]), program.rule_incorrect[rule] > 0)
+                                     for rule in rules])
+        self.transition_preds = [np.flatnonzero(row) for row in program.transition_matrix]
+        used = np.zeros(len(program.pred_feature), dtype=bool)
+        for stage in self.gate_stages:
+            for preds, _ in stage:
+                used[preds] = True
+        for preds in self.transition_preds:
+            used[preds] = True
+
+        # Predicate inputs; those whose threshold is not tuned are evaluated once
+        tuned = set(self.threshold_names)
+        self.tuned_preds = [pred for pred in np.flatnonzero(used)
+                            if any(name in tuned for name in program.pred_terms[pred][1])]
+        self.lo = features[:, program.pred_feature] * program.pred_sign
+        self.scale = features[:, program.pred_scale]
+        self.fixed = program.evaluate_predicates(features) > 0
+
+    def base_values(self):
+        return np.array([self.program.threshold_values[name] for name in self.threshold_names])
+
+    def _predicate(self, pred, thresholds):
+        program = self.program
+        lo, hi = self.lo[:, pred], thresholds[:, pred, None] * self.scale[:, pred]
+        return ((lo < hi) if program.pred_strict[pred] else (lo <= hi)) != program.pred_negate[pred]
+
+    def _all(self, preds, values, shape):
+        result = np.ones(shape, dtype=bool)
+        for pred in preds:
+            result &= values[pred]
+        return result
+
+    def rep_counts(self, candidates, chunk_frames=4_000_000):
+        """Counted reps (K, S) per candidate (K, len(threshold_names)) and session"""
+        program = self.program
+        candidates = np.atleast_2d(candidates)
+        thresholds = program.candidate_thresholds(self.threshold_names, candidates)
+        counts = np.zeros((len(candidates), len(self.session_starts)), dtype=np.int64)
+        if not len(program.transition_matrix) or not self.n_frames:
+            return counts
+
+        chunk = max(1, chunk_frames // self.n_frames)
+        counts_rep = np.append(program.transition_counts, False)
+        for begin in range(0, len(candidates), chunk):
+            block = thresholds[begin:begin + chunk]
+            shape = (len(block), self.n_frames)
+            values = {pred: self.fixed[:, pred] for pred in range(self.fixed.shape[1])}
+            values.update({pred: self._predicate(pred, block) for pred in self.tuned_preds})
+
+            # Form gate: within a stage the first matching rule wins
+            correct_form = np.broadcast_to(self.valid, shape).copy()
+            for stage in self.gate_stages:
+                undecided = np.ones(shape, dtype=bool)
+                for preds, incorrect in stage:
+                    fired = undecided & self._all(preds, values, shape)
+                    undecided &= ~fired
+                    if incorrect:
+                        correct_form &= ~fired
+
+            fired = np.stack([self._all(preds, values, shape) & self.valid for preds in self.transition_preds],
+                             axis=-1)
+            _, taken = program._propagate_states(fired, program.initial_state, self.frame_starts)
+            reps = counts_rep[taken] & correct_form
+            counts[begin:begin + chunk] = np.add.reduceat(reps, self.session_starts, axis=1)
+        return counts
+
+
+class RangeReplay:
+    """Frames of one pose, scored like AsanaDetector.detect_asana for many range candidates.
+
+    angles (N, J) holds the criteria joints (NaN when missing), special_score
+    (N,) the fraction of passed special checks, and positive (N,) whether a
+    frame is labelled as this pose. A frame is detected when the mean of the
+    in-range angle fraction and special_score reaches min_score.
+    """
+
+    def __init__(self, angles, special_score, positive, min_score=0.8):
+        self.angles = np.asarray(angles, dtype=np.float64)
+        self.special_score = np.asarray(special_score, dtype=np.float64)
+        self.positive = np.asarray(positive, dtype=bool)
+        self.min_score = min_score
+
+    def detected(self, bounds):
+        """Detected frames (K, N) for candidate ranges bounds (K, J, 2)"""
+        bounds = np.asarray(bounds, dtype=np.float64)
+        n_joints = self.angles.shape[1]
+        matches = np.zeros((len(bounds), len(self.angles)), dtype=np.intp)
+        for joint in range(n_joints):
+            angle = self.angles[:, joint]
+            matches += (bounds[:, joint, :1] <= angle) & (angle <= bounds[:, joint, 1:])
+        angle_score = matches / n_joints if n_joints else 1.0
+        return (angle_score + self.special_score) / 2 >= self.min_score
+
+    def metrics(self, bounds, chunk_frames=8_000_000):
+        """detection_metrics of every candidate"""
+        bounds = np.asarray(bounds, dtype=np.float64)
+        chunk = max(1, chunk_frames // max(len(self.angles), 1))
+        parts = [detection_metrics(self.detected(bounds[begin:begin + chunk]), self.positive)
+                 for begin in range(0, len(bounds), chunk)]
+        return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
\ No newline at end of file
@@ -1,5 +1,7 @@
-import cv2
 import numpy as np
+from utils.lazy_import import lazy_import
+
+cv2 = lazy_import('cv2')
 
 class UIComponents:
     def __init__(self):
@@ -38,6 +40,20 @@ class UIComponents:
             ('left_eye', 'left_ear'),
             ('right_eye', 'right_ear')
         ]
+        
+        # Ideal angle ranges for different body parts, matched by substring of the angle name
+        self.ideal_ranges = {
+            'elbow': (80, 100),      # For push-ups and bicep curls
+            'knee': (80, 100),       # For squats
+            'hip': (160, 200),       # For body alignment
+            'body': (170, 190),      # For plank alignment
+            'torso': (120, 160),     # For crunches and sit-ups
+            'shoulder': (100, 140),  # For pull-ups and jumping jacks
+            'rotation': (20, 80),    # For Russian twists
+            'distance': (50, 150)    # For jumping jacks feet distance
+        }
+        # Angle name -> matched range (or None), resolved once per name
+        self._angle_ranges = {}
     
     def draw_pose_skeleton(self, frame, landmarks):
         """Draw pose skeleton with joints and connections"""
@@ -65,19 +81,19 @@ class UIComponents:
         
         return annotated_frame
     
+    def angle_labels(self, angles):
+        """(text, color) of every angle as draw_angles shows it"""
+        return tuple((f"{angle_name.replace('_', ' ').title()}: {angle_value:.1f}°",
+                      self._get_angle_color(angle_name, angle_value))
+                     for angle_name, angle_value in angles.items())
+    
     def draw_angles(self, frame, angles):
         """Draw angle measurements on the frame"""
         annotated_frame = frame.copy()
         
         # Position angles on the frame
         y_offset = 30
-        for angle_name, angle_value in angles.items():
-            # Format angle text
-            angle_text = f"{angle_name.replace('_', ' ').title()}: {angle_value:.1f}°"
-            
-            # Choose color based on angle name and value
-            color = self._get_angle_color(angle_name, angle_value)
-            
+        for angle_text, color in self.angle_labels(angles):
             # Draw background rectangle
             text_size = cv2.getTextSize(angle_text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
             cv2.rectangle(annotated_frame, (10, y_offset - 25), 
@@ -132,30 +148,26 @@ class UIComponents:
         
         return annotated_frame
     
+    def _get_angle_range(self, angle_name):
+        """Find the ideal range for an angle name (memoized per name)"""
+        if angle_name not in self._angle_ranges:
+            lowered = angle_name.lower()
+            self._angle_ranges[angle_name] = next(
+                (value_range for key, value_range in self.ideal_ranges.items() if key in lowered), None)
+        return self._angle_ranges[angle_name]
+    
     def _get_angle_color(self, angle_name, angle_value):
         """Get color for angle display based on expected ranges"""
-        # Define ideal angle ranges for different body parts
-        ideal_ranges = {
-            'elbow': (80, 100),      # For push-ups and bicep curls
-            'knee': (80, 100),       # For squats
-            'hip': (160, 200),       # For body alignment
-            'body': (170, 190),      # For plank alignment
-            'torso': (120, 160),     # For crunches and sit-ups
-            'shoulder': (100, 140),  # For pull-ups and jumping jacks
-            'rotation': (20, 80),    # For Russian twists
-            'distance': (50, 150)    # For jumping jacks feet distance
-        }
-        
-        # Find matching range
-        for key, (min_val, max_val) in ideal_ranges.items():
-            if key in angle_name.lower():
-                if min_val <= angle_value <= max_val:
-                    return self.colors['correct']
-                else:
-                    return self.colors['incorrect']
+        value_range = self._get_angle_range(angle_name)
         
         # Default to white if no specific range found
-        return self.colors['angle_text']
+        if value_range is None:
+            return self.colors['angle_text']
+        
+        min_val, max_val = value_range
+        if min_val <= angle_value <= max_val:
+            return self.colors['correct']
+        return self.colors['incorrect']
     
     def _wrap_text(self, text, max_chars):
         """Wrap text to fit within specified character limit"""
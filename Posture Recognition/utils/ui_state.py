@@ -0,0 +1,94 @@
+"""
+Diff-based, rate-limited rendering of the Streamlit statistics panel.
+
+Every placeholder write is a round trip to the browser, so the panel is
+described as a small UI state dict built from the worker snapshot. Only the
+entries that changed since the last render are written, and text/metric
+refreshes are capped at ``refresh_hz`` independently of the video rate.
+"""
+import time
+
+
+def build_stats_state(snapshot):
+    """Build the statistics panel state from a session worker snapshot"""
+    exercise_data = snapshot['exercise_data']
+    if exercise_data is None:
+        # Keep the last rendered stats, only the warning changes
+        return {'feedback': ('warning', snapshot['message'])}
+
+    state = {
+        'exercise': snapshot['exercise'],
+        'reps': snapshot['reps'],
+        'sets': snapshot['sets'],
+        'status': bool(exercise_data['correct_form']),
+        'feedback': ('info', exercise_data['feedback'])
+    }
+
+    if snapshot.get('form_accuracy') is not None:
+        state['form_accuracy'] = f"{snapshot['form_accuracy']:.1f}%"
+
+    tempo = snapshot.get('tempo')
+    if tempo is not None:
+        text = f"{tempo['verdict']} ({tempo['duration']:.1f}s last rep, {tempo['average_duration']:.1f}s average)"
+        if tempo['eccentric'] is not None and tempo['concentric'] is not None:
+            text += f"\nLowering {tempo['eccentric']:.1f}s / lifting {tempo['concentric']:.1f}s"
+        state['tempo'] = text
+
+    rep_match = snapshot.get('rep_match')
+    if rep_match is not None:
+        state['rep_match'] = (f"{rep_match['similarity']:.0%} similar to the reference rep "
+                              f"(furthest off in the {rep_match['worst_phase']} phase)")
+
+    if exercise_data['angles']:
+        angle_text = []
+        for angle_name, angle_value in exercise_data['angles'].items():
+            if isinstance(angle_value, (int, float)):
+                angle_text.append(f"{angle_name}: {angle_value:.1f}°")
+        state['angles'] = "\n".join(angle_text)
+
+    return state
+
+
+class UIStateRenderer:
+    def __init__(self, refresh_hz=4.0):
+        self.refresh_interval = 1.0 / refresh_hz if refresh_hz else 0.0
+        self.last_refresh = None
+        self.rendered = {}
+        self.widget_writes = 0
+        self.skipped_writes = 0
+
+    def is_due(self, now=None):
+        """Check whether the refresh interval has elapsed"""
+        if self.last_refresh is None:
+            return True
+        now = time.monotonic() if now is None else now
+        return now - self.last_refresh >= self.refresh_interval
+
+    def render(self, state, widgets, now=None):
+        """Write changed state entries through their widget callbacks.
+
+        ``widgets`` maps each state key to a callable taking the new value;
+        keys without a widget are ignored. Returns True if a refresh happened
+        (even if nothing had changed).
+        """
+        now = time.monotonic() if now is None else now
+        if not self.is_due(now):
+            return False
+        self.last_refresh = now
+
+        for key, value in state.items():
+            if key not in widgets:
+                continue
+            if key in self.rendered and self.rendered[key] == value:
+                self.skipped_writes += 1
+                continue
+            widgets[key](value)
+            self.rendered[key] = value
+            self.widget_writes += 1
+
+        return True
+
+    def invalidate(self):
+        """Force every widget to be rewritten on the next refresh"""
+        self.rendered = {}
+        self.last_refresh = None
\ No newline at end of file
@@ -0,0 +1,170 @@
+"""
+MJPEG video transport for the Streamlit apps.
+
+Pushing a raw RGB array through ``st.image`` every frame makes Streamlit
+re-encode the frame and send it over the websocket. The streamer instead
+encodes each annotated frame once with ``cv2.imencode`` and serves it from a
+small local HTTP endpoint as ``multipart/x-mixed-replace`` that the page embeds
+with a plain ``<img>`` tag. Every client always receives the newest frame:
+frames published while a client is still writing are dropped for that client,
+and nothing is encoded while nobody is watching.
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.lazy_import import lazy_import
+
+cv2 = lazy_import('cv2')
+
+STREAM_PATH = '/stream.mjpg'
+
+
+class JpegEncoder:
+    def __init__(self, quality=80, scale=1.0):
+        self.params = [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)]
+        self.scale = scale
+        self._resized = None
+
+    def encode(self, frame):
+        """Encode a BGR frame to JPEG, downscaling into a reused buffer"""
+        if self.scale != 1.0:
+            h, w = frame.shape[:2]
+            size = (max(1, int(w * self.scale)), max(1, int(h * self.scale)))
+            if self._resized is None or self._resized.shape[:2] != (size[1], size[0]):
+                self._resized = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            else:
+                cv2.resize(frame, size, dst=self._resized, interpolation=cv2.INTER_AREA)
+            frame = self._resized
+
+        ok, buffer = cv2.imencode('.jpg', frame, self.params)
+        return buffer if ok else None
+
+
+class _StreamHandler(BaseHTTPRequestHandler):
+    streamer = None
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', STREAM_PATH):
+            self.send_error(404)
+            return
+        self.streamer.serve_client(self)
+
+    def log_message(self, format, *args):
+        # Keep the Streamlit console quiet
+        pass
+
+
+class MJPEGStreamer:
+    def __init__(self, host='127.0.0.1', port=8765, jpeg_quality=80, scale=1.0, public_url=None):
+        self.host = host
+        self.port = port
+        self.public_url = public_url
+        self.encoder = JpegEncoder(jpeg_quality, scale)
+
+        self._condition = threading.Condition()
+        self._jpeg = None
+        self._seq = 0
+        self._server = None
+        self._thread = None
+
+        # Diagnostics
+        self.clients = 0
+        self.frames_encoded = 0
+        self.frames_sent = 0
+        self.frames_dropped = 0
+
+    @property
+    def url(self):
+        if self.public_url:
+            return self.public_url
+        return f"http://{self.host}:{self.port}{STREAM_PATH}"
+
+    def start(self):
+        """Start serving in a background thread (idempotent)"""
+        if self._server is None:
+            handler = type('StreamHandler', (_StreamHandler,), {'streamer': self})
+            self._server = ThreadingHTTPServer((self.host, self.port), handler)
+            self._server.daemon_threads = True
+            self._thread = threading.Thread(target=self._server.serve_forever, name="mjpeg-streamer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        with self._condition:
+            self._condition.notify_all()
+
+    def html(self, width="100%"):
+        """Markup embedding the stream in a Streamlit page"""
+        return f'<img src="{self.url}" style="width: {width};" alt="Live camera feed"/>'
+
+    def publish(self, frame):
+        """Encode and publish a BGR frame; skipped while no client is connected"""
+        if self.clients == 0:
+            return False
+
+        jpeg = self.encoder.encode(frame)
+        if jpeg is None:
+            return False
+
+        with self._condition:
+            self._jpeg = jpeg
+            self._seq += 1
+            self.frames_encoded += 1
+            self._condition.notify_all()
+        return True
+
+    def serve_client(self, handler):
+        """Stream frames to one client until it disconnects"""
+        handler.send_response(200)
+        handler.send_header('Cache-Control', 'no-cache, private')
+        handler.send_header('Pragma', 'no-cache')
+        handler.send_header('Content-Type', 'multipart/x-mixed-replace; boundary=frame')
+        handler.end_headers()
+
+        with self._condition:
+            self.clients += 1
+            last_seq = self._seq
+
+        try:
+            while self._server is not None:
+                with self._condition:
+                    # Wake up on the newest frame only; anything in between is dropped
+                    if not self._condition.wait_for(lambda: self._seq != last_seq or self._server is None,
+                                                    timeout=1.0):
+                        continue
+                    jpeg = self._jpeg
+                    if last_seq:
+                        self.frames_dropped += self._seq - last_seq - 1
+                    last_seq = self._seq
+
+                if jpeg is None:
+                    continue
+
+                handler.wfile.write(b'--frame\r\nContent-Type: image/jpeg\r\n')
+                handler.wfile.write(b'Content-Length: %d\r\n\r\n' % len(jpeg))
+                handler.wfile.write(jpeg)
+                handler.wfile.write(b'\r\n')
+                self.frames_sent += 1
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with self._condition:
+                self.clients -= 1
+
+
+def create_streamer(transport_config):
+    """Build and start an MJPEG streamer, or return None for st.image transport"""
+    if transport_config.get('mode', 'image') != 'mjpeg':
+        return None
+
+    return MJPEGStreamer(
+        host=transport_config.get('host', '127.0.0.1'),
+        port=transport_config.get('port', 8765),
+        jpeg_quality=transport_config.get('jpeg_quality', 80),
+        scale=transport_config.get('scale', 1.0),
+        public_url=transport_config.get('public_url')
+    ).start()
\ No newline at end of file
@@ -4,7 +4,7 @@ import requests
 import json
 from dotenv import load_dotenv
 import os
-from langchain_groq import ChatGroq
+from functools import lru_cache
 
 load_dotenv()
 
@@ -51,14 +51,20 @@ def chat():
     except requests.exceptions.RequestException as e:
         return jsonify({"response": "Error: " + str(e)})
 
-@app.route('/api/chat2', methods=['POST'])
-def chat2():
-    user_input = request.json.get('message')
-    llm = ChatGroq(
+@lru_cache(maxsize=1)
+def get_groq_llm():
+    # langchain is slow to import, so load it on the first chat2 request
+    from langchain_groq import ChatGroq
+    return ChatGroq(
         model_name="llama-3.3-70b-versatile", 
         api_key=os.getenv("GROQ_API_KEY")
     )
 
+@app.route('/api/chat2', methods=['POST'])
+def chat2():
+    user_input = request.json.get('message')
+    llm = get_groq_llm()
+
     res = llm.invoke(
        "give small and quick replies like human to the user query, " + user_input
     )